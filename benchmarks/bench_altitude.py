@@ -0,0 +1,92 @@
+"""Lecture des altitudes dans un MNT SRTM et détection du relief.
+
+Des dalles SRTM 3" synthétiques (collines et petites bosses) sont écrites
+dans un dossier temporaire autour d'Évreux. On compare la lecture groupée des
+altitudes de tous les points d'une étape de 100 km à une lecture point par
+point, puis on traite un rallye de 10 étapes avec un modèle partagé pour
+vérifier que chaque dalle n'est ouverte qu'une fois.
+
+Lancement depuis la racine du dépôt :
+    python -m benchmarks.bench_altitude
+"""
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.itineraires import DEPART, itineraire_synthetique
+from rally.altitude import ModeleTerrain, annoter_relief
+from rally.presets import PRESETS
+from rally.roadbook import TYPES_RELIEF, Roadbook
+
+COTE = 1201  # SRTM 3"
+
+
+def relief_synthetique(lon, lat):
+    """Altitude (m) : vallonnement, ondulations de quelques centaines de mètres et bosses"""
+    x = (lon - DEPART[0]) * 73_000
+    y = (lat - DEPART[1]) * 111_000
+    return (120 + 40 * np.sin(x / 2500) * np.cos(y / 3100)
+            + 8 * np.sin(x / 90 + 1.3) * np.sin(y / 110)
+            + 3 * np.sin((x + y) / 60))
+
+
+def ecrire_dalles(dossier):
+    for lat in range(48, 51):
+        for lon in range(0, 4):
+            i, j = np.meshgrid(np.arange(COTE), np.arange(COTE), indexing="ij")
+            z = relief_synthetique(lon + j / (COTE - 1), lat + 1 - i / (COTE - 1))
+            z.round().astype(">i2").tofile(os.path.join(dossier, f"N{lat:02d}E{lon:03d}.hgt"))
+
+
+def main():
+    reglage = PRESETS["phase1_2"]
+    with tempfile.TemporaryDirectory() as dossier:
+        debut = time.perf_counter()
+        ecrire_dalles(dossier)
+        print(f"12 dalles SRTM 3\" écrites en {time.perf_counter() - debut:.1f}s")
+
+        roadbook = reglage.analyser(itineraire_synthetique(2_400, graine=3))
+        points = np.asarray(roadbook.coordinates)
+        modele = ModeleTerrain(dossier)
+        modele.altitudes(points[:1, 0], points[:1, 1])  # Ouverture des dalles hors chronométrage
+
+        debut = time.perf_counter()
+        groupees = modele.altitudes(points[:, 0], points[:, 1])
+        t_groupe = time.perf_counter() - debut
+        debut = time.perf_counter()
+        une_a_une = np.array([modele.altitudes(lon, lat) for lon, lat in points])
+        t_point = time.perf_counter() - debut
+        print(f"{len(points)} points : groupé {t_groupe * 1000:.1f} ms, point par point {t_point * 1000:.0f} ms "
+              f"(gain {t_point / t_groupe:.0f}x), identiques : {np.allclose(groupees, une_a_une)}")
+        erreur = np.abs(groupees - relief_synthetique(points[:, 0], points[:, 1]))
+        print(f"écart au relief exact : médiane {np.median(erreur):.2f} m, max {erreur.max():.2f} m")
+
+        debut = time.perf_counter()
+        annoter_relief(roadbook, modele)
+        types = np.bincount(roadbook.reliefs["type"], minlength=len(TYPES_RELIEF))
+        print(f"relief détecté en {(time.perf_counter() - debut) * 1000:.1f} ms : "
+              + ", ".join(f"{n} {t}" for t, n in zip(TYPES_RELIEF, types)))
+
+        chemin = os.path.join(dossier, "etape.rbk")
+        roadbook.ecrire(chemin)
+        relu = Roadbook.charger(chemin)
+        print("relief relu à l'identique" if np.array_equal(relu.reliefs, roadbook.reliefs)
+              and relu.notes() == roadbook.notes() else "ÉCART après relecture du roadbook !")
+
+        # Rallye complet : un seul modèle, chaque dalle ouverte une fois
+        modele = ModeleTerrain(dossier)
+        dalles = set()
+        debut = time.perf_counter()
+        for graine in range(10):
+            etape = reglage.analyser(itineraire_synthetique(1_200, graine=graine))
+            annoter_relief(etape, modele)
+            pts = np.asarray(etape.coordinates)
+            dalles |= set(zip(np.floor(pts[:, 0]).astype(int), np.floor(pts[:, 1]).astype(int)))
+        print(f"10 étapes en {time.perf_counter() - debut:.2f}s : {modele.ouvertures} ouvertures de dalles "
+              f"pour {len(dalles)} dalles traversées ({modele.acces} accès)")
+
+
+if __name__ == "__main__":
+    main()
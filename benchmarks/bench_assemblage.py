@@ -0,0 +1,98 @@
+"""Parcours à points de passage : tronçons raccordés contre requête unique et découpage manuel.
+
+Routage local sur un quadrillage OSM synthétique (pas de réseau). Les points
+de passage tombent sur des carrefours, où la route tourne souvent à angle
+droit : exactement les virages que coupait le découpage manuel d'une étape
+en morceaux analysés séparément. Mesure :
+  - que la géométrie raccordée est celle d'une requête unique passant par
+    tous les points (aucun sommet doublé aux raccords) et donne le même
+    roadbook, avec une distance depuis le départ continue ;
+  - les virages perdus ou coupés quand chaque morceau a son propre roadbook ;
+  - le temps de téléchargement avec une latence réseau simulée, tronçons
+    demandés l'un après l'autre puis en parallèle.
+
+Lancement depuis la racine du dépôt :
+    python -m benchmarks.bench_assemblage
+"""
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.itineraires import extrait_osm_synthetique
+from rally.assemblage import recuperer_parcours
+from rally.geodesie import longueurs_segments
+from rally.itineraire import coordonnees_route
+from rally.presets import PRESETS
+from rally.routage_local import ClientLocal, charger_graphe
+
+COTE = 60
+NB_POINTS = 10  # Départ, 8 points de passage, arrivée
+LATENCE = 0.15  # Secondes par requête
+REGLAGE = PRESETS["phase1_2"]
+
+
+class ClientLent:
+    """Client local avec la latence d'un service distant"""
+
+    def __init__(self, client):
+        self.client = client
+
+    def directions(self, **kwargs):
+        time.sleep(LATENCE)
+        return self.client.directions(**kwargs)
+
+
+def main():
+    with tempfile.TemporaryDirectory() as dossier:
+        chemin = os.path.join(dossier, "quadrillage.osm")
+        extrait_osm_synthetique(chemin, COTE, COTE)
+        client = ClientLocal(charger_graphe(chemin, os.path.join(dossier, "graphes")))
+        graphe = client.graphe
+
+        rng = np.random.default_rng(3)
+        noeuds = rng.choice(len(graphe), NB_POINTS, replace=False)
+        points = [(float(graphe.lat[k]), float(graphe.lon[k])) for k in noeuds]
+
+        # === Raccord contre requête unique ===
+        unique = client.directions(coordinates=[p[::-1] for p in points])
+        raccordee = recuperer_parcours(client, points)
+        geometrie = np.asarray(coordonnees_route(raccordee))
+        doublons = int(np.sum(np.all(np.diff(geometrie, axis=0) == 0, axis=1)))
+        identique = np.array_equal(geometrie, np.asarray(coordonnees_route(unique)))
+        print(f"{NB_POINTS - 1} tronçons, {len(geometrie)} sommets raccordés, {doublons} doublon(s), "
+              f"{'géométrie identique' if identique else 'ÉCART'} à la requête unique")
+        points_passage = raccordee["features"][0]["properties"]["way_points"]
+        proprietes = raccordee["features"][0]["properties"]
+        identiques = points_passage == unique["features"][0]["properties"]["way_points"]
+        print(f"points de passage aux {'mêmes' if identiques else 'AUTRES'} indices, "
+              f"distance {proprietes['summary']['distance'] / 1000:.1f} km")
+
+        roadbook = REGLAGE.analyser(geometrie)
+        reference = REGLAGE.analyser(coordonnees_route(unique))
+        print(f"roadbook continu : {len(roadbook)} virages, "
+              f"{'notes identiques' if roadbook.notes() == reference.notes() else 'NOTES DIFFÉRENTES'}, "
+              f"dernier virage à {roadbook.table['distance_depart'][-1] / 1000:.2f} km du départ")
+
+        # === Découpage manuel : un roadbook par morceau ===
+        morceaux = [REGLAGE.analyser(geometrie[a:b + 1]) for a, b in zip(points_passage[:-1], points_passage[1:])]
+        abscisses = np.concatenate(([0.0], np.cumsum(longueurs_segments(geometrie))))
+        jonctions = abscisses[points_passage[1:-1]]
+        debut_virage = roadbook.table["distance_depart"][:, None]
+        a_cheval = (debut_virage < jonctions) & (jonctions < debut_virage + roadbook.table["longueur"][:, None])
+        print(f"découpage manuel : {sum(len(m) for m in morceaux)} virages en {len(morceaux)} roadbooks "
+              f"(distance remise à zéro à chaque morceau), contre {len(roadbook)} en continu dont "
+              f"{int(a_cheval.any(axis=1).sum())} à cheval sur un point de passage")
+
+        # === Téléchargement : séquentiel puis parallèle ===
+        lent = ClientLent(client)
+        for nom, telechargements in (("séquentiel", 1), ("parallèle (4)", 4), ("parallèle (9)", 9)):
+            debut = time.perf_counter()
+            recuperer_parcours(lent, points, telechargements=telechargements)
+            print(f"{nom:<14}: {time.perf_counter() - debut:6.2f} s pour {NB_POINTS - 1} tronçons "
+                  f"({LATENCE * 1000:.0f} ms de latence par requête)")
+
+
+if __name__ == "__main__":
+    main()
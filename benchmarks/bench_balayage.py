@@ -0,0 +1,75 @@
+"""Balayage de 100 combinaisons de seuils sur une étape de 50 km.
+
+Grille : 4 pas × 5 angles cumulés minimaux × 5 jeux de bornes des notes.
+Mesure :
+  - l'ancienne méthode, une exécution complète par combinaison (analyse puis
+    carte HTML, routage exclu : il est en cache) ;
+  - Reglage.analyser seul pour chaque combinaison ;
+  - le balayage (un rééchantillonnage par pas, un regroupement par seuils),
+    dans le processus courant puis sur tous les cœurs ;
+et vérifie, combinaison par combinaison, que le balayage compte les mêmes
+virages et les mêmes notes que Reglage.analyser.
+
+Lancement depuis la racine du dépôt :
+    python -m benchmarks.bench_balayage
+"""
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.itineraires import itineraire_etape
+from rally.balayage import Balayage, combinaisons
+from rally.presets import PRESETS
+from rally.rendu import ecrire_carte
+
+GRILLE = {
+    "distance": [20.0, 25.0, 30.0, 50.0],
+    "seuil_angle_total": [10.0, 15.0, 20.0, 25.0, 30.0],
+    "bornes_notes": [(30, 60, 90, 120, 150), (40, 70, 100, 130, 160), (45, 75, 105, 135, 165),
+                     (50, 80, 110, 140, 170), (60, 90, 120, 150, 180)],
+}
+
+
+def main():
+    coords = itineraire_etape(50_000.0)
+    route = {"type": "FeatureCollection",
+             "features": [{"type": "Feature", "properties": {},
+                           "geometry": {"type": "LineString", "coordinates": coords.tolist()}}]}
+    depart, arrivee = tuple(coords[0][::-1]), tuple(coords[-1][::-1])
+    reglages = combinaisons(PRESETS["phase1_2"], GRILLE)
+    print(f"Étape de 50 km ({len(coords)} sommets), {len(reglages)} combinaisons, {os.cpu_count()} cœur(s)\n")
+
+    with tempfile.TemporaryDirectory() as dossier:
+        debut = time.perf_counter()
+        for k, reglage in enumerate(reglages):
+            ecrire_carte(os.path.join(dossier, f"carte_{k}.html"), route, reglage.analyser(coords), depart, arrivee)
+        t_complet = time.perf_counter() - debut
+
+    debut = time.perf_counter()
+    references = [reglage.analyser(coords) for reglage in reglages]
+    t_analyse = time.perf_counter() - debut
+
+    mesures = {}
+    processus_max = max(2, os.cpu_count() or 1)
+    for nom, processus in (("balayage, 1 processus", 1), (f"balayage, {processus_max} processus", processus_max)):
+        debut = time.perf_counter()
+        resultats = Balayage(coords).evaluer(reglages, processus)
+        mesures[nom] = (time.perf_counter() - debut, resultats)
+
+    print(f"{'méthode':<26} {'durée':>9} {'par combinaison':>16}")
+    for nom, duree in (("analyse + carte", t_complet), ("Reglage.analyser", t_analyse),
+                       *((nom, duree) for nom, (duree, _) in mesures.items())):
+        print(f"{nom:<26} {duree:>8.3f}s {duree / len(reglages) * 1000:>13.2f}ms  x{t_complet / duree:.0f}")
+
+    for nom, (_, resultats) in mesures.items():
+        ecarts = sum(
+            r.nb_virages != len(ref) or r.notes != tuple(np.bincount(ref.table["note"], minlength=7)[1:])
+            for r, ref in zip(resultats, references)
+        )
+        print(f"{nom} : {'identique' if not ecarts else f'{ecarts} ÉCART(S)'} à Reglage.analyser")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""Cache des itinéraires (rally.cache) devant un faux client directions.
+
+Le faux client répond après LATENCE secondes par une route sinueuse et
+compte ses appels. Vérifie, sur un cache SQLite temporaire :
+  - qu'une requête répétée ne rappelle pas le client, et mesure le gain ;
+  - qu'une route plus vieille que le TTL est redemandée ;
+  - qu'au-delà de la taille maximale les routes sont évincées par ordre de
+    dernier accès (la plus anciennement lue part la première) ;
+  - qu'en mode hors ligne une route absente lève RouteAbsenteDuCache sans
+    appeler le client, et qu'une route présente est servie.
+
+Lancement depuis la racine du dépôt :
+    python -m benchmarks.bench_cache
+"""
+import json
+import os
+import tempfile
+import time
+import zlib
+
+from benchmarks.bench_serveur import fausse_route
+from rally.cache import CacheItineraires, ClientEnCache, RouteAbsenteDuCache
+
+LATENCE = 0.05  # Secondes par appel du faux client
+NB_ROUTES = 20
+TTL = 0.5  # Secondes, pour l'essai d'expiration
+
+
+class FauxClient:
+    """directions(coordinates=..., profile=..., format=...) comme openrouteservice.Client"""
+
+    def __init__(self):
+        self.appels = 0
+
+    def directions(self, coordinates, profile="driving-car", format="geojson", **options):
+        self.appels += 1
+        time.sleep(LATENCE)
+        return fausse_route(coordinates)
+
+
+def trajet(k):
+    """Départ et arrivée (lon, lat) d'environ 5 km, distincts pour chaque k"""
+    return [(1.5 + 0.01 * k, 49.0), (1.55 + 0.01 * k, 49.03)]
+
+
+def verifier(condition, message):
+    print(("ok     " if condition else "ÉCART  ") + message)
+    return condition
+
+
+def main():
+    ok = True
+    with tempfile.TemporaryDirectory() as dossier:
+        # Requêtes répétées : un seul appel au client par trajet
+        faux = FauxClient()
+        client = ClientEnCache(faux, CacheItineraires(os.path.join(dossier, "repetition.sqlite")), hors_ligne=False)
+        debut = time.perf_counter()
+        premieres = [client.directions(trajet(k)) for k in range(NB_ROUTES)]
+        duree_reseau = time.perf_counter() - debut
+        debut = time.perf_counter()
+        secondes = [client.directions(trajet(k)) for k in range(NB_ROUTES)]
+        duree_cache = time.perf_counter() - debut
+        print(f"{NB_ROUTES} trajets : {duree_reseau / NB_ROUTES * 1000:.1f} ms par appel du client, "
+              f"{duree_cache / NB_ROUTES * 1000:.2f} ms par lecture du cache")
+        ok &= verifier(faux.appels == NB_ROUTES and secondes == premieres,
+                       f"répétition : {faux.appels} appels pour {2 * NB_ROUTES} requêtes, routes identiques")
+        ok &= verifier((client.succes, client.echecs) == (NB_ROUTES, NB_ROUTES),
+                       f"compteurs : {client.succes} succès, {client.echecs} échecs")
+
+        # Expiration : au-delà du TTL, la route est redemandée
+        faux = FauxClient()
+        client = ClientEnCache(faux, CacheItineraires(os.path.join(dossier, "ttl.sqlite"), ttl=TTL), hors_ligne=False)
+        client.directions(trajet(0))
+        client.directions(trajet(0))
+        time.sleep(TTL * 1.5)
+        client.directions(trajet(0))
+        ok &= verifier(faux.appels == 2, f"TTL : {faux.appels} appels (1 avant expiration, 1 après)")
+
+        # Éviction : taille maximale de trois routes et demie, la moins récemment lue part
+        tailles = [len(zlib.compress(json.dumps(fausse_route(trajet(k)), separators=(",", ":")).encode(), 6))
+                   for k in range(4)]
+        cache = CacheItineraires(os.path.join(dossier, "lru.sqlite"), taille_max=sum(tailles[:3]) + tailles[3] // 2)
+        faux = FauxClient()
+        client = ClientEnCache(faux, cache, hors_ligne=False)
+        for k in range(3):
+            client.directions(trajet(k))
+        client.directions(trajet(0))  # Trajet 0 relu : le trajet 1 devient le moins récent
+        client.directions(trajet(3))  # Dépasse la taille maximale : une éviction
+        restants = [k for k in range(4) if cache.lire(cache.cle(trajet(k), "driving-car", format="geojson"))]
+        ok &= verifier(restants == [0, 2, 3], f"éviction LRU : trajets {restants} gardés (attendu [0, 2, 3])")
+
+        # Hors ligne : cache seul, le client n'est jamais appelé
+        appels = faux.appels
+        hors_ligne = ClientEnCache(faux, cache, hors_ligne=True)
+        servie = hors_ligne.directions(trajet(2)) == fausse_route(trajet(2))
+        try:
+            hors_ligne.directions(trajet(1))
+            absente = False
+        except RouteAbsenteDuCache:
+            absente = True
+        ok &= verifier(servie and absente and faux.appels == appels,
+                       "hors ligne : route présente servie, route évincée -> RouteAbsenteDuCache, aucun appel")
+    print("cache conforme" if ok else "ÉCART : cache non conforme !")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Rejoue une trace GPS simulée dans le mode embarqué et mesure la latence.
+
+Une voiture parcourt une étape synthétique d'environ 100 km à 90 km/h, un
+fix par seconde avec 5 m de bruit ; les trames NMEA RMC sont relues puis
+recalées sur le roadbook phase1_2. Affiche la latence par position
+(lecture NMEA comprise) et l'erreur de recalage le long de l'itinéraire.
+
+Lancement depuis la racine du dépôt :
+    python -m benchmarks.bench_direct
+"""
+import time
+
+import numpy as np
+
+from benchmarks.itineraires import itineraire_synthetique
+from rally.direct import NOEUD, Guidage, lire_nmea
+from rally.presets import PRESETS
+
+VITESSE = 25.0  # m/s
+BRUIT = 5.0  # Écart type (mètres)
+
+
+def _ddmm(valeur, positif, negatif, largeur):
+    hemisphere = positif if valeur >= 0 else negatif
+    valeur = abs(valeur)
+    degres = int(valeur)
+    return f"{degres:0{largeur}d}{(valeur - degres) * 60:07.4f}", hemisphere
+
+
+def trame_rmc(secondes, lon, lat, vitesse, cap):
+    """Trame $GPRMC avec somme de contrôle"""
+    h, m, s = int(secondes // 3600) % 24, int(secondes // 60 % 60), secondes % 60
+    lat_txt, ns = _ddmm(lat, "N", "S", 2)
+    lon_txt, ew = _ddmm(lon, "E", "W", 3)
+    corps = (f"GPRMC,{h:02d}{m:02d}{s:05.2f},A,{lat_txt},{ns},{lon_txt},{ew},"
+             f"{vitesse / NOEUD:.1f},{cap:.1f},010125,,,A")
+    somme = 0
+    for c in corps:
+        somme ^= ord(c)
+    return f"${corps}*{somme:02X}"
+
+
+def trace_nmea(guidage, vitesse=VITESSE, bruit=BRUIT, graine=0):
+    """(trames, abscisses réelles) d'un parcours de l'itinéraire du guidage"""
+    rng = np.random.default_rng(graine)
+    abscisses = np.arange(0.0, guidage.abscisses[-1], vitesse)
+    x = np.interp(abscisses, guidage.abscisses, guidage.index.xy[:, 0]) + rng.normal(0, bruit, len(abscisses))
+    y = np.interp(abscisses, guidage.abscisses, guidage.index.xy[:, 1]) + rng.normal(0, bruit, len(abscisses))
+    echelle = guidage.index._echelle
+    lon = guidage.index.origine[0] + x / echelle[0]
+    lat = guidage.index.origine[1] + y / echelle[1]
+    cap = np.degrees(np.arctan2(np.gradient(x), np.gradient(y))) % 360
+    trames = [trame_rmc(8 * 3600 + k, lon[k], lat[k], vitesse, cap[k]) for k in range(len(abscisses))]
+    return trames, abscisses
+
+
+def main():
+    reglage = PRESETS["phase1_2"]
+    roadbook = reglage.analyser(itineraire_synthetique(2_400, graine=3))
+    guidage = Guidage(roadbook)
+    trames, reelles = trace_nmea(guidage)
+    print(f"Étape : {guidage.abscisses[-1] / 1000:.1f} km, {len(roadbook.coordinates)} points, "
+          f"{len(roadbook)} virages ; {len(trames)} positions à {VITESSE * 3.6:.0f} km/h")
+
+    latences, abscisses, textes = [], [], []
+    fixes = lire_nmea(trames)
+    while True:
+        debut = time.perf_counter()
+        fix = next(fixes, None)
+        if fix is None:
+            break
+        annonce = guidage.annoncer(fix)
+        latences.append(time.perf_counter() - debut)
+        abscisses.append(annonce.abscisse if annonce else np.nan)
+        textes.append(annonce.texte if annonce else "hors itinéraire")
+
+    latences = np.array(latences) * 1000
+    erreurs = np.abs(np.array(abscisses) - reelles)
+    print(f"latence par position : médiane {np.median(latences):.3f} ms, "
+          f"p99 {np.percentile(latences, 99):.3f} ms, max {latences.max():.3f} ms")
+    print(f"recalage : erreur médiane {np.nanmedian(erreurs):.1f} m, max {np.nanmax(erreurs):.1f} m, "
+          f"{np.isnan(erreurs).sum()} positions hors itinéraire")
+    print("exemples :", " | ".join(textes[k] for k in range(0, len(textes), len(textes) // 5)))
+
+
+if __name__ == "__main__":
+    main()
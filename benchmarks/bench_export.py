@@ -0,0 +1,85 @@
+"""Export d'un rallye complet : GPX, CSV, JSON compact et PDF en tulipes.
+
+Quarante étapes synthétiques de 50 km sont analysées puis écrites en .rbk,
+comme le fait `python -m rally lot`. Chaque format est ensuite produit en
+relisant les roadbooks un à un : durée, taille du fichier et pic de mémoire
+Python (tracemalloc), qui doit rester celui d'une étape et non du rallye.
+Vérifie que les distances partielles du CSV ne sont jamais négatives (virages
+qui se chevauchent) et retombent, cumulées, sur la distance de chaque note,
+et que le GPX donne tous ses points de passage avant les traces (GPX 1.1).
+
+Lancement depuis la racine du dépôt :
+    python -m benchmarks.bench_export
+"""
+import csv
+import os
+import tempfile
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+
+from benchmarks.itineraires import itineraire_etape
+from rally.export import EXPORTEURS, exporter
+from rally.presets import PRESETS
+from rally.roadbook import Roadbook
+
+NB_ETAPES = 40
+LONGUEUR = 50_000.0
+REGLAGE = PRESETS["phase1_2"]
+
+
+def verifier_csv(chemin):
+    """Partiels positifs, et leur cumul par étape égal à la distance depuis le départ"""
+    cumuls = {}
+    with open(chemin, newline="", encoding="utf-8") as f:
+        for ligne in csv.DictReader(f):
+            cumuls[ligne["etape"]] = cumuls.get(ligne["etape"], 0) + int(ligne["intervalle"])
+            if int(ligne["intervalle"]) < 0 or cumuls[ligne["etape"]] != int(ligne["distance"]):
+                return False
+    return True
+
+
+def verifier_gpx(chemin, nb_etapes):
+    """Éléments wpt puis trk (ordre imposé par le schéma GPX 1.1), une trace par étape"""
+    balises = [element.tag.rsplit("}", 1)[-1] for element in ET.parse(chemin).getroot()]
+    return balises.count("trk") == nb_etapes and "wpt" not in balises[balises.index("trk"):]
+
+
+def main():
+    with tempfile.TemporaryDirectory() as dossier:
+        chemins = []
+        nb_notes = 0
+        for k in range(NB_ETAPES):
+            roadbook = REGLAGE.analyser(itineraire_etape(LONGUEUR, graine=k))
+            nb_notes += len(roadbook.notes())
+            chemins.append(os.path.join(dossier, f"es{k + 1}.rbk"))
+            roadbook.ecrire(chemins[-1])
+        print(f"{NB_ETAPES} étapes de {LONGUEUR / 1000:.0f} km, {nb_notes} notes")
+
+        # Pic de mémoire d'une seule étape, pour comparaison
+        tracemalloc.start()
+        exporter(os.path.join(dossier, "une.pdf"), [("ES1", Roadbook.charger(chemins[0]))])
+        pic_etape = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        print(f"\n{'format':<6} {'durée':>8} {'taille':>10} {'pic mémoire':>12}")
+        for extension in EXPORTEURS:
+            chemin = os.path.join(dossier, f"rallye{extension}")
+            debut = time.perf_counter()
+            exporter(chemin, ((f"ES{k + 1}", Roadbook.charger(c)) for k, c in enumerate(chemins)))
+            duree = time.perf_counter() - debut
+            # Deuxième passage sous tracemalloc (qui ralentit beaucoup) pour le pic de mémoire
+            tracemalloc.start()
+            exporter(chemin, ((f"ES{k + 1}", Roadbook.charger(c)) for k, c in enumerate(chemins)))
+            pic = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"{extension:<6} {duree:>7.2f}s {os.path.getsize(chemin) / 1e6:>7.2f} Mo {pic / 1e6:>9.2f} Mo")
+        print(f"\npic mémoire du PDF d'une seule étape : {pic_etape / 1e6:.2f} Mo")
+        print("distances partielles du CSV cohérentes" if verifier_csv(os.path.join(dossier, "rallye.csv"))
+              else "ÉCART : distance partielle négative ou cumul différent de la distance !")
+        print("GPX : points de passage puis traces" if verifier_gpx(os.path.join(dossier, "rallye.gpx"), NB_ETAPES)
+              else "ÉCART : GPX invalide, points de passage et traces mêlés !")
+
+
+if __name__ == "__main__":
+    main()
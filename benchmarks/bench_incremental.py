@@ -0,0 +1,84 @@
+"""Compare la mise à jour incrémentale d'un roadbook à une analyse complète.
+
+Étapes synthétiques d'environ 100 et 500 km ; on déplace une portion de 500 m au
+milieu (déviation) puis on mesure le temps d'une réanalyse complète et celui
+de AnalyseIncrementale.mettre_a_jour. Vérifie que les virages obtenus sont
+ceux d'une détection complète sur les mêmes points et que les identifiants
+des virages hors de la zone modifiée sont conservés.
+
+Lancement depuis la racine du dépôt :
+    python -m benchmarks.bench_incremental
+"""
+import time
+
+import numpy as np
+
+from benchmarks.bench_reechantillonnage import chronometrer
+from benchmarks.itineraires import itineraire_synthetique
+from rally.geodesie import abscisses_curvilignes
+from rally.incremental import AnalyseIncrementale
+from rally.presets import PRESETS
+from rally.virages import detecter_virages
+
+COLONNES = ("index", "index_debut", "index_fin", "angle", "note", "longueur")
+
+
+def deviation(brut, debut, longueur=500.0, ecart=80.0):
+    """Copie de brut dont la portion [debut, debut + longueur] (mètres) est déportée sur le côté"""
+    abscisses = abscisses_curvilignes(brut)
+    portion = (abscisses >= debut) & (abscisses <= debut + longueur)
+    bosse = np.sin(np.pi * (abscisses[portion] - debut) / longueur)
+    # Déport perpendiculaire à la direction générale de la portion (en degrés, approximatif)
+    a, b = brut[portion][0], brut[portion][-1]
+    normale = np.array([-(b - a)[1], (b - a)[0]]) / np.hypot(*(b - a))
+    nouveau = brut.copy()
+    nouveau[portion] += bosse[:, None] * normale * ecart / 111_000
+    return nouveau
+
+
+def identiques(roadbook, reference):
+    if len(roadbook) != len(reference):
+        return False
+    return all(np.array_equal(roadbook.table[c], reference.table[c]) for c in COLONNES) and np.allclose(
+        roadbook.table["distance_depart"], reference.table["distance_depart"]
+    )
+
+
+def comparer(nb_sommets):
+    brut = itineraire_synthetique(nb_sommets, graine=3)
+    total = abscisses_curvilignes(brut)[-1]
+    nouveau = deviation(brut, total / 2)
+    print(f"\n=== Étape : {total / 1000:.1f} km, {len(brut)} sommets, déviation de 500 m au milieu ===")
+
+    for nom, reglage in PRESETS.items():
+        t_complet, _ = chronometrer(reglage.analyser, nouveau)
+
+        def mettre_a_jour():
+            analyse = AnalyseIncrementale(brut, reglage)
+            ids_avant = set(analyse.roadbook.table["id"].tolist())
+            debut = time.perf_counter()
+            roadbook = analyse.mettre_a_jour(nouveau)
+            return time.perf_counter() - debut, analyse, ids_avant, roadbook
+
+        durees = [mettre_a_jour() for _ in range(3)]
+        t_incr, analyse, ids_avant, roadbook = min(durees, key=lambda d: d[0])
+        conserves = len(ids_avant & set(roadbook.table["id"].tolist()))
+        reference = detecter_virages(analyse.points, reglage.virages)
+
+        print(f"\n[{nom}] {len(analyse.points)} points à {reglage.distance} m, {len(roadbook)} virages")
+        print(f"  analyse complète : {t_complet * 1000:8.2f} ms")
+        print(f"  incrémentale     : {t_incr * 1000:8.2f} ms  "
+              f"({analyse.points_recalcules} points rééchantillonnés, {analyse.departs_evalues} départs évalués)")
+        print(f"  gain             : {t_complet / t_incr:8.0f}x")
+        print(f"  identifiants conservés : {conserves} / {len(ids_avant)}")
+        print("  virages identiques à une détection complète" if identiques(roadbook, reference)
+              else "  ÉCART avec une détection complète !")
+
+
+def main():
+    comparer(2_400)  # ~100 km
+    comparer(12_000)  # ~500 km : le coût incrémental ne dépend pas de la longueur
+
+
+if __name__ == "__main__":
+    main()
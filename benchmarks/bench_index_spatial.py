@@ -0,0 +1,128 @@
+"""Compare l'index spatial à un parcours linéaire NumPy sur 100 000 points.
+
+Requêtes autour de points de l'itinéraire (bruit de 50 m) : point le plus
+proche (une par une et groupées), points dans un rayon, abscisse le long de
+l'itinéraire et plage d'abscisses. Vérifie que les résultats sont identiques,
+y compris pour l'abscisse de points au-delà des bouts d'itinéraires courts.
+
+Lancement depuis la racine du dépôt :
+    python -m benchmarks.bench_index_spatial
+"""
+import time
+
+import numpy as np
+
+from benchmarks.itineraires import itineraire_synthetique
+from rally.index_spatial import IndexSpatial
+
+NB_POINTS = 100_000
+NB_REQUETES = 2_000
+RAYON = 200.0
+BRUIT = 50.0
+
+
+def chrono(fonction, *args):
+    debut = time.perf_counter()
+    resultat = fonction(*args)
+    return time.perf_counter() - debut, resultat
+
+
+def lineaire_plus_proche(index, requetes):
+    resultats = []
+    for x, y in requetes:
+        distances = np.hypot(index.xy[:, 0] - x, index.xy[:, 1] - y)
+        k = int(np.argmin(distances))
+        resultats.append((k, distances[k]))
+    return resultats
+
+
+def lineaire_proches(index, requetes):
+    return [np.flatnonzero(np.hypot(index.xy[:, 0] - x, index.xy[:, 1] - y) <= RAYON) for x, y in requetes]
+
+
+def lineaire_abscisse(index, requetes):
+    a = index.xy[:-1]
+    ab = np.diff(index.xy, axis=0)
+    longueur2 = (ab * ab).sum(axis=1)
+    resultats = []
+    for p in requetes:
+        t = np.clip(((p - a) * ab).sum(axis=1) / longueur2, 0.0, 1.0)
+        ecarts = np.hypot(*(a + t[:, None] * ab - p).T)
+        k = int(np.argmin(ecarts))
+        resultats.append(index.abscisses[k] + t[k] * (index.abscisses[k + 1] - index.abscisses[k]))
+    return resultats
+
+
+def lineaire_plage(index, plages):
+    return [np.flatnonzero((index.abscisses >= a) & (index.abscisses <= b)) for a, b in plages]
+
+
+def hors_bouts(points, rng):
+    """Abscisses de points au-delà des bouts de courts itinéraires, égales à celles du parcours linéaire.
+
+    Le projeté y tombe sur le sommet du bout, à quelques ulps de la distance à ce sommet.
+    """
+    for debut in rng.integers(len(points) - 20, size=NB_REQUETES):
+        index = IndexSpatial(points[debut:debut + 20])
+        i, j = (0, 1) if rng.random() < 0.5 else (-1, -2)
+        point = index.coordinates[i] + (index.coordinates[i] - index.coordinates[j]) * rng.uniform(0.01, 5)
+        try:
+            obtenue = index.abscisse(*point)[0]
+        except ValueError:
+            return False
+        if not np.isclose(obtenue, lineaire_abscisse(index, index.projeter(*point)[None])[0]):
+            return False
+    return True
+
+
+def ligne(nom, t_lineaire, t_index):
+    print(f"{nom:<28} linéaire {t_lineaire * 1e6 / NB_REQUETES:9.1f} µs   "
+          f"index {t_index * 1e6 / NB_REQUETES:7.2f} µs   gain {t_lineaire / t_index:6.0f}x")
+
+
+def main():
+    rng = np.random.default_rng(0)
+    points = itineraire_synthetique(NB_POINTS, graine=5)
+    t_construction, index = chrono(IndexSpatial, points)
+    index.abscisses  # Abscisses calculées hors chronométrage des requêtes
+    print(f"Itinéraire : {len(index)} points, {index.abscisses[-1] / 1000:.0f} km ; "
+          f"construction de l'index {t_construction * 1000:.0f} ms")
+
+    tirage = rng.integers(len(points), size=NB_REQUETES)
+    requetes = index.xy[tirage] + rng.normal(0, BRUIT, (NB_REQUETES, 2))
+    lon = index.origine[0] + requetes[:, 0] / index._echelle[0]
+    lat = index.origine[1] + requetes[:, 1] / index._echelle[1]
+
+    t_lin, attendu = chrono(lineaire_plus_proche, index, requetes)
+    t_idx, obtenu = chrono(lambda: [index.plus_proche(x, y) for x, y in zip(lon, lat)])
+    t_grp, (indices, distances) = chrono(index.plus_proches, lon, lat)
+    ligne("plus proche", t_lin, t_idx)
+    ligne("plus proche (groupé)", t_lin, t_grp)
+    ok = np.allclose([d for _, d in attendu], [d for _, d in obtenu]) and np.allclose(
+        [d for _, d in attendu], distances)
+
+    t_lin, attendu = chrono(lineaire_proches, index, requetes)
+    t_idx, obtenu = chrono(lambda: [index.proches(x, y, RAYON)[0] for x, y in zip(lon, lat)])
+    ligne(f"rayon {RAYON:.0f} m", t_lin, t_idx)
+    ok &= all(np.array_equal(a, b) for a, b in zip(attendu, obtenu))
+
+    t_lin, attendu = chrono(lineaire_abscisse, index, requetes)
+    t_idx, obtenu = chrono(lambda: [index.abscisse(x, y)[0] for x, y in zip(lon, lat)])
+    ligne("abscisse le long du tracé", t_lin, t_idx)
+    # Deux segments à égale distance (aller et retour) donnent deux abscisses valables
+    ok &= np.mean(np.isclose(attendu, obtenu)) > 0.99
+
+    ok &= hors_bouts(points, rng)
+
+    debuts = rng.uniform(0, index.abscisses[-1], NB_REQUETES)
+    plages = np.stack((debuts, debuts + 1000), axis=1)
+    t_lin, attendu = chrono(lineaire_plage, index, plages)
+    t_idx, obtenu = chrono(lambda: [index.entre_abscisses(a, b) for a, b in plages])
+    ligne("plage d'abscisses (1 km)", t_lin, t_idx)
+    ok &= all(len(a) == j - i and (not len(a) or a[0] == i) for a, (i, j) in zip(attendu, obtenu))
+
+    print("résultats identiques" if ok else "ÉCART entre l'index et le parcours linéaire !")
+
+
+if __name__ == "__main__":
+    main()
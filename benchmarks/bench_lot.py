@@ -0,0 +1,156 @@
+"""Téléchargements de `lot` par le client de routage asynchrone, contre un faux routage local.
+
+Le faux serveur (compatible openrouteservice, dans un thread de ce
+processus) répond après LATENCE secondes par la route sinueuse de
+bench_serveur et note l'instant de chaque requête. generer_lot traite
+NB_ETAPES étapes (0 à 2 points de passage, un tronçon par paire de points)
+avec ClientRoutageAsync :
+  - sans limite de débit : une requête par tronçon, lancées ensemble ;
+  - une deuxième fois sur le même cache : aucune requête ;
+  - avec un budget de REQUETES_PAR_MINUTE : requêtes espacées d'au moins
+    60 / REQUETES_PAR_MINUTE secondes ;
+puis avec un client bloquant (même fausse route, sans HTTP) dans des threads,
+comme pour le routage local : les roadbooks .rbk doivent être identiques.
+
+Lancement depuis la racine du dépôt :
+    python -m benchmarks.bench_lot
+"""
+import asyncio
+import math
+import os
+import random
+import tempfile
+import threading
+import time
+
+from benchmarks.bench_serveur import fausse_route, port_libre
+from rally.cache import CacheItineraires, ClientEnCache
+from rally.lot import Etape, generer_lot
+from rally.presets import PRESETS
+from rally.routage_async import ClientRoutageAsync
+
+LATENCE = 0.05  # Secondes par requête de routage
+NB_ETAPES = 12
+REQUETES_PAR_MINUTE = 300
+METRES_PAR_DEGRE = 111_320.0
+REGLAGE = PRESETS["phase1_2"]
+
+
+class FauxRoutage:
+    """Serveur POST /v2/directions/{profil}/geojson dans un thread, instants des requêtes dans `instants`"""
+
+    def __init__(self):
+        self.port = port_libre()
+        self.instants = []
+        self._pret = threading.Event()
+        self._boucle = None
+        threading.Thread(target=self._servir, daemon=True).start()
+        self._pret.wait()
+
+    def _servir(self):
+        from aiohttp import web
+
+        async def directions(requete):
+            self.instants.append(time.monotonic())
+            corps = await requete.json()
+            await asyncio.sleep(LATENCE)
+            return web.json_response(fausse_route(corps["coordinates"]))
+
+        async def demarrer():
+            app = web.Application()
+            app.router.add_post("/v2/directions/{profil}/{format}", directions)
+            runner = web.AppRunner(app)
+            await runner.setup()
+            await web.TCPSite(runner, "127.0.0.1", self.port).start()
+
+        self._boucle = asyncio.new_event_loop()
+        self._boucle.run_until_complete(demarrer())
+        self._pret.set()
+        self._boucle.run_forever()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.port}"
+
+
+class FauxClientBloquant:
+    """directions() bloquant rendant la même fausse route, sans HTTP"""
+
+    def directions(self, coordinates, profile="driving-car", format="geojson", **options):
+        time.sleep(LATENCE)
+        return fausse_route([list(p) for p in coordinates])
+
+
+def etapes():
+    rng = random.Random(5)
+    resultat = []
+    for k in range(NB_ETAPES):
+        depart = (49.0 + rng.uniform(-0.3, 0.3), 1.5 + rng.uniform(-0.4, 0.4))
+        cap, longueur = rng.uniform(0, 2 * math.pi), rng.uniform(10_000.0, 25_000.0)
+        arrivee = (depart[0] + longueur * math.cos(cap) / METRES_PAR_DEGRE,
+                   depart[1] + longueur * math.sin(cap) / (METRES_PAR_DEGRE * math.cos(math.radians(depart[0]))))
+        passages = [(depart[0] + (arrivee[0] - depart[0]) * f + rng.uniform(-0.02, 0.02),
+                     depart[1] + (arrivee[1] - depart[1]) * f + rng.uniform(-0.02, 0.02))
+                    for f in sorted(rng.uniform(0.2, 0.8) for _ in range(rng.randint(0, 2)))]
+        resultat.append(Etape(f"ES{k + 1}", depart, arrivee, passages))
+    return resultat
+
+
+def lancer(etapes, client, dossier, **options):
+    debut = time.perf_counter()
+    resultats = generer_lot(etapes, client, dossier, REGLAGE, processus=1, **options)
+    return resultats, time.perf_counter() - debut
+
+
+def verifier(condition, message):
+    print(("ok     " if condition else "ÉCART  ") + message)
+    return condition
+
+
+def main():
+    serveur = FauxRoutage()
+    liste = etapes()
+    nb_troncons = sum(len(e.etapes) + 1 for e in liste)
+    print(f"{NB_ETAPES} étapes, {nb_troncons} tronçons, {LATENCE * 1000:.0f} ms par requête "
+          f"(en série : {nb_troncons * LATENCE:.2f}s de réseau)")
+    ok = True
+    with tempfile.TemporaryDirectory() as dossier:
+        cache = CacheItineraires(os.path.join(dossier, "itineraires.sqlite"))
+
+        client = ClientRoutageAsync(url_base=serveur.url, requetes_par_minute=0, cache=cache)
+        resultats, duree = lancer(liste, client, os.path.join(dossier, "async"))
+        reseau = max(r.telechargement for r in resultats)
+        print(f"asynchrone, débit libre : {duree:.2f}s dont {reseau:.2f}s pour la dernière route")
+        ok &= verifier(all(r.statut == "ok" for r in resultats) and len(serveur.instants) == nb_troncons,
+                       f"{sum(r.statut == 'ok' for r in resultats)}/{NB_ETAPES} étapes, "
+                       f"{len(serveur.instants)} requêtes pour {nb_troncons} tronçons")
+
+        serveur.instants.clear()
+        client = ClientRoutageAsync(url_base=serveur.url, requetes_par_minute=0, cache=cache)
+        resultats, duree = lancer(liste, client, os.path.join(dossier, "relance"))
+        ok &= verifier(all(r.statut == "ok" for r in resultats) and not serveur.instants,
+                       f"relance sur le même cache : {len(serveur.instants)} requêtes, {duree:.2f}s")
+
+        serveur.instants.clear()
+        client = ClientRoutageAsync(url_base=serveur.url, requetes_par_minute=REQUETES_PAR_MINUTE,
+                                    cache=CacheItineraires(os.path.join(dossier, "budget.sqlite")))
+        resultats, duree = lancer(liste, client, os.path.join(dossier, "budget"))
+        ecarts = [b - a for a, b in zip(serveur.instants[:-1], serveur.instants[1:])]
+        intervalle = 60 / REQUETES_PAR_MINUTE
+        print(f"asynchrone, {REQUETES_PAR_MINUTE} requêtes par minute : {duree:.2f}s")
+        ok &= verifier(all(r.statut == "ok" for r in resultats) and min(ecarts) >= 0.95 * intervalle,
+                       f"budget : écart minimal {min(ecarts) * 1000:.0f} ms entre requêtes "
+                       f"(au moins {intervalle * 1000:.0f} ms attendus)")
+
+        client = ClientEnCache(FauxClientBloquant(), CacheItineraires(os.path.join(dossier, "bloquant.sqlite")),
+                               hors_ligne=False)
+        resultats_bloquants, duree = lancer(liste, client, os.path.join(dossier, "bloquant"), telechargements=4)
+        print(f"client bloquant, 4 threads : {duree:.2f}s")
+        identiques = all(a.statut == b.statut == "ok" and open(a.binaire, "rb").read() == open(b.binaire, "rb").read()
+                         for a, b in zip(resultats, resultats_bloquants))
+        ok &= verifier(identiques, "roadbooks identiques (client asynchrone et client bloquant)")
+    print("téléchargements conformes" if ok else "ÉCART : téléchargements non conformes !")
+
+
+if __name__ == "__main__":
+    main()
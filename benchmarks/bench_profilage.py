@@ -0,0 +1,67 @@
+"""Coût de l'instrumentation (rally.profilage), désactivée puis active.
+
+Analyse d'une étape synthétique de 50 km avec le preset phase1_2 : sans
+Profilage actif, les appels etape() / compter() laissés dans le code ne
+doivent pas se voir dans le temps de calcul. Vérifie aussi que le pic de
+mémoire d'une étape atteint avant une étape imbriquée lui reste attribué.
+
+Lancement depuis la racine du dépôt :
+    python -m benchmarks.bench_profilage
+"""
+import timeit
+
+from benchmarks.bench_reechantillonnage import chronometrer
+from benchmarks.itineraires import itineraire_synthetique
+from rally.presets import PRESETS
+from rally.profilage import Profilage, compter, etape
+
+NB_APPELS = 1_000_000
+GROS, PETIT = 20_000_000, 1_000_000  # Octets alloués par le parent puis par l'étape imbriquée
+
+
+def appels_vides():
+    with etape("vide"):
+        compter("vide")
+
+
+def pics_imbriques():
+    """(pic du parent, pic du bloc) quand le parent libère un gros tableau avant une étape enfant"""
+    with Profilage() as profil:
+        with etape("parent"):
+            gros = bytearray(GROS)
+            del gros
+            with etape("enfant"):
+                petit = bytearray(PETIT)
+                del petit
+    return profil.etapes["parent"]["memoire_pic"], profil.pic_memoire
+
+
+def main():
+    reglage = PRESETS["phase1_2"]
+    brut = itineraire_synthetique(1_200, graine=1)
+
+    t_appel = timeit.timeit(appels_vides, number=NB_APPELS) / NB_APPELS
+    print(f"etape() + compter() désactivés : {t_appel * 1e9:.0f} ns par appel")
+
+    t_inactif, _ = chronometrer(reglage.analyser, brut)
+    with Profilage(memoire=False):
+        t_chrono, _ = chronometrer(reglage.analyser, brut)
+    with Profilage(memoire=False, cprofile=True):
+        t_profil, _ = chronometrer(reglage.analyser, brut)
+    with Profilage():
+        reglage.analyser(brut)  # Premier passage sous tracemalloc plus lent, hors mesure
+        t_memoire, _ = chronometrer(reglage.analyser, brut, repetitions=10)
+    print(f"analyse, instrumentation désactivée : {t_inactif * 1000:6.2f} ms "
+          f"(dont ~{4 * t_appel / t_inactif:.3%} pour les appels d'instrumentation)")
+    print(f"durées seules                      : {t_chrono * 1000:6.2f} ms")
+    print(f"durées + cProfile                  : {t_profil * 1000:6.2f} ms")
+    print(f"durées + mémoire (tracemalloc)     : {t_memoire * 1000:6.2f} ms")
+
+    pic_parent, pic_bloc = pics_imbriques()
+    print(f"\npic d'un parent à {GROS / 1e6:.0f} Mo avant un enfant à {PETIT / 1e6:.0f} Mo : "
+          f"{pic_parent / 1e6:.1f} Mo (bloc {pic_bloc / 1e6:.1f} Mo)"
+          + ("" if min(pic_parent, pic_bloc) >= GROS else "  PIC DU PARENT PERDU"))
+
+
+if __name__ == "__main__":
+    main()
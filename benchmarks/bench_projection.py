@@ -0,0 +1,88 @@
+"""Repère métrique local contre géodésique et angles en degrés, sur l'étape de phase1.py.
+
+Itinéraire synthétique Évreux → Rambouillet (extrémités de phase1.py, pas de
+réseau), seuils du preset phase1. Mesure :
+  - l'erreur des longueurs du repère métrique par rapport à Vincenty ;
+  - le temps du passage de détection des virages (mesures + regroupement),
+    avant (angles en degrés, longueurs géodésiques) et après (repère métrique),
+    et celui des longueurs par paire avec geopy comme dans les scripts d'origine ;
+  - l'écart des angles dû au calcul en degrés, et les notes qu'il change.
+
+Lancement depuis la racine du dépôt :
+    python -m benchmarks.bench_projection
+"""
+from dataclasses import replace
+
+import numpy as np
+from geopy.distance import geodesic
+
+from benchmarks.bench_reechantillonnage import chronometrer
+from benchmarks.itineraires import itineraire_phase1
+from rally.geodesie import longueurs_segments
+from rally.presets import PRESETS
+from rally.projection import TraceMetrique, erreur_segment
+from rally.reechantillonnage import interpoler_points
+from rally.virages import courbure, courbure_vecteurs, grouper_virages
+
+REGLAGE = PRESETS["phase1"]
+METRIQUE = replace(REGLAGE, virages=replace(REGLAGE.virages, repere_metrique=True))
+
+
+def detection_degres(points):
+    angles, gauche = courbure(points)
+    return grouper_virages(angles, gauche, longueurs_segments(points), REGLAGE.virages)
+
+
+def detection_metrique(points):
+    trace = TraceMetrique(points)
+    angles, gauche = courbure_vecteurs(trace.vecteurs)
+    return grouper_virages(angles, gauche, trace.longueurs, METRIQUE.virages)
+
+
+def longueurs_geopy(points):
+    return [geodesic((a[1], a[0]), (b[1], b[0])).meters for a, b in zip(points[:-1], points[1:])]
+
+
+def main():
+    brut = itineraire_phase1()
+    points = interpoler_points(brut, REGLAGE.distance)
+    print(f"Étape Évreux → Rambouillet : {len(brut)} sommets, {longueurs_segments(brut).sum() / 1000:.1f} km, "
+          f"{len(points)} points à {REGLAGE.distance:.0f} m")
+
+    # === Précision ===
+    for nom, pts in (("sommets bruts", brut), ("points à 20 m", points)):
+        trace = TraceMetrique(pts)
+        exactes = longueurs_segments(pts)
+        erreur = np.abs(trace.longueurs / exactes - 1)
+        print(f"{nom:<14}: erreur relative max {erreur.max():.1e} (borne {erreur_segment(exactes.max()):.1e}), "
+              f"cumul {abs(trace.abscisses[-1] - exactes.sum()) * 1000:.2f} mm, {trace.nb_exacts} segment(s) exacts")
+    trace = TraceMetrique(brut)
+    print(f"projection centrée : écart d'échelle max {trace.projection.ecart_echelle(brut[:, 1]).max():.2%} "
+          f"sur l'emprise de l'étape")
+
+    # === Temps du passage de détection ===
+    t_geopy, _ = chronometrer(longueurs_geopy, points, repetitions=1)
+    t_avant, avant = chronometrer(detection_degres, points)
+    t_apres, apres = chronometrer(detection_metrique, points)
+    print(f"\nlongueurs geopy par paire (scripts d'origine) : {t_geopy * 1000:8.1f} ms")
+    print(f"détection, degrés + Vincenty                  : {t_avant * 1000:8.2f} ms  ({len(avant[0])} virages)")
+    print(f"détection, repère métrique                    : {t_apres * 1000:8.2f} ms  ({len(apres[0])} virages)")
+    print(f"gain : {t_avant / t_apres:.1f}x (x{t_geopy / t_apres:.0f} par rapport à geopy)")
+    t_avant, roadbook_avant = chronometrer(REGLAGE.analyser, brut)
+    t_apres, roadbook_apres = chronometrer(METRIQUE.analyser, brut)
+    print(f"analyse complète (rééchantillonnage compris) : {t_avant * 1000:.2f} ms → {t_apres * 1000:.2f} ms")
+
+    # === Effet des angles en degrés ===
+    degres, _ = courbure(points)
+    metriques, _ = courbure_vecteurs(TraceMetrique(points).vecteurs)
+    ecart = np.abs(degres - metriques)
+    print(f"\nangles en degrés : écart médian {np.median(ecart):.2f}°, max {ecart.max():.1f}°")
+    avant = {int(i): int(n) for i, n in roadbook_avant.table[["index", "note"]]}
+    apres = {int(i): int(n) for i, n in roadbook_apres.table[["index", "note"]]}
+    communs = avant.keys() & apres.keys()
+    print(f"virages : {len(avant)} en degrés, {len(apres)} en mètres, {len(communs)} au même point "
+          f"dont {sum(avant[i] == apres[i] for i in communs)} avec la même note")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""Stabilité des notes selon le pas de rééchantillonnage : angle cumulé contre rayon.
+
+Étape synthétique faite de lignes droites et d'arcs de cercle exacts (rayon
+et angle connus), rééchantillonnée de 10 à 50 m. Pour chaque arc, on relève
+la note du virage détecté à son milieu par les deux moteurs (seuils de
+phase1_2.py pour l'angle cumulé, ParametresRayon par défaut pour le rayon)
+et on la compare à la note obtenue au pas de 10 m et à la note attendue
+d'après le vrai rayon.
+
+Lancement depuis la racine du dépôt :
+    python -m benchmarks.bench_rayons
+"""
+from dataclasses import replace
+import time
+
+import numpy as np
+
+from benchmarks.itineraires import itineraire_virages_connus
+from rally.geodesie import abscisses_curvilignes
+from rally.index_spatial import IndexSpatial
+from rally.presets import PRESETS
+from rally.rayons import ParametresRayon, notes_rayon, rayons_courbure
+from rally.reechantillonnage import interpoler_points
+
+PAS = (10, 20, 25, 30, 40, 50)
+NB_VIRAGES = 300
+
+
+def notes_aux_arcs(roadbook, milieux):
+    """Note du virage qui contient le milieu (lon, lat) de chaque arc, 0 si aucun"""
+    lignes = np.array([roadbook.virage_en(lon, lat) for lon, lat in milieux])
+    return np.where(lignes >= 0, roadbook.table["note"][lignes], 0)
+
+
+def main():
+    brut, arcs = itineraire_virages_connus(NB_VIRAGES, graine=2)
+    vrais_rayons = arcs[:, 1]
+    milieux = brut[np.round(arcs[:, 0]).astype(int)]  # Tracé brut au pas de 1 m
+    attendues = notes_rayon(vrais_rayons)
+    moteurs = {
+        "angle cumulé": PRESETS["phase1_2"],
+        "rayon": replace(PRESETS["phase1_2"], rayons=ParametresRayon()),
+    }
+    print(f"Étape : {abscisses_curvilignes(brut)[-1] / 1000:.0f} km, {NB_VIRAGES} arcs de {vrais_rayons.min():.0f} "
+          f"à {vrais_rayons.max():.0f} m")
+
+    for nom, reglage in moteurs.items():
+        print(f"\n{nom}")
+        print("  pas   virages   détectés   = note à 10 m   = note attendue   temps")
+        reference, sequences = None, []
+        for pas in PAS:
+            reglage_pas = replace(reglage, distance=pas)
+            debut = time.perf_counter()
+            roadbook = reglage_pas.analyser(brut)
+            duree = time.perf_counter() - debut
+            notes = notes_aux_arcs(roadbook, milieux)
+            sequences.append(roadbook.table["note"])
+            reference = notes if reference is None else reference
+            print(f"  {pas:3d} m {len(roadbook):8d} {np.mean(notes > 0):10.0%} "
+                  f"{np.mean(notes == reference):14.0%} {np.mean(notes == attendues):17.0%} "
+                  f"{duree * 1000:7.1f} ms")
+        identiques = all(np.array_equal(sequences[0], n) for n in sequences)
+        print(f"  suite des notes identique à tous les pas : {'oui' if identiques else 'non'}")
+
+    # Cercles ajustés directement sur les points rééchantillonnés : les arcs serrés se perdent
+    # entre deux points, d'où la mesure des rayons au pas fin ParametresRayon.pas
+    print("\nrayon ajusté sur les points rééchantillonnés / vrai rayon (médiane, 10e et 90e centiles)")
+    for pas in PAS:
+        points = interpoler_points(brut, pas)
+        rayons = np.abs(rayons_courbure(points))
+        ratio = rayons[IndexSpatial(points).plus_proches(milieux[:, 0], milieux[:, 1])[0]] / vrais_rayons
+        print(f"  {pas:3d} m   {np.median(ratio):.2f}  [{np.percentile(ratio, 10):.2f} - "
+              f"{np.percentile(ratio, 90):.2f}]")
+
+
+if __name__ == "__main__":
+    main()
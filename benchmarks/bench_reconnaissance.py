@@ -0,0 +1,197 @@
+"""Contrôle des notes d'après des traces de reconnaissance (python -m rally reconnaissance).
+
+Étape synthétique faite de lignes droites et d'arcs de cercle exacts, notée
+au rayon (phase1_2 + ParametresRayon) ; les notes de NB_FAUSSES virages sont
+ensuite faussées de deux crans dans le .rbk, comme une géométrie de routage
+qui arrondit ou resserre un virage. NB_TRACES passages sont simulés et écrits
+en GPX à 10 Hz : vitesse limitée par l'adhérence (accélération latérale
+propre à chaque pilote) avec freinage et réaccélération, ligne décalée de la
+route de quelques décimètres, dérive GPS lente, gigue et quelques positions
+aberrantes. Mesure :
+  - le recalage d'une trace : projection vectorisée contre Guidage position
+    par position (mode direct), durée et écart entre les deux ;
+  - le lot : traces par seconde et positions par seconde selon le nombre de
+    processus, et pic de mémoire du processus principal (tracemalloc) à
+    comparer au volume des fichiers ;
+  - les virages signalés, à comparer aux notes faussées ;
+et vérifie qu'une trace d'une autre étape est lue sans erreur, sans position
+recalée.
+
+Lancement depuis la racine du dépôt :
+    python -m benchmarks.bench_reconnaissance
+"""
+import os
+import tempfile
+import time
+import tracemalloc
+from dataclasses import replace
+
+import numpy as np
+
+from benchmarks.itineraires import itineraire_virages_connus
+from rally.direct import Guidage
+from rally.geodesie import abscisses_curvilignes
+from rally.presets import PRESETS
+from rally.projection import ProjectionLocale
+from rally.rayons import ParametresRayon, rayons_courbure
+from rally.reconnaissance import Bilan, Reference, aligner, lire_trace, mesurer_traces
+from rally.roadbook import Roadbook
+
+NB_VIRAGES = 40
+NB_TRACES = 200
+NB_FAUSSES = 6
+FREQUENCE = 10.0  # Positions par seconde
+VITESSE_MAX = 130 / 3.6  # m/s
+FREINAGE = 6.0  # m/s², freinage et accélération
+BRUIT_GPS = 1.5  # Écart type (mètres) de la dérive GPS, lissée sur DERIVE secondes (filtre du récepteur)
+DERIVE = 5.0
+GIGUE = 0.1  # Écart type (mètres) du bruit d'une position à l'autre
+
+
+def etape():
+    """(géométrie dense (lon, lat), roadbook au rayon, lignes dont la note a été faussée)"""
+    route, _ = itineraire_virages_connus(NB_VIRAGES, graine=5)
+    roadbook = replace(PRESETS["phase1_2"], rayons=ParametresRayon()).analyser(route)
+    rng = np.random.default_rng(1)
+    fausses = np.sort(rng.choice(len(roadbook), NB_FAUSSES, replace=False))
+    table = roadbook.table.copy()
+    notes = table["note"][fausses]
+    table["note"][fausses] = np.where(notes <= 3, notes + 2, notes - 2)
+    return route, Roadbook(roadbook.coordinates, table, roadbook.params), fausses
+
+
+def passage(xy, abscisses, rayons, rng):
+    """(temps, x, y, abscisse vraie) d'un passage simulé sur la route dense (mètres)"""
+    # Vitesse limitée par l'adhérence, puis par le freinage (v² décroît d'au plus 2·a·ds par mètre)
+    adherence = rng.uniform(3.0, 6.0)
+    ds = np.diff(abscisses, prepend=0.0)
+    limite = np.minimum(VITESSE_MAX, np.sqrt(adherence * np.abs(rayons))) ** 2
+    marche = 2 * FREINAGE * abscisses
+    v2 = np.minimum.accumulate(limite - marche) + marche  # Accélération en sortie de virage
+    v2 = np.minimum(v2, np.minimum.accumulate((limite + marche)[::-1])[::-1] - marche)  # Freinage
+    vitesses = np.sqrt(np.maximum(v2, 1.0))
+    temps = np.cumsum(ds / vitesses)
+
+    # Ligne suivie : décalage latéral lent, puis positions à FREQUENCE et bruit GPS corrélé
+    normale = np.gradient(xy, axis=0)[:, ::-1] * (1, -1)
+    normale /= np.hypot(*normale.T)[:, None]
+    decalage = sum(rng.uniform(0.1, 0.3) * np.sin(2 * np.pi * abscisses / rng.uniform(300, 1000) + rng.uniform(0, 6))
+                   for _ in range(3))
+    t = np.arange(0.0, temps[-1], 1 / FREQUENCE)
+    s = np.interp(t, temps, abscisses)
+    x = np.interp(s, abscisses, xy[:, 0] + decalage * normale[:, 0])
+    y = np.interp(s, abscisses, xy[:, 1] + decalage * normale[:, 1])
+    noyau = np.exp(-0.5 * (np.arange(-3 * DERIVE * FREQUENCE, 3 * DERIVE * FREQUENCE + 1) / (DERIVE * FREQUENCE)) ** 2)
+    noyau *= BRUIT_GPS / np.sqrt((noyau ** 2).sum())
+    x += np.convolve(rng.normal(0, 1, len(t)), noyau, "same") + rng.normal(0, GIGUE, len(t))
+    y += np.convolve(rng.normal(0, 1, len(t)), noyau, "same") + rng.normal(0, GIGUE, len(t))
+    aberrantes = rng.choice(len(t), 3, replace=False)  # Multitrajets
+    x[aberrantes] += rng.uniform(-300, 300, 3)
+    y[aberrantes] += rng.uniform(-300, 300, 3)
+    return t, x, y, s
+
+
+def ecrire_gpx(chemin, t, lon, lat):
+    horodatages = np.datetime_as_string(np.datetime64("2025-03-01T08:00:00") + (t * 1000).astype("timedelta64[ms]"),
+                                        unit="ms")
+    with open(chemin, "w", encoding="utf-8") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<gpx version="1.1" creator="bench" xmlns="http://www.topografix.com/GPX/1/1">\n<trk><trkseg>\n')
+        f.writelines(f'<trkpt lat="{b:.7f}" lon="{a:.7f}"><time>{h}Z</time></trkpt>\n'
+                     for a, b, h in zip(lon.tolist(), lat.tolist(), horodatages.tolist()))
+        f.write("</trkseg></trk>\n</gpx>\n")
+
+
+def simuler(dossier, route):
+    """Écrit NB_TRACES fichiers GPX, chemins dans l'ordre"""
+    projection = ProjectionLocale.centree(route)
+    xy = projection.projeter(route)
+    abscisses = abscisses_curvilignes(route)
+    rayons = rayons_courbure(route, 40)
+    chemins = []
+    for k in range(NB_TRACES):
+        t, x, y, _ = passage(xy, abscisses, rayons, np.random.default_rng(100 + k))
+        lon, lat = projection.deprojeter(np.column_stack((x, y))).T
+        chemin = os.path.join(dossier, f"reco_{k:03d}.gpx")
+        ecrire_gpx(chemin, t, lon, lat)
+        chemins.append(chemin)
+    return chemins
+
+
+def main():
+    route, roadbook, fausses = etape()
+    with tempfile.TemporaryDirectory() as dossier:
+        chemin_rbk = os.path.join(dossier, "etape_roadbook.rbk")
+        roadbook.ecrire(chemin_rbk)
+        debut = time.perf_counter()
+        chemins = simuler(dossier, route)
+        volume = sum(os.path.getsize(c) for c in chemins)
+        print(f"Étape de {abscisses_curvilignes(route)[-1] / 1000:.1f} km, {len(roadbook)} virages dont "
+              f"{NB_FAUSSES} à la note faussée ; {NB_TRACES} traces GPX à {FREQUENCE:.0f} Hz, "
+              f"{volume / 1e6:.0f} Mo (simulées en {time.perf_counter() - debut:.1f}s), {os.cpu_count()} cœur(s)\n")
+
+        # Recalage d'une trace : d'un bloc contre position par position
+        reference = Reference(Roadbook.charger(chemin_rbk))
+        trace = lire_trace(chemins[0])
+        debut = time.perf_counter()
+        abscisses, _ = aligner(reference.index, trace.lon, trace.lat)
+        t_bloc = time.perf_counter() - debut
+        guidage = Guidage(reference.roadbook, rayon=30.0)
+        debut = time.perf_counter()
+        sequentielles = []
+        for lon, lat in zip(trace.lon.tolist(), trace.lat.tolist()):
+            position = guidage.localiser(lon, lat)
+            if position is not None:
+                guidage.position = position[0]
+            sequentielles.append(np.nan if position is None else position[0])
+        t_sequentiel = time.perf_counter() - debut
+        sequentielles = np.array(sequentielles)
+        for nom, duree, valeurs in (("vectorisé", t_bloc, abscisses), ("Guidage", t_sequentiel, sequentielles)):
+            print(f"recalage {nom:<9} : {duree * 1000:7.1f} ms pour {len(trace.lon)} positions, "
+                  f"{np.isnan(valeurs).sum()} écartées")
+        ecarts = np.abs(abscisses - sequentielles)
+        print(f"écart d'abscisse entre les deux : médiane {np.nanmedian(ecarts):.2f} m, "
+              f"p99 {np.nanpercentile(ecarts, 99):.2f} m, {(ecarts > 20).sum()} positions à plus de 20 m")
+
+        # Trace d'une autre étape rangée dans le même dossier : aucune position à moins de rayon de la route
+        ailleurs = os.path.join(dossier, "autre_etape.gpx")
+        ecrire_gpx(ailleurs, trace.temps, trace.lon + 0.05, trace.lat + 0.05)
+        [(_, resultat, erreur)] = mesurer_traces(chemin_rbk, [ailleurs])
+        print(f"trace d'une autre étape : {erreur}" if erreur else
+              f"trace d'une autre étape : {resultat.recalees}/{resultat.positions} positions recalées, "
+              f"{resultat.virages} virages parcourus")
+
+        # Lot complet
+        print(f"\n{'processus':>9} {'durée':>8} {'traces/s':>9} {'positions/s':>12}")
+        for processus in sorted({1, 2, os.cpu_count() or 1}):
+            bilan = Bilan(reference)
+            positions = 0
+            debut = time.perf_counter()
+            for _, resultat, erreur in mesurer_traces(chemin_rbk, iter(chemins), processus=processus):
+                if erreur:
+                    raise RuntimeError(erreur)
+                bilan.ajouter(resultat)
+                positions += resultat.positions
+            duree = time.perf_counter() - debut
+            print(f"{processus:>9} {duree:>7.2f}s {NB_TRACES / duree:>9.1f} {positions / duree:>12.0f}")
+
+        tracemalloc.start()
+        bilan = Bilan(reference)
+        for _, resultat, _ in mesurer_traces(chemin_rbk, iter(chemins), processus=1):
+            bilan.ajouter(resultat)
+        _, pic = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f"\npic de mémoire du lot (un processus) : {pic / 1e6:.1f} Mo pour {volume / 1e6:.0f} Mo de traces")
+
+    lignes = list(bilan.lignes())
+    signales = np.array([ligne[-1] for ligne in lignes[1:]], dtype=bool)
+    attendus = np.zeros(len(roadbook), dtype=bool)
+    attendus[fausses] = True
+    parcourus = np.array([ligne[4] for ligne in lignes[1:]])
+    print(f"virages parcourus par toutes les traces : {(parcourus == NB_TRACES).sum()}/{len(roadbook)}")
+    print(f"virages signalés : {signales.sum()}, dont {(signales & attendus).sum()}/{NB_FAUSSES} notes faussées "
+          f"retrouvées et {(signales & ~attendus).sum()} signalements sur des notes justes")
+
+
+if __name__ == "__main__":
+    main()
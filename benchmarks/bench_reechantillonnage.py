@@ -0,0 +1,71 @@
+"""Compare le rééchantillonnage vectorisé à l'ancienne boucle par segment.
+
+Lancement depuis la racine du dépôt :
+    python -m benchmarks.bench_reechantillonnage
+"""
+import time
+
+import numpy as np
+from geopy.distance import geodesic
+
+from benchmarks.itineraires import itineraire_synthetique
+from rally.geodesie import longueurs_segments
+from rally.reechantillonnage import interpoler_points
+
+DISTANCE = 20
+
+
+def interpoler_points_historique(coordinates, distance=DISTANCE):
+    """Version d'origine de phase1.py (un appel geodesic par segment)"""
+    interpolated_points = []
+    for i in range(len(coordinates) - 1):
+        p0 = np.array(coordinates[i])
+        p1 = np.array(coordinates[i + 1])
+
+        segment_length = geodesic((p0[1], p0[0]), (p1[1], p1[0])).meters
+
+        if segment_length <= distance:
+            interpolated_points.append(p0)
+            if i == len(coordinates) - 2:
+                interpolated_points.append(p1)
+        else:
+            num_points = max(2, int(np.ceil(segment_length / distance)))
+            for j in range(num_points):
+                ratio = j / (num_points - 1)
+                interpolated_points.append(p0 + ratio * (p1 - p0))
+
+    return np.array(interpolated_points)
+
+
+def chronometrer(fonction, *args, repetitions=3):
+    """Meilleur temps (secondes) sur plusieurs répétitions"""
+    meilleur = float("inf")
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        resultat = fonction(*args)
+        meilleur = min(meilleur, time.perf_counter() - debut)
+    return meilleur, resultat
+
+
+def main():
+    print(f"Pas de rééchantillonnage : {DISTANCE} m\n")
+    print(f"{'sommets':>8} {'points (hist.)':>15} {'points (vect.)':>15} "
+          f"{'historique':>12} {'vectorisé':>12} {'gain':>8}")
+    for nb_sommets in (1_000, 10_000, 100_000):
+        coords = itineraire_synthetique(nb_sommets)
+        repetitions = 1 if nb_sommets >= 100_000 else 3
+        t_hist, hist = chronometrer(interpoler_points_historique, coords, DISTANCE,
+                                    repetitions=repetitions)
+        t_vect, vect = chronometrer(interpoler_points, coords, DISTANCE)
+        print(f"{nb_sommets:>8} {len(hist):>15} {len(vect):>15} "
+              f"{t_hist * 1000:>10.1f}ms {t_vect * 1000:>10.2f}ms {t_hist / t_vect:>7.0f}x")
+
+        # Contrôle : cordes ≤ pas (coupe des angles) et aucun doublon dans la sortie vectorisée
+        pas = longueurs_segments(vect)
+        doublons_hist = int(np.sum(np.all(np.diff(hist, axis=0) == 0, axis=1)))
+        print(f"{'':>8} cordes vectorisé : {pas[:-1].min():.3f}–{pas[:-1].max():.3f} m, "
+              f"doublons historique : {doublons_hist}, vectorisé : {int(np.sum(pas == 0))}")
+
+
+if __name__ == "__main__":
+    main()
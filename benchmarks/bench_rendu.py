@@ -0,0 +1,64 @@
+"""Compare le rendu folium (carte.save) au rendu HTML écrit au fil de l'eau.
+
+Même itinéraire, mêmes virages, mêmes points : taille du fichier HTML et
+temps de génération.
+
+Lancement depuis la racine du dépôt :
+    python -m benchmarks.bench_rendu
+"""
+import os
+import tempfile
+import time
+
+from benchmarks.itineraires import itineraire_synthetique
+from rally.reechantillonnage import interpoler_points
+from rally.rendu import carte_virages, ecrire_carte
+from rally.presets import PRESETS
+from rally.virages import detecter_virages
+
+DISTANCE = 20
+PARAMETRES = PRESETS["phase1_2"].virages
+
+
+def route_geojson(coords):
+    return {
+        "type": "FeatureCollection",
+        "features": [{
+            "type": "Feature",
+            "properties": {},
+            "geometry": {"type": "LineString", "coordinates": coords.tolist()},
+        }],
+    }
+
+
+def main():
+    dossier = tempfile.mkdtemp()
+    print(f"{'étape':>8} {'points':>7} {'virages':>7} {'folium':>20} {'flux':>20}")
+    for nb_sommets in (100, 1_200, 5_000):
+        brut = itineraire_synthetique(nb_sommets, graine=2)
+        route = route_geojson(brut)
+        coordinates = interpoler_points(brut, DISTANCE)
+        roadbook = detecter_virages(coordinates, PARAMETRES)
+        depart = (brut[0, 1], brut[0, 0])
+        arrivee = (brut[-1, 1], brut[-1, 0])
+
+        chemin_folium = os.path.join(dossier, f"folium_{nb_sommets}.html")
+        debut = time.perf_counter()
+        carte = carte_virages(route, roadbook, depart, arrivee)
+        carte.save(chemin_folium)
+        t_folium = time.perf_counter() - debut
+
+        chemin_flux = os.path.join(dossier, f"flux_{nb_sommets}.html")
+        debut = time.perf_counter()
+        ecrire_carte(chemin_flux, route, roadbook, depart, arrivee)
+        t_flux = time.perf_counter() - debut
+
+        taille_folium = os.path.getsize(chemin_folium) / 1e6
+        taille_flux = os.path.getsize(chemin_flux) / 1e6
+        km = coordinates.shape[0] * DISTANCE / 1000
+        print(f"{km:>6.0f}km {len(coordinates):>7} {len(roadbook):>7} "
+              f"{t_folium:>7.2f}s {taille_folium:>8.2f} Mo {t_flux:>7.3f}s {taille_flux:>8.2f} Mo")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""Routage hors ligne sur un extrait OSM synthétique.
+
+Quadrillage de 300 x 300 rues (90 000 nœuds, environ 36 x 36 km) : temps
+d'analyse du XML, de relecture du graphe depuis le cache en mémoire projetée,
+et d'un calcul d'itinéraire par A* et par Dijkstra bidirectionnel (même durée
+attendue). Le GeoJSON produit passe ensuite dans le calcul du roadbook.
+Vérifie aussi que les tags d'un nœud (feu, "oneway", "maxspeed") ne sont
+pas attribués à la voie qui le suit dans le fichier.
+
+Lancement depuis la racine du dépôt :
+    python -m benchmarks.bench_routage_local
+"""
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.itineraires import extrait_osm_synthetique
+from rally.itineraire import coordonnees_route, recuperer_route
+from rally.presets import PRESETS
+from rally.routage_local import VITESSES, ClientLocal, GrapheRoutier, charger_graphe, lire_osm_xml
+
+COTE = 300
+NB_TRAJETS = 20
+
+NOEUD_AVEC_TAGS = """<?xml version="1.0" encoding="UTF-8"?>
+<osm version="0.6">
+ <node id="1" lat="49.0" lon="1.5"><tag k="highway" v="traffic_signals"/><tag k="oneway" v="-1"/>
+  <tag k="maxspeed" v="5"/></node>
+ <node id="2" lat="49.001" lon="1.5"/>
+ <way id="1"><nd ref="1"/><nd ref="2"/><tag k="highway" v="primary"/></way>
+</osm>
+"""
+
+
+def verifier_tags_noeuds(dossier):
+    """Une voie sans "oneway" ni "maxspeed" reste à double sens et à la vitesse de sa classe"""
+    chemin = os.path.join(dossier, "noeud_avec_tags.osm")
+    with open(chemin, "w", encoding="utf-8") as f:
+        f.write(NOEUD_AVEC_TAGS)
+    extrait = lire_osm_xml(chemin)
+    return list(extrait.sens) == [0] and list(extrait.vitesses) == [VITESSES["primary"]]
+
+
+def main():
+    with tempfile.TemporaryDirectory() as dossier:
+        chemin = os.path.join(dossier, "quadrillage.osm")
+        extrait_osm_synthetique(chemin, COTE, COTE)
+        cache = os.path.join(dossier, "graphes")
+        print(f"Extrait : {os.path.getsize(chemin) / 1e6:.1f} Mo")
+        print("tags des nœuds ignorés par les voies" if verifier_tags_noeuds(dossier)
+              else "ÉCART : tags d'un nœud attribués à la voie suivante !")
+
+        debut = time.perf_counter()
+        graphe = charger_graphe(chemin, cache)
+        t_analyse = time.perf_counter() - debut
+        debut = time.perf_counter()
+        graphe = charger_graphe(chemin, cache)
+        t_cache = time.perf_counter() - debut
+        taille = sum(os.path.getsize(os.path.join(cache, f)) for f in os.listdir(cache))
+        print(f"graphe : {len(graphe)} nœuds, {graphe.nb_arcs} arcs, fichier {taille / 1e6:.1f} Mo")
+        print(f"premier chargement (XML) : {t_analyse * 1000:8.0f} ms")
+        print(f"chargement depuis le cache : {t_cache * 1000:6.1f} ms "
+              f"({'mémoire projetée' if isinstance(graphe.lon, np.memmap) else 'en mémoire'})")
+
+        rng = np.random.default_rng(0)
+        trajets = rng.integers(len(graphe), size=(NB_TRAJETS, 2))
+        graphe.index_spatial()
+        durees = {}
+        for algorithme in ("a_etoile", "bidirectionnel"):
+            debut = time.perf_counter()
+            durees[algorithme] = [graphe.resume(graphe.chemin(int(a), int(b), algorithme))[1] for a, b in trajets]
+            print(f"{algorithme:<15}: {(time.perf_counter() - debut) * 1000 / NB_TRAJETS:8.1f} ms par trajet")
+        print("durées identiques" if np.allclose(durees["a_etoile"], durees["bidirectionnel"], rtol=1e-5)
+              else "ÉCART entre A* et Dijkstra bidirectionnel !")
+
+        # Même usage qu'openrouteservice : (lat, lon) en entrée, GeoJSON en sortie
+        client = ClientLocal(GrapheRoutier.charger(os.path.join(cache, os.listdir(cache)[0])))
+        debut_route = (float(graphe.lat[0]), float(graphe.lon[0]))
+        fin_route = (float(graphe.lat[-1]), float(graphe.lon[-1]))
+        debut = time.perf_counter()
+        route = recuperer_route(client, debut_route, fin_route)
+        roadbook = PRESETS["phase1_2"].analyser(coordonnees_route(route))
+        resume = route["features"][0]["properties"]["summary"]
+        print(f"coin à coin : {resume['distance'] / 1000:.1f} km, {resume['duration'] / 60:.0f} min, "
+              f"{len(roadbook)} virages, roadbook en {(time.perf_counter() - debut) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""Mutualisation des routes communes sur un rallye complet.
+
+Rallye synthétique sur une route de 240 km : six spéciales de 50 km qui se
+chevauchent de 10 km, parcourues deux fois (deuxième boucle identique), et
+un enchaînement continu des trois premières. Compare Reglage.analyser étape
+par étape au magasin de tronçons (rally.segments) :
+  - roadbooks identiques au bit près (points et table des virages) ;
+  - durée totale, part des tronçons, points et étapes réutilisés, temps de
+    calcul évité ;
+  - cohérence : sur la route commune à deux étapes (hors 1 km aux bords),
+    part des virages identiques (même position au mètre près, même note)
+    d'une étape à l'autre, et sensibilité de Reglage.analyser au point de
+    départ (deux sommets bruts retirés).
+
+Lancement depuis la racine du dépôt :
+    python -m benchmarks.bench_segments
+"""
+import time
+from dataclasses import replace
+
+import numpy as np
+
+from benchmarks.itineraires import itineraire_etape
+from rally.geodesie import abscisses_curvilignes
+from rally.presets import PRESETS
+from rally.segments import MagasinSegments
+
+LONGUEUR = 240_000.0
+SPECIALES = [(k * 40_000.0, k * 40_000.0 + 50_000.0) for k in range(5)] + [(190_000.0, 240_000.0)]
+MARGE = 1_000.0  # Mètres exclus aux bords de la route commune
+REPETITIONS = 3
+
+
+def rallye():
+    """(nom, début, fin, géométrie) des étapes, dans l'ordre de génération"""
+    route = itineraire_etape(LONGUEUR)
+    abscisses = abscisses_curvilignes(route)
+
+    def portion(debut, fin):
+        return route[np.searchsorted(abscisses, debut):np.searchsorted(abscisses, fin, side="right")]
+
+    etapes = []
+    for boucle in (1, 2):
+        for k, (debut, fin) in enumerate(SPECIALES):
+            etapes.append((f"ES{k + 1 + 6 * (boucle - 1)}", debut, fin, portion(debut, fin)))
+    debut, fin = SPECIALES[0][0], SPECIALES[2][1]
+    etapes.append(("ES1-ES3", debut, fin, portion(debut, fin)))
+    return etapes
+
+
+def paires_communes(etapes):
+    """Couples d'étapes distinctes par leur géométrie dont les routes se recouvrent : (i, j, début, fin)"""
+    paires = []
+    for i, (_, d1, f1, g1) in enumerate(etapes):
+        for j, (_, d2, f2, g2) in enumerate(etapes[:i]):
+            debut, fin = max(d1, d2) + MARGE, min(f1, f2) - MARGE
+            if fin > debut and not np.array_equal(g1, g2):
+                paires.append((j, i, debut, fin))
+    return paires
+
+
+def virages_sur(roadbook, debut_etape, debut, fin):
+    """Virages (lat, lon arrondis au mètre, note) situés entre les abscisses debut et fin de la route"""
+    abscisses = abscisses_curvilignes(roadbook.coordinates) + debut_etape
+    table = roadbook.table
+    dedans = (abscisses[table["index"]] >= debut) & (abscisses[table["index"]] <= fin)
+    return {(round(float(lat), 5), round(float(lon), 5), int(note))
+            for lat, lon, note in zip(table["lat"][dedans], table["lon"][dedans], table["note"][dedans])}
+
+
+def coherence(etapes, roadbooks):
+    """Part des virages de la route commune retrouvés à l'identique dans l'autre étape"""
+    communs = total = 0
+    for i, j, debut, fin in paires_communes(etapes):
+        a = virages_sur(roadbooks[i], etapes[i][1], debut, fin)
+        b = virages_sur(roadbooks[j], etapes[j][1], debut, fin)
+        communs += 2 * len(a & b)
+        total += len(a) + len(b)
+    return communs / total if total else 1.0
+
+
+def identiques(a, b):
+    return np.array_equal(a.coordinates, b.coordinates) and np.array_equal(a.table, b.table)
+
+
+def verifier(condition, message):
+    print(("  ok     " if condition else "  ÉCART  ") + message)
+    return condition
+
+
+def main():
+    etapes = rallye()
+    ok = True
+    print(f"Rallye de {len(etapes)} étapes sur {LONGUEUR / 1000:.0f} km de route "
+          f"({sum(len(g) for *_, g in etapes)} sommets bruts au total)\n")
+    for nom_preset, metrique in (("phase1", False), ("phase1_2", False), ("phase1_2", True)):
+        reglage = PRESETS[nom_preset]
+        reglage = replace(reglage, virages=replace(reglage.virages, repere_metrique=metrique))
+
+        t_analyse = t_magasin = float("inf")
+        for _ in range(REPETITIONS):
+            debut = time.perf_counter()
+            references = [reglage.analyser(g) for *_, g in etapes]
+            t_analyse = min(t_analyse, time.perf_counter() - debut)
+            magasin = MagasinSegments(reglage)
+            debut = time.perf_counter()
+            roadbooks = [magasin.analyser(g) for *_, g in etapes]
+            t_magasin = min(t_magasin, time.perf_counter() - debut)
+
+        decales = [len(reglage.analyser(g[2:])) - len(ref) for (*_, g), ref in zip(etapes, references)]
+        print(f"{nom_preset}{' (repère métrique)' if metrique else ''}, pas de {reglage.distance:.0f} m")
+        print(f"  Reglage.analyser : {t_analyse * 1000:7.1f} ms, {sum(map(len, references))} virages")
+        print(f"  magasin          : {t_magasin * 1000:7.1f} ms ({t_analyse / t_magasin:.1f}x), "
+              f"{sum(map(len, roadbooks))} virages")
+        print(f"  {magasin.resume()}")
+        print(f"  virages identiques sur les routes communes : {coherence(etapes, references):.0%} ; "
+              f"départ décalé de deux sommets : écart par étape de {min(decales):+d} à {max(decales):+d} virages")
+        nb = sum(identiques(r, ref) for r, ref in zip(roadbooks, references))
+        ok &= verifier(nb == len(etapes), f"{nb}/{len(etapes)} roadbooks identiques à Reglage.analyser\n")
+    print("magasin conforme" if ok else "ÉCART : magasin non conforme !")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,245 @@
+"""Charge du service de roadbooks (python -m rally serveur) contre un faux routage local.
+
+Le faux serveur de routage (compatible openrouteservice, dans ce processus)
+répond après LATENCE secondes par une route sinueuse passant par les points
+demandés. Le service est lancé dans un processus à part, pointé dessus, puis
+240 demandes sur 24 itinéraires (les plus demandés revenant souvent, presets
+tirés au hasard) sont envoyées à plusieurs niveaux de concurrence, un
+service neuf par niveau. Mesure :
+  - le coût de démarrage d'un script par roadbook (imports seuls) ;
+  - le démarrage du service, puis par niveau le débit, les latences, les
+    calculs, routages et calculs partagés, et la latence d'une sonde GET
+    /etat envoyée pendant la charge (la boucle ne doit pas être bloquée
+    par la détection des virages) ;
+et vérifie qu'un roadbook servi est celui de Reglage.analyser sur la même
+route, carte HTML comprise.
+
+Lancement depuis la racine du dépôt :
+    python -m benchmarks.bench_serveur
+"""
+import asyncio
+import hashlib
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from rally.assemblage import assembler, decouper
+from rally.presets import PRESETS
+
+LATENCE = 0.05  # Secondes par requête de routage
+NB_ITINERAIRES = 24
+NB_DEMANDES = 240
+CONCURRENCES = (1, 8, 32)
+PAS = 30.0  # Mètres entre sommets des fausses routes
+METRES_PAR_DEGRE = 111_320.0
+
+
+def fausse_geometrie(coordinates):
+    """Polyligne (lon, lat) sinueuse passant par les points, déterministe"""
+    geometrie = [tuple(coordinates[0])]
+    for (lon0, lat0), (lon1, lat1) in zip(coordinates[:-1], coordinates[1:]):
+        graine = int(hashlib.sha1(repr((lon0, lat0, lon1, lat1)).encode()).hexdigest()[:8], 16)
+        rng = np.random.default_rng(graine)
+        echelle = np.array([METRES_PAR_DEGRE * math.cos(math.radians(lat0)), METRES_PAR_DEGRE])
+        delta = (np.array([lon1, lat1]) - (lon0, lat0)) * echelle
+        longueur = float(np.hypot(*delta))
+        n = max(2, int(longueur / PAS))
+        t = np.linspace(0.0, 1.0, n + 1)[1:]
+        normale = np.array([-delta[1], delta[0]]) / max(longueur, 1e-9)
+        ecart = np.zeros_like(t)
+        for onde in rng.uniform(300.0, 2000.0, 6):
+            ecart += rng.uniform(20.0, 120.0) * np.sin(2 * np.pi * t * longueur / onde + rng.uniform(0, 2 * np.pi))
+        ecart *= np.sin(np.pi * t)  # Nul aux points demandés
+        xy = t[:, None] * delta + ecart[:, None] * normale
+        geometrie.extend(map(tuple, (xy / echelle + (lon0, lat0)).tolist()))
+    return [list(p) for p in geometrie]
+
+
+def fausse_route(coordinates):
+    geometrie = fausse_geometrie(coordinates)
+    return {"type": "FeatureCollection", "features": [{
+        "type": "Feature", "geometry": {"type": "LineString", "coordinates": geometrie},
+        "properties": {"way_points": [0, len(geometrie) - 1], "summary": {}},
+    }]}
+
+
+async def faux_routage(port, compteur):
+    """Serveur de routage local : POST /v2/directions/{profil}/geojson"""
+    from aiohttp import web
+
+    async def directions(requete):
+        corps = await requete.json()
+        compteur["requetes"] += 1
+        await asyncio.sleep(LATENCE)
+        return web.json_response(fausse_route(corps["coordinates"]))
+
+    app = web.Application()
+    app.router.add_post("/v2/directions/{profil}/{format}", directions)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, "127.0.0.1", port).start()
+    return runner
+
+
+def port_libre():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def demandes():
+    """Itinéraires (départ, arrivée, points de passage en (lat, lon)) et suite de demandes"""
+    rng = random.Random(3)
+    itineraires = []
+    for _ in range(NB_ITINERAIRES):
+        depart = (49.0 + rng.uniform(-0.3, 0.3), 1.5 + rng.uniform(-0.4, 0.4))
+        cap, longueur = rng.uniform(0, 2 * math.pi), rng.uniform(15_000.0, 40_000.0)
+        arrivee = (depart[0] + longueur * math.cos(cap) / METRES_PAR_DEGRE,
+                   depart[1] + longueur * math.sin(cap) / (METRES_PAR_DEGRE * math.cos(math.radians(depart[0]))))
+        etapes = [(depart[0] + (arrivee[0] - depart[0]) * f + rng.uniform(-0.02, 0.02),
+                   depart[1] + (arrivee[1] - depart[1]) * f + rng.uniform(-0.02, 0.02))
+                  for f in sorted(rng.uniform(0.2, 0.8) for _ in range(rng.randint(0, 2)))]
+        itineraires.append({"depart": list(depart), "arrivee": list(arrivee), "etapes": [list(p) for p in etapes]})
+    poids = [1 / (k + 1) for k in range(NB_ITINERAIRES)]
+    presets = sorted(PRESETS)
+    return [{**rng.choices(itineraires, poids)[0], "preset": rng.choice(presets)} for _ in range(NB_DEMANDES)]
+
+
+def demarrage_script():
+    """Secondes d'imports d'un script de roadbook lancé à chaque demande"""
+    commande = "import numpy, folium, openrouteservice, rally.cli, rally.itineraire, rally.rendu"
+    durees = []
+    for _ in range(3):
+        debut = time.perf_counter()
+        subprocess.run([sys.executable, "-c", commande], check=True)
+        durees.append(time.perf_counter() - debut)
+    return min(durees)
+
+
+async def lancer_service(url_routage, dossier):
+    """(processus, url) du service démarré, et secondes jusqu'à sa première réponse"""
+    import aiohttp
+
+    port = port_libre()
+    journal = open(os.path.join(dossier, f"serveur_{port}.log"), "w")
+    debut = time.perf_counter()
+    processus = subprocess.Popen(
+        [sys.executable, "-m", "rally", "serveur", "--port", str(port), "--url-routage", url_routage,
+         "--requetes-par-minute", "0", "--cache", os.path.join(dossier, f"itineraires_{port}.sqlite")],
+        stdout=journal, stderr=subprocess.STDOUT)
+    url = f"http://127.0.0.1:{port}"
+    async with aiohttp.ClientSession() as session:
+        while True:
+            if processus.poll() is not None:
+                raise RuntimeError(f"Le service s'est arrêté, voir {journal.name}")
+            try:
+                async with session.get(url + "/etat") as reponse:
+                    if reponse.status == 200:
+                        return processus, url, time.perf_counter() - debut
+            except aiohttp.ClientConnectionError:
+                await asyncio.sleep(0.05)
+
+
+def quantiles(valeurs):
+    valeurs = np.asarray(valeurs) * 1000
+    return np.percentile(valeurs, 50), np.percentile(valeurs, 95), valeurs.max()
+
+
+async def charger(url, suite, concurrence):
+    """Envoie la suite de demandes avec `concurrence` clients : (durée, latences, latences de la sonde, réponses)"""
+    import aiohttp
+
+    latences, sonde, reponses = [], [], []
+    file = iter(suite)
+    fini = asyncio.Event()
+
+    async def client(session):
+        for demande in file:
+            debut = time.perf_counter()
+            async with session.post(url + "/roadbook", json=demande) as reponse:
+                corps = await reponse.json()
+                if reponse.status != 200:
+                    raise RuntimeError(f"HTTP {reponse.status} : {corps}")
+            latences.append(time.perf_counter() - debut)
+            reponses.append((demande, corps))
+
+    async def sonder(session):
+        while not fini.is_set():
+            debut = time.perf_counter()
+            async with session.get(url + "/etat") as reponse:
+                await reponse.read()
+            sonde.append(time.perf_counter() - debut)
+            await asyncio.sleep(0.01)
+
+    async with aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=concurrence + 1)) as session:
+        tache_sonde = asyncio.ensure_future(sonder(session))
+        debut = time.perf_counter()
+        await asyncio.gather(*(client(session) for _ in range(concurrence)))
+        duree = time.perf_counter() - debut
+        fini.set()
+        await tache_sonde
+        async with session.get(url + "/etat") as reponse:
+            etat = await reponse.json()
+    return duree, latences, sonde, reponses, etat
+
+
+async def verifier(url, demande, corps):
+    """Le roadbook servi est celui de Reglage.analyser sur la même route, et sa carte est servie"""
+    import aiohttp
+
+    points = [demande["depart"], *demande["etapes"], demande["arrivee"]]
+    route = assembler([fausse_route(t) for t in decouper([tuple(p[::-1]) for p in points])])
+    roadbook = PRESETS[demande["preset"]].analyser(route["features"][0]["geometry"]["coordinates"])
+    attendues = [[lat, lon, note, angle] for lat, lon, note, angle in roadbook.notes()]
+    obtenues = [[n["lat"], n["lon"], n["note"], n["angle"]] for n in corps["notes"]]
+    async with aiohttp.ClientSession() as session:
+        async with session.get(url + corps["carte"]) as reponse:
+            carte = await reponse.text()
+    return attendues == obtenues and reponse.content_type == "text/html" and "L.map" in carte
+
+
+async def principal():
+    suite = demandes()
+    print(f"{NB_DEMANDES} demandes sur {NB_ITINERAIRES} itinéraires, routage simulé à {LATENCE * 1000:.0f} ms "
+          f"par requête, {os.cpu_count()} cœur(s)\n")
+    print(f"script par roadbook : {demarrage_script():.2f}s d'imports à chaque demande (avant routage et calcul)")
+
+    compteur = {"requetes": 0}
+    port_routage = port_libre()
+    routage = await faux_routage(port_routage, compteur)
+    try:
+        with tempfile.TemporaryDirectory() as dossier:
+            print(f"\n{'clients':>7} {'démarrage':>9} {'débit':>9} {'p50':>8} {'p95':>8} {'max':>8} "
+                  f"{'calculs':>7} {'partagés':>8} {'routages':>8} {'sonde p95':>9} {'max':>7}")
+            for concurrence in CONCURRENCES:
+                processus, url, demarrage = await lancer_service(f"http://127.0.0.1:{port_routage}", dossier)
+                try:
+                    duree, latences, sonde, reponses, etat = await charger(url, suite, concurrence)
+                    correct = await verifier(url, *reponses[0])
+                finally:
+                    processus.terminate()
+                    processus.wait()
+                p50, p95, pmax = quantiles(latences)
+                s50, s95, smax = quantiles(sonde)
+                print(f"{concurrence:>7} {demarrage:>8.2f}s {len(latences) / duree:>5.0f} r/s {p50:>6.1f}ms "
+                      f"{p95:>6.1f}ms {pmax:>6.0f}ms {etat['calculs']:>7} {etat['partages']:>8} "
+                      f"{etat['routages']:>8} {s95:>7.1f}ms {smax:>5.0f}ms"
+                      f"{'' if correct else '  ÉCART avec Reglage.analyser'}")
+            print(f"\n(requêtes reçues par le faux routage : {compteur['requetes']})")
+    finally:
+        await routage.cleanup()
+
+
+def main():
+    asyncio.run(principal())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""Simplification (Douglas-Peucker, Visvalingam) avant le rééchantillonnage.
+
+L'étape Évreux → Rambouillet synthétique sert de tracé propre. On en tire une
+géométrie façon openrouteservice : des grappes de sommets presque alignés
+sur chaque segment, décalés de quelques décimètres à un mètre. Pour chaque
+variante (brute, simplifiée, simplifiée puis lissée), la mesure donne :
+  - le nombre de sommets et le taux de réduction ;
+  - le temps de la simplification et celui du passage en aval
+    (rééchantillonnage et détection), pour la note à l'angle et au rayon ;
+  - les virages retrouvés par rapport au tracé propre (même sens, début à
+    moins de 40 m) et les faux virages créés par le bruit.
+
+La spline n'aide pas sur l'étape Évreux → Rambouillet, faite de lignes
+brisées : elle déborde aux angles et étale la courbure. Une seconde mesure
+reprend donc des arcs de cercle exacts (vérité terrain de bench_rayons),
+réduits à une géométrie façon openrouteservice puis bruités : on y compte,
+pour la note au rayon, les arcs détectés et les arcs à la note attendue.
+
+Enfin, sur des marches aléatoires (pire cas : rien n'est aligné), l'écart
+maximal des sommets retirés au tracé simplifié, qui doit rester sous la
+tolérance pour les deux méthodes.
+
+Lancement depuis la racine du dépôt :
+    python -m benchmarks.bench_simplification
+"""
+from dataclasses import replace
+
+import numpy as np
+
+from benchmarks.bench_reechantillonnage import chronometrer
+from benchmarks.itineraires import itineraire_phase1, itineraire_virages_connus
+from rally.geodesie import longueurs_segments
+from rally.presets import PRESETS
+from rally.projection import ProjectionLocale
+from rally.rayons import ParametresRayon, notes_rayon
+from rally.simplification import ParametresSimplification, douglas_peucker, simplifier, visvalingam
+
+ECART_MAX = 40.0  # Mètres entre débuts de virages appariés
+VARIANTES = (
+    ("brute", None),
+    ("rdp 2 m", ParametresSimplification(2.0)),
+    ("visvalingam 2 m", ParametresSimplification(2.0, "visvalingam")),
+    ("rdp 2 m + spline", ParametresSimplification(2.0, lissage=5.0)),
+)
+NB_ARCS = 80
+VARIANTES_ARCS = (
+    ("brute", None),
+    ("rdp 2 m", ParametresSimplification(2.0)),
+    ("rdp 2 m + spline", ParametresSimplification(2.0, lissage=5.0)),
+    ("rdp 3 m + spline", ParametresSimplification(3.0, lissage=5.0)),
+)
+NB_MARCHES = 20
+TOLERANCES = (0.5, 1.0, 3.0)
+
+
+def bruiter(coords, graine=0, par_segment=4, ecart=0.5):
+    """Sommets intermédiaires presque alignés, décalés de `ecart` mètres (écart type) sur chaque segment"""
+    rng = np.random.default_rng(graine)
+    projection = ProjectionLocale.centree(coords)
+    xy = projection.projeter(coords)
+    nombres = rng.poisson(par_segment, len(xy) - 1)
+    k = np.repeat(np.arange(len(xy) - 1), nombres)
+    t = rng.random(len(k))
+    intermediaires = xy[k] + t[:, None] * (xy[k + 1] - xy[k]) + rng.normal(0, ecart, (len(k), 2))
+    tous = np.concatenate((xy, intermediaires))
+    # Chaque sommet d'origine, puis les intermédiaires de son segment dans l'ordre
+    ordre = np.lexsort((np.concatenate((np.zeros(len(xy)), 0.5 + t / 2)),
+                        np.concatenate((np.arange(len(xy)), k))))
+    return projection.deprojeter(tous[ordre])
+
+
+def apparier(reference, roadbook):
+    """(virages de référence retrouvés, virages en trop)"""
+    debuts = reference.table["distance_depart"]
+    sens = np.sign(reference.table["angle"])
+    libres = np.ones(len(roadbook), dtype=bool)
+    retrouves = 0
+    for debut, s in zip(debuts, sens):
+        ecarts = np.abs(roadbook.table["distance_depart"] - debut)
+        candidats = np.flatnonzero(libres & (ecarts < ECART_MAX) & (np.sign(roadbook.table["angle"]) == s))
+        if len(candidats):
+            libres[candidats[np.argmin(ecarts[candidats])]] = False
+            retrouves += 1
+    return retrouves, int(libres.sum())
+
+
+def ecart_max(xy, garder):
+    """Plus grand écart (mètres) d'un sommet d'origine au segment simplifié qui le remplace"""
+    gardes = np.flatnonzero(garder)
+    k = np.arange(len(xy))
+    a = xy[gardes[np.searchsorted(gardes, k, side="right") - 1]]
+    b = xy[gardes[np.minimum(np.searchsorted(gardes, k), len(gardes) - 1)]]
+    ab, ap = b - a, xy - a
+    norme2 = (ab * ab).sum(axis=1)
+    t = np.clip((ap * ab).sum(axis=1) / np.where(norme2 > 0, norme2, 1.0), 0.0, 1.0)
+    return float(np.hypot(*(ap - t[:, None] * ab).T).max())
+
+
+def main():
+    propre = itineraire_phase1()
+    brute = bruiter(propre)
+    print(f"Étape Évreux → Rambouillet : {len(propre)} sommets propres, {len(brute)} avec grappes et bruit\n")
+
+    for nom_reglage, reglage in (("angle (phase1)", PRESETS["phase1"]),
+                                 ("rayon", replace(PRESETS["phase1"], rayons=ParametresRayon()))):
+        reference = reglage.analyser(propre)
+        print(f"{nom_reglage} : {len(reference)} virages sur le tracé propre")
+        print(f"{'variante':<18} {'sommets':>8} {'réduction':>9} {'simplif.':>9} {'aval':>9} "
+              f"{'retrouvés':>10} {'en trop':>8}")
+        t_brut = None
+        for nom, simplification in VARIANTES:
+            if simplification is None:
+                t_simplification, entree = 0.0, brute
+            else:
+                t_simplification, entree = chronometrer(simplifier, brute, simplification)
+            t_aval, roadbook = chronometrer(reglage.analyser, entree)
+            t_brut = t_brut or t_aval
+            retrouves, en_trop = apparier(reference, roadbook)
+            print(f"{nom:<18} {len(entree):>8} {len(brute) / len(entree):>8.1f}x {t_simplification * 1000:>7.2f}ms "
+                  f"{t_aval * 1000:>7.2f}ms {retrouves:>5}/{len(reference):<4} {en_trop:>8}"
+                  + (f"  aval x{t_brut / t_aval:.1f}" if simplification else ""))
+        print()
+
+    # === Arcs de cercle exacts : la spline avant la note au rayon ===
+    dense, arcs = itineraire_virages_connus(NB_ARCS, graine=1)
+    abscisses = np.concatenate(([0.0], np.cumsum(longueurs_segments(dense))))
+    milieux = dense[np.searchsorted(abscisses, arcs[:, 0])]
+    attendues = notes_rayon(arcs[:, 1])
+    ors = simplifier(dense, ParametresSimplification(0.3))
+    brute = bruiter(ors, par_segment=3, ecart=0.4)
+    reglage = replace(PRESETS["phase1_2"], rayons=ParametresRayon())
+    print(f"{NB_ARCS} arcs exacts, note au rayon (phase1_2) : {len(ors)} sommets façon openrouteservice, "
+          f"{len(brute)} avec grappes et bruit")
+    print(f"{'variante':<18} {'sommets':>8} {'virages':>8} {'détectés':>9} {'bonne note':>11}")
+    for nom, simplification in VARIANTES_ARCS:
+        entree = brute if simplification is None else simplifier(brute, simplification)
+        roadbook = reglage.analyser(entree)
+        lignes = np.array([roadbook.virage_en(lon, lat) for lon, lat in milieux])
+        detectes = lignes >= 0
+        bonnes = int(np.sum(roadbook.table["note"][lignes[detectes]] == attendues[detectes]))
+        print(f"{nom:<18} {len(entree):>8} {len(roadbook):>8} {int(detectes.sum()):>5}/{NB_ARCS:<3} "
+              f"{bonnes:>7}/{NB_ARCS}")
+
+    # === Marches aléatoires : l'écart au tracé simplifié reste sous la tolérance ===
+    rng = np.random.default_rng(2)
+    marches = [np.cumsum(rng.normal(0, 1, (2000, 2)), axis=0) for _ in range(NB_MARCHES)]
+    print(f"\n{NB_MARCHES} marches aléatoires de 2000 sommets (pas de 1 m) : écart maximal au tracé simplifié")
+    print(f"{'méthode':<12} {'tolérance':>9} {'sommets':>8} {'écart max':>10}")
+    for nom, methode in (("rdp", douglas_peucker), ("visvalingam", visvalingam)):
+        for tolerance in TOLERANCES:
+            masques = [methode(xy, tolerance) for xy in marches]
+            ecart = max(ecart_max(xy, garder) for xy, garder in zip(marches, masques))
+            print(f"{nom:<12} {tolerance:>7.1f} m {sum(int(g.sum()) for g in masques) / NB_MARCHES:>8.0f} "
+                  f"{ecart:>8.2f} m" + ("" if ecart <= tolerance else "  AU-DELÀ DE LA TOLÉRANCE"))
+
+
+if __name__ == "__main__":
+    main()
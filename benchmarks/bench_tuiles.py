@@ -0,0 +1,129 @@
+"""Carte à niveaux de détail d'un rallye complet contre la carte en une page.
+
+Quarante étapes synthétiques de 50 km (preset phase1, pas de 20 m), réparties
+sur la région. Mesure :
+  - le poids de la carte actuelle : une page ecrire_carte par étape, dont la
+    somme est ce qu'une page unique du rallye devrait contenir ;
+  - la génération des tuiles (durée, nombre et poids par niveau) ;
+  - ce que la page à niveaux de détail charge réellement pour trois vues
+    d'un écran de 1280 × 800 pixels : le rallye entier, une étape (zoom 11)
+    et un virage (zoom 16). Les tuiles retenues sont celles que choisit la
+    page : niveau courant, rectangle de la vue.
+
+Lancement depuis la racine du dépôt :
+    python -m benchmarks.bench_tuiles
+"""
+import math
+import os
+import re
+import tempfile
+import time
+
+import numpy as np
+
+from benchmarks.itineraires import itineraire_etape
+from rally.presets import PRESETS
+from rally.rendu import ecrire_carte
+from rally.tuiles import NIVEAUX, ecrire_carte_tuiles, tuiles_flottantes
+
+NB_ETAPES = 40
+LONGUEUR = 50_000.0
+REGLAGE = PRESETS["phase1"]
+ECRAN = (1280, 800)  # Pixels
+
+
+def etapes():
+    """(nom, roadbook, géométrie) des étapes, décalées sur une grille de 8 × 5"""
+    for k in range(NB_ETAPES):
+        geometrie = itineraire_etape(LONGUEUR, graine=k) + ((k % 8) * 0.5, -(k // 8) * 0.35)
+        yield f"ES{k + 1}", REGLAGE.analyser(geometrie), geometrie
+
+
+def zoom_ajuste(ouest, sud, est, nord):
+    """Zoom entier le plus fort où le rectangle tient dans l'écran (comme carte.fitBounds)"""
+    for zoom in range(19, -1, -1):
+        x, y = tuiles_flottantes([(ouest, nord), (est, sud)], zoom)
+        if (x[1] - x[0]) * 256 <= ECRAN[0] and (y[1] - y[0]) * 256 <= ECRAN[1]:
+            return zoom
+    return 0
+
+
+def tuiles_vues(dossier, centre, zoom):
+    """Fichiers de tuiles chargés par la page pour une vue centrée sur (lon, lat) au zoom donné"""
+    niveau = max((n.zoom for n in NIVEAUX if n.zoom <= zoom), default=NIVEAUX[0].zoom)
+    (cx,), (cy,) = tuiles_flottantes(centre, zoom)
+    demi_x, demi_y = ECRAN[0] / 512, ECRAN[1] / 512  # Demi-écran en tuiles du zoom courant
+    facteur = 2.0 ** (niveau - zoom)
+    x0, x1 = math.floor((cx - demi_x) * facteur), math.floor((cx + demi_x) * facteur)
+    y0, y1 = math.floor((cy - demi_y) * facteur), math.floor((cy + demi_y) * facteur)
+    chemins = (os.path.join(dossier, "tuiles", str(niveau), str(x), f"{y}.js")
+               for x in range(x0, x1 + 1) for y in range(y0, y1 + 1))
+    return niveau, [c for c in chemins if os.path.exists(c)]
+
+
+def contenu(chemins):
+    """(octets, features, sommets) d'un ensemble de fichiers"""
+    octets = features = sommets = 0
+    for chemin in chemins:
+        with open(chemin, encoding="utf-8") as f:
+            texte = f.read()
+        octets += len(texte.encode("utf-8"))
+        features += texte.count('"type":"Feature"')
+        sommets += len(re.findall(r"\[-?\d+\.\d+,-?\d+\.\d+\]", texte))
+    return octets, features, sommets
+
+
+def main():
+    with tempfile.TemporaryDirectory() as dossier:
+        # === Carte actuelle : une page par étape ===
+        debut = time.perf_counter()
+        pages, bornes = [], []
+        for nom, roadbook, geometrie in etapes():
+            route = {"type": "FeatureCollection",
+                     "features": [{"type": "Feature", "properties": {},
+                                   "geometry": {"type": "LineString", "coordinates": geometrie.tolist()}}]}
+            pages.append(os.path.join(dossier, f"{nom}.html"))
+            ecrire_carte(pages[-1], route, roadbook, tuple(geometrie[0][::-1]), tuple(geometrie[-1][::-1]))
+            bornes.append((*geometrie.min(axis=0), *geometrie.max(axis=0)))
+        t_pages = time.perf_counter() - debut
+        octets, features, sommets = contenu(pages)
+        print(f"{NB_ETAPES} étapes de {LONGUEUR / 1000:.0f} km\n")
+        print(f"carte en une page : {octets / 1e6:6.1f} Mo, {features} features, {sommets} sommets "
+              f"(écrite en {t_pages:.1f}s)")
+
+        # === Carte à niveaux de détail ===
+        lod = os.path.join(dossier, "lod")
+        debut = time.perf_counter()
+        nb_tuiles = ecrire_carte_tuiles(lod, etapes())
+        t_tuiles = time.perf_counter() - debut
+        print(f"carte à niveaux de détail : {nb_tuiles} tuiles écrites en {t_tuiles:.1f}s "
+              f"(analyse des étapes comprise)")
+        print(f"  {'niveau':<8} {'tuiles':>7} {'Mo':>7} {'features':>9} {'sommets':>9}")
+        for niveau in NIVEAUX:
+            racine = os.path.join(lod, "tuiles", str(niveau.zoom))
+            chemins = [os.path.join(d, f) for d, _, fichiers in os.walk(racine) for f in fichiers]
+            octets, features, sommets = contenu(chemins)
+            print(f"  z{niveau.zoom:<7} {len(chemins):>7} {octets / 1e6:>7.2f} {features:>9} {sommets:>9}")
+        print(f"  page : {os.path.getsize(os.path.join(lod, 'index.html')) / 1000:.0f} ko\n")
+
+        # === Vues : ce que la page charge ===
+        bornes = np.array(bornes)
+        ouest, sud = bornes[:, :2].min(axis=0)
+        est, nord = bornes[:, 2:].max(axis=0)
+        premiere = next(etapes())
+        virage = premiere[1].table[np.argmin(premiere[1].table["note"])]
+        vues = (
+            ("rallye entier", ((ouest + est) / 2, (sud + nord) / 2), zoom_ajuste(ouest, sud, est, nord)),
+            ("une étape", tuple(premiere[2].mean(axis=0)), 11),
+            ("un virage", (virage["lon"], virage["lat"]), 16),
+        )
+        print(f"{'vue':<14} {'zoom':>4} {'niveau':>6} {'tuiles':>7} {'ko':>8} {'features':>9} {'sommets':>9}")
+        for nom, centre, zoom in vues:
+            niveau, chemins = tuiles_vues(lod, centre, zoom)
+            octets, features, sommets = contenu(chemins)
+            print(f"{nom:<14} {zoom:>4} {'z' + str(niveau):>6} {len(chemins):>7} {octets / 1000:>8.0f} "
+                  f"{features:>9} {sommets:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Compare la détection de virages vectorisée à l'ancienne boucle while.
+
+Étape spéciale synthétique d'environ 50 km, rééchantillonnée à 20 m, avec
+les seuils de phase1_2.py. Vérifie aussi que les notes sont identiques.
+
+Lancement depuis la racine du dépôt :
+    python -m benchmarks.bench_virages
+"""
+import numpy as np
+from geopy.distance import geodesic
+
+from benchmarks.bench_reechantillonnage import chronometrer
+from benchmarks.itineraires import itineraire_synthetique
+from rally.geodesie import longueurs_segments
+from rally.presets import PRESETS
+from rally.reechantillonnage import interpoler_points
+from rally.roadbook import classer_virage
+from rally.virages import detecter_virages
+
+DISTANCE = 20
+PARAMETRES = PRESETS["phase1_2"].virages
+
+
+def calcul_angle(v1, v2):
+    norm_v1 = np.linalg.norm(v1)
+    norm_v2 = np.linalg.norm(v2)
+    if norm_v1 == 0 or norm_v2 == 0:
+        return 0
+    angle_rad = np.arccos(np.clip(np.dot(v1, v2) / (norm_v1 * norm_v2), -1.0, 1.0))
+    return np.degrees(angle_rad)
+
+
+def distance_geodesique(p1, p2):
+    return geodesic((p1[1], p1[0]), (p2[1], p2[0])).meters
+
+
+def cross2(v1, v2):
+    return v1[0] * v2[1] - v1[1] * v2[0]
+
+
+def virages_historique(coordinates):
+    """Boucle d'origine de phase1_2.py, sans la partie folium"""
+    notes = []
+    i = 1
+    seuil_angle_min = 10
+    seuil_angle_total = 20
+    distance_max_virage = 150
+
+    while i < len(coordinates) - 1:
+        p0 = np.array(coordinates[i - 1])
+        p1 = np.array(coordinates[i])
+        p2 = np.array(coordinates[i + 1])
+        v1 = p1 - p0
+        v2 = p2 - p1
+
+        angle = calcul_angle(v1, v2)
+        if np.isnan(angle) or angle < 5:
+            i += 1
+            continue
+
+        direction = "gauche" if cross2(v1, v2) > 0 else "droite"
+        angle_total = angle
+        j = i + 1
+        distance_totale_virage = 0
+
+        while j < len(coordinates) - 1:
+            p_prev = np.array(coordinates[j - 1])
+            p_curr = np.array(coordinates[j])
+            p_next = np.array(coordinates[j + 1])
+
+            distance_totale_virage += distance_geodesique(p_prev, p_curr)
+            if distance_totale_virage > distance_max_virage:
+                break
+
+            v_prev = p_curr - p_prev
+            v_next = p_next - p_curr
+            a = calcul_angle(v_prev, v_next)
+            if np.isnan(a) or a < 10:
+                break
+
+            d = "gauche" if cross2(v_prev, v_next) > 0 else "droite"
+            if d == direction and a >= seuil_angle_min:
+                angle_total += a
+                j += 1
+            elif abs(a - angle) < 10 and d != direction:
+                angle_total += a * 0.7
+                j += 1
+            else:
+                break
+
+        if distance_totale_virage > 0:
+            if angle_total / (distance_totale_virage / 10) < 1:
+                i += 1
+                continue
+
+        if angle_total < seuil_angle_total:
+            i += 1
+            continue
+
+        angle_final = int(angle_total)
+        note, _ = classer_virage(angle_final, direction, PARAMETRES)
+        notes.append((max(i - 1, 0), min(j, len(coordinates) - 1), note, angle_final))
+        i = max(i + 1, j - 2)
+
+    return notes
+
+
+def virages_vectorises(coordinates):
+    notes = []
+    for virage in detecter_virages(coordinates, PARAMETRES):
+        angle_final = int(virage.angle_total)
+        note, _ = classer_virage(angle_final, virage.direction, PARAMETRES)
+        notes.append((virage.index_debut, virage.index_fin, note, angle_final))
+    return notes
+
+
+def main():
+    brut = itineraire_synthetique(1_200, graine=1)
+    coords = interpoler_points(brut, DISTANCE)
+    longueur = longueurs_segments(coords).sum() / 1000
+    print(f"Étape : {longueur:.1f} km, {len(coords)} points à {DISTANCE} m")
+
+    t_hist, hist = chronometrer(virages_historique, coords, repetitions=1)
+    t_vect, vect = chronometrer(virages_vectorises, coords)
+    print(f"historique : {t_hist * 1000:8.1f} ms  ({len(hist)} virages)")
+    print(f"vectorisé  : {t_vect * 1000:8.2f} ms  ({len(vect)} virages)")
+    print(f"gain       : {t_hist / t_vect:8.0f}x")
+    print("notes identiques" if hist == vect else "ÉCART entre les deux roadbooks !")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""Itinéraires synthétiques pour les benchmarks (aucun appel réseau)."""
+import numpy as np
+
+from rally.geodesie import longueurs_segments
+
+# Départ commun : Évreux, comme dans phase1.py
+DEPART = (1.5994303744710572, 49.060418927265914)  # (lon, lat)
+
+
+def itineraire_synthetique(nb_sommets, graine=0, pas_min=5.0, pas_max=80.0):
+    """Polyligne (lon, lat) sinueuse façon route de campagne.
+
+    Alterne lignes droites et virages de rayon variable ; la longueur des
+    segments est tirée entre pas_min et pas_max mètres, comme les géométries
+    renvoyées par openrouteservice.
+    """
+    rng = np.random.default_rng(graine)
+    pas = rng.uniform(pas_min, pas_max, nb_sommets - 1)
+
+    # Variation de cap : virages groupés séparés par des portions droites
+    virage = rng.random(nb_sommets - 1) < 0.3
+    delta_cap = np.where(virage, rng.normal(0, 25, nb_sommets - 1), rng.normal(0, 2, nb_sommets - 1))
+    cap = np.radians(rng.uniform(0, 360) + np.cumsum(delta_cap))
+
+    dx = pas * np.sin(cap)
+    dy = pas * np.cos(cap)
+    lat0 = np.radians(DEPART[1])
+    dlon = np.degrees(dx / (6371008.8 * np.cos(lat0)))
+    dlat = np.degrees(dy / 6371008.8)
+
+    coords = np.empty((nb_sommets, 2))
+    coords[0] = DEPART
+    coords[1:, 0] = DEPART[0] + np.cumsum(dlon)
+    coords[1:, 1] = DEPART[1] + np.cumsum(dlat)
+    return coords
+
+
+def extrait_osm_synthetique(chemin, nb_lignes=100, nb_colonnes=100, pas=120.0, graine=0):
+    """Écrit un extrait OSM XML : quadrillage de rues autour du départ.
+
+    Une ligne et une colonne sur dix sont des routes principales, quelques
+    rues sont à sens unique et environ 5 % des tronçons sont supprimés pour
+    que le réseau ne soit pas trop régulier.
+    """
+    rng = np.random.default_rng(graine)
+    lat0 = np.radians(DEPART[1])
+    i, j = np.meshgrid(np.arange(nb_lignes), np.arange(nb_colonnes), indexing="ij")
+    x = j * pas + rng.normal(0, pas / 8, i.shape)
+    y = i * pas + rng.normal(0, pas / 8, i.shape)
+    lon = DEPART[0] + np.degrees(x / (6371008.8 * np.cos(lat0)))
+    lat = DEPART[1] + np.degrees(y / 6371008.8)
+    ids = 1 + i * nb_colonnes + j
+
+    with open(chemin, "w", encoding="utf-8") as f:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n<osm version="0.6" generator="rally-benchmarks">\n')
+        for ident, x_, y_ in zip(ids.ravel(), lon.ravel(), lat.ravel()):
+            f.write(f' <node id="{ident}" lat="{y_:.7f}" lon="{x_:.7f}"/>\n')
+        numero = 1
+        for axe, nb in ((0, nb_lignes), (1, nb_colonnes)):
+            for k in range(nb):
+                noeuds = ids[k] if axe == 0 else ids[:, k]
+                classe = "primary" if k % 10 == 0 else ("tertiary" if k % 3 == 0 else "residential")
+                sens = 'yes' if classe == "residential" and rng.random() < 0.2 else None
+                # Tronçons supprimés : la rue est coupée en plusieurs voies
+                coupures = np.flatnonzero(rng.random(len(noeuds) - 1) < 0.05) + 1
+                for morceau in np.split(noeuds, coupures):
+                    if len(morceau) < 2:
+                        continue
+                    f.write(f' <way id="{numero}">\n')
+                    f.writelines(f'  <nd ref="{n}"/>\n' for n in morceau)
+                    f.write(f'  <tag k="highway" v="{classe}"/>\n')
+                    if sens:
+                        f.write(f'  <tag k="oneway" v="{sens}"/>\n')
+                    f.write(' </way>\n')
+                    numero += 1
+        f.write('</osm>\n')
+
+
+def itineraire_virages_connus(nb_virages, graine=0, rayons=(12.0, 250.0), pas=1.0):
+    """Polyligne (lon, lat) dense faite de lignes droites et d'arcs de cercle exacts.
+
+    Retourne (coordonnées, virages) : virages est un tableau (nb_virages, 3)
+    donnant pour chaque arc l'abscisse de son milieu, son rayon et son angle
+    signé (mètres, degrés, positif à gauche). Sert de vérité terrain pour
+    comparer les notes à différents pas de rééchantillonnage.
+    """
+    rng = np.random.default_rng(graine)
+    rayon = np.exp(rng.uniform(*np.log(rayons), nb_virages))
+    angle = rng.uniform(30, 170, nb_virages) * rng.choice((-1, 1), nb_virages)
+    droites = rng.uniform(100, 400, nb_virages + 1)
+
+    # Courbure (1/m) en chaque pas, puis cap et position par intégration
+    morceaux, milieux, abscisse = [], [], 0.0
+    for k in range(nb_virages + 1):
+        morceaux.append(np.zeros(int(droites[k] / pas)))
+        abscisse += len(morceaux[-1]) * pas
+        if k < nb_virages:
+            longueur = abs(np.radians(angle[k])) * rayon[k]
+            nb = int(round(longueur / pas))
+            morceaux.append(np.full(nb, np.radians(angle[k]) / (nb * pas)))
+            milieux.append(abscisse + nb * pas / 2)
+            abscisse += nb * pas
+    cap = rng.uniform(0, 2 * np.pi) + np.cumsum(np.concatenate(morceaux)) * pas
+    x = np.concatenate(([0.0], np.cumsum(pas * np.cos(cap))))
+    y = np.concatenate(([0.0], np.cumsum(pas * np.sin(cap))))
+
+    lat0 = np.radians(DEPART[1])
+    coords = np.empty((len(x), 2))
+    coords[:, 0] = DEPART[0] + np.degrees(x / (6371008.8 * np.cos(lat0)))
+    coords[:, 1] = DEPART[1] + np.degrees(y / 6371008.8)
+    return coords, np.stack((milieux, rayon, angle), axis=1)
+
+
+# Extrémités de phase1.py : Évreux → Rambouillet (lat, lon)
+PHASE1 = ((49.060418927265914, 1.5994303744710572), (48.826810021473705, 1.331220342850973))
+
+
+def itineraire_phase1(graine=0, pas_moyen=40.0):
+    """Polyligne (lon, lat) routière d'Évreux à Rambouillet, en remplacement de la route de phase1.py.
+
+    Le cap suit la direction de l'arrivée avec des écarts durables (détours,
+    virages) ; l'écart résiduel à l'arrivée est réparti le long du tracé.
+    Environ 45 km pour 35 km à vol d'oiseau, comme l'itinéraire openrouteservice.
+    """
+    rng = np.random.default_rng(graine)
+    (lat_a, lon_a), (lat_b, lon_b) = PHASE1
+    lat0 = np.radians((lat_a + lat_b) / 2)
+    kx, ky = np.radians(6371008.8) * np.cos(lat0), np.radians(6371008.8)
+    cible = np.array([(lon_b - lon_a) * kx, (lat_b - lat_a) * ky])
+    nb = int(1.3 * np.hypot(*cible) / pas_moyen)
+
+    pas = rng.uniform(0.25, 1.75, nb) * pas_moyen
+    # Écart au cap de l'arrivée : marche aléatoire rappelée vers 0, virages groupés
+    virage = rng.random(nb) < 0.25
+    bruit = np.where(virage, rng.normal(0, 20, nb), rng.normal(0, 2, nb))
+    ecart = np.zeros(nb)
+    for k in range(1, nb):
+        ecart[k] = 0.97 * ecart[k - 1] + bruit[k]
+    cap = np.arctan2(cible[1], cible[0]) + np.radians(np.clip(ecart, -120, 120))
+
+    xy = np.zeros((nb + 1, 2))
+    xy[1:, 0] = np.cumsum(pas * np.cos(cap))
+    xy[1:, 1] = np.cumsum(pas * np.sin(cap))
+    abscisses = np.concatenate(([0.0], np.cumsum(pas)))
+    xy += np.outer(abscisses / abscisses[-1], cible - xy[-1])
+
+    coords = np.empty_like(xy)
+    coords[:, 0] = lon_a + xy[:, 0] / kx
+    coords[:, 1] = lat_a + xy[:, 1] / ky
+    return coords
+
+
+def itineraire_etape(longueur=200_000.0, graine=7):
+    """Polyligne (lon, lat) d'une longue étape : itineraire_synthetique coupé à `longueur` mètres"""
+    coords = itineraire_synthetique(int(longueur / 35) + 2, graine=graine)
+    fin = int(np.searchsorted(np.cumsum(longueurs_segments(coords)), longueur)) + 2
+    return coords[:fin]
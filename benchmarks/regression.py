@@ -0,0 +1,255 @@
+"""Suite de non-régression et de performance, entièrement hors ligne.
+
+Itinéraires enregistrés (benchmarks/donnees/itineraires/*.geojson) :
+  - village : boucle courte de phase1_2.py, géométrie openrouteservice
+    reprise de rendu_html/carte_rally_avec_tous_points.html (69 sommets) ;
+  - synthetique_43km : itinéraire synthétique entre les extrémités de l'étape
+    de phase1.py, Évreux → Rambouillet (itineraire_phase1, 43 km) : aucune
+    route openrouteservice de cette étape n'a été enregistrée ;
+  - etape_200km : longue étape synthétique (itineraire_etape).
+
+Pour chaque cas (itinéraire + réglage), le rééchantillonnage, la détection
+des virages et le rendu de la carte sont chronométrés à la manière de
+pytest-benchmark (échauffement, tours répétés jusqu'à une durée minimale,
+min / max / moyenne / écart type / médiane). Le roadbook produit est comparé
+à son fichier de référence (benchmarks/donnees/roadbooks/<cas>.json) : le
+code de sortie vaut 1 à la moindre différence.
+
+Lancement depuis la racine du dépôt :
+    python -m benchmarks.regression
+    python -m benchmarks.regression --json perf.json       # mesures détaillées
+    python -m benchmarks.regression --comparer perf.json   # écart de médiane avec un lancement précédent
+    python -m benchmarks.regression --mettre-a-jour        # après un changement voulu des résultats
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+from dataclasses import replace
+
+from benchmarks.itineraires import itineraire_etape, itineraire_phase1
+from rally.itineraire import coordonnees_route
+from rally.presets import PRESETS
+from rally.rayons import ParametresRayon
+from rally.reechantillonnage import interpoler_ancres
+from rally.rendu import ecrire_carte
+from rally.virages import detecter_virages, mesurer_longueurs
+
+DONNEES = os.path.join(os.path.dirname(__file__), "donnees")
+ITINERAIRES = os.path.join(DONNEES, "itineraires")
+ROADBOOKS = os.path.join(DONNEES, "roadbooks")
+
+DUREE_MIN = 0.5  # Secondes de mesure par fonction
+TOURS_MIN = 3
+TOURS_MAX = 200
+TOLERANCE = 1e-6  # Écart absolu admis sur les réels des références
+
+# Itinéraires synthétiques enregistrés (le village est une route réelle, non régénérable)
+GENERATEURS = {
+    "synthetique_43km": itineraire_phase1,
+    "etape_200km": itineraire_etape,
+}
+
+_METRIQUE = replace(PRESETS["phase1"], virages=replace(PRESETS["phase1"].virages, repere_metrique=True))
+CAS = {
+    "village_phase1_2": ("village", PRESETS["phase1_2"]),
+    "village_test": ("village", PRESETS["test"]),
+    "synthetique_43km_phase1": ("synthetique_43km", PRESETS["phase1"]),
+    "synthetique_43km_metrique": ("synthetique_43km", _METRIQUE),
+    "etape_200km_phase1_2": ("etape_200km", PRESETS["phase1_2"]),
+    "etape_200km_rayon": ("etape_200km", replace(PRESETS["phase1_2"], rayons=ParametresRayon())),
+}
+
+
+def charger_itineraire(nom):
+    """Route GeoJSON enregistrée"""
+    with open(os.path.join(ITINERAIRES, f"{nom}.geojson"), encoding="utf-8") as f:
+        return json.load(f)
+
+
+def enregistrer_itineraire(nom, coords):
+    route = {
+        "type": "FeatureCollection",
+        "features": [{
+            "type": "Feature",
+            "properties": {"nom": nom},
+            "geometry": {"type": "LineString", "coordinates": [[round(float(x), 7) for x in p] for p in coords]},
+        }],
+    }
+    with open(os.path.join(ITINERAIRES, f"{nom}.geojson"), "w", encoding="utf-8") as f:
+        json.dump(route, f, separators=(",", ":"))
+        f.write("\n")
+
+
+# === Chronométrage ===
+def mesurer(fonction, *args, duree_min=DUREE_MIN):
+    """Statistiques (secondes) façon pytest-benchmark, et le résultat du dernier appel"""
+    resultat = fonction(*args)  # Échauffement
+    temps = []
+    debut = time.perf_counter()
+    while len(temps) < TOURS_MIN or (time.perf_counter() - debut < duree_min and len(temps) < TOURS_MAX):
+        t0 = time.perf_counter()
+        resultat = fonction(*args)
+        temps.append(time.perf_counter() - t0)
+    stats = {
+        "min": min(temps),
+        "max": max(temps),
+        "mean": statistics.fmean(temps),
+        "stddev": statistics.stdev(temps),
+        "median": statistics.median(temps),
+        "rounds": len(temps),
+    }
+    return stats, resultat
+
+
+# === Références ===
+def empreinte(roadbook, carte):
+    """Contenu comparé aux références : table des virages, notes copilote et carte HTML"""
+    table = roadbook.table
+    return {
+        "points": len(roadbook.coordinates),
+        "virages": [
+            [int(v["index"]), int(v["index_debut"]), int(v["index_fin"]), int(v["note"]),
+             round(float(v["angle"]), 6), round(float(v["longueur"]), 3), round(float(v["distance_depart"]), 3)]
+            for v in table
+        ],
+        "notes": [[round(float(lat), 7), round(float(lon), 7), note, angle]
+                  for lat, lon, note, angle in roadbook.notes()],
+        "carte": hashlib.sha256(carte).hexdigest(),
+    }
+
+
+def differences(attendu, obtenu, chemin="", nb_max=5):
+    """Liste des écarts entre deux empreintes (réels à TOLERANCE près)"""
+    ecarts = []
+
+    def comparer(a, b, chemin):
+        if len(ecarts) >= nb_max:
+            return
+        if isinstance(a, dict) and isinstance(b, dict):
+            for cle in sorted(a.keys() | b.keys()):
+                comparer(a.get(cle), b.get(cle), f"{chemin}.{cle}")
+        elif isinstance(a, list) and isinstance(b, list):
+            if len(a) != len(b):
+                ecarts.append(f"{chemin} : {len(a)} éléments attendus, {len(b)} obtenus")
+            for k, (x, y) in enumerate(zip(a, b)):
+                comparer(x, y, f"{chemin}[{k}]")
+        elif isinstance(a, float) and isinstance(b, (int, float)):
+            if not math.isclose(a, b, rel_tol=0, abs_tol=TOLERANCE):
+                ecarts.append(f"{chemin} : {a} attendu, {b} obtenu")
+        elif a != b:
+            ecarts.append(f"{chemin} : {a!r} attendu, {b!r} obtenu")
+
+    comparer(attendu, obtenu, chemin)
+    return ecarts
+
+
+def executer_cas(nom, route, reglage, dossier, duree_min):
+    """Mesures et empreinte d'un cas"""
+    brut = coordonnees_route(route)
+    depart, arrivee = brut[0][::-1], brut[-1][::-1]
+    mesures = {}
+    mesures["analyse"], roadbook = mesurer(reglage.analyser, brut, duree_min=duree_min)
+    if reglage.rayons is None:
+        longueurs = mesurer_longueurs(brut, reglage.virages)
+        mesures["reechantillonnage"], points = mesurer(interpoler_ancres, brut, reglage.distance, longueurs,
+                                                       duree_min=duree_min)
+        mesures["virages"], _ = mesurer(detecter_virages, points, reglage.virages, duree_min=duree_min)
+    carte = os.path.join(dossier, f"{nom}.html")
+    mesures["rendu"], _ = mesurer(ecrire_carte, carte, route, roadbook, depart, arrivee, duree_min=duree_min)
+    with open(carte, "rb") as f:
+        return mesures, empreinte(roadbook, f.read())
+
+
+def afficher(resultats, reference):
+    print(f"\n{'cas / fonction':<46} {'min':>9} {'max':>9} {'moyenne':>9} {'écart t.':>9} "
+          f"{'médiane':>9} {'tours':>6}" + ("  référence" if reference else ""))
+    for nom, mesures in resultats.items():
+        for fonction, m in mesures.items():
+            ligne = f"{nom + '/' + fonction:<46}" + "".join(
+                f" {m[cle] * 1000:>7.2f}ms" for cle in ("min", "max", "mean", "stddev", "median"))
+            ligne += f" {m['rounds']:>6}"
+            precedent = reference.get(nom, {}).get(fonction)
+            if precedent:
+                ligne += f"  {m['median'] / precedent['median'] - 1:+7.1%}"
+            print(ligne)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m benchmarks.regression", description=__doc__.splitlines()[0])
+    parser.add_argument("cas", nargs="*", help=f"Cas à lancer parmi {', '.join(CAS)} (tous par défaut)")
+    parser.add_argument("--duree-min", type=float, default=DUREE_MIN, help="Secondes de mesure par fonction")
+    parser.add_argument("--json", default=None, help="Écrit les mesures détaillées")
+    parser.add_argument("--comparer", default=None, help="Mesures d'un lancement précédent (--json)")
+    parser.add_argument("--seuil", type=float, default=None,
+                        help="Échec si une médiane dépasse la référence de cette fraction (ex. 0.2)")
+    parser.add_argument("--mettre-a-jour", action="store_true", help="Réécrit les roadbooks de référence")
+    parser.add_argument("--regenerer-itineraires", action="store_true",
+                        help=f"Réécrit les itinéraires synthétiques ({', '.join(GENERATEURS)})")
+    args = parser.parse_args(argv)
+    inconnus = set(args.cas) - CAS.keys()
+    if inconnus:
+        parser.error(f"cas inconnu(s) : {', '.join(sorted(inconnus))}")
+
+    if args.regenerer_itineraires:
+        for nom, generateur in GENERATEURS.items():
+            enregistrer_itineraire(nom, generateur())
+    reference = {}
+    if args.comparer:
+        with open(args.comparer, encoding="utf-8") as f:
+            reference = json.load(f)["resultats"]
+
+    routes = {}
+    resultats = {}
+    echecs = []
+    dossier = tempfile.mkdtemp()
+    for nom in args.cas or CAS:
+        itineraire, reglage = CAS[nom]
+        if itineraire not in routes:
+            routes[itineraire] = charger_itineraire(itineraire)
+        resultats[nom], obtenu = executer_cas(nom, routes[itineraire], reglage, dossier, args.duree_min)
+
+        chemin = os.path.join(ROADBOOKS, f"{nom}.json")
+        if args.mettre_a_jour:
+            with open(chemin, "w", encoding="utf-8") as f:
+                json.dump(obtenu, f, ensure_ascii=False, separators=(",", ":"))
+                f.write("\n")
+            statut = "référence écrite"
+        elif not os.path.exists(chemin):
+            statut = "ÉCHEC : pas de référence (--mettre-a-jour)"
+            echecs.append(nom)
+        else:
+            with open(chemin, encoding="utf-8") as f:
+                ecarts = differences(json.load(f), json.loads(json.dumps(obtenu)))
+            statut = "ok" if not ecarts else "ÉCHEC\n    " + "\n    ".join(ecarts)
+            if ecarts:
+                echecs.append(nom)
+        print(f"{nom:<30} {obtenu['points']:>6} points {len(obtenu['virages']):>5} virages  {statut}")
+
+    afficher(resultats, reference)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"machine": {"python": sys.version.split()[0], "plateforme": platform.platform(),
+                                   "processeur": platform.processor()},
+                       "resultats": resultats}, f, ensure_ascii=False, indent=1)
+
+    if args.seuil is not None:
+        for nom, mesures in resultats.items():
+            for fonction, m in mesures.items():
+                precedent = reference.get(nom, {}).get(fonction)
+                if precedent and m["median"] > precedent["median"] * (1 + args.seuil):
+                    echecs.append(f"{nom}/{fonction} (lenteur)")
+    if echecs:
+        print(f"\n{len(echecs)} échec(s) : {', '.join(echecs)}", file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
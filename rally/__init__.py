@@ -0,0 +1,10 @@
+"""Project Rally : transforme un itinéraire GPS en indications pour copilote.
+
+Le cœur (rééchantillonnage, détection des virages, presets) ne dépend que de
+numpy ; le téléchargement (rally.itineraire) et le rendu (rally.rendu)
+importent openrouteservice et folium seulement à l'usage.
+"""
+from rally.presets import PRESET_DEFAUT, PRESETS, Reglage
+from rally.reechantillonnage import interpoler_ancres, interpoler_points
+from rally.roadbook import Roadbook, Virage, classer_virage
+from rally.virages import ParametresVirage, detecter_virages
@@ -0,0 +1,3 @@
+from rally.cli import main
+
+raise SystemExit(main())
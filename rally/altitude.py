@@ -0,0 +1,271 @@
+"""Relief de l'itinéraire : altitudes d'un MNT local, bosses, creux et compressions.
+
+Les altitudes de tous les points rééchantillonnés sont lues d'un coup dans
+les dalles d'un modèle numérique de terrain posées sur disque : SRTM .hgt
+(lues en mémoire projetée, sans dépendance) ou GeoTIFF (via rasterio, par
+fenêtres englobant les points demandés).
+Les dalles ouvertes restent en cache : tout un rallye n'ouvre chaque dalle
+qu'une fois par processus.
+
+    mnt = ModeleTerrain("srtm/")
+    annoter_relief(roadbook, mnt)
+    roadbook.reliefs  # bosses, creux et compressions
+"""
+import glob
+import os
+import re
+from collections import OrderedDict
+from dataclasses import dataclass
+
+import numpy as np
+
+from rally.geodesie import longueurs_segments
+from rally.roadbook import DTYPE_RELIEF, TYPES_RELIEF
+
+VIDE_SRTM = -32768
+TUILES_MAX = 64  # Dalles gardées ouvertes (une dalle SRTM1 fait 25 Mo, projetés à la demande)
+_NOM_HGT = re.compile(r"([NS])(\d{2})([EW])(\d{3})\.hgt$", re.IGNORECASE)
+
+
+@dataclass(frozen=True)
+class ParametresRelief:
+    """Seuils de détection du relief (mètres)"""
+    lissage: float = 60  # Fenêtre de la moyenne glissante des altitudes
+    rayon_bosse: float = 1500  # Bosse : rayon vertical convexe inférieur
+    rayon_creux: float = 1500  # Creux : rayon vertical concave inférieur
+    rayon_compression: float = 600  # Compression : creux plus serré que ce rayon
+
+
+class _Dalle:
+    """Grille d'altitudes régulière en (lon, lat) : centre du pixel [0, 0] et pas (degrés)"""
+
+    def __init__(self, donnees, lon0, lat0, pas_lon, pas_lat, vide=None, forme=None):
+        self.donnees = donnees
+        self.forme = donnees.shape if forme is None else forme  # (hauteur, largeur) en pixels
+        self.lon0, self.lat0 = lon0, lat0
+        self.pas_lon, self.pas_lat = pas_lon, pas_lat  # pas_lat < 0 : lignes du nord au sud
+        self.vide = vide
+
+    def contient(self, lon, lat):
+        hauteur, largeur = self.forme
+        colonne = (lon - self.lon0) / self.pas_lon
+        ligne = (lat - self.lat0) / self.pas_lat
+        return (colonne >= 0) & (colonne <= largeur - 1) & (ligne >= 0) & (ligne <= hauteur - 1)
+
+    def _voisins(self, l0, c0):
+        """Pixels [l0 + dl, c0 + dc] pour (dl, dc) = (0, 0), (0, 1), (1, 0), (1, 1)"""
+        return [self.donnees[l0 + dl, c0 + dc] for dl in (0, 1) for dc in (0, 1)]
+
+    def altitudes(self, lon, lat):
+        """Interpolation bilinéaire ; seuls les pixels voisins des points sont lus"""
+        hauteur, largeur = self.forme
+        colonne = np.clip((lon - self.lon0) / self.pas_lon, 0, largeur - 1)
+        ligne = np.clip((lat - self.lat0) / self.pas_lat, 0, hauteur - 1)
+        c0 = np.minimum(colonne.astype(np.int64), largeur - 2)
+        l0 = np.minimum(ligne.astype(np.int64), hauteur - 2)
+        fc, fl = colonne - c0, ligne - l0
+
+        valeurs = [np.asarray(v, dtype=np.float64) for v in self._voisins(l0, c0)]
+        if self.vide is not None:
+            for v in valeurs:
+                v[v == self.vide] = np.nan
+        z00, z01, z10, z11 = valeurs
+        return (z00 * (1 - fc) * (1 - fl) + z01 * fc * (1 - fl)
+                + z10 * (1 - fc) * fl + z11 * fc * fl)
+
+    def fermer(self):
+        pass
+
+
+class _DalleGeotiff(_Dalle):
+    """GeoTIFF gardé ouvert : chaque appel ne lit que la fenêtre englobant les pixels voisins des points"""
+
+    def __init__(self, chemin):
+        import rasterio
+
+        self.source = rasterio.open(chemin)
+        t = self.source.transform
+        super().__init__(None, t.c + t.a / 2, t.f + t.e / 2, t.a, t.e, vide=self.source.nodata,
+                         forme=(self.source.height, self.source.width))
+        self.pixels_lus = 0
+
+    def _voisins(self, l0, c0):
+        from rasterio.windows import Window
+
+        if not len(l0):
+            return [np.zeros(0) for _ in range(4)]
+        haut, gauche = int(l0.min()), int(c0.min())
+        fenetre = Window(gauche, haut, int(c0.max()) + 2 - gauche, int(l0.max()) + 2 - haut)
+        donnees = self.source.read(1, window=fenetre)
+        self.pixels_lus += donnees.size
+        return [donnees[l0 - haut + dl, c0 - gauche + dc] for dl in (0, 1) for dc in (0, 1)]
+
+    def fermer(self):
+        self.source.close()
+
+
+def _ouvrir_hgt(chemin):
+    """Dalle SRTM : entiers 16 bits gros-boutistes, 1201² (3") ou 3601² (1") pixels"""
+    cote = int(round(np.sqrt(os.path.getsize(chemin) // 2)))
+    nom = _NOM_HGT.search(os.path.basename(chemin))
+    lat = int(nom.group(2)) * (1 if nom.group(1).upper() == "N" else -1)
+    lon = int(nom.group(4)) * (1 if nom.group(3).upper() == "E" else -1)
+    donnees = np.memmap(chemin, dtype=">i2", mode="r", shape=(cote, cote))
+    pas = 1 / (cote - 1)
+    return _Dalle(donnees, lon, lat + 1, pas, -pas, vide=VIDE_SRTM)
+
+
+class ModeleTerrain:
+    """Dalles d'un MNT posées dans un dossier, ouvertes à la demande et gardées en cache.
+
+    Les noms SRTM (N49E001.hgt) donnent l'emprise sans ouvrir le fichier ;
+    l'emprise des GeoTIFF est lue une fois à l'ouverture du modèle.
+    """
+
+    def __init__(self, dossier, tuiles_max=TUILES_MAX):
+        self.dossier = dossier
+        self.tuiles_max = tuiles_max
+        self._dalles = OrderedDict()
+        self.ouvertures = 0  # Dalles lues sur disque
+        self.acces = 0
+        self._hgt = {}
+        for chemin in glob.glob(os.path.join(dossier, "*.hgt")):
+            nom = _NOM_HGT.search(os.path.basename(chemin))
+            if nom:
+                lat = int(nom.group(2)) * (1 if nom.group(1).upper() == "N" else -1)
+                lon = int(nom.group(4)) * (1 if nom.group(3).upper() == "E" else -1)
+                self._hgt[(lon, lat)] = chemin
+        self._geotiff = []
+        chemins_tiff = sorted(glob.glob(os.path.join(dossier, "*.tif")) + glob.glob(os.path.join(dossier, "*.tiff")))
+        if chemins_tiff:
+            import rasterio
+
+            for chemin in chemins_tiff:
+                with rasterio.open(chemin) as source:
+                    self._geotiff.append((chemin, tuple(source.bounds)))
+        if not self._hgt and not self._geotiff:
+            raise FileNotFoundError(f"Aucune dalle .hgt ou GeoTIFF dans {dossier}")
+
+    def _dalle(self, chemin, ouvrir):
+        self.acces += 1
+        dalle = self._dalles.get(chemin)
+        if dalle is None:
+            dalle = ouvrir(chemin)
+            self.ouvertures += 1
+            self._dalles[chemin] = dalle
+            if len(self._dalles) > self.tuiles_max:
+                self._dalles.popitem(last=False)[1].fermer()
+        else:
+            self._dalles.move_to_end(chemin)
+        return dalle
+
+    def altitudes(self, lon, lat):
+        """Altitude (mètres) de chaque point, NaN hors des dalles ou sur un vide"""
+        lon = np.asarray(lon, dtype=np.float64)
+        lat = np.asarray(lat, dtype=np.float64)
+        resultat = np.full(lon.shape, np.nan)
+        restants = np.ones(lon.shape, dtype=bool)
+
+        # SRTM : dalle d'un degré repérée par le coin sud-ouest
+        if self._hgt:
+            cles = np.stack((np.floor(lon), np.floor(lat)), axis=-1).astype(np.int64)
+            uniques, groupe = np.unique(cles.reshape(-1, 2), axis=0, return_inverse=True)
+            groupe = groupe.reshape(lon.shape)
+            for g, (x, y) in enumerate(uniques):
+                chemin = self._hgt.get((int(x), int(y)))
+                if chemin is None:
+                    continue
+                dans = groupe == g
+                resultat[dans] = self._dalle(chemin, _ouvrir_hgt).altitudes(lon[dans], lat[dans])
+                restants &= ~dans
+
+        for chemin, (ouest, sud, est, nord) in self._geotiff:
+            dans = restants & (lon >= ouest) & (lon <= est) & (lat >= sud) & (lat <= nord)
+            if dans.any():
+                dalle = self._dalle(chemin, _DalleGeotiff)
+                resultat[dans] = dalle.altitudes(lon[dans], lat[dans])
+                restants &= ~dans
+        return resultat
+
+
+_MODELES = {}
+
+
+def modele_partage(dossier):
+    """ModeleTerrain unique par dossier dans le processus : les dalles sont partagées entre étapes"""
+    modele = _MODELES.get(dossier)
+    if modele is None:
+        modele = _MODELES[dossier] = ModeleTerrain(dossier)
+    return modele
+
+
+# === Profil en long ===
+def profil(coordinates, altitudes, params=ParametresRelief()):
+    """(abscisses, altitudes lissées, pente en %, courbure verticale en 1/m) le long des points"""
+    pts = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+    abscisses = np.concatenate(([0.0], np.cumsum(longueurs_segments(pts))))
+    z = np.asarray(altitudes, dtype=np.float64)
+    if np.isnan(z).all():
+        nan = np.full(len(z), np.nan)
+        return abscisses, nan, nan, nan
+    # Trous du MNT bouchés par interpolation le long de l'itinéraire
+    connus = ~np.isnan(z)
+    z = np.interp(abscisses, abscisses[connus], z[connus])
+
+    if len(z) < 3:
+        zero = np.zeros(len(z))
+        return abscisses, z, zero, zero
+    pas = max(abscisses[-1] / (len(z) - 1), 1e-9)
+    demi = max(int(round(params.lissage / pas / 2)), 0)
+    if demi:
+        noyau = np.ones(2 * demi + 1) / (2 * demi + 1)
+        bords = np.pad(z, demi, mode="edge")
+        z = np.convolve(bords, noyau, mode="valid")
+    pente = np.gradient(z, abscisses)
+    courbure = np.gradient(pente, abscisses)
+    return abscisses, z, pente * 100, courbure
+
+
+def detecter_reliefs(coordinates, altitudes, params=ParametresRelief()):
+    """Tableau DTYPE_RELIEF : un élément par bosse, creux ou compression, à son point le plus marqué"""
+    pts = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+    abscisses, z, pente, courbure = profil(pts, altitudes, params)
+    if np.isnan(courbure).all():
+        return np.zeros(0, dtype=DTYPE_RELIEF)
+
+    bosse = courbure <= -1 / params.rayon_bosse
+    creux = courbure >= 1 / params.rayon_creux
+    lignes = []
+    for masque, signe in ((bosse, -1), (creux, 1)):
+        # Plages consécutives au-delà du seuil : le point de courbure maximale les représente
+        bord = np.diff(np.concatenate(([0], masque.astype(np.int8), [0])))
+        for debut, fin in zip(np.flatnonzero(bord == 1), np.flatnonzero(bord == -1)):
+            k = debut + int(np.argmax(signe * courbure[debut:fin]))
+            rayon = 1 / abs(courbure[k])
+            if signe < 0:
+                type_ = "bosse"
+            else:
+                type_ = "compression" if rayon < params.rayon_compression else "creux"
+            lignes.append((k, TYPES_RELIEF.index(type_), rayon))
+
+    lignes.sort()
+    table = np.zeros(len(lignes), dtype=DTYPE_RELIEF)
+    if lignes:
+        index = np.array([k for k, _, _ in lignes])
+        table["index"] = index
+        table["lon"] = pts[index, 0]
+        table["lat"] = pts[index, 1]
+        table["distance_depart"] = abscisses[index]
+        table["type"] = [t for _, t, _ in lignes]
+        table["rayon"] = [r for _, _, r in lignes]
+        table["altitude"] = z[index]
+        table["pente"] = pente[index]
+    return table
+
+
+def annoter_relief(roadbook, modele, params=ParametresRelief()):
+    """Lit les altitudes des points du roadbook dans le MNT et y ajoute le relief"""
+    points = np.asarray(roadbook.coordinates, dtype=np.float64).reshape(-1, 2)
+    altitudes = modele.altitudes(points[:, 0], points[:, 1])
+    roadbook.reliefs = detecter_reliefs(points, altitudes, params)
+    return roadbook
@@ -0,0 +1,95 @@
+"""Itinéraires à points de passage : tronçons téléchargés en parallèle puis raccordés.
+
+Le parcours départ → points de passage → arrivée est découpé en tronçons
+qui partagent leurs extrémités. Chacun est demandé séparément au client de
+routage (en parallèle, et mis en cache individuellement : déplacer un point
+de passage ne fait recalculer que les deux tronçons qui le touchent). Les
+géométries sont ensuite raccordées en une seule route GeoJSON, sans doubler
+le sommet commun, si bien que le rééchantillonnage et la détection des
+virages voient un tracé continu : un virage à cheval sur un point de passage
+n'est pas coupé en deux et la distance depuis le départ ne repart pas de zéro.
+"""
+from concurrent.futures import ThreadPoolExecutor
+
+from rally.itineraire import PROFIL
+
+POINTS_PAR_TRONCON = 2  # Un tronçon par paire de points consécutifs
+MAX_POINTS_REQUETE = 50  # Limite openrouteservice des points d'une requête directions
+TELECHARGEMENTS = 4  # Tronçons demandés simultanément
+
+
+def decouper(points, points_par_troncon=POINTS_PAR_TRONCON):
+    """Listes de points consécutives, la dernière de chaque tronçon ouvrant le suivant"""
+    taille = min(max(2, points_par_troncon), MAX_POINTS_REQUETE)
+    return [points[k:k + taille] for k in range(0, max(len(points) - 1, 1), taille - 1)]
+
+
+def _decaler(indices, decalage):
+    return [i + decalage for i in indices]
+
+
+def assembler(routes):
+    """Route GeoJSON unique raccordant les routes des tronçons, dans l'ordre.
+
+    Les propriétés openrouteservice suivent : distances et durées sommées,
+    `segments` mis bout à bout, `way_points` (et ceux des instructions)
+    renumérotés dans la géométrie raccordée.
+    """
+    if len(routes) == 1:
+        return routes[0]
+
+    geometrie, segments, points_passage = [], [], []
+    distance = duree = 0.0
+    for route in routes:
+        feature = route["features"][0]
+        coordonnees = feature["geometry"]["coordinates"]
+        proprietes = feature.get("properties", {})
+        # Le premier sommet d'un tronçon est le dernier du précédent
+        debut = 1 if geometrie and list(coordonnees[0]) == list(geometrie[-1]) else 0
+        decalage = len(geometrie) - debut
+
+        geometrie.extend(coordonnees[debut:])
+        indices = proprietes.get("way_points", [0, len(coordonnees) - 1])
+        points_passage.extend(_decaler(indices, decalage)[1 if points_passage else 0:])
+        for segment in proprietes.get("segments", []):
+            segment = dict(segment)
+            if "steps" in segment:
+                segment["steps"] = [{**pas, "way_points": _decaler(pas["way_points"], decalage)}
+                                    if "way_points" in pas else pas for pas in segment["steps"]]
+            segments.append(segment)
+        resume = proprietes.get("summary", {})
+        distance += resume.get("distance", 0.0)
+        duree += resume.get("duration", 0.0)
+
+    lon = [p[0] for p in geometrie]
+    lat = [p[1] for p in geometrie]
+    bbox = [min(lon), min(lat), max(lon), max(lat)]
+    proprietes = {"summary": {"distance": round(distance, 1), "duration": round(duree, 1)},
+                  "way_points": points_passage, "troncons": len(routes)}
+    if segments:
+        proprietes["segments"] = segments
+    return {
+        "type": "FeatureCollection",
+        "bbox": bbox,
+        "features": [{
+            "type": "Feature",
+            "bbox": bbox,
+            "properties": proprietes,
+            "geometry": {"type": "LineString", "coordinates": geometrie},
+        }],
+        "metadata": {**routes[0].get("metadata", {}), "troncons": [r.get("metadata", {}) for r in routes]},
+    }
+
+
+def recuperer_parcours(client, points, profil=PROFIL, points_par_troncon=POINTS_PAR_TRONCON,
+                       telechargements=TELECHARGEMENTS):
+    """Route GeoJSON raccordée passant par tous les points (lat, lon), tronçons demandés en parallèle"""
+    troncons = decouper([tuple(p[::-1]) for p in points], points_par_troncon)
+
+    def telecharger(coordonnees):
+        return client.directions(coordinates=coordonnees, profile=profil, format='geojson')
+
+    if len(troncons) == 1:
+        return telecharger(troncons[0])
+    with ThreadPoolExecutor(max_workers=max(1, min(telechargements, len(troncons)))) as reseau:
+        return assembler(list(reseau.map(telecharger, troncons)))
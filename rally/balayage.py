@@ -0,0 +1,268 @@
+"""Balayage de seuils : une grille de réglages évaluée sur un même itinéraire.
+
+    python -m rally balayage 49.0604,1.5994 48.8268,1.3312 --preset phase1_2 \\
+        --grille distance=20,25,50 --grille seuil_angle_total=15,20,25 \\
+        --grille bornes_notes=30/60/90/120/150,45/75/105/135/165 --csv balayage.csv
+
+L'itinéraire est téléchargé une fois (ou lu dans un fichier GeoJSON), puis
+rééchantillonné et mesuré (angles, sens, longueurs) une seule fois par pas
+et par repère. Les combinaisons qui ne diffèrent que par les bornes des
+notes, les couleurs ou les marqueurs partagent le même regroupement en
+virages : seules les notes sont recalculées. Les regroupements sont répartis
+sur un pool de processus, chaque processus recevant les tracés mesurés une
+fois pour toutes à son démarrage. Le résultat est identique, combinaison par
+combinaison, à Reglage.analyser.
+
+Seule la note à l'angle cumulé est balayée ; les réglages au rayon
+(rally.rayons) ont leurs propres paramètres.
+"""
+import argparse
+import csv
+import itertools
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, fields, replace
+from typing import Tuple
+
+import numpy as np
+
+from rally.presets import PRESET_DEFAUT, PRESETS
+from rally.reechantillonnage import interpoler_ancres
+from rally.virages import ParametresVirage, grouper_virages, mesurer, mesurer_longueurs
+
+CHAMPS_NOTES = ("bornes_notes", "couleurs", "marqueurs")  # Sans effet sur le regroupement en virages
+CHAMPS = ("distance", *(f.name for f in fields(ParametresVirage) if f.name not in ("couleurs", "marqueurs")))
+NOTES = (1, 2, 3, 4, 5, 6)
+MIN_PARALLELE = 8  # En dessous, les regroupements sont calculés dans le processus courant
+
+
+@dataclass(frozen=True)
+class TraceMesuree:
+    """Itinéraire rééchantillonné et ses mesures, partagés par tous les seuils d'un même pas"""
+    coordinates: np.ndarray
+    angles: np.ndarray
+    gauche: np.ndarray
+    longueurs: np.ndarray
+
+
+@dataclass
+class ResultatReglage:
+    reglage: object  # Reglage
+    nb_points: int
+    nb_virages: int
+    notes: Tuple[int, ...]  # Nombre de virages par note, de 1 (épingle) à 6
+    gauche: int
+    longueur_moyenne: float  # Mètres
+
+
+def mesurer_trace(coordinates, distance, repere_metrique=False):
+    """Rééchantillonnage et mesures d'une géométrie brute (lon, lat), comme Reglage.analyser"""
+    params = ParametresVirage(repere_metrique=repere_metrique)
+    points = interpoler_ancres(coordinates, distance, mesurer_longueurs(coordinates, params))
+    return TraceMesuree(points, *mesurer(points, params))
+
+
+def combinaisons(base, grille):
+    """Réglages du produit cartésien de la grille {champ: [valeurs]}, appliquée au Reglage `base`.
+
+    Les champs sont "distance" et ceux de ParametresVirage ; le dernier champ
+    de la grille varie le plus vite.
+    """
+    inconnus = [champ for champ in grille if champ not in CHAMPS]
+    if inconnus:
+        raise ValueError(f"Champ(s) de balayage inconnu(s) : {', '.join(inconnus)} (attendu : {', '.join(CHAMPS)})")
+    if base.rayons is not None:
+        raise ValueError("Le balayage ne porte que sur la note à l'angle cumulé (rayons=None)")
+    reglages = []
+    for valeurs in itertools.product(*grille.values()):
+        choix = dict(zip(grille, valeurs))
+        distance = choix.pop("distance", base.distance)
+        reglages.append(replace(base, distance=distance, virages=replace(base.virages, **choix)))
+    return reglages
+
+
+def _cle_regroupement(params):
+    return replace(params, **{champ: getattr(ParametresVirage, champ) for champ in CHAMPS_NOTES})
+
+
+def _compter(trace, params, bornes):
+    """ResultatReglage sans le reglage, pour chaque jeu de bornes d'un même regroupement"""
+    index, _, gauche, total, distance = grouper_virages(trace.angles, trace.gauche, trace.longueurs, params)
+    angles = np.trunc(total)
+    resultats = []
+    for b in bornes:
+        notes = 6 - np.searchsorted(np.asarray(b), angles, side="right")
+        repartition = tuple(int(n) for n in np.bincount(notes, minlength=7)[1:])
+        resultats.append((len(trace.coordinates), len(index), repartition, int(gauche.sum()),
+                          float(distance.mean()) if len(distance) else 0.0))
+    return resultats
+
+
+# === Pool de processus : les tracés sont transmis une fois, à l'initialisation ===
+_TRACES = {}
+
+
+def _initialiser(traces):
+    _TRACES.clear()
+    _TRACES.update(traces)
+
+
+def _evaluer(tache):
+    cle_trace, params, bornes = tache
+    return _compter(_TRACES[cle_trace], params, bornes)
+
+
+class Balayage:
+    """Évalue des réglages sur une géométrie brute, tracés mesurés gardés en cache par (pas, repère)"""
+
+    def __init__(self, coordinates):
+        self.coordinates = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+        self.traces = {}
+
+    def trace(self, distance, repere_metrique=False):
+        cle = (float(distance), bool(repere_metrique))
+        if cle not in self.traces:
+            self.traces[cle] = mesurer_trace(self.coordinates, *cle)
+        return self.traces[cle]
+
+    def evaluer(self, reglages, processus=None):
+        """Un ResultatReglage par réglage, dans l'ordre"""
+        # Regroupements distincts : (pas, repère, seuils) -> positions des réglages qui le partagent
+        groupes = {}
+        for position, reglage in enumerate(reglages):
+            cle_trace = (float(reglage.distance), bool(reglage.virages.repere_metrique))
+            self.trace(*cle_trace)
+            groupes.setdefault((cle_trace, _cle_regroupement(reglage.virages)), []).append(position)
+        taches = [(cle_trace, params, [reglages[p].virages.bornes_notes for p in positions])
+                  for (cle_trace, params), positions in groupes.items()]
+
+        processus = processus or os.cpu_count() or 1
+        if processus <= 1 or len(taches) < MIN_PARALLELE:
+            comptes = [_compter(self.traces[t[0]], t[1], t[2]) for t in taches]
+        else:
+            with ProcessPoolExecutor(max_workers=processus, initializer=_initialiser,
+                                     initargs=(self.traces,)) as pool:
+                comptes = list(pool.map(_evaluer, taches, chunksize=max(1, len(taches) // (4 * processus))))
+
+        resultats = [None] * len(reglages)
+        for positions, lignes in zip(groupes.values(), comptes):
+            for position, ligne in zip(positions, lignes):
+                resultats[position] = ResultatReglage(reglages[position], *ligne)
+        return resultats
+
+
+def valeur_champ(champ, texte):
+    """Valeur d'un champ de balayage lue dans le texte de la ligne de commande"""
+    if champ == "distance":
+        return float(texte)
+    defaut = getattr(ParametresVirage, champ)
+    if texte.lower() in ("aucun", "none"):
+        return None
+    if isinstance(defaut, bool):
+        if texte.lower() not in ("oui", "non", "true", "false", "1", "0"):
+            raise ValueError(f"{champ} : oui ou non attendu, pas {texte!r}")
+        return texte.lower() in ("oui", "true", "1")
+    if isinstance(defaut, tuple):
+        return tuple(float(x) for x in texte.split("/"))
+    return float(texte)
+
+
+def axe_grille(texte):
+    """"champ=v1,v2,..." -> (champ, [valeurs]) ; bornes des notes séparées par "/", "aucun" pour None"""
+    champ, _, valeurs = texte.partition("=")
+    champ = champ.strip().replace("-", "_")
+    if champ not in CHAMPS or not valeurs:
+        raise argparse.ArgumentTypeError(f"champ=v1,v2,... attendu avec un champ parmi {', '.join(CHAMPS)} : {texte!r}")
+    try:
+        return champ, [valeur_champ(champ, v.strip()) for v in valeurs.split(",") if v.strip()]
+    except ValueError as exc:
+        raise argparse.ArgumentTypeError(str(exc))
+
+
+def _valeur(reglage, champ):
+    valeur = reglage.distance if champ == "distance" else getattr(reglage.virages, champ)
+    if isinstance(valeur, tuple):
+        return "/".join(f"{v:g}" for v in valeur)
+    return "aucun" if valeur is None else f"{valeur:g}" if isinstance(valeur, float) else str(valeur)
+
+
+def lignes_tableau(resultats, champs):
+    """Lignes du tableau comparatif : champs balayés, puis points, virages, gauche et répartition des notes"""
+    entete = [*champs, "points", "virages", "gauche", "longueur_moyenne", *(f"note_{n}" for n in NOTES)]
+    yield entete
+    for r in resultats:
+        yield [*(_valeur(r.reglage, champ) for champ in champs), r.nb_points, r.nb_virages, r.gauche,
+               round(r.longueur_moyenne, 1), *r.notes]
+
+
+def afficher_tableau(resultats, champs):
+    lignes = [[str(x) for x in ligne] for ligne in lignes_tableau(resultats, champs)]
+    largeurs = [max(len(ligne[k]) for ligne in lignes) for k in range(len(lignes[0]))]
+    for ligne in lignes:
+        print("  ".join(x.rjust(largeur) for x, largeur in zip(ligne, largeurs)))
+
+
+def ecrire_csv(chemin, resultats, champs):
+    with open(chemin, "w", newline="", encoding="utf-8") as f:
+        csv.writer(f).writerows(lignes_tableau(resultats, champs))
+
+
+def main(argv=None):
+    from rally.cli import point
+
+    parser = argparse.ArgumentParser(prog="python -m rally balayage",
+                                     description="Virages et notes d'une grille de seuils sur un même itinéraire")
+    parser.add_argument("depart", type=point, nargs="?", help="lat,lon")
+    parser.add_argument("arrivee", type=point, nargs="?", help="lat,lon")
+    parser.add_argument("--etape", type=point, action="append", default=[], help="Point de passage lat,lon")
+    parser.add_argument("--itineraire", default=None, help="Route GeoJSON déjà enregistrée, à la place du routage")
+    parser.add_argument("--preset", choices=sorted(PRESETS), default=PRESET_DEFAUT, help="Seuils non balayés")
+    parser.add_argument("--grille", type=axe_grille, action="append", default=[], metavar="CHAMP=V1,V2",
+                        help="Valeurs d'un champ (distance ou ParametresVirage), répétable ; ex. distance=20,25,50 "
+                             "ou bornes_notes=30/60/90/120/150,45/75/105/135/165")
+    parser.add_argument("--repere-metrique", action="store_true",
+                        help="Angles et longueurs dans un repère local en mètres plutôt qu'en degrés")
+    parser.add_argument("--processus", type=int, default=None, help="Processus de calcul")
+    parser.add_argument("--csv", default=None, help="Écrit aussi le tableau comparatif en CSV")
+    parser.add_argument("--hors-ligne", action="store_true", help="Uniquement le cache des itinéraires")
+    parser.add_argument("--cle-api", default=None)
+    parser.add_argument("--osm", default=None, help="Extrait OpenStreetMap (.osm, .osm.pbf) : routage local")
+    args = parser.parse_args(argv)
+    if args.itineraire is None and (args.depart is None or args.arrivee is None):
+        parser.error("départ et arrivée, ou --itineraire, sont nécessaires")
+
+    from rally.itineraire import coordonnees_route
+
+    if args.itineraire:
+        with open(args.itineraire, encoding="utf-8") as f:
+            route = json.load(f)
+    else:
+        from rally.itineraire import creer_client, recuperer_route
+
+        client = creer_client(args.cle_api, hors_ligne=args.hors_ligne or None, osm=args.osm)
+        route = recuperer_route(client, args.depart, args.arrivee, args.etape)
+
+    base = PRESETS[args.preset]
+    if args.repere_metrique:
+        base = replace(base, virages=replace(base.virages, repere_metrique=True))
+    grille = dict(args.grille)
+    reglages = combinaisons(base, grille)
+
+    debut = time.perf_counter()
+    balayage = Balayage(coordonnees_route(route))
+    resultats = balayage.evaluer(reglages, args.processus)
+    duree = time.perf_counter() - debut
+
+    champs = [champ for champ, valeurs in grille.items() if len(valeurs) > 1] or list(grille)
+    afficher_tableau(resultats, champs)
+    if args.csv:
+        ecrire_csv(args.csv, resultats, champs)
+    print(f"\n✅ {len(reglages)} combinaisons, {len(balayage.traces)} rééchantillonnage(s) en {duree:.2f}s"
+          + (f", tableau : {args.csv}" if args.csv else ""))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,142 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+import zlib
+from contextlib import contextmanager
+
+CHEMIN_CACHE = "cache/itineraires.sqlite"
+TTL = 30 * 24 * 3600  # Un mois (secondes)
+TAILLE_MAX = 256 * 1024 * 1024  # Octets compressés
+HORS_LIGNE = os.environ.get("RALLY_HORS_LIGNE") == "1"
+
+
+class RouteAbsenteDuCache(LookupError):
+    """Levée en mode hors ligne quand l'itinéraire n'a jamais été téléchargé"""
+
+
+class CacheItineraires:
+    """Cache disque (SQLite) des réponses GeoJSON d'openrouteservice.
+
+    Les réponses sont indexées par une empreinte du contenu de la requête
+    (coordonnées de départ, étapes, arrivée, profil et options), compressées
+    avec zlib, expirées après `ttl` secondes et évincées par ordre de dernier
+    accès dès que la taille totale dépasse `taille_max` octets.
+    """
+
+    def __init__(self, chemin=CHEMIN_CACHE, ttl=TTL, taille_max=TAILLE_MAX):
+        self.chemin = chemin
+        self.ttl = ttl
+        self.taille_max = taille_max
+        dossier = os.path.dirname(chemin)
+        if dossier:
+            os.makedirs(dossier, exist_ok=True)
+        with self._connexion() as cnx:
+            cnx.execute(
+                "CREATE TABLE IF NOT EXISTS routes ("
+                " cle TEXT PRIMARY KEY, donnees BLOB NOT NULL, taille INTEGER NOT NULL,"
+                " cree REAL NOT NULL, acces REAL NOT NULL)"
+            )
+            cnx.execute("CREATE INDEX IF NOT EXISTS routes_acces ON routes (acces)")
+
+    @contextmanager
+    def _connexion(self):
+        # Une connexion par opération : utilisable depuis plusieurs processus
+        cnx = sqlite3.connect(self.chemin, timeout=30)
+        try:
+            cnx.execute("PRAGMA journal_mode=WAL")
+            with cnx:
+                yield cnx
+        finally:
+            cnx.close()
+
+    @staticmethod
+    def cle(coordinates, profile, **options):
+        """Empreinte SHA-256 d'une requête directions (coordonnées en (lon, lat))"""
+        contenu = {
+            "coordinates": [[round(float(x), 7) for x in point] for point in coordinates],
+            "profile": profile,
+            "options": options,
+        }
+        texte = json.dumps(contenu, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(texte.encode()).hexdigest()
+
+    def lire(self, cle):
+        """Route en cache ou None si absente ou expirée"""
+        maintenant = time.time()
+        with self._connexion() as cnx:
+            ligne = cnx.execute("SELECT donnees, cree FROM routes WHERE cle = ?", (cle,)).fetchone()
+            if ligne is None:
+                return None
+            donnees, cree = ligne
+            if self.ttl is not None and maintenant - cree > self.ttl:
+                cnx.execute("DELETE FROM routes WHERE cle = ?", (cle,))
+                return None
+            cnx.execute("UPDATE routes SET acces = ? WHERE cle = ?", (maintenant, cle))
+        return json.loads(zlib.decompress(donnees))
+
+    def ecrire(self, cle, route):
+        """Enregistre une route puis évince les plus anciennes si nécessaire"""
+        donnees = zlib.compress(json.dumps(route, separators=(",", ":")).encode(), 6)
+        maintenant = time.time()
+        with self._connexion() as cnx:
+            cnx.execute(
+                "INSERT OR REPLACE INTO routes (cle, donnees, taille, cree, acces) VALUES (?, ?, ?, ?, ?)",
+                (cle, donnees, len(donnees), maintenant, maintenant),
+            )
+            if self.ttl is not None:
+                cnx.execute("DELETE FROM routes WHERE cree < ?", (maintenant - self.ttl,))
+            self._evincer(cnx)
+
+    def _evincer(self, cnx):
+        total = cnx.execute("SELECT COALESCE(SUM(taille), 0) FROM routes").fetchone()[0]
+        if total <= self.taille_max:
+            return
+        a_supprimer = []
+        for cle, taille in cnx.execute("SELECT cle, taille FROM routes ORDER BY acces"):
+            if total <= self.taille_max:
+                break
+            a_supprimer.append((cle,))
+            total -= taille
+        cnx.executemany("DELETE FROM routes WHERE cle = ?", a_supprimer)
+
+    def vider(self):
+        with self._connexion() as cnx:
+            cnx.execute("DELETE FROM routes")
+
+    def __len__(self):
+        with self._connexion() as cnx:
+            return cnx.execute("SELECT COUNT(*) FROM routes").fetchone()[0]
+
+
+class ClientEnCache:
+    """Remplace openrouteservice.Client pour les appels directions.
+
+    `client` peut être n'importe quel objet exposant
+    directions(coordinates=..., profile=..., format=...) : un client factice
+    local convient pour les essais. En mode hors ligne, seul le cache est
+    consulté et client peut valoir None (variable d'environnement
+    RALLY_HORS_LIGNE=1 par défaut).
+    """
+
+    def __init__(self, client, cache=None, hors_ligne=HORS_LIGNE):
+        self.client = client
+        self.cache = cache if cache is not None else CacheItineraires()
+        self.hors_ligne = hors_ligne
+        self.succes = 0
+        self.echecs = 0
+
+    def directions(self, coordinates, profile="driving-car", format="geojson", **options):
+        cle = self.cache.cle(coordinates, profile, format=format, **options)
+        route = self.cache.lire(cle)
+        if route is not None:
+            self.succes += 1
+            return route
+
+        self.echecs += 1
+        if self.hors_ligne or self.client is None:
+            raise RouteAbsenteDuCache(f"Itinéraire absent du cache (hors ligne) : {list(coordinates)}")
+        route = self.client.directions(coordinates=coordinates, profile=profile, format=format, **options)
+        self.cache.ecrire(cle, route)
+        return route
@@ -0,0 +1,149 @@
+"""Point d'entrée en ligne de commande : python -m rally <commande> ...
+
+    python -m rally roadbook 49.0604,1.5994 48.8268,1.3312 --preset phase1
+    python -m rally lot etapes.json --sortie rendu_html/lot
+    python -m rally direct rendu_html/lot/etape_roadbook.rbk --nmea trace.nmea
+    python -m rally balayage 49.0604,1.5994 48.8268,1.3312 --grille distance=20,25,50
+    python -m rally serveur --port 8080
+    python -m rally reconnaissance rendu_html/lot/etape_roadbook.rbk traces/ --csv controle.csv
+"""
+import argparse
+import importlib
+import json
+import os
+import sys
+from dataclasses import asdict
+
+from rally.presets import ajouter_options_reglage, reglage_depuis
+from rally.profilage import Profilage, compter, etape
+
+# Commande -> module exposant main(argv), importé seulement à l'usage
+COMMANDES = {
+    "lot": "rally.lot",
+    "direct": "rally.direct",
+    "balayage": "rally.balayage",
+    "serveur": "rally.serveur",
+    "reconnaissance": "rally.reconnaissance",
+}
+
+
+def point(texte):
+    """Coordonnées "lat,lon" -> (lat, lon)"""
+    try:
+        lat, lon = (float(x) for x in texte.split(","))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"point attendu sous la forme lat,lon : {texte!r}")
+    return lat, lon
+
+
+def afficher_roadbook(notes):
+    print("\nRoadbook copilote :")
+    for lat, lon, note, angle in notes:
+        print(f"{lat:.6f}, {lon:.6f} : {note} ({angle}°)")
+
+
+def roadbook(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m rally roadbook",
+                                     description="Roadbook copilote entre deux points")
+    parser.add_argument("depart", type=point, help="lat,lon")
+    parser.add_argument("arrivee", type=point, help="lat,lon")
+    parser.add_argument("--etape", type=point, action="append", default=[], help="Point de passage lat,lon")
+    parser.add_argument("--points-par-troncon", type=int, default=None,
+                        help="Points par requête de routage (défaut 2 : un tronçon par paire, en parallèle)")
+    ajouter_options_reglage(parser)
+    parser.add_argument("--carte", default="rendu_html/carte_rally_avec_tous_points.html")
+    parser.add_argument("--folium", action="store_true", help="Carte folium plutôt que le rendu en flux")
+    parser.add_argument("--sans-points", action="store_true", help="Ne pas dessiner les points rééchantillonnés")
+    parser.add_argument("--carte-tuiles", default=None, metavar="DOSSIER",
+                        help="Carte à niveaux de détail (page + tuiles par zoom) pour les longues étapes")
+    parser.add_argument("--json", default=None, help="Écrit aussi le roadbook en JSON")
+    parser.add_argument("--export", action="append", default=[],
+                        help="Notes copilote exportées (.gpx, .csv, .json compact ou .pdf en tulipes), répétable")
+    parser.add_argument("--hors-ligne", action="store_true", help="Uniquement le cache des itinéraires")
+    parser.add_argument("--cle-api", default=None)
+    parser.add_argument("--osm", default=None, help="Extrait OpenStreetMap (.osm, .osm.pbf) : routage local")
+    parser.add_argument("--mnt", default=None, help="Dossier de dalles SRTM (.hgt) ou GeoTIFF : bosses et creux")
+    parser.add_argument("--rapport", action="store_true",
+                        help="Durées, mémoire et compteurs par étape dans <carte>.rapport.json")
+    parser.add_argument("--profil", action="store_true", help="Profil cProfile dans <carte>.prof (implique --rapport)")
+    args = parser.parse_args(argv)
+
+    reglage = reglage_depuis(args)
+
+    if not (args.rapport or args.profil):
+        return _calculer(args, reglage)
+
+    # Rapport JSON (et profil cProfile) à côté de la carte HTML
+    base = os.path.splitext(args.carte)[0]
+    with Profilage(cprofile=args.profil) as profil:
+        code = _calculer(args, reglage)
+    contexte = {"commande": "roadbook", "arguments": sys.argv[1:] if argv is None else list(argv),
+                "preset": args.preset, "reglage": asdict(reglage)}
+    profil.ecrire(f"{base}.rapport.json", **contexte)
+    print(f"\n{profil.resume()}\n📊 Rapport : {base}.rapport.json", file=sys.stderr)
+    if args.profil:
+        profil.ecrire_profil(f"{base}.prof")
+    return code
+
+
+def _calculer(args, reglage):
+    from rally.itineraire import coordonnees_route, creer_client, recuperer_route
+    from rally.rendu import carte_virages, ecrire_carte
+
+    with etape("client"):
+        client = creer_client(args.cle_api, hors_ligne=args.hors_ligne or None, osm=args.osm)
+    with etape("routage"):
+        route = recuperer_route(client, args.depart, args.arrivee, args.etape,
+                                points_par_troncon=args.points_par_troncon)
+    with etape("analyse"):
+        resultat = reglage.analyser(coordonnees_route(route))
+    if args.mnt:
+        from rally.altitude import ModeleTerrain, annoter_relief
+
+        with etape("relief"):
+            annoter_relief(resultat, ModeleTerrain(args.mnt))
+        compter("reliefs", len(resultat.reliefs))
+
+    if args.folium:
+        with etape("rendu folium"):
+            carte = carte_virages(route, resultat, args.depart, args.arrivee, not args.sans_points)
+        with etape("carte.save"):
+            carte.save(args.carte)
+    else:
+        with etape("carte"):
+            ecrire_carte(args.carte, route, resultat, args.depart, args.arrivee, not args.sans_points)
+    print(f"✅ Carte créée : {args.carte}")
+    if args.carte_tuiles:
+        from rally.tuiles import ecrire_carte_tuiles
+
+        with etape("carte tuiles"):
+            nom = os.path.splitext(os.path.basename(args.carte))[0]
+            nb_tuiles = ecrire_carte_tuiles(args.carte_tuiles, [(nom, resultat, coordonnees_route(route))])
+        print(f"✅ Carte à niveaux de détail : {os.path.join(args.carte_tuiles, 'index.html')} ({nb_tuiles} tuiles)")
+
+    notes = resultat.notes()
+    compter("notes", len(notes))
+    if args.json:
+        with etape("export json"), open(args.json, "w", encoding="utf-8") as f:
+            json.dump([{"lat": lat, "lon": lon, "note": note, "angle": angle} for lat, lon, note, angle in notes],
+                      f, ensure_ascii=False, indent=1)
+    if args.export:
+        from rally.export import exporter
+    for chemin in args.export:
+        with etape("export " + os.path.splitext(chemin)[1].lstrip(".")):
+            exporter(chemin, [(os.path.splitext(os.path.basename(args.carte))[0], resultat)])
+        print(f"📄 Export : {chemin}")
+    afficher_roadbook(notes)
+    return 0
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    commandes = ["roadbook", *COMMANDES]
+    if not argv or argv[0] not in commandes:
+        print(f"usage : python -m rally {{{','.join(commandes)}}} ...", file=sys.stderr)
+        return 2
+    commande, reste = argv[0], argv[1:]
+    if commande == "roadbook":
+        return roadbook(reste)
+    return importlib.import_module(COMMANDES[commande]).main(reste)
@@ -0,0 +1,212 @@
+"""Mode embarqué : annonces copilote en direct à partir des positions GPS.
+
+Chaque position (trame NMEA d'un récepteur, d'un fichier ou de l'entrée
+standard) est recalée sur les points rééchantillonnés d'un roadbook déjà
+calculé, via un index spatial ; on annonce le prochain virage et la distance
+qui nous en sépare : "gauche 4 dans 150 m".
+
+    python -m rally direct rendu_html/lot/etape_roadbook.rbk --nmea trace.nmea
+    gpspipe -r | python -m rally direct etape_roadbook.rbk
+"""
+import argparse
+import sys
+import time
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+from rally.index_spatial import IndexSpatial
+from rally.roadbook import Roadbook
+
+NOEUD = 1852 / 3600  # m/s
+
+
+class Fix(NamedTuple):
+    temps: Optional[float]  # Secondes depuis minuit UTC
+    lat: float
+    lon: float
+    vitesse: Optional[float] = None  # m/s
+    cap: Optional[float] = None  # Degrés
+
+
+class Annonce(NamedTuple):
+    abscisse: float  # Position recalée le long de l'itinéraire (mètres)
+    ecart: float  # Distance entre le fix et l'itinéraire (mètres)
+    virage: int  # Ligne du prochain virage dans la table du roadbook, -1 après le dernier
+    distance: float  # Mètres jusqu'au début du prochain virage (ou jusqu'à l'arrivée)
+    texte: str
+
+
+# === Lecture NMEA ===
+def _somme_controle_ok(ligne):
+    corps, _, somme = ligne.partition("*")
+    if not somme:
+        return True  # Certains rejeux n'ont pas de somme de contrôle
+    calcul = 0
+    for c in corps[1:]:
+        calcul ^= ord(c)
+    try:
+        return calcul == int(somme[:2], 16)
+    except ValueError:
+        return False
+
+
+def _degres(valeur, hemisphere):
+    """ddmm.mmmm + N/S/E/W -> degrés décimaux signés"""
+    point = valeur.index(".") if "." in valeur else len(valeur)
+    degres = float(valeur[:point - 2]) + float(valeur[point - 2:]) / 60
+    return -degres if hemisphere in ("S", "W") else degres
+
+
+def _secondes(hhmmss):
+    if not hhmmss:
+        return None
+    return int(hhmmss[:2]) * 3600 + int(hhmmss[2:4]) * 60 + float(hhmmss[4:])
+
+
+def lire_nmea(lignes):
+    """Fix des trames RMC (ou GGA en l'absence de RMC) valides d'un flux de lignes NMEA"""
+    avec_rmc = False
+    for ligne in lignes:
+        ligne = ligne.strip()
+        if not ligne.startswith("$") or not _somme_controle_ok(ligne):
+            continue
+        champs = ligne.split("*")[0].split(",")
+        type_ = champs[0][3:]
+        try:
+            if type_ == "RMC" and len(champs) > 8 and champs[2] == "A":
+                avec_rmc = True
+                yield Fix(
+                    temps=_secondes(champs[1]),
+                    lat=_degres(champs[3], champs[4]),
+                    lon=_degres(champs[5], champs[6]),
+                    vitesse=float(champs[7]) * NOEUD if champs[7] else None,
+                    cap=float(champs[8]) if champs[8] else None,
+                )
+            elif type_ == "GGA" and not avec_rmc and len(champs) > 6 and champs[6] not in ("", "0"):
+                yield Fix(temps=_secondes(champs[1]), lat=_degres(champs[2], champs[3]),
+                          lon=_degres(champs[4], champs[5]))
+        except (ValueError, IndexError):
+            continue  # Trame tronquée
+
+
+# === Recalage et annonces ===
+class Guidage:
+    """Recale les positions sur un roadbook et annonce le prochain virage.
+
+    Les candidats sont les segments proches (index spatial) ; on écarte ceux
+    qui ramèneraient en arrière de plus de recul_max mètres et on pénalise
+    les sauts en avant (poids_continuite mètres d'écart par mètre de saut),
+    pour ne pas s'accrocher à une autre portion de l'itinéraire qui passe
+    à proximité.
+    """
+
+    def __init__(self, roadbook, rayon=50.0, recul_max=30.0, poids_continuite=0.05, taille_cellule=50.0):
+        self.roadbook = roadbook
+        points = np.asarray(roadbook.coordinates, dtype=np.float64).reshape(-1, 2)
+        if len(points) < 2:
+            raise ValueError("Roadbook sans points rééchantillonnés")
+        self.index = IndexSpatial(points, taille_cellule)
+        # Mêmes abscisses que distance_depart dans detecter_virages
+        self.abscisses = self.index.abscisses
+        self.debuts = np.asarray(roadbook.table["distance_depart"], dtype=np.float64)
+        self.textes = [note for _, note, _ in roadbook.classes()]
+        self.rayon = rayon
+        self.recul_max = recul_max
+        self.poids_continuite = poids_continuite
+        self.position = None
+        self.localiser(*points[0])  # Premier appel lent (chargement des routines numpy) fait d'avance
+
+    def localiser(self, lon, lat):
+        """(abscisse, écart) du point de l'itinéraire le plus plausible, None si hors itinéraire"""
+        _, _, ecarts, abscisses = self.index.segments_proches(lon, lat, self.rayon)
+        if not len(ecarts):
+            return None
+        cout = ecarts
+        if self.position is not None:
+            en_avant = abscisses >= self.position - self.recul_max
+            if en_avant.any():
+                cout = np.where(en_avant, ecarts + self.poids_continuite * np.abs(abscisses - self.position), np.inf)
+        k = int(np.argmin(cout))
+        return float(abscisses[k]), float(ecarts[k])
+
+    def annoncer(self, fix):
+        """Annonce pour une position, None si elle est trop loin de l'itinéraire"""
+        position = self.localiser(fix.lon, fix.lat)
+        if position is None:
+            return None
+        abscisse, ecart = position
+        self.position = abscisse
+        virage = int(np.searchsorted(self.debuts, abscisse, side="right"))
+        if virage < len(self.debuts):
+            distance = float(self.debuts[virage] - abscisse)
+            texte = f"{self.textes[virage]} dans {int(round(distance, -1))} m"
+        else:
+            virage = -1
+            distance = float(self.abscisses[-1] - abscisse)
+            texte = f"arrivée dans {int(round(distance, -1))} m"
+        return Annonce(abscisse, ecart, virage, distance, texte)
+
+
+def guider(roadbook, fixes, **options):
+    """(fix, annonce) pour chaque position d'un flux"""
+    guidage = Guidage(roadbook, **options)
+    for fix in fixes:
+        yield fix, guidage.annoncer(fix)
+
+
+def _horodatage(secondes):
+    if secondes is None:
+        return "--:--:--"
+    secondes = int(secondes)
+    return f"{secondes // 3600:02d}:{secondes // 60 % 60:02d}:{secondes % 60:02d}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m rally direct",
+                                     description="Annonces copilote en direct depuis des trames NMEA")
+    parser.add_argument("roadbook", help="Roadbook binaire (.rbk) d'une étape")
+    parser.add_argument("--nmea", default="-", help="Fichier de trames NMEA, - pour l'entrée standard")
+    parser.add_argument("--temps-reel", action="store_true", help="Rejoue un fichier au rythme des horodatages")
+    parser.add_argument("--rayon", type=float, default=50.0, help="Écart maximal à l'itinéraire (m)")
+    parser.add_argument("--toutes", action="store_true", help="Une ligne par position, même sans changement")
+    args = parser.parse_args(argv)
+
+    roadbook = Roadbook.charger(args.roadbook)
+    guidage = Guidage(roadbook, rayon=args.rayon)
+    source = sys.stdin if args.nmea == "-" else open(args.nmea, encoding="ascii", errors="replace")
+
+    latences = []
+    precedent = None
+    debut_rejeu = temps_initial = None
+    try:
+        for fix in lire_nmea(source):
+            if args.temps_reel and fix.temps is not None:
+                if debut_rejeu is None:
+                    debut_rejeu, temps_initial = time.monotonic(), fix.temps
+                attente = (fix.temps - temps_initial) - (time.monotonic() - debut_rejeu)
+                if attente > 0:
+                    time.sleep(attente)
+            debut = time.perf_counter()
+            annonce = guidage.annoncer(fix)
+            latences.append(time.perf_counter() - debut)
+
+            texte = annonce.texte if annonce else "hors itinéraire"
+            if args.toutes or texte != precedent:
+                print(f"{_horodatage(fix.temps)}  {texte}", flush=True)
+            precedent = texte
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if source is not sys.stdin:
+            source.close()
+
+    if latences:
+        latences = np.array(latences) * 1000
+        print(f"\n{len(latences)} positions, latence médiane {np.median(latences):.2f} ms, "
+              f"p99 {np.percentile(latences, 99):.2f} ms, max {latences.max():.2f} ms", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
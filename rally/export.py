@@ -0,0 +1,279 @@
+"""Export du roadbook : GPX, notes copilote CSV / JSON compactes, PDF imprimable en tulipes.
+
+Chaque exporteur reçoit les étapes sous la forme d'un itérable de paires
+(nom, roadbook), consommé au fil de l'écriture : un rallye de nombreuses
+étapes (par exemple relues une à une depuis les .rbk de `lot`) s'exporte
+sans jamais garder plus d'une étape ni plus d'une page en mémoire. Le
+roadbook est un Roadbook, ou la liste (lat, lon, note, angle) que rendent
+notes() et recup_itineraire_complet() ; dans ce dernier cas, la distance
+depuis le départ est mesurée à vol d'oiseau d'une note à la suivante.
+
+    from rally.export import ecrire_gpx, ecrire_pdf
+    ecrire_gpx("es1.gpx", [("ES1", roadbook)])
+    ecrire_pdf("rallye.pdf", ((nom, Roadbook.charger(chemin)) for nom, chemin in etapes))
+
+Le PDF est écrit directement (PDF 1.4, polices standard, flux compressés),
+sans dépendance : chaque page part dans le fichier dès qu'elle est pleine.
+"""
+import csv
+import json
+import shutil
+import tempfile
+import zlib
+from typing import NamedTuple
+from xml.sax.saxutils import escape
+
+import numpy as np
+
+from rally.geodesie import longueurs_segments
+from rally.roadbook import TYPES_RELIEF, Roadbook
+
+LIGNES_PAR_PAGE = 8  # Cases du PDF par page
+A4 = (595.28, 841.89)  # Points PDF
+
+
+class Note(NamedTuple):
+    distance: float  # Depuis le départ de l'étape (mètres)
+    intervalle: float  # Depuis la note précédente (mètres)
+    lat: float
+    lon: float
+    note: str  # "gauche 4", "Début droite 2", "bosse"...
+    angle: int  # Angle cumulé (degrés), 0 pour le relief
+
+
+def lignes_notes(roadbook):
+    """Notes copilote d'un Roadbook ou d'une liste (lat, lon, note, angle[, distance]), dans l'ordre de la route"""
+    if isinstance(roadbook, Roadbook):
+        notes = roadbook.notes(distances=True)
+    else:
+        notes = [tuple(n) for n in roadbook]
+        if notes and len(notes[0]) < 5:
+            points = np.array([(n[1], n[0]) for n in notes], dtype=np.float64).reshape(-1, 2)
+            distances = np.concatenate(([0.0], np.cumsum(longueurs_segments(points)))) if len(points) else []
+            notes = [(*n[:4], d) for n, d in zip(notes, distances)]
+    # Virages qui se chevauchent : la fin de l'un vient après le début du suivant, les notes sont lues dans
+    # l'ordre de la route (tri stable, les notes à la même distance gardent leur ordre)
+    notes = sorted(notes, key=lambda n: n[4])
+    precedente = 0.0
+    lignes = []
+    for lat, lon, note, angle, distance in notes:
+        lignes.append(Note(float(distance), float(distance) - precedente, float(lat), float(lon), str(note),
+                           int(angle)))
+        precedente = float(distance)
+    return lignes
+
+
+def sens(note):
+    """+1 à gauche, -1 à droite, 0 pour le relief"""
+    return 1 if "gauche" in note else -1 if "droite" in note else 0
+
+
+def _longueur(roadbook, lignes):
+    """Longueur de l'étape (mètres) : trace du Roadbook, sinon distance de la dernière note"""
+    if isinstance(roadbook, Roadbook):
+        return float(longueurs_segments(roadbook.coordinates).sum())
+    return lignes[-1].distance if lignes else 0.0
+
+
+def _km(metres):
+    return f"{metres / 1000:.2f}".replace(".", ",")
+
+
+# === GPX ===
+def ecrire_gpx(chemin, etapes):
+    """Un point de passage (wpt) par note puis, pour chaque Roadbook, sa trace (trk), dans l'ordre du GPX 1.1.
+
+    Le schéma veut tous les wpt avant les trk : les traces sont mises de côté
+    dans un fichier temporaire pendant l'écriture des points de passage, puis
+    recopiées à la suite, sans garder plus d'une étape en mémoire.
+    """
+    with open(chemin, "w", encoding="utf-8") as f, tempfile.TemporaryFile("w+", encoding="utf-8") as traces:
+        f.write('<?xml version="1.0" encoding="UTF-8"?>\n'
+                '<gpx version="1.1" creator="rally" xmlns="http://www.topografix.com/GPX/1/1">\n')
+        for nom, roadbook in etapes:
+            for numero, n in enumerate(lignes_notes(roadbook), 1):
+                type_ = "relief" if n.note in TYPES_RELIEF else "virage"
+                f.write(f'<wpt lat="{n.lat:.7f}" lon="{n.lon:.7f}"><name>{escape(f"{nom} {numero} {n.note}")}</name>'
+                        f'<desc>{escape(f"{n.note} ({n.angle}°) à {_km(n.distance)} km")}</desc>'
+                        f'<type>{type_}</type></wpt>\n')
+            if isinstance(roadbook, Roadbook):
+                traces.write(f"<trk><name>{escape(str(nom))}</name><trkseg>\n")
+                coordinates = np.asarray(roadbook.coordinates, dtype=np.float64).reshape(-1, 2)
+                traces.writelines(f'<trkpt lat="{lat:.7f}" lon="{lon:.7f}"/>\n' for lon, lat in coordinates.tolist())
+                traces.write("</trkseg></trk>\n")
+        traces.seek(0)
+        shutil.copyfileobj(traces, f)
+        f.write("</gpx>\n")
+
+
+# === Notes compactes ===
+COLONNES = ("distance", "intervalle", "note", "angle", "lat", "lon")
+
+
+def _valeurs(n):
+    # Intervalle entre distances arrondies : la somme des intervalles retombe sur la distance
+    distance = round(n.distance)
+    return distance, distance - round(n.distance - n.intervalle), n.note, n.angle, round(n.lat, 6), round(n.lon, 6)
+
+
+def ecrire_csv(chemin, etapes):
+    """Une ligne par note : étape, numéro, distances cumulée et partielle (mètres), note, angle, position"""
+    with open(chemin, "w", newline="", encoding="utf-8") as f:
+        ecriture = csv.writer(f)
+        ecriture.writerow(("etape", "numero", *COLONNES))
+        for nom, roadbook in etapes:
+            ecriture.writerows((nom, numero, *_valeurs(n)) for numero, n in enumerate(lignes_notes(roadbook), 1))
+
+
+def ecrire_json(chemin, etapes):
+    """{"colonnes": [...], "etapes": [{"nom", "longueur", "notes": [[...], ...]}]}, une note par ligne"""
+    with open(chemin, "w", encoding="utf-8") as f:
+        f.write(f'{{"colonnes":{json.dumps(COLONNES, separators=(",", ":"))},"etapes":[')
+        for k, (nom, roadbook) in enumerate(etapes):
+            lignes = lignes_notes(roadbook)
+            longueur = _longueur(roadbook, lignes)
+            f.write(f'{"," if k else ""}\n{{"nom":{json.dumps(nom, ensure_ascii=False)},'
+                    f'"longueur":{round(longueur)},"notes":[')
+            f.write(",".join("\n" + json.dumps(_valeurs(n), ensure_ascii=False, separators=(",", ":"))
+                             for n in lignes))
+            f.write("]}")
+        f.write("\n]}\n")
+
+
+# === PDF en tulipes ===
+def _texte(texte):
+    """Chaîne PDF littérale (WinAnsiEncoding)"""
+    brut = str(texte).encode("cp1252", errors="replace")
+    return b"(" + brut.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+
+class _DocumentPdf:
+    """Fichier PDF écrit page par page : seuls les décalages des objets restent en mémoire"""
+
+    def __init__(self, chemin, taille=A4):
+        self.fichier = open(chemin, "wb")
+        self.taille = taille
+        self.decalages = {}
+        self.pages = []
+        self.suivant = 5  # 1 : catalogue, 2 : arbre des pages, 3 et 4 : polices
+        self.fichier.write(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+        for numero, police in ((3, b"Helvetica"), (4, b"Helvetica-Bold")):
+            self._objet(numero, b"<< /Type /Font /Subtype /Type1 /BaseFont /" + police
+                        + b" /Encoding /WinAnsiEncoding >>")
+
+    def _objet(self, numero, contenu):
+        self.decalages[numero] = self.fichier.tell()
+        self.fichier.write(b"%d 0 obj\n" % numero + contenu + b"\nendobj\n")
+
+    def page(self, operations):
+        """Ajoute une page dont le contenu est la liste d'opérations (bytes)"""
+        flux = zlib.compress(b"\n".join(operations), 6)
+        contenu, page = self.suivant, self.suivant + 1
+        self.suivant += 2
+        self._objet(contenu, b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(flux) + flux
+                    + b"\nendstream")
+        self._objet(page, b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %.2f %.2f] /Contents %d 0 R "
+                    b"/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> >>" % (*self.taille, contenu))
+        self.pages.append(page)
+
+    def fermer(self):
+        kids = b" ".join(b"%d 0 R" % p for p in self.pages)
+        self._objet(2, b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % len(self.pages))
+        self._objet(1, b"<< /Type /Catalog /Pages 2 0 R >>")
+        xref = self.fichier.tell()
+        self.fichier.write(b"xref\n0 %d\n0000000000 65535 f \n" % self.suivant)
+        self.fichier.write(b"".join(b"%010d 00000 n \n" % self.decalages[k] for k in range(1, self.suivant)))
+        self.fichier.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (self.suivant, xref))
+        self.fichier.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.fermer()
+        return False
+
+
+def _ecrire(x, y, texte, taille=10, gras=False):
+    return b"BT /F%d %d Tf %.1f %.1f Td %s Tj ET" % (2 if gras else 1, taille, x, y, _texte(texte))
+
+
+def _disque(x, y, r):
+    """Disque plein (quatre arcs de Bézier)"""
+    k = 0.5523 * r
+    return (b"%.1f %.1f m %.1f %.1f %.1f %.1f %.1f %.1f c %.1f %.1f %.1f %.1f %.1f %.1f c "
+            b"%.1f %.1f %.1f %.1f %.1f %.1f c %.1f %.1f %.1f %.1f %.1f %.1f c f" % (
+                x + r, y, x + r, y + k, x + k, y + r, x, y + r, x - k, y + r, x - r, y + k, x - r, y,
+                x - r, y - k, x - k, y - r, x, y - r, x + k, y - r, x + r, y - k, x + r, y))
+
+
+def tulipe(cx, cy, note, angle, taille=22.0):
+    """Opérations PDF du schéma d'une note : arrivée par le bas, sortie fléchée selon l'angle"""
+    ops = [b"2.5 w 1 J 1 j %.1f %.1f m %.1f %.1f l S" % (cx, cy - taille, cx, cy), _disque(cx, cy - taille, 3.5)]
+    cote = sens(note)
+    if cote == 0:
+        # Relief : bosse vers le haut, creux et compression vers le bas
+        bombe = 12 if note == "bosse" else -12
+        ops.append(b"%.1f %.1f m %.1f %.1f l S" % (cx, cy, cx, cy + taille))
+        ops.append(b"%.1f %.1f m %.1f %.1f %.1f %.1f %.1f %.1f c S" % (
+            cx - 14, cy, cx - 6, cy + bombe, cx + 6, cy + bombe, cx + 14, cy))
+        return ops
+    theta = np.radians(min(abs(angle), 180)) * cote
+    dx, dy = -np.sin(theta), np.cos(theta)
+    fx, fy = cx + dx * taille, cy + dy * taille
+    ops.append(b"%.1f %.1f m %.1f %.1f l S" % (cx, cy, fx, fy))
+    # Pointe de flèche
+    px, py = -dy, dx
+    ops.append(b"%.1f %.1f m %.1f %.1f l %.1f %.1f l h f" % (
+        fx + dx * 6, fy + dy * 6, fx + px * 4, fy + py * 4, fx - px * 4, fy - py * 4))
+    return ops
+
+
+def ecrire_pdf(chemin, etapes, lignes_par_page=LIGNES_PAR_PAGE, titre="Roadbook"):
+    """Roadbook imprimable : par note une case (distance totale, partielle, tulipe, note), page par page"""
+    largeur, hauteur = A4
+    marge, entete = 36.0, 54.0
+    hauteur_case = (hauteur - 2 * marge - entete) / lignes_par_page
+    colonnes = (marge, marge + 40, marge + 120, marge + 200, marge + 320)  # N°, total, partiel, tulipe, note
+
+    with _DocumentPdf(chemin) as pdf:
+        numero_page = 0
+        for nom, roadbook in etapes:
+            lignes = lignes_notes(roadbook)
+            total = _longueur(roadbook, lignes)
+            for debut in range(0, max(len(lignes), 1), lignes_par_page):
+                numero_page += 1
+                haut = hauteur - marge
+                ops = [_ecrire(marge, haut - 18, f"{titre} — {nom}", 16, gras=True),
+                       _ecrire(largeur - marge - 150, haut - 18, f"page {numero_page}", 10),
+                       _ecrire(marge, haut - 36, f"{len(lignes)} notes, {_km(total)} km", 10)]
+                y = haut - entete
+                ops.append(b"0.5 w")
+                for titre_colonne, x in zip(("N°", "Total", "Partiel", "Tulipe", "Note"), colonnes):
+                    ops.append(_ecrire(x + 4, y + 4, titre_colonne, 8, gras=True))
+                for k, n in enumerate(lignes[debut:debut + lignes_par_page], debut + 1):
+                    bas = y - hauteur_case
+                    ops.append(b"%.1f %.1f %.1f %.1f re S" % (marge, bas, largeur - 2 * marge, hauteur_case))
+                    ops.extend(b"%.1f %.1f m %.1f %.1f l S" % (x, bas, x, y) for x in colonnes[1:])
+                    milieu = bas + hauteur_case / 2
+                    ops.append(_ecrire(colonnes[0] + 6, milieu - 5, k, 12))
+                    ops.append(_ecrire(colonnes[1] + 6, milieu - 6, _km(n.distance), 16, gras=True))
+                    ops.append(_ecrire(colonnes[2] + 6, milieu - 5, _km(n.intervalle), 12))
+                    ops.extend(tulipe(colonnes[3] + 60, milieu, n.note, n.angle, hauteur_case * 0.3))
+                    ops.append(b"0.5 w")
+                    ops.append(_ecrire(colonnes[4] + 8, milieu + 2, n.note, 16, gras=True))
+                    if n.angle:
+                        ops.append(_ecrire(colonnes[4] + 8, milieu - 16, f"{n.angle}°", 10))
+                    y = bas
+                pdf.page(ops)
+
+
+EXPORTEURS = {".gpx": ecrire_gpx, ".csv": ecrire_csv, ".json": ecrire_json, ".pdf": ecrire_pdf}
+
+
+def exporter(chemin, etapes):
+    """Écrit les étapes dans le format donné par l'extension du chemin (.gpx, .csv, .json, .pdf)"""
+    extension = chemin[chemin.rfind("."):].lower() if "." in chemin else ""
+    if extension not in EXPORTEURS:
+        raise ValueError(f"Format d'export inconnu : {chemin!r} (attendu : {', '.join(EXPORTEURS)})")
+    EXPORTEURS[extension](chemin, etapes)
@@ -0,0 +1,100 @@
+import numpy as np
+
+# === Ellipsoïde WGS84 ===
+WGS84_A = 6378137.0
+WGS84_F = 1 / 298.257223563
+WGS84_B = (1 - WGS84_F) * WGS84_A
+RAYON_TERRE = 6371008.8  # Rayon moyen (mètres)
+
+
+def distances_haversine(lon1, lat1, lon2, lat2):
+    """Distance sphérique en mètres entre deux tableaux de points (degrés)"""
+    lon1, lat1, lon2, lat2 = map(np.radians, (lon1, lat1, lon2, lat2))
+    dlat = lat2 - lat1
+    dlon = lon2 - lon1
+    h = np.sin(dlat / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin(dlon / 2) ** 2
+    return 2 * RAYON_TERRE * np.arcsin(np.sqrt(np.clip(h, 0.0, 1.0)))
+
+
+def distances_vincenty(lon1, lat1, lon2, lat2, tolerance=1e-12, iterations_max=200, par_couple=False):
+    """Distance géodésique en mètres (formule inverse de Vincenty, vectorisée).
+
+    Équivalente à geopy.geodesic à quelques dixièmes de millimètre près. Les
+    couples quasi antipodaux qui ne convergent pas retombent sur haversine.
+    Avec `par_couple`, un couple convergé n'est plus itéré et sa distance est
+    tirée du lambda de sa propre convergence : elle ne dépend que de lui, au
+    bit près, et non des autres couples du tableau.
+    """
+    lon1, lat1, lon2, lat2 = np.broadcast_arrays(
+        *(np.asarray(x, dtype=np.float64) for x in (lon1, lat1, lon2, lat2))
+    )
+    f = WGS84_F
+    L = np.radians(lon2 - lon1)
+    U1 = np.arctan((1 - f) * np.tan(np.radians(lat1)))
+    U2 = np.arctan((1 - f) * np.tan(np.radians(lat2)))
+    sinU1, cosU1 = np.sin(U1), np.cos(U1)
+    sinU2, cosU2 = np.sin(U2), np.cos(U2)
+
+    def termes(lam):
+        sin_lam, cos_lam = np.sin(lam), np.cos(lam)
+        sin_sigma = np.hypot(cosU2 * sin_lam, cosU1 * sinU2 - sinU1 * cosU2 * cos_lam)
+        cos_sigma = sinU1 * sinU2 + cosU1 * cosU2 * cos_lam
+        sigma = np.arctan2(sin_sigma, cos_sigma)
+        sin_alpha = np.where(sin_sigma == 0, 0.0, cosU1 * cosU2 * sin_lam / sin_sigma)
+        cos2_alpha = 1 - sin_alpha ** 2
+        cos_2sm = np.where(cos2_alpha == 0, 0.0, cos_sigma - 2 * sinU1 * sinU2 / cos2_alpha)
+        return sin_sigma, cos_sigma, sigma, sin_alpha, cos2_alpha, cos_2sm
+
+    lam = L.copy()
+    converge = np.zeros(L.shape, dtype=bool)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for _ in range(iterations_max):
+            sin_sigma, cos_sigma, sigma, sin_alpha, cos2_alpha, cos_2sm = termes(lam)
+            C = f / 16 * cos2_alpha * (4 + f * (4 - 3 * cos2_alpha))
+            lam_prec = lam
+            lam = L + (1 - C) * f * sin_alpha * (
+                sigma + C * sin_sigma * (cos_2sm + C * cos_sigma * (-1 + 2 * cos_2sm ** 2))
+            )
+            if par_couple:
+                # Lambda gardé tel qu'au moment de la convergence, quelle que soit la suite des itérations
+                lam = np.where(converge, lam_prec, lam)
+                converge = converge | (np.abs(lam - lam_prec) <= tolerance)
+            else:
+                converge = np.abs(lam - lam_prec) <= tolerance
+            if converge.all():
+                break
+        if par_couple:
+            sin_sigma, cos_sigma, sigma, sin_alpha, cos2_alpha, cos_2sm = termes(lam)
+
+        u2 = cos2_alpha * (WGS84_A ** 2 - WGS84_B ** 2) / WGS84_B ** 2
+        A = 1 + u2 / 16384 * (4096 + u2 * (-768 + u2 * (320 - 175 * u2)))
+        B = u2 / 1024 * (256 + u2 * (-128 + u2 * (74 - 47 * u2)))
+        delta_sigma = B * sin_sigma * (
+            cos_2sm + B / 4 * (
+                cos_sigma * (-1 + 2 * cos_2sm ** 2)
+                - B / 6 * cos_2sm * (-3 + 4 * sin_sigma ** 2) * (-3 + 4 * cos_2sm ** 2)
+            )
+        )
+        s = WGS84_B * A * (sigma - delta_sigma)
+
+    if not converge.all():
+        secours = distances_haversine(lon1, lat1, lon2, lat2)
+        s = np.where(converge, s, secours)
+    return s
+
+
+def longueurs_segments(coordinates):
+    """Longueur en mètres de chaque segment d'une polyligne (lon, lat), qui ne dépend que de ce segment"""
+    pts = np.asarray(coordinates, dtype=np.float64)
+    if len(pts) < 2:
+        return np.zeros(0)
+    return distances_vincenty(pts[:-1, 0], pts[:-1, 1], pts[1:, 0], pts[1:, 1], par_couple=True)
+
+
+def abscisses_curvilignes(coordinates):
+    """Distance cumulée depuis le premier point (mètres), premier élément nul"""
+    longueurs = longueurs_segments(coordinates)
+    cumul = np.empty(len(longueurs) + 1)
+    cumul[0] = 0.0
+    np.cumsum(longueurs, out=cumul[1:])
+    return cumul
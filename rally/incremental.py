@@ -0,0 +1,214 @@
+"""Mise à jour incrémentale d'un roadbook quand l'itinéraire change un peu.
+
+La nouvelle géométrie est comparée à l'ancienne (préfixe et suffixe de
+sommets communs) ; seule la portion modifiée, élargie d'une marge, est
+rééchantillonnée. La détection reprend au dernier virage non touché et
+s'arrête dès que le parcours des points retombe sur celui de l'ancien
+roadbook : les virages suivants sont recopiés (indices décalés) avec leurs
+identifiants.
+"""
+import numpy as np
+
+from rally.reechantillonnage import interpoler_abscisses, pas_reguliers
+from rally.roadbook import Roadbook
+from rally.virages import detecter_virages, evaluer_departs, mesurer, mesurer_longueurs, reprise
+
+TOLERANCE = 1e-9  # Degrés : en dessous, deux sommets sont considérés identiques
+TRANCHE = 64  # Départs évalués à la fois pendant la resynchronisation
+TYPES_COLONNES = (np.int64, np.int64, bool, np.float64, np.float64)  # index, fin, gauche, total, distance
+
+
+def _cumul(longueurs, depart=0.0):
+    cumul = np.empty(len(longueurs) + 1)
+    cumul[0] = depart
+    cumul[1:] = depart + np.cumsum(longueurs)
+    return cumul
+
+
+def _reprises(table, params):
+    """reprise() de chaque virage de la table, vectorisée"""
+    index, index_fin = table["index"].astype(np.int64), table["index_fin"].astype(np.int64)
+    return np.maximum(index + 1, index_fin - 2) if params.chevauchement else index_fin
+
+
+def _longueur_commune(a, b):
+    """Nombre de sommets identiques en tête de a et b"""
+    m = min(len(a), len(b))
+    egal = np.all(np.abs(a[:m] - b[:m]) <= TOLERANCE, axis=1)
+    return m if egal.all() else int(np.argmin(egal))
+
+
+class AnalyseIncrementale:
+    """Roadbook d'un itinéraire, tenu à jour au fil des modifications.
+
+        analyse = AnalyseIncrementale(coordonnees_lon_lat, PRESETS["phase1"])
+        roadbook = analyse.mettre_a_jour(nouvelles_coordonnees)
+
+    `marge` (mètres) élargit la portion rééchantillonnée de part et d'autre
+    de la modification. Dans la portion modifiée, le pas est ajusté pour
+    retomber exactement sur les points conservés en aval.
+    """
+
+    def __init__(self, coordinates, reglage, marge=None):
+        if reglage.rayons is not None:
+            raise ValueError("Mise à jour incrémentale disponible pour la note à l'angle cumulé uniquement")
+        if reglage.simplification is not None:
+            raise ValueError("Mise à jour incrémentale indisponible avec la simplification de la géométrie")
+        self.reglage = reglage
+        self.marge = 2 * reglage.distance if marge is None else marge
+        self._tout_recalculer(np.asarray(coordinates, dtype=np.float64).reshape(-1, 2))
+
+    @property
+    def params(self):
+        return self.reglage.virages
+
+    def _tout_recalculer(self, brut):
+        if len(brut) < 2:
+            raise ValueError("Itinéraire d'au moins deux points attendu")
+        self.brut = brut
+        self.cumul_brut = _cumul(mesurer_longueurs(brut, self.params))
+        self.abscisses = pas_reguliers(self.cumul_brut[-1], self.reglage.distance)
+        self.points = interpoler_abscisses(brut, self.cumul_brut, self.abscisses)
+        self.cumul_points = _cumul(mesurer_longueurs(self.points, self.params))
+        self.roadbook = detecter_virages(self.points, self.params)
+        self.prochain_id = len(self.roadbook)
+        self.points_recalcules = len(self.points)
+        self.departs_evalues = len(self.points)
+        return self.roadbook
+
+    def mettre_a_jour(self, coordinates):
+        """Roadbook de la nouvelle géométrie (lon, lat), en ne recalculant que la zone modifiée"""
+        nouveau = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+        ancien = self.brut
+        n_ancien, n_nouveau = len(ancien), len(nouveau)
+
+        prefixe = _longueur_commune(ancien, nouveau)
+        if prefixe == n_ancien == n_nouveau:
+            self.points_recalcules = self.departs_evalues = 0
+            return self.roadbook
+        suffixe = _longueur_commune(ancien[::-1], nouveau[::-1])
+        suffixe = min(suffixe, min(n_ancien, n_nouveau) - prefixe)
+        if prefixe == 0 or suffixe == 0:
+            # Départ ou arrivée déplacés : tout est à refaire
+            return self._tout_recalculer(nouveau)
+
+        # === Abscisses de la nouvelle géométrie : seuls les segments modifiés sont mesurés ===
+        debut_modif = self.cumul_brut[prefixe - 1]
+        fin_modif = self.cumul_brut[n_ancien - suffixe]
+        milieu = _cumul(mesurer_longueurs(nouveau[prefixe - 1:n_nouveau - suffixe + 1], self.params), debut_modif)
+        delta = milieu[-1] - fin_modif
+        cumul_brut = np.concatenate((
+            self.cumul_brut[:prefixe - 1], milieu, self.cumul_brut[n_ancien - suffixe + 1:] + delta
+        ))
+
+        # === Rééchantillonnage de la fenêtre modifiée uniquement ===
+        pas = self.reglage.distance
+        ia = max(int(np.searchsorted(self.abscisses, debut_modif - self.marge, side="right")) - 1, 0)
+        ib = min(int(np.searchsorted(self.abscisses, fin_modif + self.marge, side="left")), len(self.points) - 1)
+        s0, s1 = self.abscisses[ia], self.abscisses[ib] + delta
+        nb_pas = max(1, int(round((s1 - s0) / pas)))
+        abscisses_fenetre = s0 + (s1 - s0) / nb_pas * np.arange(1, nb_pas)
+        points_fenetre = interpoler_abscisses(nouveau, cumul_brut, abscisses_fenetre)
+
+        points = np.concatenate((self.points[:ia + 1], points_fenetre, self.points[ib:]))
+        abscisses = np.concatenate((self.abscisses[:ia + 1], abscisses_fenetre, self.abscisses[ib:] + delta))
+        decalage = ia + 1 + len(points_fenetre) - ib  # Décalage des indices en aval
+        ib_nouveau = ib + decalage
+
+        # Distance depuis le départ le long des points rééchantillonnés (distance_depart des virages)
+        cumul_fenetre = _cumul(mesurer_longueurs(points[ia:ib_nouveau + 1], self.params), self.cumul_points[ia])
+        ecart = cumul_fenetre[-1] - self.cumul_points[ib]
+        cumul_points = np.concatenate((
+            self.cumul_points[:ia], cumul_fenetre, self.cumul_points[ib + 1:] + ecart
+        ))
+
+        table = self._detecter(points, cumul_points, ia, ib_nouveau, decalage, ecart)
+
+        self.brut = nouveau
+        self.cumul_brut = cumul_brut
+        self.points = points
+        self.abscisses = abscisses
+        self.cumul_points = cumul_points
+        self.roadbook = Roadbook(points, table, self.params)
+        self.points_recalcules = len(points_fenetre)
+        return self.roadbook
+
+    def _evaluer(self, points, debut, fin):
+        """Évalue les départs debut..fin-1 sur une tranche de points juste assez longue"""
+        n = len(points)
+        portee = self.params.distance_max_virage or 10 * self.reglage.distance
+        extra = int(np.ceil(portee / self.reglage.distance)) + 2
+        borne = min(n, fin + 1 + extra)
+        while True:
+            tranche = points[debut - 1:borne]
+            angles, gauche, longueurs = mesurer(tranche, self.params)
+            retenu, total, distance, j = evaluer_departs(angles, gauche, longueurs, self.params)
+            nb = fin - debut
+            # Un virage qui atteint le bout de la tranche a peut-être été coupé
+            if borne == n or not np.any(j[:nb] >= len(tranche) - 1):
+                break
+            borne = min(n, borne + 2 * (borne - debut))
+        self.departs_evalues += nb
+        return retenu[:nb], total[:nb], distance[:nb], j[:nb] + debut - 1, gauche[1:nb + 1]
+
+    def _detecter(self, points, abscisses, ia, ib_nouveau, decalage, delta):
+        """Table des virages : préfixe conservé, zone recalculée, suffixe recopié"""
+        params = self.params
+        ancienne = self.roadbook.table
+        n = len(points)
+
+        # Virages dont tous les points lus sont avant la modification
+        nb_prefixe = int(np.sum(ancienne["index_fin"] + 1 <= ia))
+        if nb_prefixe:
+            dernier = ancienne[nb_prefixe - 1]
+            i = reprise(int(dernier["index"]), int(dernier["index_fin"]), params)
+        else:
+            i = 1
+
+        # Positions de recherche de l'ancien parcours avant chacun de ses virages
+        anciens_index = ancienne["index"].astype(np.int64)
+        etat_avant = np.concatenate(([1], _reprises(ancienne, params)))
+
+        colonnes = [[] for _ in TYPES_COLONNES]
+        synchro = None
+        debut, fin = i, i
+        retenu = total = distance = j = gauche = np.zeros(0)
+        self.departs_evalues = 0
+
+        while i < n - 1:
+            if i >= fin:
+                debut, fin = i, min(n - 1, max(i, ib_nouveau + 1) + TRANCHE)
+                retenu, total, distance, j, gauche = self._evaluer(points, debut, fin)
+            candidats = np.flatnonzero(retenu[i - debut:])
+            k = i + int(candidats[0]) if len(candidats) else None
+
+            # Resynchronisation : la recherche couvre-t-elle une position de l'ancien parcours ?
+            p = max(i, ib_nouveau + 1)
+            dernier_balaye = k if k is not None else fin - 1
+            if p <= dernier_balaye:
+                p_ancien, fin_ancien = p - decalage, dernier_balaye - decalage
+                t = int(np.searchsorted(anciens_index, p_ancien, side="left"))
+                if max(p_ancien, etat_avant[t]) <= fin_ancien:
+                    synchro = t
+                    break
+
+            if k is None:
+                i = fin
+                continue
+            r = k - debut
+            for colonne, valeur in zip(colonnes, (k, j[r], gauche[r], total[r], distance[r])):
+                colonne.append(valeur)
+            i = reprise(k, int(j[r]), params)
+
+        ids = np.arange(self.prochain_id, self.prochain_id + len(colonnes[0]))
+        self.prochain_id += len(ids)
+        nouvelles = Roadbook.depuis_colonnes(
+            points, params, *(np.asarray(c, dtype=t) for c, t in zip(colonnes, TYPES_COLONNES)), abscisses,
+            ids=ids,
+        ).table
+
+        suffixe = ancienne[synchro:].copy() if synchro is not None else ancienne[:0].copy()
+        for champ in ("index", "index_debut", "index_fin"):
+            suffixe[champ] += decalage
+        suffixe["distance_depart"] += delta
+        return np.concatenate((ancienne[:nb_prefixe], nouvelles, suffixe))
@@ -0,0 +1,240 @@
+"""Index spatial des points d'un itinéraire : grille régulière en mètres.
+
+Les points (lon, lat) sont projetés sur un plan équirectangulaire centré sur
+l'itinéraire puis rangés par cellule carrée ; une requête ne parcourt que les
+cellules voisines au lieu de tout le tableau. Les requêtes le long de
+l'itinéraire (abscisse curviligne) passent par une recherche dichotomique.
+
+    index = IndexSpatial(roadbook.coordinates)
+    k, distance = index.plus_proche(lon, lat)
+    indices, distances = index.proches(lon, lat, 100)
+    abscisse, ecart = index.abscisse(lon, lat)
+    debut, fin = index.entre_abscisses(1000, 2000)  # points[debut:fin]
+"""
+import math
+
+import numpy as np
+
+from rally.geodesie import RAYON_TERRE, longueurs_segments
+
+DECALAGE_CLE = np.int64(1) << 32  # Clé de cellule : ix * DECALAGE_CLE + iy
+ANNEAUX = (1, 2, 4, 8)  # Voisinages successifs (en cellules) des requêtes groupées
+
+
+class IndexSpatial:
+    """Grille de hachage sur les points (lon, lat) d'un itinéraire.
+
+    La projection locale est précise au mètre près sur une étape de rallye,
+    largement assez pour localiser une position ; les distances renvoyées
+    sont mesurées dans ce plan (mètres). Les abscisses curvilignes sont par
+    défaut les longueurs géodésiques cumulées, comme distance_depart dans le
+    roadbook.
+    """
+
+    def __init__(self, coordinates, taille_cellule=50.0, abscisses=None):
+        self.coordinates = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+        if not len(self.coordinates):
+            raise ValueError("Index spatial d'un itinéraire vide")
+        self.taille_cellule = float(taille_cellule)
+        self.origine = self.coordinates.mean(axis=0)
+        self._echelle = np.radians([RAYON_TERRE * np.cos(np.radians(self.origine[1])), RAYON_TERRE])
+        self._lon0, self._lat0 = (float(v) for v in self.origine)
+        self._kx, self._ky = (float(v) for v in self._echelle)
+        self.xy = self.projeter(self.coordinates[:, 0], self.coordinates[:, 1])
+        self._portee = float(np.hypot(self.xy[:, 0], self.xy[:, 1]).max())
+        self._abscisses = None if abscisses is None else np.asarray(abscisses, dtype=np.float64)
+        self._demi_segment = None
+
+        cles = self._cles(*self._cellules(self.xy[:, 0], self.xy[:, 1]))
+        self.ordre = np.argsort(cles, kind="stable")
+        self.cles, debuts = np.unique(cles[self.ordre], return_index=True)
+        self.debuts = np.append(debuts, len(cles))
+        self._ix, self._iy = self._cellules(self.xy[self.ordre[debuts], 0], self.xy[self.ordre[debuts], 1])
+
+    def __len__(self):
+        return len(self.coordinates)
+
+    @property
+    def abscisses(self):
+        """Abscisse curviligne de chaque point (mètres), calculée au premier usage"""
+        if self._abscisses is None:
+            self._abscisses = np.concatenate(([0.0], np.cumsum(longueurs_segments(self.coordinates))))
+        return self._abscisses
+
+    @property
+    def demi_segment(self):
+        """Moitié du plus long segment : un segment à moins de r a un sommet à moins de r + demi_segment"""
+        if self._demi_segment is None:
+            longueurs = np.hypot(*np.diff(self.xy, axis=0).T)
+            self._demi_segment = float(longueurs.max()) / 2 if len(longueurs) else 0.0
+        return self._demi_segment
+
+    def projeter(self, lon, lat):
+        """(lon, lat) en degrés -> (x, y) en mètres dans le plan de l'index"""
+        lon = np.asarray(lon, dtype=np.float64)
+        lat = np.asarray(lat, dtype=np.float64)
+        return np.stack(((lon - self.origine[0]) * self._echelle[0],
+                         (lat - self.origine[1]) * self._echelle[1]), axis=-1)
+
+    def _cellules(self, x, y):
+        return (np.floor(np.asarray(x) / self.taille_cellule).astype(np.int64),
+                np.floor(np.asarray(y) / self.taille_cellule).astype(np.int64))
+
+    @staticmethod
+    def _cles(ix, iy):
+        return ix * DECALAGE_CLE + (iy + (DECALAGE_CLE >> 1))
+
+    def _rangs(self, cles):
+        """Rang de chaque clé parmi les cellules occupées, -1 si la cellule est vide"""
+        rang = np.searchsorted(self.cles, cles)
+        borne = np.minimum(rang, len(self.cles) - 1)
+        return np.where((rang < len(self.cles)) & (self.cles[borne] == cles), borne, -1)
+
+    def _point(self, lon, lat):
+        """Projection d'une seule position, en flottants Python (plus rapide que projeter)"""
+        return (float(lon) - self._lon0) * self._kx, (float(lat) - self._lat0) * self._ky
+
+    def _candidats(self, x, y, rayon):
+        """Indices des points des cellules qui touchent le disque (x, y, rayon)"""
+        c = self.taille_cellule
+        ix0, ix1 = math.floor((x - rayon) / c), math.floor((x + rayon) / c)
+        iy0, iy1 = math.floor((y - rayon) / c), math.floor((y + rayon) / c)
+        if (ix1 - ix0 + 1) * (iy1 - iy0 + 1) > len(self.cles):
+            # Grand rayon : moins de cellules occupées que de cellules dans le carré
+            rang = np.flatnonzero((self._ix >= ix0) & (self._ix <= ix1) & (self._iy >= iy0) & (self._iy <= iy1))
+        else:
+            cles = self._cles(np.arange(ix0, ix1 + 1, dtype=np.int64)[:, None],
+                              np.arange(iy0, iy1 + 1, dtype=np.int64)[None, :])
+            rang = self._rangs(cles.ravel())
+            rang = rang[rang >= 0]
+        if not len(rang):
+            return np.zeros(0, dtype=np.int64)
+        return np.concatenate([self.ordre[self.debuts[r]:self.debuts[r + 1]] for r in rang])
+
+    # === Requêtes ponctuelles ===
+    def proches(self, lon, lat, rayon):
+        """(indices, distances) des points à moins de rayon mètres, triés par indice"""
+        x, y = self._point(lon, lat)
+        candidats = np.sort(self._candidats(x, y, rayon))
+        distances = np.hypot(self.xy[candidats, 0] - x, self.xy[candidats, 1] - y)
+        garde = distances <= rayon
+        return candidats[garde], distances[garde]
+
+    def plus_proche(self, lon, lat, rayon_max=np.inf):
+        """(indice, distance) du point le plus proche, ou None au-delà de rayon_max"""
+        x, y = self._point(lon, lat)
+        etendue = math.hypot(x, y) + self._portee  # Au-delà, tous les points sont dans le disque
+        rayon = self.taille_cellule
+        while True:
+            indices, distances = self.proches(lon, lat, min(rayon, rayon_max))
+            if len(indices):
+                k = int(np.argmin(distances))
+                return int(indices[k]), float(distances[k])
+            if rayon >= rayon_max or rayon > etendue:
+                return None
+            rayon *= 2
+
+    # === Requêtes le long de l'itinéraire ===
+    def segments_proches(self, lon, lat, rayon):
+        """Projection sur les segments à moins de rayon mètres.
+
+        Retourne (segments, t, ecarts, abscisses) : segment k = (k, k + 1),
+        position relative t dans [0, 1], distance au segment et abscisse
+        curviligne du point projeté.
+        """
+        if len(self) < 2:
+            vide = np.zeros(0)
+            return np.zeros(0, dtype=np.int64), vide, vide, vide
+        sommets, _ = self.proches(lon, lat, rayon + self.demi_segment)
+        segments = np.unique(np.clip(np.concatenate((sommets - 1, sommets)), 0, len(self) - 2))
+
+        p = np.array(self._point(lon, lat))
+        a = self.xy[segments]
+        ab = self.xy[segments + 1] - a
+        longueur2 = (ab * ab).sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            t = np.clip(np.where(longueur2 > 0, ((p - a) * ab).sum(axis=1) / longueur2, 0.0), 0.0, 1.0)
+        ecarts = np.hypot(*(a + t[:, None] * ab - p).T)
+        debut = self.abscisses[segments]
+        abscisses = debut + t * (self.abscisses[segments + 1] - debut)
+
+        garde = ecarts <= rayon
+        return segments[garde], t[garde], ecarts[garde], abscisses[garde]
+
+    def abscisse(self, lon, lat, rayon_max=np.inf):
+        """(abscisse, écart) du point de l'itinéraire le plus proche, ou None au-delà de rayon_max"""
+        proche = self.plus_proche(lon, lat, rayon_max)
+        if proche is None:
+            return None
+        if len(self) < 2:
+            return 0.0, proche[1]
+        # Le segment le plus proche est au plus à la distance du sommet le plus proche (marge pour les arrondis
+        # de la projection, qui peut tomber sur ce sommet quelques ulps plus loin)
+        indice, distance = proche
+        _, _, ecarts, abscisses = self.segments_proches(lon, lat, distance * (1 + 1e-9) + 1e-9)
+        if not len(ecarts):
+            return float(self.abscisses[indice]), distance
+        k = int(np.argmin(ecarts))
+        return float(abscisses[k]), float(ecarts[k])
+
+    def entre_abscisses(self, debut, fin):
+        """(i, j) tels que points[i:j] soient les points d'abscisse comprise entre debut et fin"""
+        return (int(np.searchsorted(self.abscisses, debut, side="left")),
+                int(np.searchsorted(self.abscisses, fin, side="right")))
+
+    def point_a(self, abscisse):
+        """(lon, lat) du point de l'itinéraire à une abscisse curviligne donnée"""
+        return (float(np.interp(abscisse, self.abscisses, self.coordinates[:, 0])),
+                float(np.interp(abscisse, self.abscisses, self.coordinates[:, 1])))
+
+    # === Requêtes groupées ===
+    def plus_proches(self, lon, lat):
+        """(indices, distances) du point le plus proche de chaque requête, vectorisé.
+
+        Les cellules à moins de r cellules de chaque requête sont examinées
+        d'un bloc ; une requête dont le meilleur candidat est à moins de
+        r * taille_cellule est résolue (rien de plus proche hors du bloc), les
+        autres recommencent avec r doublé, puis passent par plus_proche.
+        """
+        lon, lat = np.broadcast_arrays(np.ravel(lon), np.ravel(lat))
+        q = self.projeter(lon, lat)
+        indices = np.full(len(q), -1, dtype=np.int64)
+        distances = np.full(len(q), np.inf)
+        restantes = np.arange(len(q))
+        for anneau in ANNEAUX:
+            if not len(restantes):
+                break
+            k, d = self._plus_proches_bloc(q[restantes], anneau)
+            resolues = d <= anneau * self.taille_cellule
+            indices[restantes[resolues]] = k[resolues]
+            distances[restantes[resolues]] = d[resolues]
+            restantes = restantes[~resolues]
+        for r in restantes:
+            indices[r], distances[r] = self.plus_proche(lon[r], lat[r])
+        return indices, distances
+
+    def _plus_proches_bloc(self, q, anneau):
+        """Meilleur point de chaque requête parmi les (2 * anneau + 1)² cellules autour d'elle"""
+        nb = len(q)
+        decalages = np.arange(-anneau, anneau + 1)
+        dx, dy = (d.ravel() for d in np.meshgrid(decalages, decalages, indexing="ij"))
+        ix, iy = self._cellules(q[:, 0], q[:, 1])
+        rang = self._rangs(self._cles((ix[:, None] + dx).ravel(), (iy[:, None] + dy).ravel()))
+        requete = np.repeat(np.arange(nb), len(dx))[rang >= 0]
+        rang = rang[rang >= 0]
+
+        # Tous les points des cellules trouvées, à plat : (requête, point)
+        debut, nombre = self.debuts[rang], self.debuts[rang + 1] - self.debuts[rang]
+        requete = np.repeat(requete, nombre)
+        decalage = np.arange(len(requete)) - np.repeat(np.cumsum(nombre) - nombre, nombre)
+        points = self.ordre[np.repeat(debut, nombre) + decalage]
+        distances = np.hypot(*(self.xy[points] - q[requete]).T)
+
+        # Minimum par requête : tri (requête, distance) puis premier de chaque groupe
+        tri = np.lexsort((distances, requete))
+        premier = tri[np.flatnonzero(np.r_[True, np.diff(requete[tri]) != 0])] if len(tri) else tri
+        indices = np.full(nb, -1, dtype=np.int64)
+        meilleures = np.full(nb, np.inf)
+        indices[requete[premier]] = points[premier]
+        meilleures[requete[premier]] = distances[premier]
+        return indices, meilleures
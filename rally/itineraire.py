@@ -0,0 +1,48 @@
+import os
+
+PROFIL = "driving-car"
+
+
+def creer_client(cle_api=None, hors_ligne=None, osm=None, cache=None):
+    """Client openrouteservice derrière le cache disque des itinéraires.
+
+    La clé est lue dans la variable d'environnement ORS_API_KEY si elle n'est
+    pas fournie. Avec un extrait OpenStreetMap (`osm`, ou variable RALLY_OSM),
+    le routage est calculé localement, sans réseau ni cache. `cache`
+    (CacheItineraires) remplace le cache par défaut.
+    """
+    osm = osm or os.environ.get("RALLY_OSM")
+    if osm:
+        from rally.routage_local import ClientLocal
+
+        return ClientLocal.depuis_osm(osm)
+
+    import openrouteservice
+
+    from rally.cache import HORS_LIGNE, ClientEnCache
+
+    hors_ligne = HORS_LIGNE if hors_ligne is None else hors_ligne
+    cle_api = cle_api or os.environ.get("ORS_API_KEY")
+    client = None
+    if not hors_ligne:
+        if not cle_api:
+            raise ValueError("Clé openrouteservice manquante (variable ORS_API_KEY)")
+        client = openrouteservice.Client(key=cle_api)
+    return ClientEnCache(client, cache, hors_ligne=hors_ligne)
+
+
+def recuperer_route(client, depart, arrivee, etapes=(), profil=PROFIL, points_par_troncon=None):
+    """Route GeoJSON entre deux points (lat, lon), en passant par les étapes.
+
+    Avec des étapes, le parcours est demandé par tronçons en parallèle puis
+    raccordé en une seule géométrie (rally.assemblage).
+    """
+    from rally.assemblage import POINTS_PAR_TRONCON, recuperer_parcours
+
+    return recuperer_parcours(client, [depart, *etapes, arrivee], profil,
+                              points_par_troncon or POINTS_PAR_TRONCON)
+
+
+def coordonnees_route(route):
+    """Géométrie (lon, lat) de la première feature d'une route GeoJSON"""
+    return route['features'][0]['geometry']['coordinates']
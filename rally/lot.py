@@ -0,0 +1,377 @@
+"""Génération des roadbooks de toutes les épreuves spéciales d'un rallye.
+
+Les itinéraires sont téléchargés simultanément par le client de routage
+asynchrone (rally.routage_async : connexions partagées, débit limité en
+requêtes par minute, relances), ou par des threads en nombre borné pour le
+routage local et le cache seul. Chaque étape est rééchantillonnée, analysée
+et rendue dans un pool de processus dès que sa route arrive. L'échec d'une
+étape n'interrompt pas les autres. Avec --mutualiser, les routes communes à
+plusieurs étapes (deuxièmes passages, chevauchements, enchaînements) ne sont
+analysées qu'une fois par processus de calcul (rally.segments), pour les
+mêmes roadbooks.
+
+    python -m rally lot etapes.json --sortie rendu_html/lot
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, field
+from typing import List, Optional, Tuple
+
+from rally.cache import CHEMIN_CACHE, HORS_LIGNE, CacheItineraires
+from rally.itineraire import coordonnees_route, creer_client, recuperer_route
+from rally.presets import PRESET_DEFAUT, PRESETS, ajouter_options_reglage, reglage_depuis
+
+
+@dataclass
+class Etape:
+    nom: str
+    depart: Tuple[float, float]  # (lat, lon)
+    arrivee: Tuple[float, float]
+    etapes: List[Tuple[float, float]] = field(default_factory=list)  # Points de passage
+
+
+@dataclass
+class ResultatEtape:
+    nom: str
+    statut: str = "en attente"
+    erreur: Optional[str] = None
+    telechargement: float = 0.0  # Secondes
+    analyse: float = 0.0
+    rendu: float = 0.0
+    nb_points: int = 0
+    nb_virages: int = 0
+    troncons: int = 0  # Avec mutualisation : tronçons de l'étape, dont repris du magasin du processus
+    troncons_reutilises: int = 0
+    economie: float = 0.0  # Secondes de calcul évitées
+    roadbook: Optional[str] = None
+    binaire: Optional[str] = None  # Roadbook .rbk, relu par les exports du lot
+    carte: Optional[str] = None
+
+
+def _point(texte):
+    lat, lon = (float(x) for x in texte.replace(",", " ").split())
+    return lat, lon
+
+
+def enchainer(nom, etapes):
+    """Étape unique parcourant les étapes à la suite (liaisons comprises), points communs fusionnés"""
+    points = []
+    for etape in etapes:
+        for p in (etape.depart, *etape.etapes, etape.arrivee):
+            if not points or tuple(p) != tuple(points[-1]):
+                points.append(tuple(p))
+    return Etape(nom=nom, depart=points[0], arrivee=points[-1], etapes=points[1:-1])
+
+
+def verifier_noms(etapes):
+    """ValueError si deux étapes ont le même nom ou le même nom de fichier (résultats et fichiers écrasés)"""
+    vus = {}
+    for etape in etapes:
+        fichier = nom_fichier(etape.nom)
+        if fichier in vus:
+            raise ValueError(f"Étapes {vus[fichier]!r} et {etape.nom!r} : même fichier de sortie {fichier!r}, "
+                             "les noms doivent être distincts")
+        vus[fichier] = etape.nom
+
+
+def _resoudre(etapes, enchainements):
+    """Ajoute les étapes enchaînées [(nom, [noms des étapes])] à la suite des étapes simples"""
+    par_nom = {etape.nom: etape for etape in etapes}
+    for nom, noms in enchainements:
+        inconnues = [n for n in noms if n not in par_nom]
+        if inconnues:
+            raise ValueError(f"Enchaînement {nom!r} : étape(s) inconnue(s) {', '.join(inconnues)}")
+        etapes.append(enchainer(nom, [par_nom[n] for n in noms]))
+    verifier_noms(etapes)
+    return etapes
+
+
+def lire_etapes(chemin):
+    """Lit un fichier JSON ou CSV de définitions d'étapes (coordonnées en (lat, lon)).
+
+    JSON : liste de {"nom", "depart": [lat, lon], "arrivee": [lat, lon],
+    "etapes": [[lat, lon], ...]}, ou {"nom", "enchainement": [noms]} pour un
+    roadbook continu couvrant plusieurs étapes à la suite.
+    CSV : colonnes nom, depart_lat, depart_lon, arrivee_lat, arrivee_lon et
+    optionnellement etapes sous la forme "lat lon; lat lon", ou enchainement
+    sous la forme "nom; nom". Les noms doivent être distincts (ValueError).
+    """
+    etapes, enchainements = [], []
+    if chemin.lower().endswith(".csv"):
+        with open(chemin, newline="", encoding="utf-8") as f:
+            for ligne in csv.DictReader(f):
+                if (ligne.get("enchainement") or "").strip():
+                    enchainements.append((ligne["nom"], [n.strip() for n in ligne["enchainement"].split(";")
+                                                         if n.strip()]))
+                    continue
+                passages = [_point(p) for p in (ligne.get("etapes") or "").split(";") if p.strip()]
+                etapes.append(Etape(
+                    nom=ligne["nom"],
+                    depart=(float(ligne["depart_lat"]), float(ligne["depart_lon"])),
+                    arrivee=(float(ligne["arrivee_lat"]), float(ligne["arrivee_lon"])),
+                    etapes=passages,
+                ))
+        return _resoudre(etapes, enchainements)
+
+    with open(chemin, encoding="utf-8") as f:
+        donnees = json.load(f)
+    if isinstance(donnees, dict):
+        donnees = donnees["etapes"]
+    for d in donnees:
+        if "enchainement" in d:
+            enchainements.append((d["nom"], list(d["enchainement"])))
+            continue
+        etapes.append(Etape(
+            nom=d["nom"],
+            depart=tuple(d["depart"]),
+            arrivee=tuple(d["arrivee"]),
+            etapes=[tuple(p) for p in d.get("etapes", [])],
+        ))
+    return _resoudre(etapes, enchainements)
+
+
+def nom_fichier(nom):
+    return re.sub(r"[^\w.-]+", "_", nom).strip("_") or "etape"
+
+
+def traiter_etape(etape, route, dossier, reglage=PRESETS[PRESET_DEFAUT], mnt=None, mutualiser=False):
+    """Rééchantillonne, détecte les virages et écrit roadbook + carte (processus de calcul).
+
+    Avec `mnt` (dossier de dalles SRTM / GeoTIFF), le relief est ajouté ; les
+    dalles restent ouvertes d'une étape à l'autre dans le processus. Avec
+    `mutualiser`, les tronçons déjà analysés dans le processus sont repris.
+    """
+    from rally.rendu import ecrire_carte
+
+    debut = time.perf_counter()
+    mutualisation = {}
+    if mutualiser:
+        from rally.segments import magasin_partage
+
+        magasin = magasin_partage(reglage)
+        avant = magasin.nb_troncons, magasin.troncons_reutilises, magasin.economie
+        roadbook = magasin.analyser(coordonnees_route(route))
+        mutualisation = {"troncons": magasin.nb_troncons - avant[0],
+                         "troncons_reutilises": magasin.troncons_reutilises - avant[1],
+                         "economie": magasin.economie - avant[2]}
+    else:
+        roadbook = reglage.analyser(coordonnees_route(route))
+    if mnt:
+        from rally.altitude import annoter_relief, modele_partage
+
+        annoter_relief(roadbook, modele_partage(mnt))
+    analyse = time.perf_counter() - debut
+
+    base = os.path.join(dossier, nom_fichier(etape.nom))
+    with open(base + "_roadbook.json", "w", encoding="utf-8") as f:
+        json.dump(
+            [{"lat": lat, "lon": lon, "note": note, "angle": angle} for lat, lon, note, angle in roadbook.notes()],
+            f, ensure_ascii=False, indent=1,
+        )
+    roadbook.ecrire(base + "_roadbook.rbk")
+
+    debut = time.perf_counter()
+    ecrire_carte(base + "_carte.html", route, roadbook, etape.depart, etape.arrivee)
+    rendu = time.perf_counter() - debut
+
+    return {
+        "analyse": analyse,
+        "rendu": rendu,
+        "nb_points": len(roadbook.coordinates),
+        "nb_virages": len(roadbook),
+        "roadbook": base + "_roadbook.json",
+        "binaire": base + "_roadbook.rbk",
+        "carte": base + "_carte.html",
+        **mutualisation,
+    }
+
+
+def _telecharger(client, etape, points_par_troncon=None):
+    debut = time.perf_counter()
+    route = recuperer_route(client, etape.depart, etape.arrivee, etape.etapes, points_par_troncon=points_par_troncon)
+    return route, time.perf_counter() - debut
+
+
+async def _telecharger_async(client, etapes, points_par_troncon, arrivee):
+    """Routes de toutes les étapes par le ClientRoutageAsync, arrivee(etape, route, duree, erreur) à chacune"""
+    from rally.assemblage import POINTS_PAR_TRONCON
+
+    async def une(etape):
+        debut = time.perf_counter()
+        try:
+            route = await client.parcours([etape.depart, *etape.etapes, etape.arrivee],
+                                          points_par_troncon=points_par_troncon or POINTS_PAR_TRONCON)
+        except Exception as exc:
+            arrivee(etape, None, time.perf_counter() - debut, exc)
+        else:
+            arrivee(etape, route, time.perf_counter() - debut, None)
+
+    async with client:
+        await asyncio.gather(*(une(etape) for etape in etapes))
+
+
+def generer_lot(etapes, client, dossier, reglage=PRESETS[PRESET_DEFAUT], telechargements=4, processus=None,
+                mnt=None, points_par_troncon=None, mutualiser=False):
+    """Traite toutes les étapes et retourne un ResultatEtape par étape, dans l'ordre.
+
+    `client` est un ClientRoutageAsync (étapes et tronçons demandés ensemble,
+    au débit du client), ou un client bloquant (creer_client) appelé depuis
+    `telechargements` threads.
+    """
+    from rally.routage_async import ClientRoutageAsync
+
+    verifier_noms(etapes)
+    os.makedirs(dossier, exist_ok=True)
+    resultats = {etape.nom: ResultatEtape(nom=etape.nom) for etape in etapes}
+
+    with ProcessPoolExecutor(max_workers=processus) as calcul:
+        futurs_calcul = {}
+
+        # Le calcul d'une étape démarre dès que sa route est arrivée
+        def arrivee(etape, route, duree, erreur):
+            resultat = resultats[etape.nom]
+            resultat.telechargement = duree
+            if erreur is not None:
+                resultat.statut, resultat.erreur = "échec", f"téléchargement : {erreur}"
+                return
+            futurs_calcul[calcul.submit(traiter_etape, etape, route, dossier, reglage, mnt, mutualiser)] = etape
+
+        if isinstance(client, ClientRoutageAsync):
+            asyncio.run(_telecharger_async(client, etapes, points_par_troncon, arrivee))
+        else:
+            with ThreadPoolExecutor(max_workers=telechargements) as reseau:
+                futurs_reseau = {reseau.submit(_telecharger, client, etape, points_par_troncon): etape
+                                 for etape in etapes}
+                for futur in as_completed(futurs_reseau):
+                    try:
+                        route, duree = futur.result()
+                    except Exception as exc:
+                        arrivee(futurs_reseau[futur], None, 0.0, exc)
+                    else:
+                        arrivee(futurs_reseau[futur], route, duree, None)
+
+        for futur in as_completed(futurs_calcul):
+            resultat = resultats[futurs_calcul[futur].nom]
+            try:
+                for cle, valeur in futur.result().items():
+                    setattr(resultat, cle, valeur)
+                resultat.statut = "ok"
+            except Exception as exc:
+                resultat.statut, resultat.erreur = "échec", f"analyse : {exc}"
+
+    return [resultats[etape.nom] for etape in etapes]
+
+
+def exporter_lot(resultats, chemins):
+    """Exporte les étapes réussies, dans l'ordre, vers chaque chemin (format selon l'extension).
+
+    Les roadbooks sont relus un à un depuis leur .rbk (mémoire projetée) :
+    un seul est chargé à la fois, quel que soit le nombre d'étapes.
+    """
+    from rally.export import exporter
+    from rally.roadbook import Roadbook
+
+    for chemin in chemins:
+        exporter(chemin, ((r.nom, Roadbook.charger(r.binaire)) for r in resultats if r.statut == "ok"))
+
+
+def carte_lot(resultats, dossier):
+    """Carte à niveaux de détail de toutes les étapes réussies, relues une à une depuis leur .rbk"""
+    from rally.roadbook import Roadbook
+    from rally.tuiles import ecrire_carte_tuiles
+
+    return ecrire_carte_tuiles(dossier, ((r.nom, Roadbook.charger(r.binaire)) for r in resultats if r.statut == "ok"))
+
+
+def afficher_resume(resultats):
+    print(f"\n{'étape':<20} {'statut':<7} {'réseau':>8} {'analyse':>8} {'rendu':>8} {'points':>7} {'virages':>7}")
+    for r in resultats:
+        print(f"{r.nom[:20]:<20} {r.statut:<7} {r.telechargement:>7.2f}s {r.analyse:>7.2f}s "
+              f"{r.rendu:>7.2f}s {r.nb_points:>7} {r.nb_virages:>7}")
+        if r.erreur:
+            print(f"    ⚠ {r.erreur}")
+    troncons = sum(r.troncons for r in resultats)
+    if troncons:
+        reutilises = sum(r.troncons_reutilises for r in resultats)
+        print(f"\n♻ Routes communes : {reutilises}/{troncons} tronçons réutilisés ({reutilises / troncons:.0%}), "
+              f"{sum(r.economie for r in resultats) * 1000:.0f} ms de calcul évités")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Roadbooks de toutes les étapes d'un rallye")
+    parser.add_argument("fichier", help="Définitions des étapes (JSON ou CSV)")
+    parser.add_argument("--sortie", default="rendu_html/lot")
+    ajouter_options_reglage(parser)
+    parser.add_argument("--mutualiser", action="store_true",
+                        help="Analyse une seule fois les routes communes à plusieurs étapes (note à l'angle)")
+    parser.add_argument("--telechargements", type=int, default=4, help="Requêtes réseau simultanées")
+    parser.add_argument("--url-routage", default=None,
+                        help="Serveur de routage compatible openrouteservice (défaut : api.openrouteservice.org)")
+    parser.add_argument("--requetes-par-minute", type=int, default=None,
+                        help="Débit maximal vers le routage (0 : illimité ; défaut : quota openrouteservice)")
+    parser.add_argument("--cache", default=None, help="Cache disque des itinéraires (SQLite)")
+    parser.add_argument("--points-par-troncon", type=int, default=None,
+                        help="Points par requête de routage (défaut 2 : un tronçon par paire, en parallèle)")
+    parser.add_argument("--processus", type=int, default=None, help="Processus de calcul")
+    parser.add_argument("--hors-ligne", action="store_true", help="Uniquement le cache des itinéraires")
+    parser.add_argument("--cle-api", default=None)
+    parser.add_argument("--osm", default=None, help="Extrait OpenStreetMap (.osm, .osm.pbf) : routage local")
+    parser.add_argument("--mnt", default=None, help="Dossier de dalles SRTM (.hgt) ou GeoTIFF : bosses et creux")
+    parser.add_argument("--export", default="",
+                        help="Formats exportés pour tout le rallye dans la sortie, ex. gpx,csv,json,pdf")
+    parser.add_argument("--carte-tuiles", action="store_true",
+                        help="Carte à niveaux de détail de tout le rallye dans <sortie>/carte")
+    args = parser.parse_args(argv)
+
+    try:
+        etapes = lire_etapes(args.fichier)  # Noms en double, enchaînement inconnu : ValueError
+    except (OSError, ValueError) as exc:
+        parser.error(f"{args.fichier} : {exc}")
+    reglage = reglage_depuis(args)
+    if args.mutualiser and reglage.rayons is not None:
+        parser.error("--mutualiser est incompatible avec --gravite rayon")
+    cache = CacheItineraires(args.cache or CHEMIN_CACHE)
+    if args.osm or os.environ.get("RALLY_OSM") or args.hors_ligne or HORS_LIGNE:
+        # Client bloquant : graphe local ou cache seul
+        client = creer_client(args.cle_api, hors_ligne=args.hors_ligne or None, osm=args.osm, cache=cache)
+    else:
+        from rally.routage_async import REQUETES_PAR_MINUTE, URL_ORS, ClientRoutageAsync
+
+        cle_api = args.cle_api or os.environ.get("ORS_API_KEY")
+        if not cle_api and args.url_routage is None:
+            parser.error("Clé openrouteservice manquante (variable ORS_API_KEY), ou --url-routage")
+        par_minute = REQUETES_PAR_MINUTE if args.requetes_par_minute is None else args.requetes_par_minute
+        client = ClientRoutageAsync(cle_api, url_base=args.url_routage or URL_ORS, requetes_par_minute=par_minute,
+                                    connexions=args.telechargements, cache=cache)
+    debut = time.perf_counter()
+    resultats = generer_lot(etapes, client, args.sortie, reglage,
+                            telechargements=args.telechargements, processus=args.processus, mnt=args.mnt,
+                            points_par_troncon=args.points_par_troncon, mutualiser=args.mutualiser)
+    duree = time.perf_counter() - debut
+
+    afficher_resume(resultats)
+    if args.export:
+        debut_export = time.perf_counter()
+        chemins = [os.path.join(args.sortie, f"rallye.{f.strip().lstrip('.')}") for f in args.export.split(",")]
+        exporter_lot(resultats, chemins)
+        print(f"📄 Export : {', '.join(chemins)} en {time.perf_counter() - debut_export:.1f}s")
+    if args.carte_tuiles:
+        debut_carte = time.perf_counter()
+        nb_tuiles = carte_lot(resultats, os.path.join(args.sortie, "carte"))
+        print(f"🗺 Carte : {os.path.join(args.sortie, 'carte', 'index.html')}, {nb_tuiles} tuiles "
+              f"en {time.perf_counter() - debut_carte:.1f}s")
+    with open(os.path.join(args.sortie, "resume.json"), "w", encoding="utf-8") as f:
+        json.dump({"duree": duree, "etapes": [asdict(r) for r in resultats]}, f, ensure_ascii=False, indent=1)
+    nb_ok = sum(r.statut == "ok" for r in resultats)
+    print(f"\n✅ {nb_ok}/{len(resultats)} étapes traitées en {duree:.1f}s")
+    return 0 if nb_ok == len(resultats) else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
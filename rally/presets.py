@@ -0,0 +1,127 @@
+from dataclasses import dataclass, replace
+from typing import Optional
+
+from rally.profilage import compter, etape
+from rally.rayons import ParametresRayon, detecter_virages_rayon
+from rally.reechantillonnage import interpoler_ancres
+from rally.simplification import METHODES, ParametresSimplification, simplifier
+from rally.virages import ParametresVirage, detecter_virages, mesurer_longueurs
+
+
+@dataclass(frozen=True)
+class Reglage:
+    """Pas de rééchantillonnage (mètres) et seuils de détection des virages.
+
+    Le pas est ajusté entre des sommets ancres (interpoler_ancres) : une route
+    commune à plusieurs étapes y reçoit les mêmes points et les mêmes virages,
+    et n'est analysée qu'une fois par rally.segments. Avec `rayons`, les
+    virages et leur note viennent du rayon ajusté (rally.rayons) plutôt que de
+    l'angle cumulé. Avec `simplification`, la géométrie brute est d'abord
+    simplifiée (rally.simplification).
+    """
+    distance: float
+    virages: ParametresVirage
+    rayons: Optional[ParametresRayon] = None
+    simplification: Optional[ParametresSimplification] = None
+
+    def analyser(self, coordinates):
+        """Roadbook d'une géométrie brute (lon, lat) : rééchantillonnage puis détection"""
+        compter("points_bruts", len(coordinates))
+        if self.simplification is not None:
+            with etape("simplification"):
+                coordinates = simplifier(coordinates, self.simplification)
+            compter("points_simplifies", len(coordinates))
+        if self.rayons is not None:
+            with etape("virages (rayon)"):
+                roadbook = detecter_virages_rayon(coordinates, self.distance, self.virages, self.rayons)
+        else:
+            with etape("reechantillonnage"):
+                points = interpoler_ancres(coordinates, self.distance, mesurer_longueurs(coordinates, self.virages))
+            with etape("virages"):
+                roadbook = detecter_virages(points, self.virages)
+        compter("points_reechantillonnes", len(roadbook.coordinates))
+        compter("virages", len(roadbook))
+        return roadbook
+
+
+# === Seuils historiques des trois scripts ===
+PRESETS = {
+    # phase1.py : longue étape Évreux → Rambouillet, une note par virage
+    "phase1": Reglage(
+        distance=20,
+        virages=ParametresVirage(
+            seuil_angle_depart=0,
+            seuil_angle_coupure=0,
+            seuil_angle_total=20,
+            distance_max_virage=None,
+            ratio_min=None,
+            tolerance_correction=None,
+            chevauchement=False,
+            bornes_notes=(30, 60, 90, 120, 150),
+            marqueurs="sommet",
+        ),
+    ),
+    # phase1_2.py : boucle courte, seuils bas et notes début / fin
+    "phase1_2": Reglage(
+        distance=50,
+        virages=ParametresVirage(
+            seuil_angle_depart=5,  # Seuil très bas pour le filtrage initial
+            seuil_angle_min=10,  # Réduit pour détecter plus de virages
+            seuil_angle_coupure=10,  # Seuil très bas pour ne pas rater les petits changements
+            seuil_angle_total=20,  # Réduit pour détecter plus de virages
+            distance_max_virage=150,
+            ratio_min=1,  # Réduit de 2 à 1 pour être moins strict
+            tolerance_correction=10,  # Petite correction de direction comptée à 70 %
+            poids_correction=0.7,
+            chevauchement=True,  # Éviter de rater les virages suivants
+            bornes_notes=(45, 75, 105, 135, 165),
+        ),
+    ),
+    # test.py : virages courts (75 m max) et ratio angle / distance plus strict
+    "test": Reglage(
+        distance=25,
+        virages=ParametresVirage(
+            seuil_angle_depart=10,  # Filtrer dès le départ les petits angles
+            seuil_angle_min=10,
+            seuil_angle_coupure=10,
+            seuil_angle_total=15,
+            distance_max_virage=75,
+            ratio_min=2,  # Moins de 2° par 10 m : probablement une ligne droite
+            tolerance_correction=None,
+            chevauchement=False,
+            bornes_notes=(45, 75, 105, 135, 165),
+            couleurs=("lightgreen", "green", "orange", "red", "darkred", "purple"),
+        ),
+    ),
+}
+PRESET_DEFAUT = "phase1_2"
+
+
+def ajouter_options_reglage(parser):
+    """Options du réglage communes aux commandes roadbook et lot (voir reglage_depuis)"""
+    parser.add_argument("--preset", choices=sorted(PRESETS), default=PRESET_DEFAUT, help="Jeu de seuils")
+    parser.add_argument("--distance", type=float, default=None, help="Pas de rééchantillonnage (m)")
+    parser.add_argument("--gravite", choices=("angle", "rayon"), default="angle",
+                        help="Note à l'angle cumulé ou au rayon ajusté (indépendante du pas)")
+    parser.add_argument("--repere-metrique", action="store_true",
+                        help="Angles et longueurs dans un repère local en mètres plutôt qu'en degrés")
+    parser.add_argument("--simplifier", type=float, default=None, metavar="TOLERANCE",
+                        help="Simplifie la géométrie brute à TOLERANCE mètres près avant le rééchantillonnage")
+    parser.add_argument("--methode-simplification", choices=METHODES, default="rdp")
+    parser.add_argument("--lissage", type=float, default=None, metavar="PAS",
+                        help="Avec --simplifier : spline de Catmull-Rom échantillonnée tous les PAS mètres")
+
+
+def reglage_depuis(args):
+    """Reglage des options lues par un parser passé à ajouter_options_reglage"""
+    reglage = PRESETS[args.preset]
+    if args.distance is not None:
+        reglage = replace(reglage, distance=args.distance)
+    if args.gravite == "rayon":
+        reglage = replace(reglage, rayons=ParametresRayon())
+    if args.repere_metrique:
+        reglage = replace(reglage, virages=replace(reglage.virages, repere_metrique=True))
+    if args.simplifier is not None:
+        reglage = replace(reglage, simplification=ParametresSimplification(
+            args.simplifier, args.methode_simplification, args.lissage))
+    return reglage
@@ -0,0 +1,160 @@
+"""Instrumentation du calcul d'un roadbook : durée et mémoire par étape, compteurs, profil.
+
+Désactivée par défaut : etape() rend alors un gestionnaire de contexte vide
+partagé et compter() ne fait qu'un test, si bien que les appels laissés dans
+le code ne coûtent presque rien. Un Profilage actif (bloc with) relève pour
+chaque étape la durée et le pic de mémoire allouée (tracemalloc), et en
+option un profil cProfile de tout le bloc :
+
+    with Profilage(cprofile=True) as profil:
+        with etape("routage"):
+            route = recuperer_route(...)
+        compter("virages", len(roadbook))
+    profil.ecrire("rendu_html/carte.rapport.json")
+"""
+import cProfile
+import io
+import json
+import platform
+import pstats
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager, nullcontext
+from datetime import datetime, timezone
+
+_ACTIF = None  # Profilage en cours, None : instrumentation désactivée
+_VIDE = nullcontext()
+NB_FONCTIONS = 30  # Fonctions du profil cProfile reprises dans le rapport
+
+
+def etape(nom):
+    """Contexte mesurant une étape du calcul (vide si aucun Profilage n'est actif)"""
+    if _ACTIF is None:
+        return _VIDE
+    return _ACTIF.etape(nom)
+
+
+def compter(nom, valeur=1):
+    """Ajoute `valeur` au compteur `nom` du Profilage actif"""
+    if _ACTIF is not None:
+        _ACTIF.compteurs[nom] = _ACTIF.compteurs.get(nom, 0) + valeur
+
+
+class Profilage:
+    """Mesures d'un calcul, actives le temps d'un bloc with.
+
+    Les étapes imbriquées sont nommées "parent/enfant" ; une étape appelée
+    plusieurs fois cumule sa durée et garde son plus grand pic de mémoire.
+    """
+
+    def __init__(self, memoire=True, cprofile=False):
+        self.memoire = memoire
+        self.cprofile = cProfile.Profile() if cprofile else None
+        self.etapes = {}
+        self.compteurs = {}
+        self.duree = 0.0
+        self.pic_memoire = 0
+        self._pile = []
+        self._pic = 0  # Pic du bloc hors étape en cours, perdu à chaque remise à zéro
+        self._precedent = None
+        self._tracemalloc = False
+
+    def __enter__(self):
+        global _ACTIF
+        self._precedent, _ACTIF = _ACTIF, self
+        if self.memoire and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracemalloc = True
+        self._debut = time.perf_counter()
+        if self.cprofile is not None:
+            self.cprofile.enable()
+        return self
+
+    def __exit__(self, *exc):
+        global _ACTIF
+        if self.cprofile is not None:
+            self.cprofile.disable()
+        self.duree = time.perf_counter() - self._debut
+        if self.memoire:
+            self.pic_memoire = max(tracemalloc.get_traced_memory()[1], self._pic)
+        if self._tracemalloc:
+            tracemalloc.stop()
+        _ACTIF = self._precedent
+        return False
+
+    @contextmanager
+    def etape(self, nom):
+        nom = "/".join([*(e["nom"] for e in self._pile), nom])
+        courante = {"nom": nom, "pic": 0}
+        if self.memoire:
+            avant, pic_parent = tracemalloc.get_traced_memory()
+            self._remonter(pic_parent)  # Pic du parent atteint avant cette étape, que reset_peak efface
+            tracemalloc.reset_peak()
+        self._pile.append(courante)
+        debut = time.perf_counter()
+        try:
+            yield
+        finally:
+            duree = time.perf_counter() - debut
+            self._pile.pop()
+            mesure = self.etapes.setdefault(nom, {"duree": 0.0, "appels": 0, "memoire_pic": 0})
+            mesure["duree"] += duree
+            mesure["appels"] += 1
+            if self.memoire:
+                # Le pic des étapes enfants (remis à zéro à leur entrée) remonte au parent
+                pic = max(tracemalloc.get_traced_memory()[1], courante["pic"])
+                mesure["memoire_pic"] = max(mesure["memoire_pic"], pic - avant)
+                self._remonter(pic)
+
+    def _remonter(self, pic):
+        """Reporte un pic de mémoire à l'étape englobante, ou au bloc entier hors de toute étape"""
+        if self._pile:
+            self._pile[-1]["pic"] = max(self._pile[-1]["pic"], pic)
+        else:
+            self._pic = max(self._pic, pic)
+
+    def fonctions(self, nb=NB_FONCTIONS):
+        """Fonctions les plus coûteuses (temps cumulé) du profil cProfile"""
+        if self.cprofile is None:
+            return []
+        stats = pstats.Stats(self.cprofile, stream=io.StringIO())
+        lignes = []
+        for (fichier, ligne, fonction), (_, appels, propre, cumule, _) in stats.stats.items():
+            lignes.append({"fonction": f"{fichier}:{ligne}({fonction})", "appels": appels,
+                           "temps_propre": propre, "temps_cumule": cumule})
+        lignes.sort(key=lambda l: l["temps_cumule"], reverse=True)
+        return lignes[:nb]
+
+    def rapport(self, **contexte):
+        """Rapport JSON-sérialisable : contexte du lancement, étapes, compteurs, profil"""
+        rapport = {
+            "date": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": sys.version.split()[0],
+            "plateforme": platform.platform(),
+            **contexte,
+            "duree": self.duree,
+            "etapes": self.etapes,
+            "compteurs": self.compteurs,
+        }
+        if self.memoire:
+            rapport["memoire_pic"] = self.pic_memoire
+        if self.cprofile is not None:
+            rapport["fonctions"] = self.fonctions()
+        return rapport
+
+    def ecrire(self, chemin, **contexte):
+        with open(chemin, "w", encoding="utf-8") as f:
+            json.dump(self.rapport(**contexte), f, ensure_ascii=False, indent=1)
+
+    def ecrire_profil(self, chemin):
+        """Profil cProfile brut (lisible par pstats, snakeviz...)"""
+        self.cprofile.dump_stats(chemin)
+
+    def resume(self):
+        """Texte : une ligne par étape, durée et pic de mémoire"""
+        lignes = [f"{nom:<28} {m['duree'] * 1000:9.1f} ms  {m['memoire_pic'] / 1e6:7.1f} Mo"
+                  + (f"  ({m['appels']} appels)" if m["appels"] > 1 else "")
+                  for nom, m in self.etapes.items()]
+        lignes.append(f"{'total':<28} {self.duree * 1000:9.1f} ms")
+        return "\n".join(lignes)
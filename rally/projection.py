@@ -0,0 +1,111 @@
+"""Repère métrique local : l'itinéraire converti une fois en mètres.
+
+Les angles calculés directement sur (lon, lat) en degrés sont faussés : à
+49° N, un degré de longitude ne fait que 0,66 degré de latitude. Ici, tout
+l'itinéraire est projeté en un seul tableau contigu, et les vecteurs des
+segments sont mis à l'échelle de l'ellipsoïde WGS84 au milieu de chaque
+segment (plan tangent local). Longueurs et caps ne sont alors plus que des
+opérations vectorielles simples.
+
+Précision des longueurs par rapport à la géodésique (Vincenty), mesurée
+entre 40° et 60° de latitude : erreur relative inférieure à
+1e-8 + (s / a)² / 6 pour un segment de longueur s (a : demi-grand axe).
+Cela fait moins de 1e-8 sous 1 km et 4e-7 à 10 km. L'erreur ne dépend pas de
+la longueur de l'étape, car chaque segment a sa propre échelle. Les segments
+trop longs pour la tolérance demandée sont recalculés par la géodésique exacte.
+"""
+import numpy as np
+
+from rally.geodesie import WGS84_A, WGS84_F, distances_vincenty
+
+EXCENTRICITE2 = WGS84_F * (2 - WGS84_F)
+TOLERANCE = 1e-6  # Erreur relative admise sur la longueur d'un segment
+
+
+def rayons_principaux(lat):
+    """Rayons de courbure méridien M et du premier vertical N (mètres) à la latitude (degrés)"""
+    sinus = np.sin(np.radians(lat))
+    w2 = 1 - EXCENTRICITE2 * sinus * sinus
+    return WGS84_A * (1 - EXCENTRICITE2) / (w2 * np.sqrt(w2)), WGS84_A / np.sqrt(w2)
+
+
+def erreur_segment(longueur):
+    """Borne de l'erreur relative d'une longueur de segment calculée dans le plan tangent local"""
+    return 1e-8 + (np.asarray(longueur) / WGS84_A) ** 2 / 6
+
+
+class ProjectionLocale:
+    """Équirectangulaire centrée sur (lon0, lat0), échelles de l'ellipsoïde à la latitude d'origine.
+
+    Adaptée aux positions (index, ajustements locaux) : l'écart d'échelle
+    croît avec l'éloignement en latitude, d'environ tan(lat0) · Δlat
+    (0,2 % à 10 km au nord ou au sud d'une origine à 49° N).
+    """
+
+    def __init__(self, lon0, lat0):
+        self.lon0, self.lat0 = float(lon0), float(lat0)
+        m, n = rayons_principaux(self.lat0)
+        self.echelle = np.radians([n * np.cos(np.radians(self.lat0)), m])  # Mètres par degré
+
+    @classmethod
+    def centree(cls, coordinates):
+        """Projection centrée sur l'emprise de l'itinéraire (lon, lat)"""
+        pts = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+        if not len(pts):
+            return cls(0.0, 0.0)
+        return cls(*(pts.min(axis=0) + pts.max(axis=0)) / 2)
+
+    def projeter(self, coordinates):
+        """Tableau contigu (N, 2) des positions (x, y) en mètres"""
+        pts = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+        return np.ascontiguousarray((pts - (self.lon0, self.lat0)) * self.echelle)
+
+    def deprojeter(self, xy):
+        """Positions (lon, lat) de points (x, y) en mètres"""
+        return np.asarray(xy, dtype=np.float64) / self.echelle + (self.lon0, self.lat0)
+
+    def ecart_echelle(self, lat):
+        """Écart relatif d'échelle de la projection à la latitude donnée (degrés), le plus grand des deux axes"""
+        m, n = rayons_principaux(lat)
+        est = np.radians(n * np.cos(np.radians(lat))) / self.echelle[0]
+        nord = np.radians(m) / self.echelle[1]
+        return np.maximum(np.abs(est - 1), np.abs(nord - 1))
+
+
+class TraceMetrique:
+    """Itinéraire (lon, lat) projeté une fois pour toutes.
+
+    `xy` : positions dans la projection locale centrée ; `vecteurs` : vecteur
+    (est, nord) en mètres de chaque segment dans son plan tangent, dont on
+    tire `longueurs` et les caps. Les segments dont la borne d'erreur dépasse
+    `tolerance` ont leur longueur calculée par Vincenty (`nb_exacts`).
+    """
+    __slots__ = ("coordinates", "projection", "xy", "vecteurs", "longueurs", "nb_exacts")
+
+    def __init__(self, coordinates, tolerance=TOLERANCE):
+        pts = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+        self.coordinates = pts
+        self.projection = ProjectionLocale.centree(pts)
+        self.xy = self.projection.projeter(pts)
+
+        milieu = (pts[:-1, 1] + pts[1:, 1]) / 2
+        m, n = rayons_principaux(milieu)
+        delta = np.radians(np.diff(pts, axis=0))
+        self.vecteurs = np.empty((len(delta), 2))
+        self.vecteurs[:, 0] = delta[:, 0] * n * np.cos(np.radians(milieu))
+        self.vecteurs[:, 1] = delta[:, 1] * m
+        self.longueurs = np.hypot(self.vecteurs[:, 0], self.vecteurs[:, 1])
+
+        longs = np.flatnonzero(erreur_segment(self.longueurs) > tolerance)
+        self.nb_exacts = len(longs)
+        if len(longs):
+            self.longueurs[longs] = distances_vincenty(pts[longs, 0], pts[longs, 1],
+                                                       pts[longs + 1, 0], pts[longs + 1, 1], par_couple=True)
+
+    def __len__(self):
+        return len(self.coordinates)
+
+    @property
+    def abscisses(self):
+        """Distance cumulée depuis le premier point (mètres)"""
+        return np.concatenate(([0.0], np.cumsum(self.longueurs)))
@@ -0,0 +1,164 @@
+"""Gravité des virages d'après leur rayon, indépendante du pas de rééchantillonnage.
+
+La note historique additionne les angles entre segments successifs : le même
+virage n'a pas la même note à 20 m (phase1.py), 25 m (test.py) ou 50 m
+(phase1_2.py). Ici, un cercle est ajusté par moindres carrés sur les points
+de chaque fenêtre glissante de longueur fixe (mètres), pour tout
+l'itinéraire en une fois. Un virage est une plage de points de rayon
+inférieur à rayon_max dans le même sens ; sa note vient de la vitesse de
+passage à la corde, déduite du plus petit rayon :
+
+    reglage = replace(PRESETS["phase1_2"], rayons=ParametresRayon())
+    roadbook = reglage.analyser(coordonnees_lon_lat)
+"""
+from dataclasses import dataclass
+from typing import Tuple
+
+import numpy as np
+
+from rally.geodesie import abscisses_curvilignes, longueurs_segments
+from rally.projection import ProjectionLocale
+from rally.reechantillonnage import interpoler_points, pas_reguliers
+from rally.roadbook import Roadbook
+
+
+@dataclass(frozen=True)
+class ParametresRayon:
+    """Ajustement des cercles (mètres) et barème des notes (vitesse à la corde)"""
+    pas: float = 5  # Pas du tracé sur lequel les rayons sont mesurés
+    fenetre: float = 40  # Longueur d'itinéraire couverte par chaque cercle ajusté
+    rayon_max: float = 300  # Au-delà : ligne droite
+    angle_min: float = 20  # Changement de cap minimal pour retenir le virage (degrés)
+    acceleration: float = 7.0  # Accélération latérale admise (m/s²) : vitesse = √(a·R)
+    bornes_vitesses: Tuple[float, ...] = (50, 70, 90, 110, 130)  # km/h : en dessous, notes 1 à 5, au-delà 6
+
+
+def metres_locaux(coordinates):
+    """Positions (x, y) en mètres dans la projection locale centrée sur l'itinéraire"""
+    return ProjectionLocale.centree(coordinates).projeter(coordinates)
+
+
+def taille_fenetre(xy, fenetre):
+    """Nombre impair de points couvrant `fenetre` mètres au pas médian (au moins 3)"""
+    pas = np.median(np.hypot(*np.diff(xy, axis=0).T)) if len(xy) > 1 else 0.0
+    demi = int(fenetre / 2 // pas) if pas > 0 else 1
+    return 2 * max(demi, 1) + 1
+
+
+def cercles(xy, taille):
+    """Centre (x, y) et rayon du cercle ajusté sur chaque fenêtre de `taille` points.
+
+    Ajustement algébrique de Kåsa sur les points centrés de la fenêtre : un
+    système 2 x 2 par fenêtre, résolu pour toutes les fenêtres à la fois.
+    Points alignés : rayon infini. Retourne (centres, rayons) de longueur
+    N - taille + 1, la fenêtre k étant centrée sur le point k + taille // 2.
+    """
+    if len(xy) < taille:
+        return np.zeros((0, 2)), np.zeros(0)
+    fenetres = np.lib.stride_tricks.sliding_window_view(xy, taille, axis=0)  # (M, 2, taille)
+    moyenne = fenetres.mean(axis=2)
+    u = fenetres[:, 0] - moyenne[:, :1]
+    v = fenetres[:, 1] - moyenne[:, 1:]
+    suu, svv, suv = (u * u).mean(axis=1), (v * v).mean(axis=1), (u * v).mean(axis=1)
+    r2 = u * u + v * v
+    bu = 0.5 * (u * r2).mean(axis=1)
+    bv = 0.5 * (v * r2).mean(axis=1)
+
+    det = suu * svv - suv * suv
+    aligne = det <= 1e-12 * (suu + svv) ** 2
+    with np.errstate(divide="ignore", invalid="ignore"):
+        uc = np.where(aligne, 0.0, (bu * svv - bv * suv) / det)
+        vc = np.where(aligne, 0.0, (bv * suu - bu * suv) / det)
+    rayons = np.where(aligne, np.inf, np.sqrt(uc * uc + vc * vc + suu + svv))
+    centres = moyenne + np.stack((uc, vc), axis=1)
+    return centres, rayons
+
+
+def rayons_courbure(coordinates, fenetre=ParametresRayon.fenetre):
+    """Rayon signé (mètres, positif à gauche) en chaque point d'une polyligne (lon, lat).
+
+    Les points trop proches des extrémités pour une fenêtre complète valent +inf.
+    """
+    xy = metres_locaux(coordinates)
+    rayons = np.full(len(xy), np.inf)
+    taille = taille_fenetre(xy, fenetre)
+    centres, r = cercles(xy, taille)
+    if not len(r):
+        return rayons
+    milieu = np.arange(len(r)) + taille // 2
+    corde = xy[taille - 1:] - xy[:len(r)]
+    vers_centre = centres - xy[milieu]
+    gauche = corde[:, 0] * vers_centre[:, 1] - corde[:, 1] * vers_centre[:, 0] > 0
+    rayons[milieu] = np.where(gauche, r, -r)
+    return rayons
+
+
+def changements_cap(coordinates):
+    """Changement de cap signé (degrés, positif à gauche) en chaque sommet d'une polyligne (lon, lat), 0 aux bouts"""
+    caps = np.arctan2(*np.diff(metres_locaux(coordinates), axis=0)[:, ::-1].T)
+    tournant = np.zeros(len(coordinates))
+    if len(caps) > 1:
+        tournant[1:-1] = np.degrees((np.diff(caps) + np.pi) % (2 * np.pi) - np.pi)
+    return tournant
+
+
+def vitesse_corde(rayon, acceleration=ParametresRayon.acceleration):
+    """Vitesse de passage (km/h) dans un rayon (mètres) à accélération latérale donnée"""
+    return np.sqrt(acceleration * np.abs(rayon)) * 3.6
+
+
+def notes_rayon(rayon, params=ParametresRayon()):
+    """Note copilote de 1 (épingle) à 6 (rapide) pour chaque rayon"""
+    vitesse = vitesse_corde(rayon, params.acceleration)
+    return 1 + np.searchsorted(np.asarray(params.bornes_vitesses), vitesse, side="right")
+
+
+def detecter_virages_rayon(coordinates, distance, params, rayons_params=ParametresRayon()):
+    """Roadbook d'une géométrie brute (lon, lat) rééchantillonnée au pas `distance`.
+
+    Les rayons sont mesurés sur la géométrie ramenée au pas fin
+    rayons_params.pas, puis chaque virage est reporté sur les points du
+    roadbook par son abscisse : les virages et leurs notes ne dépendent pas
+    de `distance`. `params` (ParametresVirage) ne sert qu'à l'affichage
+    (couleurs, marqueurs).
+    """
+    pts = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+    points = interpoler_points(pts, distance)
+    fin_trace = interpoler_points(pts, rayons_params.pas)
+    rayons = rayons_courbure(fin_trace, rayons_params.fenetre)
+    longueurs = longueurs_segments(fin_trace)
+
+    tournant = changements_cap(fin_trace)
+
+    # Plages de points courbes d'un même sens
+    sens = np.where(np.abs(rayons) < rayons_params.rayon_max, np.sign(rayons), 0).astype(np.int8)
+    bord = np.flatnonzero(np.diff(np.concatenate(([0], sens, [0]))))
+    debuts, fins = bord[:-1], bord[1:]
+    garder = sens[debuts] != 0
+    debuts, fins = debuts[garder], fins[garder]  # fins : premier point après la plage
+
+    cumul = np.concatenate(([0.0], np.cumsum(tournant)))
+    angles = cumul[fins] - cumul[debuts]
+    retenu = np.abs(angles) >= rayons_params.angle_min
+    debuts, fins, angles = debuts[retenu], fins[retenu], angles[retenu]
+
+    # Corde de chaque virage : point de plus petit rayon de la plage
+    tailles = fins - debuts
+    plages = np.repeat(debuts - np.cumsum(tailles) + tailles, tailles) + np.arange(tailles.sum())
+    ordre = np.lexsort((np.abs(rayons[plages]), np.repeat(np.arange(len(debuts)), tailles)))
+    apex = plages[ordre[np.cumsum(tailles) - tailles]]
+    notes = notes_rayon(rayons[apex], rayons_params)
+
+    # Début et fin de chaque virage reportés sur les points du roadbook par abscisse :
+    # les deux rééchantillonnages placent le point k à k * pas le long de la géométrie
+    cumul_longueurs = np.concatenate(([0.0], np.cumsum(longueurs)))
+    total = abscisses_curvilignes(pts)[-1]
+    pas_roadbook = pas_reguliers(total, distance)
+    pas_fin = pas_reguliers(total, rayons_params.pas)
+    fins_trace = np.minimum(fins, len(fin_trace) - 1)
+    index_debut = np.maximum(np.searchsorted(pas_roadbook, pas_fin[debuts], side="right") - 1, 1)
+    index_fin = np.maximum(np.searchsorted(pas_roadbook, pas_fin[fins_trace]), index_debut + 1)
+
+    return Roadbook.depuis_colonnes(
+        points, params, index_debut, index_fin, angles > 0, np.abs(angles),
+        cumul_longueurs[fins_trace] - cumul_longueurs[debuts], abscisses_curvilignes(points), notes=notes)
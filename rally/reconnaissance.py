@@ -0,0 +1,499 @@
+"""Contrôle des notes d'un roadbook d'après les traces GPS des reconnaissances.
+
+Chaque trace (GPX, ou NMEA comme pour `direct`) est recalée d'un bloc sur les
+points rééchantillonnés d'un roadbook déjà calculé : toutes les positions sont
+projetées à la fois sur les segments les plus proches (index spatial), puis
+les positions trop loin de l'itinéraire ou dont l'abscisse s'écarte de la
+médiane de leurs voisines (autre portion de route qui passe à côté) sont
+écartées. Sur la ligne réellement suivie, ramenée au pas fin de rally.rayons,
+on mesure pour chaque virage le plus petit rayon (cercle passant par trois
+points distants d'une demi-fenêtre), le changement de cap et la vitesse
+minimale ; le barème de ParametresRayon en tire une note au rayon et
+une note à la vitesse. Un virage est signalé quand la note mesurée sur
+l'ensemble des passages s'écarte de celle du roadbook de plus de
+`ecart_note` : au rayon, celui de la courbure moyenne des passages point par
+point le long de l'itinéraire (le plus petit rayon d'une seule trace est
+tiré vers le bas par la gigue GPS, la moyenne l'efface) ; à la vitesse, la
+médiane des vitesses minimales.
+
+Les traces sont lues et mesurées dans un pool de processus, quelques-unes à
+la fois : seules les mesures par virage remontent au processus principal, qui
+les agrège et les écrit au fil de l'eau.
+
+    python -m rally reconnaissance rendu_html/lot/etape_roadbook.rbk traces/ --csv controle.csv
+"""
+import argparse
+import csv
+import glob
+import os
+import sys
+import time
+import warnings
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import NamedTuple
+from xml.etree import ElementTree
+
+import numpy as np
+
+from rally.direct import lire_nmea
+from rally.geodesie import longueurs_segments
+from rally.index_spatial import IndexSpatial
+from rally.rayons import ParametresRayon, changements_cap, metres_locaux, notes_rayon
+from rally.reechantillonnage import interpoler_abscisses, pas_reguliers
+from rally.roadbook import Roadbook, libelle_note
+
+CRITERES = ("rayon", "vitesse")
+PAS_RECALAGE = 5.0  # Mètres entre les points de l'itinéraire sur lesquels les positions sont recalées
+EN_VOL = 2  # Traces soumises d'avance par processus de calcul
+
+
+@dataclass(frozen=True)
+class ParametresReconnaissance:
+    """Recalage des traces (mètres) et comparaison des notes"""
+    rayon: float = 30  # Écart maximal entre une position et l'itinéraire
+    fenetre_mediane: int = 15  # Positions voisines dont l'abscisse médiane sert de référence
+    saut_max: float = 100  # Écart maximal entre l'abscisse d'une position et cette médiane
+    critere: str = "rayon"  # Note mesurée comparée au roadbook : "rayon" (ligne suivie) ou "vitesse"
+    ecart_note: int = 1  # Écart toléré entre la note mesurée et celle du roadbook
+    rayons: ParametresRayon = ParametresRayon()  # Pas fin, fenêtre des cercles et barème des notes
+
+
+class Trace(NamedTuple):
+    lon: np.ndarray
+    lat: np.ndarray
+    temps: np.ndarray  # Secondes depuis la première position, NaN sans horodatage
+
+
+class Passage(NamedTuple):
+    """Mesures d'une trace, une valeur par virage du roadbook (NaN et note 0 : virage non parcouru)"""
+    positions: int
+    recalees: int
+    ecart_median: float  # Mètres entre les positions recalées et l'itinéraire
+    duree: float  # Secondes
+    rayon: np.ndarray  # Plus petit rayon de la ligne suivie (mètres)
+    angle: np.ndarray  # Changement de cap de la ligne suivie (degrés, positif à gauche)
+    vitesse_min: np.ndarray  # km/h
+    vitesse_entree: np.ndarray  # km/h
+    note_rayon: np.ndarray
+    note_vitesse: np.ndarray
+    courbure: np.ndarray  # Courbure signée moyenne (1/m) en chaque point de Reference.grille, NaN hors trace
+
+    @property
+    def virages(self):
+        return int(np.count_nonzero(self.note_rayon))
+
+
+# === Lecture des traces ===
+def _secondes_iso(texte):
+    if not texte:
+        return np.nan
+    horodatage = datetime.fromisoformat(texte.strip())
+    if horodatage.tzinfo is None:
+        horodatage = horodatage.replace(tzinfo=timezone.utc)
+    return horodatage.timestamp()
+
+
+def lire_gpx(chemin):
+    """Trace des points <trkpt> d'un fichier GPX (tous les segments à la suite), lue en flux"""
+    lon, lat, temps = [], [], []
+    horodatage = None
+    for _, element in ElementTree.iterparse(chemin):
+        balise = element.tag.rpartition("}")[2]
+        if balise == "time":
+            horodatage = element.text
+        elif balise == "trkpt":
+            lon.append(float(element.get("lon")))
+            lat.append(float(element.get("lat")))
+            temps.append(_secondes_iso(horodatage))
+            horodatage = None
+            element.clear()
+        elif balise in ("trkseg", "wpt", "rte"):
+            element.clear()
+    return _trace(lon, lat, temps)
+
+
+def lire_trace(chemin):
+    """Trace d'un fichier GPX (extension .gpx) ou de trames NMEA (toute autre extension)"""
+    if chemin.lower().endswith(".gpx"):
+        return lire_gpx(chemin)
+    with open(chemin, encoding="ascii", errors="replace") as f:
+        fixes = list(lire_nmea(f))
+    temps = np.array([np.nan if fix.temps is None else fix.temps for fix in fixes])
+    # Passage de minuit : les heures NMEA repartent de zéro
+    temps += 86400 * np.cumsum(np.diff(temps, prepend=temps[:1]) < -43200)
+    return _trace([fix.lon for fix in fixes], [fix.lat for fix in fixes], temps)
+
+
+def _trace(lon, lat, temps):
+    if not len(lon):
+        raise ValueError("trace sans position")
+    temps = np.asarray(temps, dtype=np.float64)
+    horodatees = temps[~np.isnan(temps)]
+    return Trace(np.asarray(lon, dtype=np.float64), np.asarray(lat, dtype=np.float64),
+                 temps - horodatees[0] if len(horodatees) else temps)
+
+
+# === Recalage et mesures ===
+class Reference:
+    """Roadbook préparé pour le recalage : index spatial, abscisses de début et de fin des virages.
+
+    L'index porte sur les points du roadbook ramenés à PAS_RECALAGE mètres : à
+    50 m, le sommet le plus proche d'une position peut appartenir à une autre
+    portion de route alors que le segment le plus proche est le bon.
+    """
+
+    def __init__(self, roadbook):
+        points = np.asarray(roadbook.coordinates, dtype=np.float64).reshape(-1, 2)
+        if len(points) < 2:
+            raise ValueError("Roadbook sans points rééchantillonnés")
+        self.roadbook = roadbook
+        # Mêmes abscisses que distance_depart dans detecter_virages
+        self.abscisses = roadbook.index_spatial().abscisses
+        self.grille = pas_reguliers(self.abscisses[-1], PAS_RECALAGE)
+        self.index = IndexSpatial(interpoler_abscisses(points, self.abscisses, self.grille), 2 * PAS_RECALAGE,
+                                  abscisses=self.grille)
+        self.debuts = self.abscisses[roadbook.table["index_debut"]]
+        self.fins = self.abscisses[roadbook.table["index_fin"]]
+        self.notes = np.asarray(roadbook.table["note"])
+        # Points de la grille couverts par chaque virage
+        self.plages = np.searchsorted(self.grille, self.debuts), np.searchsorted(self.grille, self.fins, side="right")
+
+
+_REFERENCES = {}
+
+
+def reference_partagee(chemin):
+    """Reference unique par roadbook (.rbk) dans le processus : partagée par les traces qu'il traite"""
+    reference = _REFERENCES.get(chemin)
+    if reference is None:
+        reference = _REFERENCES[chemin] = Reference(Roadbook.charger(chemin))
+    return reference
+
+
+def aligner(index, lon, lat, params=ParametresReconnaissance()):
+    """(abscisses, écarts) en mètres de chaque position recalée sur l'itinéraire, abscisse NaN si écartée.
+
+    Toutes les positions sont traitées d'un bloc : point le plus proche
+    (IndexSpatial.plus_proches), puis projection sur les deux segments qui
+    l'encadrent. Une position à plus de params.rayon de l'itinéraire, ou dont
+    l'abscisse s'écarte de plus de params.saut_max de la médiane des
+    params.fenetre_mediane positions qui l'entourent, est écartée.
+    """
+    q = index.projeter(lon, lat)
+    k, _ = index.plus_proches(lon, lat)
+    colonnes = np.arange(len(q))
+
+    # Segments [k - 1, k] et [k, k + 1] de chaque position, bornés aux extrémités
+    a = np.clip(np.stack((k - 1, k)), 0, len(index) - 2)
+    p0, d = index.xy[a], index.xy[a + 1] - index.xy[a]
+    carres = (d * d).sum(axis=-1)
+    t = np.clip(((q - p0) * d).sum(axis=-1) / np.where(carres > 0, carres, 1.0), 0.0, 1.0)
+    ecarts = np.hypot(*np.moveaxis(q - p0 - t[..., None] * d, -1, 0))
+    meilleur = np.argmin(ecarts, axis=0)
+    a, t = a[meilleur, colonnes], t[meilleur, colonnes]
+    ecart = ecarts[meilleur, colonnes]
+    s = index.abscisses
+    abscisses = s[a] + t * (s[a + 1] - s[a])
+    abscisses[ecart > params.rayon] = np.nan
+
+    # Médiane glissante des abscisses : sauts vers une autre portion de l'itinéraire
+    demi = params.fenetre_mediane // 2
+    if demi and len(q):
+        bord = np.full(demi, np.nan)
+        fenetres = np.lib.stride_tricks.sliding_window_view(np.concatenate((bord, abscisses, bord)), 2 * demi + 1)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)  # Fenêtres sans position recalée
+            mediane = np.nanmedian(fenetres, axis=1)
+        abscisses[np.abs(abscisses - mediane) > params.saut_max] = np.nan
+    return abscisses, ecart
+
+
+def rayons_trace(xy, demi):
+    """Rayon signé (mètres, positif à gauche) du cercle passant par les points k - demi, k et k + demi.
+
+    Sur une trace GPS, le cercle de Kåsa (rally.rayons.cercles) préfère un
+    petit cercle centré sur la fenêtre dès que les positions zigzaguent de
+    quelques centimètres autour d'une ligne droite ; le cercle circonscrit à
+    trois points espacés ne dépend que de la flèche. Bords : +inf.
+    """
+    rayons = np.full(len(xy), np.inf)
+    if len(xy) <= 2 * demi:
+        return rayons
+    a, b, c = xy[:-2 * demi], xy[demi:len(xy) - demi], xy[2 * demi:]
+    ab, bc, ca = b - a, c - b, a - c
+    croix = ab[:, 0] * bc[:, 1] - ab[:, 1] * bc[:, 0]
+    produit = np.hypot(*ab.T) * np.hypot(*bc.T) * np.hypot(*ca.T)
+    with np.errstate(divide="ignore"):
+        rayons[demi:len(xy) - demi] = np.where(croix != 0, produit / (2 * croix), np.inf)
+    return rayons
+
+
+def _par_plage(ufunc, valeurs, debuts, fins):
+    """ufunc.reduce(valeurs[debut:fin]) pour chaque plage non vide, en un appel"""
+    return ufunc.reduceat(np.append(valeurs, 0.0), np.column_stack((debuts, fins)).ravel())[::2]
+
+
+def mesurer(reference, trace, params=ParametresReconnaissance()):
+    """Passage d'une trace sur le roadbook de la référence"""
+    nb = len(reference.debuts)
+    rayon, angle, vitesse_min, vitesse_entree = (np.full(nb, np.nan) for _ in range(4))
+    note_rayon, note_vitesse = np.zeros(nb, dtype=np.int8), np.zeros(nb, dtype=np.int8)
+    courbure = np.full(len(reference.grille), np.nan, dtype=np.float32)
+
+    abscisses, ecarts = aligner(reference.index, trace.lon, trace.lat, params)
+    recalee = ~np.isnan(abscisses)
+    temps = trace.temps[~np.isnan(trace.temps)]
+    duree = float(temps[-1] - temps[0]) if len(temps) else np.nan
+    ecart_median = float(np.median(ecarts[recalee])) if recalee.any() else np.nan
+    resultat = Passage(len(trace.lon), int(recalee.sum()), ecart_median, duree, rayon, angle, vitesse_min,
+                       vitesse_entree, note_rayon, note_vitesse, courbure)
+    if recalee.sum() < 3:  # Trace d'une autre étape, ou trop loin de la route
+        return resultat
+    pts = np.column_stack((trace.lon, trace.lat))[recalee]
+    longueurs = longueurs_segments(pts)
+    # Positions immobiles confondues : une seule par arrêt
+    garder = np.concatenate(([True], longueurs > 0))
+    pts, abscisses_pts, temps = pts[garder], abscisses[recalee][garder], trace.temps[recalee][garder]
+    if len(pts) < 3:
+        return resultat
+
+    # Ligne suivie au pas fin, chaque point repéré par son abscisse sur l'itinéraire
+    cumul = np.concatenate(([0.0], np.cumsum(longueurs[garder[1:]])))
+    pas = pas_reguliers(cumul[-1], params.rayons.pas)
+    ligne = interpoler_abscisses(pts, cumul, pas)
+    sur_route = np.maximum.accumulate(np.interp(pas, cumul, abscisses_pts))
+    demi = max(1, round(params.rayons.fenetre / 2 / params.rayons.pas))
+    rayons = rayons_trace(metres_locaux(ligne), demi)
+    courbures = 1 / rayons
+    courbures[:demi] = courbures[max(len(ligne) - demi, demi):] = np.nan
+    rayons = np.abs(rayons)
+    tournant = changements_cap(ligne)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        vitesses = np.gradient(cumul, temps) * 3.6 if len(cumul) > 1 else np.full(len(cumul), np.nan)
+    vitesses = np.interp(pas, cumul, np.where(np.isfinite(vitesses), vitesses, np.nan))
+
+    # Courbure moyenne par point de la grille de l'itinéraire
+    connue = ~np.isnan(courbures)
+    cases = np.minimum(np.rint(sur_route[connue] / PAS_RECALAGE).astype(np.int64), len(courbure) - 1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        courbure[:] = (np.bincount(cases, courbures[connue], len(courbure))
+                       / np.bincount(cases, minlength=len(courbure)))
+
+    # Virages entièrement parcourus
+    debuts = np.searchsorted(sur_route, reference.debuts, side="left")
+    fins = np.searchsorted(sur_route, reference.fins, side="right")
+    parcouru = (sur_route[0] <= reference.debuts) & (sur_route[-1] >= reference.fins) & (fins > debuts)
+    if not nb or not parcouru.any():
+        return resultat
+    debuts, fins = debuts[parcouru], fins[parcouru]
+    rayon[parcouru] = _par_plage(np.minimum, rayons, debuts, fins)
+    angle[parcouru] = _par_plage(np.add, tournant, debuts, fins)
+    vitesse_min[parcouru] = _par_plage(np.fmin, vitesses, debuts, fins)
+    vitesse_entree[parcouru] = vitesses[debuts]
+    note_rayon[parcouru] = notes_rayon(rayon[parcouru], params.rayons)
+    note_vitesse[:] = np.where(np.isnan(vitesse_min), 0, notes_vitesse(vitesse_min, params.rayons))
+    return resultat
+
+
+def notes_vitesse(vitesse, params=ParametresRayon()):
+    """Note copilote de 1 à 6 pour chaque vitesse de passage (km/h), au barème de notes_rayon"""
+    return 1 + np.searchsorted(np.asarray(params.bornes_vitesses), vitesse, side="right")
+
+
+# === Lot de traces ===
+def _mesurer_fichier(chemin_roadbook, chemin, params):
+    return mesurer(reference_partagee(chemin_roadbook), lire_trace(chemin), params)
+
+
+def _resultat(chemin, calcul):
+    try:
+        return chemin, calcul(), None
+    except Exception as exc:
+        return chemin, None, f"{type(exc).__name__} : {exc}"
+
+
+def mesurer_traces(chemin_roadbook, chemins, params=ParametresReconnaissance(), processus=None):
+    """(chemin, Passage ou None, erreur) pour chaque trace, dans l'ordre, au fil des calculs.
+
+    Au plus EN_VOL traces par processus sont soumises d'avance : `chemins`
+    peut être un générateur, les traces ne sont jamais toutes en mémoire et
+    le roadbook n'est relu qu'une fois par processus.
+    """
+    processus = processus or os.cpu_count() or 1
+    if processus <= 1:
+        for chemin in chemins:
+            yield _resultat(chemin, lambda: _mesurer_fichier(chemin_roadbook, chemin, params))
+        return
+    with ProcessPoolExecutor(max_workers=processus) as pool:
+        en_cours = deque()
+        for chemin in chemins:
+            en_cours.append((chemin, pool.submit(_mesurer_fichier, chemin_roadbook, chemin, params).result))
+            if len(en_cours) >= EN_VOL * processus:
+                yield _resultat(*en_cours.popleft())
+        while en_cours:
+            yield _resultat(*en_cours.popleft())
+
+
+class Bilan:
+    """Mesures de tous les passages, virage par virage, et courbure cumulée le long de l'itinéraire"""
+
+    def __init__(self, reference, params=ParametresReconnaissance()):
+        self.reference = reference
+        self.params = params
+        self.passages = []  # Sans leur profil de courbure
+        self._somme = np.zeros(len(reference.grille))
+        self._nombre = np.zeros(len(reference.grille), dtype=np.int64)
+
+    def ajouter(self, passage):
+        connue = ~np.isnan(passage.courbure)
+        self._somme[connue] += passage.courbure[connue]
+        self._nombre += connue
+        self.passages.append(passage._replace(courbure=None))
+
+    def courbure(self):
+        """Courbure signée moyenne des passages (1/m) en chaque point de la grille, NaN là où aucun n'est passé"""
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self._somme / self._nombre
+
+    def rayons(self):
+        """Rayon de la courbure moyenne des passages au point le plus serré de chaque virage (mètres)"""
+        debuts, fins = self.reference.plages
+        if not len(debuts):
+            return np.zeros(0)
+        plus_serree = _par_plage(np.fmax, np.abs(self.courbure()), debuts, np.maximum(fins, debuts + 1))
+        with np.errstate(divide="ignore"):
+            return 1 / plus_serree
+
+    def _colonne(self, nom):
+        return np.array([getattr(p, nom) for p in self.passages]).reshape(len(self.passages), -1)
+
+    def desaccords(self, passage):
+        """Virages du passage dont la note mesurée s'écarte de celle du roadbook"""
+        mesuree = passage.note_rayon if self.params.critere == "rayon" else passage.note_vitesse
+        return (mesuree > 0) & (np.abs(mesuree.astype(np.int64) - self.reference.notes) > self.params.ecart_note)
+
+    def lignes(self):
+        """Une ligne par virage : rayon moyen, autres mesures médianes, notes mesurées, part des désaccords"""
+        table = self.reference.roadbook.table
+        nb = len(table)
+        yield ("id", "distance_depart", "direction", "note", "passages", "rayon", "angle", "vitesse_min",
+               "vitesse_entree", "note_rayon", "note_vitesse", "desaccords", "signale")
+        passages = np.zeros(nb, dtype=np.int64)
+        desaccords = np.zeros(nb, dtype=np.int64)
+        medianes = {nom: np.full(nb, np.nan) for nom in ("angle", "vitesse_min", "vitesse_entree")}
+        if self.passages:
+            passages = (self._colonne("note_rayon") > 0).sum(axis=0)
+            desaccords = np.sum([self.desaccords(p) for p in self.passages], axis=0)
+            with warnings.catch_warnings():
+                warnings.simplefilter("ignore", RuntimeWarning)  # Virages jamais parcourus
+                medianes = {nom: np.nanmedian(self._colonne(nom), axis=0) for nom in medianes}
+        rayons = self.rayons()
+        note_rayon = np.where((passages > 0) & ~np.isnan(rayons), notes_rayon(rayons, self.params.rayons), 0)
+        note_vitesse = np.where(np.isnan(medianes["vitesse_min"]), 0,
+                                notes_vitesse(medianes["vitesse_min"], self.params.rayons))
+        mesuree = note_rayon if self.params.critere == "rayon" else note_vitesse
+        signale = (mesuree > 0) & (np.abs(mesuree - self.reference.notes) > self.params.ecart_note)
+        for k in range(nb):
+            yield (int(table["id"][k]), round(float(table["distance_depart"][k]), 1),
+                   "droite" if np.signbit(table["angle"][k]) else "gauche", int(table["note"][k]), int(passages[k]),
+                   _arrondi(rayons[k]), *(_arrondi(medianes[nom][k]) for nom in medianes),
+                   int(note_rayon[k]), int(note_vitesse[k]),
+                   round(float(desaccords[k] / passages[k]), 3) if passages[k] else "", int(signale[k]))
+
+
+def _arrondi(valeur):
+    return "" if not np.isfinite(valeur) else round(float(valeur), 1)
+
+
+LIGNE_DETAIL = ("trace", "id", "note", "rayon", "angle", "vitesse_min", "vitesse_entree", "note_rayon",
+                "note_vitesse", "desaccord")
+
+
+def lignes_detail(chemin, passage, reference, desaccords):
+    """Une ligne par virage parcouru d'une trace"""
+    for k in np.flatnonzero(passage.note_rayon):
+        yield (chemin, int(reference.roadbook.table["id"][k]), int(reference.notes[k]),
+               *(_arrondi(getattr(passage, nom)[k]) for nom in ("rayon", "angle", "vitesse_min", "vitesse_entree")),
+               int(passage.note_rayon[k]), int(passage.note_vitesse[k]), int(desaccords[k]))
+
+
+def fichiers_traces(entrees):
+    """Chemins des traces : fichiers, motifs (*.gpx) ou dossiers (leurs .gpx et .nmea), au fil de l'eau"""
+    for entree in entrees:
+        if os.path.isdir(entree):
+            noms = sorted(e.name for e in os.scandir(entree) if e.is_file()
+                          and os.path.splitext(e.name)[1].lower() in (".gpx", ".nmea"))
+            yield from (os.path.join(entree, nom) for nom in noms)
+        elif not os.path.exists(entree) and glob.has_magic(entree):
+            yield from sorted(glob.iglob(entree))
+        else:
+            yield entree
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m rally reconnaissance",
+                                     description="Notes d'un roadbook comparées aux traces GPS des reconnaissances")
+    parser.add_argument("roadbook", help="Roadbook binaire (.rbk) d'une étape")
+    parser.add_argument("traces", nargs="+", help="Traces .gpx ou .nmea, motifs ou dossiers")
+    parser.add_argument("--processus", type=int, default=None, help="Processus de calcul")
+    parser.add_argument("--critere", choices=CRITERES, default="rayon",
+                        help="Note mesurée comparée au roadbook : rayon de la ligne suivie ou vitesse minimale")
+    parser.add_argument("--ecart-note", type=int, default=1, help="Écart de note toléré")
+    parser.add_argument("--rayon", type=float, default=30.0, help="Écart maximal à l'itinéraire (m)")
+    parser.add_argument("--csv", default=None, help="Écrit le bilan par virage en CSV")
+    parser.add_argument("--details", default=None, help="Écrit une ligne par trace et par virage parcouru en CSV")
+    args = parser.parse_args(argv)
+
+    params = ParametresReconnaissance(rayon=args.rayon, critere=args.critere, ecart_note=args.ecart_note)
+    reference = reference_partagee(args.roadbook)
+    bilan = Bilan(reference, params)
+    details = open(args.details, "w", newline="", encoding="utf-8") if args.details else None
+    ecriture = csv.writer(details) if details else None
+    if ecriture:
+        ecriture.writerow(LIGNE_DETAIL)
+
+    debut = time.perf_counter()
+    positions = echecs = 0
+    try:
+        for chemin, passage, erreur in mesurer_traces(args.roadbook, fichiers_traces(args.traces), params,
+                                                      args.processus):
+            if erreur:
+                echecs += 1
+                print(f"  ⚠ {chemin} : {erreur}", file=sys.stderr)
+                continue
+            bilan.ajouter(passage)
+            positions += passage.positions
+            desaccords = bilan.desaccords(passage)
+            print(f"  {chemin} : {passage.positions} positions, {passage.recalees / passage.positions:.0%} recalées "
+                  f"(écart médian {passage.ecart_median:.1f} m), {passage.virages}/{len(reference.notes)} virages, "
+                  f"{int(desaccords.sum())} en désaccord")
+            if ecriture:
+                ecriture.writerows(lignes_detail(chemin, passage, reference, desaccords))
+    finally:
+        if details:
+            details.close()
+    duree = time.perf_counter() - debut
+
+    lignes = list(bilan.lignes())
+    if args.csv:
+        with open(args.csv, "w", newline="", encoding="utf-8") as f:
+            csv.writer(f).writerows(lignes)
+    signales = [dict(zip(lignes[0], ligne)) for ligne in lignes[1:] if ligne[-1]]
+    if signales:
+        print(f"\nVirages signalés (note au {params.critere} à plus de {params.ecart_note} de celle du roadbook) :")
+    for v in signales:
+        mesuree = v[f"note_{params.critere}"]
+        print(f"  n°{v['id']} à {v['distance_depart'] / 1000:.2f} km : {libelle_note(v['note'], v['direction'])} "
+              f"au roadbook, {mesuree} mesuré (rayon {v['rayon']} m, {v['vitesse_min']} km/h, "
+              f"{v['desaccords']:.0%} des {v['passages']} passages en désaccord)")
+    print(f"\n✅ {len(bilan.passages)} traces ({positions} positions) en {duree:.2f}s, "
+          f"{len(signales)} virages signalés sur {len(lignes) - 1}"
+          + (f", {echecs} en échec" if echecs else "") + (f", bilan : {args.csv}" if args.csv else ""))
+    return 1 if echecs and not bilan.passages else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,154 @@
+import numpy as np
+
+from rally.geodesie import longueurs_segments
+
+
+def interpoler_points(coordinates, distance, longueurs=None):
+    """Rééchantillonne une polyligne (lon, lat) à pas constant (mètres).
+
+    Les longueurs de tous les segments sont calculées en une passe vectorisée
+    (ou fournies par `longueurs`, par exemple celles du repère métrique local),
+    puis les points sont placés à abscisse curviligne k * distance le long de
+    l'itinéraire complet ; le dernier point de l'itinéraire est toujours
+    conservé. Les sommets dupliqués sont ignorés, si bien qu'aucun point n'est
+    répété aux jonctions de segments. Retourne un tableau (N, 2) float64.
+    """
+    pts = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+    if len(pts) < 2:
+        return pts.copy()
+
+    longueurs = longueurs_segments(pts) if longueurs is None else np.asarray(longueurs, dtype=np.float64)
+
+    # Suppression des sommets confondus (segments de longueur nulle)
+    garder = np.empty(len(pts), dtype=bool)
+    garder[0] = True
+    garder[1:] = longueurs > 0
+    pts = pts[garder]
+    longueurs = longueurs[garder[1:]]
+    if len(pts) < 2:
+        return pts.copy()
+
+    cumul = np.empty(len(pts))
+    cumul[0] = 0.0
+    np.cumsum(longueurs, out=cumul[1:])
+    return interpoler_abscisses(pts, cumul, pas_reguliers(cumul[-1], distance))
+
+
+def pas_reguliers(total, distance):
+    """Abscisses 0, distance, 2 * distance... et total (mètres)"""
+    nb_pas = int(total // distance)
+    reste = total - nb_pas * distance
+    # Le point final n'est ajouté que s'il ne coïncide pas avec le dernier pas
+    nb_points = nb_pas + 1 + (reste > 1e-6 * distance)
+
+    abscisses = np.arange(nb_points, dtype=np.float64) * distance
+    abscisses[-1] = total
+    return abscisses
+
+
+def interpoler_abscisses(pts, cumul, abscisses):
+    """Points (lon, lat) situés aux abscisses curvilignes données (tableau (N, 2))"""
+    resultat = np.empty((len(abscisses), 2), dtype=np.float64)
+    resultat[:, 0] = np.interp(abscisses, cumul, pts[:, 0])
+    resultat[:, 1] = np.interp(abscisses, cumul, pts[:, 1])
+    return resultat
+
+
+# === Rééchantillonnage par tronçons entre ancres ===
+PAS_ANCRES = 16  # Un sommet brut sur PAS_ANCRES en moyenne sert d'ancre
+QUANTUM = 1e7  # Coordonnées arrondies au dix-millionième de degré avant hachage
+
+
+def quantifier(coordinates):
+    """Coordonnées entières (unités de 1 / QUANTUM degré), base des ancres et des empreintes de tronçons"""
+    return np.round(np.asarray(coordinates, dtype=np.float64).reshape(-1, 2) * QUANTUM).astype(np.int64)
+
+
+def ancres(quantifiees, pas=PAS_ANCRES):
+    """Masque des sommets ancres : hachage des coordonnées seules, extrémités toujours comprises"""
+    with np.errstate(over="ignore"):
+        h = (quantifiees[:, 0].astype(np.uint64) * np.uint64(0x9E3779B97F4A7C15)) \
+            ^ (quantifiees[:, 1].astype(np.uint64) * np.uint64(0xC2B2AE3D27D4EB4F))
+    masque = (h >> np.uint64(33)) % np.uint64(pas) == 0
+    if len(masque):
+        masque[[0, -1]] = True
+    return masque
+
+
+def interpoler_troncons(brut, debuts, fins, distance, longueurs=None):
+    """Rééchantillonne chaque tronçon brut[debuts[k]..fins[k]] (sommets inclus) à pas ajusté.
+
+    Le tronçon k reçoit nb_pas[k] pas égaux, arrondi de sa longueur sur
+    `distance`, et occupe nb_pas[k] + 1 lignes consécutives de `points`, ses
+    deux sommets extrêmes compris (exactement). `longueurs` : longueurs des
+    segments de `brut`. Chaque tronçon est calculé dans son propre repère
+    d'abscisses (une ligne de matrice par tronçon) : ses points ne dépendent
+    pas des autres tronçons du lot, au bit près. Retourne (points, nb_pas).
+    """
+    brut = np.asarray(brut, dtype=np.float64).reshape(-1, 2)
+    debuts, fins = np.asarray(debuts, dtype=np.int64), np.asarray(fins, dtype=np.int64)
+    if not len(debuts):
+        return np.zeros((0, 2)), np.zeros(0, dtype=np.int64)
+    longueurs = longueurs_segments(brut) if longueurs is None else np.asarray(longueurs, dtype=np.float64)
+    tailles = fins - debuts + 1
+    colonnes = np.arange(tailles.max())
+    dans = colonnes < tailles[:, None]
+    index = np.minimum(debuts[:, None] + colonnes, fins[:, None])  # Lignes complétées par le dernier sommet
+    sommets = brut[index]  # (tronçons, taille max, 2)
+    cumul = np.zeros(dans.shape)
+    if dans.shape[1] > 1:
+        np.cumsum(np.where(dans[:, 1:], longueurs[np.minimum(index[:, :-1], len(longueurs) - 1)], 0.0),
+                  axis=1, out=cumul[:, 1:])
+    totaux = cumul[:, -1]
+
+    # n pas égaux par tronçon, sommets de début et de fin compris (n + 1 points)
+    nb_pas = np.where(totaux > 0, np.maximum(1, np.round(totaux / distance)), 0).astype(np.int64)
+    nb_points = nb_pas + 1
+    k = np.repeat(np.arange(len(debuts)), nb_points)
+    departs = np.cumsum(nb_points) - nb_points
+    i = np.arange(nb_points.sum()) - np.repeat(departs, nb_points)
+    cible = i / np.maximum(nb_pas[k], 1) * totaux[k]
+    # Segment de chaque point, cherché dans les seules abscisses de son tronçon : dichotomie menée pour tous
+    # les points à la fois, même résultat que searchsorted(cumul[ligne, :taille], side="right") ligne par ligne
+    j, haut = np.zeros(len(cible), dtype=np.int64), tailles[k]
+    while True:
+        ouverts = j < haut
+        if not ouverts.any():
+            break
+        milieu = (j + haut) // 2
+        avant = ouverts & (cumul[k, np.minimum(milieu, dans.shape[1] - 1)] <= cible)
+        j = np.where(avant, milieu + 1, j)
+        haut = np.where(ouverts & ~avant, milieu, haut)
+    j = np.minimum(np.maximum(j - 1, 0), np.maximum(tailles - 2, 0)[k])
+    suivant = np.minimum(j + 1, dans.shape[1] - 1)
+    a, b = cumul[k, j], cumul[k, suivant]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        t = np.where(b > a, (cible - a) / (b - a), 0.0)
+    p0, p1 = sommets[k, j], sommets[k, suivant]
+    points = p0 + t[:, None] * (p1 - p0)
+    points[departs] = brut[debuts]
+    points[departs + nb_pas] = brut[fins]
+    return points, nb_pas
+
+
+def interpoler_ancres(coordinates, distance, longueurs=None, pas_ancres=PAS_ANCRES):
+    """Rééchantillonne une polyligne (lon, lat) à pas ajusté entre des sommets ancres (mètres).
+
+    Les ancres sont choisies d'après leurs seules coordonnées (ancres()), si
+    bien qu'une même route est découpée de la même façon quelle que soit
+    l'étape qui la parcourt, et chaque tronçon entre deux ancres reçoit des
+    pas égaux, proches de `distance` (d'au plus un demi-pas divisé par leur
+    nombre). Les points d'une route commune à deux étapes sont donc les
+    mêmes, au bit près (rally.segments). `longueurs` : comme pour
+    interpoler_points. Les sommets dupliqués ne donnent aucun point répété ;
+    le dernier sommet est toujours conservé. Retourne un tableau (N, 2) float64.
+    """
+    pts = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+    if len(pts) < 2:
+        return pts.copy()
+    positions = np.flatnonzero(ancres(quantifier(pts), pas_ancres))
+    points, nb_pas = interpoler_troncons(pts, positions[:-1], positions[1:], distance, longueurs)
+    # L'ancre de fin d'un tronçon est le premier point du suivant ; le dernier sommet termine la polyligne
+    garder = np.ones(len(points), dtype=bool)
+    garder[np.cumsum(nb_pas + 1) - 1] = False
+    return np.concatenate((points[garder], pts[-1:]))
@@ -0,0 +1,186 @@
+import json
+from contextlib import nullcontext
+from itertools import chain
+
+from rally.profilage import compter
+from rally.roadbook import TYPES_RELIEF
+
+LEAFLET = "https://cdn.jsdelivr.net/npm/leaflet@1.9.3/dist"
+TAILLE_BLOC = 5000  # Points écrits par appel à write()
+COULEURS_RELIEF = {"bosse": "#8c510a", "creux": "#01665e", "compression": "#2166ac"}
+
+
+def _marqueurs(roadbook, virage, note):
+    """(index, popup, icône) des marqueurs d'un virage selon le style du roadbook"""
+    angle_final = int(virage.angle_total)
+    if roadbook.params.marqueurs == "sommet":
+        return [(virage.index, f"{note} ({angle_final}°)", "flag")]
+    return [
+        (virage.index_debut, f"Début {note} (Distance: {virage.distance:.0f}m)", "play"),
+        (virage.index_fin, f"Fin {note} (Distance: {virage.distance:.0f}m)", "stop"),
+    ]
+
+
+def carte_virages(route, roadbook, depart, arrivee, tous_les_points=True):
+    """Carte folium : itinéraire, virages colorés par note et marqueurs"""
+    import folium
+
+    coordinates = roadbook.coordinates
+    carte = folium.Map(location=depart, zoom_start=15)
+    folium.GeoJson(route, name='route').add_to(carte)
+    folium.Marker(depart, popup="Départ", icon=folium.Icon(color="green")).add_to(carte)
+    folium.Marker(arrivee, popup="Arrivée", icon=folium.Icon(color="red")).add_to(carte)
+    nb_marqueurs = 2
+
+    for virage, note, color in roadbook.classes():
+        marqueurs = _marqueurs(roadbook, virage, note)
+        nb_marqueurs += len(marqueurs)
+        for index, popup, icone in marqueurs:
+            lon, lat = coordinates[index]
+            folium.Marker(
+                location=(lat, lon),
+                popup=popup,
+                icon=folium.Icon(color=color, icon=icone, prefix="fa")
+            ).add_to(carte)
+
+        # Colorier tout le virage
+        for k in range(virage.index_debut, virage.index_fin):
+            lon1, lat1 = coordinates[k]
+            lon2, lat2 = coordinates[k + 1]
+            folium.PolyLine(
+                locations=[(lat1, lon1), (lat2, lon2)],
+                color=color,
+                weight=5,
+                opacity=0.9
+            ).add_to(carte)
+
+    if tous_les_points:
+        for lon, lat in coordinates:
+            folium.CircleMarker(
+                location=(lat, lon),
+                radius=2,
+                color="black",
+                fill=True,
+                fill_opacity=0.6
+            ).add_to(carte)
+        nb_marqueurs += len(coordinates)
+
+    compter("marqueurs", nb_marqueurs)
+    return carte
+
+
+def _json(objet):
+    return json.dumps(objet, ensure_ascii=False, separators=(",", ":"))
+
+
+def _latlon(point):
+    return f"[{point[1]:.6f},{point[0]:.6f}]"
+
+
+def _lonlat(point):
+    return f"[{point[0]:.6f},{point[1]:.6f}]"
+
+
+def _features_virages(roadbook):
+    """Features GeoJSON (texte) des virages : tracé coloré + marqueurs"""
+    coordinates = roadbook.coordinates
+    for virage, note, color in roadbook.classes():
+        angle_final = int(virage.angle_total)
+        proprietes = {"note": note, "angle": angle_final, "distance": round(virage.distance, 1), "couleur": color}
+        trace = ",".join(_lonlat(p) for p in coordinates[virage.index_debut:virage.index_fin + 1])
+        yield (f'{{"type":"Feature","geometry":{{"type":"LineString","coordinates":[{trace}]}},'
+               f'"properties":{_json({**proprietes, "popup": f"{note} ({angle_final}°)"})}}}')
+        for index, popup, _ in _marqueurs(roadbook, virage, note):
+            yield (f'{{"type":"Feature","geometry":{{"type":"Point","coordinates":{_lonlat(coordinates[index])}}},'
+                   f'"properties":{_json({**proprietes, "popup": popup})}}}')
+
+
+def _features_reliefs(roadbook):
+    """Features GeoJSON (texte) du relief : un point par bosse, creux ou compression"""
+    for relief in roadbook.reliefs:
+        type_ = TYPES_RELIEF[relief["type"]]
+        popup = f"{type_} (rayon {relief['rayon']:.0f} m, pente {relief['pente']:+.0f} %)"
+        point = _lonlat((relief["lon"], relief["lat"]))
+        proprietes = {"type": type_, "couleur": COULEURS_RELIEF[type_], "popup": popup}
+        yield (f'{{"type":"Feature","geometry":{{"type":"Point","coordinates":{point}}},'
+               f'"properties":{_json(proprietes)}}}')
+
+
+def ecrire_carte(chemin, route, roadbook, depart, arrivee, tous_les_points=True):
+    """Écrit la carte HTML (Leaflet) au fil de l'eau, sans construire d'arbre folium.
+
+    Les virages forment une seule FeatureCollection stylée par feature
+    (couleur de la note) et le nuage de points est dessiné sur un unique
+    calque canvas : la page reste légère même sur une longue étape.
+    `chemin` peut aussi être un flux texte déjà ouvert (io.StringIO).
+    """
+    coordinates = roadbook.coordinates
+    geometrie = route['features'][0]['geometry']['coordinates']
+    with nullcontext(chemin) if hasattr(chemin, "write") else open(chemin, "w", encoding="utf-8") as f:
+        f.write(f"""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1.0">
+<link rel="stylesheet" href="{LEAFLET}/leaflet.css">
+<script src="{LEAFLET}/leaflet.js"></script>
+<style>html, body, #carte {{ width: 100%; height: 100%; margin: 0; }}</style>
+</head>
+<body>
+<div id="carte"></div>
+<script>
+const carte = L.map("carte");
+L.tileLayer("https://tile.openstreetmap.org/{{z}}/{{x}}/{{y}}.png", {{
+  maxZoom: 19, attribution: "&copy; OpenStreetMap contributors"
+}}).addTo(carte);
+""")
+        # Tracé de l'itinéraire
+        f.write("const route = [")
+        for k in range(0, len(geometrie), TAILLE_BLOC):
+            if k:
+                f.write(",")
+            f.write(",".join(_latlon(p) for p in geometrie[k:k + TAILLE_BLOC]))
+        f.write("];\nconst trace = L.polyline(route, {color: \"#3388ff\", weight: 3}).addTo(carte);\n")
+
+        # Virages
+        f.write('const virages = {"type":"FeatureCollection","features":[\n')
+        nb_features = 0
+        for feature in chain(_features_virages(roadbook), _features_reliefs(roadbook)):
+            if nb_features:
+                f.write(",\n")
+            f.write(feature)
+            nb_features += 1
+        # Tracés des virages, marqueurs des virages et du relief, départ et arrivée
+        compter("marqueurs", nb_features - len(roadbook) + 2 + (len(coordinates) if tous_les_points else 0))
+        f.write("""]};
+L.geoJSON(virages, {
+  style: f => ({color: f.properties.couleur, weight: 5, opacity: 0.9}),
+  pointToLayer: (f, latlng) => L.circleMarker(latlng, {
+    radius: 6, color: f.properties.couleur, fillColor: f.properties.couleur, fillOpacity: 0.9
+  }),
+  onEachFeature: (f, calque) => calque.bindPopup(f.properties.popup)
+}).addTo(carte);
+""")
+
+        # Nuage de points rééchantillonnés : un seul calque canvas
+        if tous_les_points:
+            f.write("const points = [")
+            for k in range(0, len(coordinates), TAILLE_BLOC):
+                if k:
+                    f.write(",")
+                f.write(",".join(_latlon(p) for p in coordinates[k:k + TAILLE_BLOC]))
+            f.write("""];
+const toile = L.canvas({padding: 0.5});
+const nuage = L.layerGroup(points.map(p => L.circleMarker(p, {
+  renderer: toile, radius: 2, color: "black", weight: 1, fill: true, fillOpacity: 0.6
+}))).addTo(carte);
+L.control.layers(null, {"Points": nuage}).addTo(carte);
+""")
+
+        f.write(f"""L.marker({_json(list(depart))}).bindPopup("Départ").addTo(carte);
+L.marker({_json(list(arrivee))}).bindPopup("Arrivée").addTo(carte);
+carte.fitBounds(trace.getBounds());
+</script>
+</body>
+</html>
+""")
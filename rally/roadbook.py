@@ -0,0 +1,285 @@
+import json
+from dataclasses import asdict
+from typing import NamedTuple
+
+import numpy as np
+
+from rally.index_spatial import IndexSpatial
+
+# === Une ligne par virage, colonnes typées (aucune chaîne de caractères) ===
+DTYPE_VIRAGE = np.dtype([
+    ("id", np.int32),  # Identifiant stable lors des mises à jour incrémentales
+    ("index", np.int32),  # Point où le virage a été détecté
+    ("index_debut", np.int32),
+    ("index_fin", np.int32),
+    ("lon", np.float64),
+    ("lat", np.float64),
+    ("lon_debut", np.float64),
+    ("lat_debut", np.float64),
+    ("lon_fin", np.float64),
+    ("lat_fin", np.float64),
+    ("angle", np.float64),  # Angle cumulé signé (degrés) : positif à gauche
+    ("note", np.int8),  # Gravité copilote, de 6 (rapide) à 1 (épingle)
+    ("longueur", np.float32),  # Longueur du virage (mètres)
+    ("distance_depart", np.float64),  # Abscisse du début du virage (mètres)
+])
+
+# === Relief : une ligne par bosse, creux ou compression (rally.altitude) ===
+TYPES_RELIEF = ("bosse", "creux", "compression")
+DTYPE_RELIEF = np.dtype([
+    ("index", np.int32),  # Point le plus marqué
+    ("lon", np.float64),
+    ("lat", np.float64),
+    ("distance_depart", np.float64),  # Abscisse du point (mètres)
+    ("type", np.int8),  # Indice dans TYPES_RELIEF
+    ("rayon", np.float32),  # Rayon de courbure verticale (mètres)
+    ("altitude", np.float32),
+    ("pente", np.float32),  # Pente au point (%)
+])
+
+MAGIC = b"RBK1"
+ALIGNEMENT = 16
+
+
+class Virage(NamedTuple):
+    index: int  # Point où le virage a été détecté
+    index_debut: int
+    index_fin: int
+    direction: str  # "gauche" ou "droite"
+    angle_total: float
+    distance: float  # Longueur parcourue dans le virage (mètres)
+
+
+def classer_virage(angle_final, direction, params):
+    """Note copilote et couleur associées à un angle cumulé (degrés)"""
+    for k, borne in enumerate(params.bornes_notes):
+        if angle_final < borne:
+            return f"{direction} {6 - k}", params.couleurs[k]
+    return f"épingle {direction} | 1", params.couleurs[-1]
+
+
+def libelle_note(note, direction):
+    """Texte copilote d'une gravité : "gauche 4", "épingle droite | 1"..."""
+    return f"épingle {direction} | 1" if note == 1 else f"{direction} {note}"
+
+
+def _parametres(dictionnaire):
+    from rally.virages import ParametresVirage
+
+    return ParametresVirage(**{
+        cle: tuple(valeur) if isinstance(valeur, list) else valeur
+        for cle, valeur in dictionnaire.items()
+    })
+
+
+class Roadbook:
+    """Virages détectés sur un itinéraire rééchantillonné.
+
+    Les virages sont stockés dans un tableau structuré NumPy (DTYPE_VIRAGE)
+    exporté sans copie par vers_numpy() ; l'itération donne des Virage et
+    notes() le roadbook copilote sous la forme historique (lat, lon, note,
+    angle).
+    """
+    __slots__ = ("coordinates", "table", "params", "reliefs", "_index")
+
+    def __init__(self, coordinates, table, params, reliefs=None):
+        self.coordinates = coordinates
+        self.table = table
+        self.params = params
+        self.reliefs = np.zeros(0, dtype=DTYPE_RELIEF) if reliefs is None else reliefs
+        self._index = None
+
+    @classmethod
+    def depuis_colonnes(cls, coordinates, params, index, index_fin, gauche, angle_total, distance, abscisses,
+                        ids=None, notes=None):
+        """Construit la table à partir des colonnes produites par la détection.
+
+        Sans `notes`, la gravité vient de l'angle cumulé et de params.bornes_notes.
+        """
+        coordinates = np.asarray(coordinates, dtype=np.float64)
+        index = np.asarray(index, dtype=np.int64)
+        index_debut = np.maximum(index - 1, 0)
+        index_fin = np.minimum(index_fin, len(coordinates) - 1)
+        angle_total = np.asarray(angle_total, dtype=np.float64)
+
+        table = np.empty(len(index), dtype=DTYPE_VIRAGE)
+        table["id"] = np.arange(len(index)) if ids is None else ids
+        table["index"] = index
+        table["index_debut"] = index_debut
+        table["index_fin"] = index_fin
+        for prefixe, colonne in (("", index), ("_debut", index_debut), ("_fin", index_fin)):
+            table["lon" + prefixe] = coordinates[colonne, 0]
+            table["lat" + prefixe] = coordinates[colonne, 1]
+        table["angle"] = np.where(gauche, angle_total, -angle_total)
+        if notes is None:
+            bornes = np.asarray(params.bornes_notes)
+            notes = 6 - np.searchsorted(bornes, np.trunc(angle_total), side="right")
+        table["note"] = notes
+        table["longueur"] = distance
+        table["distance_depart"] = abscisses[index_debut]
+        return cls(coordinates, table, params)
+
+    @property
+    def virages(self):
+        return list(self)
+
+    def _virage(self, ligne):
+        return Virage(
+            index=int(ligne["index"]),
+            index_debut=int(ligne["index_debut"]),
+            index_fin=int(ligne["index_fin"]),
+            direction="droite" if np.signbit(ligne["angle"]) else "gauche",
+            angle_total=float(abs(ligne["angle"])),
+            distance=float(ligne["longueur"]),
+        )
+
+    def __iter__(self):
+        for ligne in self.table:
+            yield self._virage(ligne)
+
+    def __len__(self):
+        return len(self.table)
+
+    def __getitem__(self, index):
+        return self._virage(self.table[index])
+
+    def vers_numpy(self):
+        """Tableau structuré des virages (vue, sans copie)"""
+        return self.table
+
+    def colonne(self, nom):
+        return self.table[nom]
+
+    def index_spatial(self):
+        """Index spatial des points rééchantillonnés, construit au premier appel"""
+        if self._index is None:
+            self._index = IndexSpatial(self.coordinates)
+        return self._index
+
+    def virage_en(self, lon, lat, rayon=50.0):
+        """Ligne du virage qui contient la position (lon, lat), -1 si aucun ou trop loin de l'itinéraire"""
+        segments, _, ecarts, _ = self.index_spatial().segments_proches(lon, lat, rayon)
+        if not len(segments):
+            return -1
+        k = segments[np.argmin(ecarts)]
+        # Virages chevauchants : le dernier commencé l'emporte
+        ligne = int(np.searchsorted(self.table["index_debut"], k, side="right")) - 1
+        return ligne if ligne >= 0 and k < self.table["index_fin"][ligne] else -1
+
+    def classes(self):
+        """(virage, note, couleur) pour chaque virage"""
+        for ligne in self.table:
+            virage = self._virage(ligne)
+            note = int(ligne["note"])
+            yield virage, libelle_note(note, virage.direction), self.params.couleurs[6 - note]
+
+    def notes(self, distances=False):
+        """Liste (lat, lon, note, angle) : un point par virage ou un début et une fin.
+
+        Le relief éventuel (bosse, creux, compression) s'intercale à sa
+        place le long de l'itinéraire, avec un angle nul. Avec `distances`,
+        chaque note porte en plus sa distance depuis le départ (mètres).
+        """
+        notes = []
+        abscisses = []
+        for ligne, (virage, note, _) in zip(self.table, self.classes()):
+            angle_final = int(virage.angle_total)
+            debut = float(ligne["distance_depart"])
+            if self.params.marqueurs == "sommet":
+                notes.append((ligne["lat"], ligne["lon"], note, angle_final, debut))
+                abscisses.append(debut)
+            else:
+                notes.append((ligne["lat_debut"], ligne["lon_debut"], f"Début {note}", angle_final, debut))
+                notes.append((ligne["lat_fin"], ligne["lon_fin"], f"Fin {note}", angle_final,
+                              debut + float(ligne["longueur"])))
+                abscisses.extend((debut, debut))
+
+        for relief in self.reliefs:
+            notes.append((relief["lat"], relief["lon"], TYPES_RELIEF[relief["type"]], 0,
+                          float(relief["distance_depart"])))
+            abscisses.append(relief["distance_depart"])
+        if len(self.reliefs):
+            notes = [notes[k] for k in np.argsort(abscisses, kind="stable")]
+        return notes if distances else [note[:4] for note in notes]
+
+    # === Sérialisation ===
+    def ecrire(self, chemin):
+        """Format binaire compact : en-tête JSON puis table et points bruts, alignés"""
+        coordinates = np.ascontiguousarray(self.coordinates, dtype=np.float64).reshape(-1, 2)
+        entete = {
+            "dtype": DTYPE_VIRAGE.descr,
+            "nb_virages": len(self.table),
+            "nb_points": len(coordinates),
+            "params": asdict(self.params),
+        }
+        if len(self.reliefs):
+            entete["dtype_reliefs"] = DTYPE_RELIEF.descr
+            entete["nb_reliefs"] = len(self.reliefs)
+        texte = json.dumps(entete, ensure_ascii=False).encode()
+        debut_table = -(-(len(MAGIC) + 4 + len(texte)) // ALIGNEMENT) * ALIGNEMENT
+        debut_points = -(-(debut_table + self.table.nbytes) // ALIGNEMENT) * ALIGNEMENT
+        debut_reliefs = -(-(debut_points + coordinates.nbytes) // ALIGNEMENT) * ALIGNEMENT
+        with open(chemin, "wb") as f:
+            f.write(MAGIC)
+            f.write(np.uint32(len(texte)).tobytes())
+            f.write(texte)
+            f.write(b"\0" * (debut_table - f.tell()))
+            f.write(np.ascontiguousarray(self.table).tobytes())
+            f.write(b"\0" * (debut_points - f.tell()))
+            f.write(coordinates.tobytes())
+            if len(self.reliefs):
+                f.write(b"\0" * (debut_reliefs - f.tell()))
+                f.write(np.ascontiguousarray(self.reliefs, dtype=DTYPE_RELIEF).tobytes())
+
+    @classmethod
+    def charger(cls, chemin, mmap=True):
+        """Relit un fichier écrit par ecrire(), en mémoire projetée par défaut (sans copie)"""
+        with open(chemin, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{chemin} n'est pas un roadbook binaire")
+            taille = int(np.frombuffer(f.read(4), dtype=np.uint32)[0])
+            entete = json.loads(f.read(taille))
+        dtype = np.dtype([tuple(champ) for champ in entete["dtype"]])
+        debut_table = -(-(len(MAGIC) + 4 + taille) // ALIGNEMENT) * ALIGNEMENT
+        debut_points = -(-(debut_table + entete["nb_virages"] * dtype.itemsize) // ALIGNEMENT) * ALIGNEMENT
+
+        def lire(decalage, type_, forme):
+            if not np.prod(forme):
+                return np.zeros(forme, dtype=type_)
+            if mmap:
+                return np.memmap(chemin, dtype=type_, mode="r", offset=decalage, shape=forme)
+            return np.fromfile(chemin, dtype=type_, count=int(np.prod(forme)), offset=decalage).reshape(forme)
+
+        table = lire(debut_table, dtype, (entete["nb_virages"],))
+        coordinates = lire(debut_points, np.float64, (entete["nb_points"], 2))
+        reliefs = None
+        if entete.get("nb_reliefs"):
+            dtype_reliefs = np.dtype([tuple(champ) for champ in entete["dtype_reliefs"]])
+            debut_reliefs = -(-(debut_points + entete["nb_points"] * 16) // ALIGNEMENT) * ALIGNEMENT
+            reliefs = lire(debut_reliefs, dtype_reliefs, (entete["nb_reliefs"],))
+        return cls(coordinates, table, _parametres(entete["params"]), reliefs)
+
+    def vers_arrow(self):
+        """Table pyarrow (une colonne par champ), paramètres dans les métadonnées"""
+        import pyarrow as pa
+
+        colonnes = {nom: np.ascontiguousarray(self.table[nom]) for nom in self.table.dtype.names}
+        table = pa.table(colonnes)
+        return table.replace_schema_metadata({"params": json.dumps(asdict(self.params), ensure_ascii=False)})
+
+    def ecrire_parquet(self, chemin):
+        import pyarrow.parquet as pq
+
+        pq.write_table(self.vers_arrow(), chemin)
+
+    @classmethod
+    def charger_parquet(cls, chemin):
+        """Relit un fichier Parquet ; les points rééchantillonnés n'y figurent pas"""
+        import pyarrow.parquet as pq
+
+        arrow = pq.read_table(chemin)
+        table = np.empty(arrow.num_rows, dtype=DTYPE_VIRAGE)
+        for nom in DTYPE_VIRAGE.names:
+            table[nom] = arrow.column(nom).to_numpy()
+        params = _parametres(json.loads(arrow.schema.metadata[b"params"]))
+        return cls(np.zeros((0, 2)), table, params)
@@ -0,0 +1,175 @@
+"""Client de routage asynchrone (asyncio + aiohttp) pour openrouteservice.
+
+Une seule session HTTP est partagée par toutes les requêtes (connexions
+réutilisées), le débit est limité par un seau à jetons réglé sur le quota
+du fournisseur, et les erreurs transitoires (429, 5xx, coupure réseau) sont
+relancées avec un délai exponentiel. `url_base` permet de viser un faux
+serveur de routage local.
+"""
+import asyncio
+import random
+import time
+
+from rally.assemblage import POINTS_PAR_TRONCON, assembler, decouper
+from rally.itineraire import PROFIL
+
+URL_ORS = "https://api.openrouteservice.org"
+REQUETES_PAR_MINUTE = 40  # Quota directions du compte gratuit
+CODES_TRANSITOIRES = {429, 500, 502, 503, 504}
+
+
+class ErreurRoutage(RuntimeError):
+    """Réponse d'erreur définitive du service de routage"""
+
+    def __init__(self, statut, message):
+        super().__init__(f"HTTP {statut} : {message}")
+        self.statut = statut
+
+
+class SeauJetons:
+    """Limiteur de débit : `debit_par_minute` jetons par minute, au plus `capacite` en réserve"""
+
+    def __init__(self, debit_par_minute, capacite=1):
+        self.debit = debit_par_minute / 60
+        self.capacite = capacite
+        self.jetons = float(capacite)
+        self.dernier = time.monotonic()
+        self._verrou = asyncio.Lock()
+
+    def _remplir(self):
+        maintenant = time.monotonic()
+        self.jetons = min(self.capacite, self.jetons + (maintenant - self.dernier) * self.debit)
+        self.dernier = maintenant
+
+    async def acquerir(self):
+        # Le verrou sert les demandes dans l'ordre d'arrivée
+        async with self._verrou:
+            self._remplir()
+            if self.jetons < 1:
+                await asyncio.sleep((1 - self.jetons) / self.debit)
+                self._remplir()
+            self.jetons -= 1
+
+
+class ClientRoutageAsync:
+    """Équivalent asynchrone de openrouteservice.Client.directions.
+
+        async with ClientRoutageAsync(cle_api) as client:
+            routes = await client.itineraires([[depart, arrivee], ...])
+
+    Si `cache` (CacheItineraires) est fourni, il est consulté avant chaque
+    requête et alimenté avec les réponses.
+    """
+
+    def __init__(self, cle_api=None, url_base=URL_ORS, requetes_par_minute=REQUETES_PAR_MINUTE,
+                 rafale=1, connexions=8, tentatives=5, delai_initial=1.0, delai_max=30.0,
+                 timeout=60.0, cache=None, session=None):
+        self.cle_api = cle_api
+        self.url_base = url_base.rstrip("/")
+        self.seau = SeauJetons(requetes_par_minute, rafale) if requetes_par_minute else None
+        self.connexions = connexions
+        self.tentatives = tentatives
+        self.delai_initial = delai_initial
+        self.delai_max = delai_max
+        self.timeout = timeout
+        self.cache = cache
+        self.session = session
+        self._session_propre = False
+        self.nb_requetes = 0
+        self.nb_relances = 0
+
+    async def __aenter__(self):
+        if self.session is None:
+            import aiohttp
+
+            self.session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=self.connexions),
+                timeout=aiohttp.ClientTimeout(total=self.timeout),
+            )
+            self._session_propre = True
+        return self
+
+    async def __aexit__(self, *exc):
+        if self._session_propre:
+            await self.session.close()
+            self.session = None
+            self._session_propre = False
+
+    def _delai(self, tentative, retry_after=None):
+        if retry_after is not None:
+            try:
+                return min(self.delai_max, float(retry_after))
+            except ValueError:
+                pass
+        return min(self.delai_max, self.delai_initial * 2 ** tentative) * random.uniform(0.5, 1.0)
+
+    async def _poster(self, url, corps):
+        import aiohttp
+
+        entetes = {"Accept": "application/geo+json, application/json"}
+        if self.cle_api:
+            entetes["Authorization"] = self.cle_api
+
+        for tentative in range(self.tentatives):
+            if self.seau is not None:
+                await self.seau.acquerir()
+            self.nb_requetes += 1
+            retry_after = None
+            try:
+                async with self.session.post(url, json=corps, headers=entetes) as reponse:
+                    if reponse.status == 200:
+                        return await reponse.json(content_type=None)
+                    message = await reponse.text()
+                    if reponse.status not in CODES_TRANSITOIRES:
+                        raise ErreurRoutage(reponse.status, message)
+                    retry_after = reponse.headers.get("Retry-After")
+                    erreur = ErreurRoutage(reponse.status, message)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as exc:
+                erreur = exc
+
+            if tentative == self.tentatives - 1:
+                raise erreur
+            self.nb_relances += 1
+            await asyncio.sleep(self._delai(tentative, retry_after))
+
+    async def directions(self, coordinates, profile=PROFIL, format="geojson", **options):
+        """Route GeoJSON entre des points (lon, lat), comme openrouteservice.Client"""
+        cle = None
+        if self.cache is not None:
+            cle = self.cache.cle(coordinates, profile, format=format, **options)
+            route = await asyncio.to_thread(self.cache.lire, cle)
+            if route is not None:
+                return route
+
+        corps = {"coordinates": [list(p) for p in coordinates], **options}
+        route = await self._poster(f"{self.url_base}/v2/directions/{profile}/{format}", corps)
+
+        if cle is not None:
+            await asyncio.to_thread(self.cache.ecrire, cle, route)
+        return route
+
+    async def itineraires(self, liste_points, profile=PROFIL):
+        """Routes pour plusieurs listes de points (lat, lon), lancées simultanément.
+
+        Une exception est retournée à la place de la route en cas d'échec.
+        """
+        taches = [
+            self.directions([tuple(p[::-1]) for p in points], profile=profile)
+            for points in liste_points
+        ]
+        return await asyncio.gather(*taches, return_exceptions=True)
+
+    async def parcours(self, points, profile=PROFIL, points_par_troncon=POINTS_PAR_TRONCON):
+        """Route raccordée passant par tous les points (lat, lon), tronçons lancés simultanément"""
+        troncons = decouper([tuple(p[::-1]) for p in points], points_par_troncon)
+        routes = await asyncio.gather(*(self.directions(t, profile=profile) for t in troncons))
+        return assembler(routes)
+
+
+def recuperer_routes(liste_points, **options):
+    """Version bloquante de ClientRoutageAsync.itineraires"""
+    async def _tout():
+        async with ClientRoutageAsync(**options) as client:
+            return await client.itineraires(liste_points)
+
+    return asyncio.run(_tout())
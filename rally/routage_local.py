@@ -0,0 +1,451 @@
+"""Routage hors ligne sur un extrait OpenStreetMap, sans openrouteservice.
+
+Le réseau routier d'un extrait OSM (XML, ou PBF si pyosmium est installé)
+est chargé dans un graphe compact en tableaux NumPy (adjacence CSR, poids en
+secondes) ; le plus court chemin est calculé par A* ou par Dijkstra
+bidirectionnel. Le graphe est mis en cache dans un fichier binaire relu en
+mémoire projetée : les démarrages suivants évitent l'analyse de l'extrait.
+
+    client = ClientLocal.depuis_osm("normandie.osm.pbf")
+    route = recuperer_route(client, debut, fin)  # même GeoJSON qu'openrouteservice
+"""
+import hashlib
+import heapq
+import json
+import math
+import os
+import xml.etree.ElementTree as ET
+from array import array
+
+import numpy as np
+
+from rally.geodesie import RAYON_TERRE, distances_haversine
+from rally.index_spatial import IndexSpatial
+
+DOSSIER_GRAPHES = "cache/graphes"
+MAGIC = b"RGR1"
+ALIGNEMENT = 16
+VERSION = 2  # À incrémenter si la construction du graphe change
+
+# Vitesse par défaut (km/h) des routes carrossables, faute de maxspeed
+VITESSES = {
+    "motorway": 110, "motorway_link": 60,
+    "trunk": 90, "trunk_link": 50,
+    "primary": 80, "primary_link": 50,
+    "secondary": 70, "secondary_link": 50,
+    "tertiary": 60, "tertiary_link": 40,
+    "unclassified": 50, "road": 50,
+    "residential": 30, "living_street": 10, "service": 20,
+}
+SENS_UNIQUE = {"yes": 1, "true": 1, "1": 1, "-1": -1, "reverse": -1}
+
+# Tableaux du graphe : nom -> type (le nombre d'éléments est dans l'en-tête)
+TABLEAUX = {
+    "lon": np.float64, "lat": np.float64,
+    "debuts": np.int64, "voisins": np.int32, "poids": np.float32, "longueurs": np.float32,
+    "debuts_inv": np.int64, "voisins_inv": np.int32, "poids_inv": np.float32,
+}
+
+
+class AucunItineraire(LookupError):
+    """Levée quand les deux points ne sont pas reliés dans le graphe"""
+
+
+# === Lecture des extraits ===
+class _Extrait:
+    """Nœuds et voies carrossables d'un extrait, en tableaux plats"""
+
+    def __init__(self):
+        self.ids_noeuds = array("q")
+        self.lon = array("d")
+        self.lat = array("d")
+        self.refs = array("q")  # Nœuds des voies, bout à bout
+        self.longueurs_voies = array("q")
+        self.sens = array("b")  # 1 : sens unique, -1 : sens unique inversé, 0 : double sens
+        self.vitesses = array("f")  # km/h
+
+    def ajouter_voie(self, refs, tags):
+        if len(refs) < 2:
+            return
+        self.refs.extend(refs)
+        self.longueurs_voies.append(len(refs))
+        sens = SENS_UNIQUE.get(tags.get("oneway", ""), 0)
+        if not sens and (tags.get("junction") == "roundabout" or tags["highway"] == "motorway"):
+            sens = 1
+        self.sens.append(sens)
+        self.vitesses.append(_vitesse(tags))
+
+
+def _vitesse(tags):
+    maxspeed = tags.get("maxspeed", "")
+    try:
+        vitesse = float(maxspeed[:-3]) * 1.609344 if maxspeed.endswith("mph") else float(maxspeed)
+    except ValueError:  # Absent, "FR:urban", "50;70"...
+        vitesse = 0
+    return vitesse if vitesse > 0 else VITESSES[tags["highway"]]
+
+
+def lire_osm_xml(chemin):
+    """Extrait OSM XML (.osm) lu en flux avec la bibliothèque standard"""
+    extrait = _Extrait()
+    refs, tags = [], {}
+    racine = None
+    for evenement, element in ET.iterparse(chemin, events=("start", "end")):
+        if evenement == "start":
+            if racine is None:
+                racine = element  # Vidée après chaque objet : les éléments lus ne restent pas attachés
+            continue
+        balise = element.tag
+        if balise == "node":
+            extrait.ids_noeuds.append(int(element.get("id")))
+            extrait.lon.append(float(element.get("lon")))
+            extrait.lat.append(float(element.get("lat")))
+            refs, tags = [], {}  # Les tags d'un nœud (feux, "oneway" isolé...) ne vont pas à la voie suivante
+            racine.clear()
+        elif balise == "nd":
+            refs.append(int(element.get("ref")))
+        elif balise == "tag":
+            tags[element.get("k")] = element.get("v")
+        elif balise == "way":
+            if tags.get("highway") in VITESSES:
+                extrait.ajouter_voie(refs, tags)
+            refs, tags = [], {}
+            racine.clear()
+        elif balise == "relation":
+            tags = {}
+            racine.clear()
+    return extrait
+
+
+def lire_osm_pbf(chemin):
+    """Extrait OSM PBF (.osm.pbf), lu avec pyosmium"""
+    import osmium
+
+    extrait = _Extrait()
+
+    class Lecteur(osmium.SimpleHandler):
+        def way(self, voie):
+            tags = {tag.k: tag.v for tag in voie.tags}
+            if tags.get("highway") not in VITESSES:
+                return
+            refs = []
+            for noeud in voie.nodes:
+                if not noeud.location.valid():
+                    continue
+                refs.append(noeud.ref)
+                extrait.ids_noeuds.append(noeud.ref)
+                extrait.lon.append(noeud.location.lon)
+                extrait.lat.append(noeud.location.lat)
+            extrait.ajouter_voie(refs, tags)
+
+    Lecteur().apply_file(chemin, locations=True)
+    return extrait
+
+
+# === Graphe CSR ===
+def _csr(origines, destinations, nb_noeuds, *valeurs):
+    """Adjacence compressée : voisins de u dans voisins[debuts[u]:debuts[u + 1]]"""
+    ordre = np.argsort(origines, kind="stable")
+    debuts = np.zeros(nb_noeuds + 1, dtype=np.int64)
+    np.cumsum(np.bincount(origines, minlength=nb_noeuds), out=debuts[1:])
+    return (debuts, destinations[ordre].astype(np.int32), *(v[ordre].astype(np.float32) for v in valeurs))
+
+
+class GrapheRoutier:
+    """Réseau routier orienté en tableaux NumPy (adjacence CSR dans les deux sens).
+
+    Les poids sont des durées de parcours (secondes) ; les longueurs des
+    arcs (mètres) servent au résumé de l'itinéraire.
+    """
+
+    def __init__(self, tableaux):
+        for nom in TABLEAUX:
+            setattr(self, nom, tableaux[nom])
+        self.vitesse_max = float((self.longueurs / np.maximum(self.poids, 1e-9)).max()) if len(self.poids) else 1.0
+        self._index = None
+        self._vues = None
+
+    def __len__(self):
+        return len(self.lon)
+
+    @property
+    def nb_arcs(self):
+        return len(self.voisins)
+
+    @classmethod
+    def depuis_extrait(cls, extrait):
+        ids = np.frombuffer(extrait.ids_noeuds, dtype=np.int64)
+        refs = np.frombuffer(extrait.refs, dtype=np.int64)
+        longueurs_voies = np.frombuffer(extrait.longueurs_voies, dtype=np.int64)
+
+        # Coordonnées des nœuds connus (les doublons du PBF sont identiques)
+        ids, premiers = np.unique(ids, return_index=True)
+        lon_tous = np.frombuffer(extrait.lon, dtype=np.float64)[premiers]
+        lat_tous = np.frombuffer(extrait.lat, dtype=np.float64)[premiers]
+        rang = np.minimum(np.searchsorted(ids, refs), max(len(ids) - 1, 0))
+        connu = (ids[rang] == refs) if len(ids) else np.zeros(len(refs), dtype=bool)
+
+        # Arc entre deux nœuds consécutifs d'une même voie, tous deux connus
+        voie = np.repeat(np.arange(len(longueurs_voies)), longueurs_voies)
+        suivant = (voie[:-1] == voie[1:]) & connu[:-1] & connu[1:]
+        a, b, voie = rang[:-1][suivant], rang[1:][suivant], voie[:-1][suivant]
+
+        # Seuls les nœuds reliés sont gardés, renumérotés de 0 à n - 1
+        utilises, local = np.unique(np.concatenate((a, b)), return_inverse=True)
+        a, b = local[:len(a)], local[len(a):]
+        lon, lat = lon_tous[utilises], lat_tous[utilises]
+
+        longueurs = distances_haversine(lon[a], lat[a], lon[b], lat[b])
+        sens = np.frombuffer(extrait.sens, dtype=np.int8)[voie]
+        vitesse = np.frombuffer(extrait.vitesses, dtype=np.float32)[voie].astype(np.float64) / 3.6
+        duree = longueurs / vitesse
+
+        avant, arriere = sens >= 0, sens <= 0
+        origines = np.concatenate((a[avant], b[arriere]))
+        destinations = np.concatenate((b[avant], a[arriere]))
+        durees = np.concatenate((duree[avant], duree[arriere]))
+        metres = np.concatenate((longueurs[avant], longueurs[arriere]))
+
+        nb = len(utilises)
+        debuts, voisins, poids, longueurs_arcs = _csr(origines, destinations, nb, durees, metres)
+        debuts_inv, voisins_inv, poids_inv = _csr(destinations, origines, nb, durees)
+        return cls({
+            "lon": lon, "lat": lat,
+            "debuts": debuts, "voisins": voisins, "poids": poids, "longueurs": longueurs_arcs,
+            "debuts_inv": debuts_inv, "voisins_inv": voisins_inv, "poids_inv": poids_inv,
+        })
+
+    # === Fichier binaire ===
+    def ecrire(self, chemin, source=None):
+        """En-tête JSON puis chaque tableau aligné sur 16 octets"""
+        entete = {"version": VERSION, "source": source or {}, "tableaux": {}}
+        position = 0
+        for nom in TABLEAUX:
+            tableau = getattr(self, nom)
+            entete["tableaux"][nom] = {"position": position, "taille": len(tableau)}
+            position = -(-(position + tableau.nbytes) // ALIGNEMENT) * ALIGNEMENT
+        texte = json.dumps(entete).encode()
+        debut_donnees = -(-(len(MAGIC) + 4 + len(texte)) // ALIGNEMENT) * ALIGNEMENT
+
+        temporaire = chemin + ".tmp"
+        with open(temporaire, "wb") as f:
+            f.write(MAGIC)
+            f.write(np.uint32(len(texte)).tobytes())
+            f.write(texte)
+            for nom in TABLEAUX:
+                f.write(b"\0" * (debut_donnees + entete["tableaux"][nom]["position"] - f.tell()))
+                f.write(np.ascontiguousarray(getattr(self, nom), dtype=TABLEAUX[nom]).tobytes())
+        os.replace(temporaire, chemin)  # Jamais de fichier à moitié écrit pour un autre processus
+
+    @staticmethod
+    def lire_entete(chemin):
+        with open(chemin, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{chemin} n'est pas un graphe routier")
+            taille = int(np.frombuffer(f.read(4), dtype=np.uint32)[0])
+            entete = json.loads(f.read(taille))
+        entete["debut_donnees"] = -(-(len(MAGIC) + 4 + taille) // ALIGNEMENT) * ALIGNEMENT
+        return entete
+
+    @classmethod
+    def charger(cls, chemin):
+        """Relit un fichier écrit par ecrire(), en mémoire projetée (sans copie)"""
+        entete = cls.lire_entete(chemin)
+        tableaux = {}
+        for nom, type_ in TABLEAUX.items():
+            info = entete["tableaux"][nom]
+            if info["taille"]:
+                tableaux[nom] = np.memmap(chemin, dtype=type_, mode="r",
+                                          offset=entete["debut_donnees"] + info["position"], shape=(info["taille"],))
+            else:
+                tableaux[nom] = np.zeros(0, dtype=type_)
+        return cls(tableaux)
+
+    # === Recherche ===
+    def index_spatial(self):
+        if self._index is None:
+            self._index = IndexSpatial(np.column_stack((self.lon, self.lat)), taille_cellule=200.0)
+        return self._index
+
+    def noeud_proche(self, lon, lat):
+        """Nœud du graphe le plus proche d'un point (lon, lat)"""
+        return self.index_spatial().plus_proche(lon, lat)[0]
+
+    def _tableaux_python(self):
+        # Les memoryview donnent des scalaires Python : bien plus rapide que l'indexation NumPy en boucle
+        if self._vues is None:
+            self._vues = tuple(memoryview(np.ascontiguousarray(getattr(self, nom))) for nom in (
+                "debuts", "voisins", "poids", "debuts_inv", "voisins_inv", "poids_inv", "lon", "lat"))
+        return self._vues
+
+    def a_etoile(self, source, cible):
+        """Liste des nœuds du chemin le plus rapide (A*, heuristique : vol d'oiseau à vitesse max)"""
+        debuts, voisins, poids, _, _, _, lon, lat = self._tableaux_python()
+        lon_c, lat_c = math.radians(lon[cible]), math.radians(lat[cible])
+        cos_c = math.cos(lat_c)
+        facteur = 2 * RAYON_TERRE / self.vitesse_max
+
+        def heuristique(u):
+            lat_u = math.radians(lat[u])
+            h = (math.sin((lat_c - lat_u) / 2) ** 2
+                 + math.cos(lat_u) * cos_c * math.sin((lon_c - math.radians(lon[u])) / 2) ** 2)
+            return facteur * math.asin(math.sqrt(min(h, 1.0))) * 0.999  # Marge : reste minorante
+
+        couts = {source: 0.0}
+        precedents = {source: -1}
+        file = [(heuristique(source), source)]
+        fermes = set()
+        while file:
+            _, u = heapq.heappop(file)
+            if u == cible:
+                return _remonter(precedents, cible)
+            if u in fermes:
+                continue
+            fermes.add(u)
+            cout_u = couts[u]
+            for arc in range(debuts[u], debuts[u + 1]):
+                v = voisins[arc]
+                cout = cout_u + poids[arc]
+                if cout < couts.get(v, math.inf):
+                    couts[v] = cout
+                    precedents[v] = u
+                    heapq.heappush(file, (cout + heuristique(v), v))
+        raise AucunItineraire(f"Nœuds {source} et {cible} non reliés")
+
+    def dijkstra_bidirectionnel(self, source, cible):
+        """Liste des nœuds du chemin le plus rapide, recherche depuis les deux extrémités"""
+        vues = self._tableaux_python()
+        sens = ((vues[0], vues[1], vues[2]), (vues[3], vues[4], vues[5]))
+        couts = ({source: 0.0}, {cible: 0.0})
+        precedents = ({source: -1}, {cible: -1})
+        files = ([(0.0, source)], [(0.0, cible)])
+        fermes = (set(), set())
+        meilleur, jonction = (0.0, source) if source == cible else (math.inf, -1)
+
+        while files[0] and files[1]:
+            if files[0][0][0] + files[1][0][0] >= meilleur:
+                break
+            cote = 0 if files[0][0][0] <= files[1][0][0] else 1
+            cout_u, u = heapq.heappop(files[cote])
+            if u in fermes[cote]:
+                continue
+            fermes[cote].add(u)
+            debuts, voisins, poids = sens[cote]
+            mes_couts, autres_couts = couts[cote], couts[1 - cote]
+            for arc in range(debuts[u], debuts[u + 1]):
+                v = voisins[arc]
+                cout = cout_u + poids[arc]
+                if cout < mes_couts.get(v, math.inf):
+                    mes_couts[v] = cout
+                    precedents[cote][v] = u
+                    heapq.heappush(files[cote], (cout, v))
+                if v in autres_couts and cout + autres_couts[v] < meilleur:
+                    meilleur, jonction = cout + autres_couts[v], v
+
+        if jonction < 0:
+            raise AucunItineraire(f"Nœuds {source} et {cible} non reliés")
+        aller = _remonter(precedents[0], jonction)
+        retour = _remonter(precedents[1], jonction)[::-1]
+        return aller + retour[1:]
+
+    def chemin(self, source, cible, algorithme="a_etoile"):
+        if algorithme == "a_etoile":
+            return self.a_etoile(source, cible)
+        if algorithme == "bidirectionnel":
+            return self.dijkstra_bidirectionnel(source, cible)
+        raise ValueError(f"Algorithme inconnu : {algorithme}")
+
+    def resume(self, noeuds):
+        """(distance en mètres, durée en secondes) d'un chemin"""
+        distance = duree = 0.0
+        for u, v in zip(noeuds[:-1], noeuds[1:]):
+            arcs = np.arange(self.debuts[u], self.debuts[u + 1])
+            arc = arcs[np.argmin(np.where(self.voisins[arcs] == v, self.poids[arcs], np.inf))]
+            distance += float(self.longueurs[arc])
+            duree += float(self.poids[arc])
+        return distance, duree
+
+
+def _remonter(precedents, noeud):
+    chemin = []
+    while noeud >= 0:
+        chemin.append(noeud)
+        noeud = precedents[noeud]
+    return chemin[::-1]
+
+
+# === Cache du graphe ===
+def _empreinte_source(chemin):
+    etat = os.stat(chemin)
+    return {"chemin": os.path.abspath(chemin), "taille": etat.st_size, "modifie": etat.st_mtime_ns}
+
+
+def charger_graphe(chemin_osm, dossier_cache=DOSSIER_GRAPHES):
+    """Graphe d'un extrait OSM, relu depuis le cache binaire s'il est à jour"""
+    source = _empreinte_source(chemin_osm)
+    nom = os.path.basename(chemin_osm).split(".")[0]
+    suffixe = hashlib.sha256(source["chemin"].encode()).hexdigest()[:8]
+    chemin_cache = os.path.join(dossier_cache, f"{nom}-{suffixe}.rgr")
+
+    if os.path.exists(chemin_cache):
+        try:
+            entete = GrapheRoutier.lire_entete(chemin_cache)
+            if entete["version"] == VERSION and entete["source"] == source:
+                return GrapheRoutier.charger(chemin_cache)
+        except (ValueError, KeyError, OSError):
+            pass  # Cache illisible : reconstruit ci-dessous
+
+    lire = lire_osm_pbf if chemin_osm.endswith(".pbf") else lire_osm_xml
+    graphe = GrapheRoutier.depuis_extrait(lire(chemin_osm))
+    os.makedirs(dossier_cache, exist_ok=True)
+    graphe.ecrire(chemin_cache, source)
+    return GrapheRoutier.charger(chemin_cache)
+
+
+# === Client compatible openrouteservice ===
+class ClientLocal:
+    """Remplace openrouteservice.Client pour les appels directions, sans réseau.
+
+    La réponse a la forme GeoJSON d'openrouteservice : une Feature dont la
+    géométrie LineString (lon, lat) passe par les nœuds du chemin, avec un
+    résumé distance / durée et les indices des points de passage.
+    """
+
+    def __init__(self, graphe, algorithme="a_etoile"):
+        self.graphe = graphe
+        self.algorithme = algorithme
+
+    @classmethod
+    def depuis_osm(cls, chemin_osm, **options):
+        return cls(charger_graphe(chemin_osm), **options)
+
+    def directions(self, coordinates, profile="driving-car", format="geojson", **options):
+        if profile != "driving-car" or format != "geojson":
+            raise ValueError("Le routage local ne fournit que driving-car au format geojson")
+        graphe = self.graphe
+        noeuds = [graphe.noeud_proche(lon, lat) for lon, lat in coordinates]
+
+        chemin, points_passage = [noeuds[0]], [0]
+        for source, cible in zip(noeuds[:-1], noeuds[1:]):
+            chemin.extend(graphe.chemin(source, cible, self.algorithme)[1:])
+            points_passage.append(len(chemin) - 1)
+        distance, duree = graphe.resume(chemin)
+
+        geometrie = np.column_stack((graphe.lon[chemin], graphe.lat[chemin]))
+        if len(geometrie) == 1:
+            geometrie = np.repeat(geometrie, 2, axis=0)  # LineString : au moins deux positions
+        return {
+            "type": "FeatureCollection",
+            "bbox": [*geometrie.min(axis=0).tolist(), *geometrie.max(axis=0).tolist()],
+            "features": [{
+                "type": "Feature",
+                "bbox": [*geometrie.min(axis=0).tolist(), *geometrie.max(axis=0).tolist()],
+                "properties": {
+                    "summary": {"distance": round(distance, 1), "duration": round(duree, 1)},
+                    "way_points": points_passage,
+                },
+                "geometry": {"type": "LineString", "coordinates": geometrie.tolist()},
+            }],
+            "metadata": {"engine": {"name": "rally.routage_local"},
+                         "query": {"coordinates": [list(p) for p in coordinates], "profile": profile}},
+        }
@@ -0,0 +1,198 @@
+"""Routes communes à plusieurs étapes ou passages : tronçons analysés une seule fois.
+
+Un rallye emprunte plusieurs fois les mêmes routes (deuxième passage d'une
+spéciale, étapes qui se chevauchent, enchaînements). Reglage.analyser
+rééchantillonne la géométrie brute par tronçons entre des sommets « ancres »
+choisis d'après leurs seules coordonnées (rally.reechantillonnage.
+interpoler_ancres) : une même route donne les mêmes tronçons et les mêmes
+points, quelle que soit l'étape qui la parcourt. Le magasin mémorise les
+points, vecteurs, longueurs, angles et sens de rotation de chaque tronçon
+sous l'empreinte de ses sommets. Une étape ne calcule ainsi que ses
+tronçons nouveaux, raccorde les autres, puis regroupe les virages. Une étape
+déjà vue en entier (même géométrie, même réglage) reprend directement ses
+virages.
+
+    magasin = MagasinSegments(PRESETS["phase1_2"])
+    for coordonnees in etapes:
+        roadbook = magasin.analyser(coordonnees)
+    print(magasin.resume())
+
+Le roadbook est identique, au bit près, à celui de Reglage.analyser : chaque
+tronçon est rééchantillonné dans son propre repère d'abscisses, et chaque
+longueur géodésique ne dépend que de son segment (distances_vincenty avec
+`par_couple`). Note à l'angle cumulé uniquement.
+"""
+import hashlib
+import time
+from collections import OrderedDict
+from typing import NamedTuple
+
+import numpy as np
+
+from rally.geodesie import longueurs_segments
+from rally.projection import TraceMetrique
+from rally.reechantillonnage import PAS_ANCRES, ancres, interpoler_troncons, quantifier
+from rally.roadbook import Roadbook
+from rally.simplification import simplifier
+from rally.virages import courbure_vecteurs, grouper_virages, mesurer_longueurs
+
+CAPACITE = 200_000  # Tronçons gardés en mémoire (les moins récemment utilisés sont évincés)
+
+
+class Troncon(NamedTuple):
+    """Tronçon rééchantillonné : ses n points, à partir de son ancre de début (exclue : son ancre de fin)"""
+    points: np.ndarray  # (n, 2) lon, lat
+    vecteurs: np.ndarray  # (n, 2) du point k au suivant, le dernier allant à l'ancre de fin
+    longueurs: np.ndarray  # (n,) mètres
+    angles: np.ndarray  # (n,) degrés, angles[0] dépend du tronçon précédent (recalculé au raccord)
+    gauche: np.ndarray  # (n,)
+    duree: float  # Secondes passées à le calculer
+
+
+def calculer_troncons(brut, debuts, fins, distance, params):
+    """Troncons des sommets bruts debuts[k]..fins[k] (inclus), calculés ensemble en une passe vectorisée.
+
+    Seuls les sommets des tronçons demandés sont mesurés. Le résultat de
+    chaque tronçon ne dépend pas des autres tronçons du lot, au bit près.
+    """
+    debut_calcul = time.perf_counter()
+    # Sommets des tronçons mis bout à bout (le segment d'un tronçon au suivant n'est jamais utilisé)
+    tailles = fins - debuts + 1
+    premiers = np.cumsum(tailles) - tailles
+    sommets = brut[np.repeat(debuts - premiers, tailles) + np.arange(tailles.sum())]
+    points, nb_pas = interpoler_troncons(sommets, premiers, premiers + tailles - 1, distance,
+                                         mesurer_longueurs(sommets, params))
+
+    if params.repere_metrique:
+        trace = TraceMetrique(points)
+        vecteurs, longueurs = trace.vecteurs, trace.longueurs
+    else:
+        vecteurs, longueurs = np.diff(points, axis=0), longueurs_segments(points)
+    angles, gauche = courbure_vecteurs(vecteurs)
+    duree = (time.perf_counter() - debut_calcul) / max(1, len(points))
+    departs = np.cumsum(nb_pas + 1) - (nb_pas + 1)
+    return [Troncon(points[d:d + n], vecteurs[d:d + n], longueurs[d:d + n], angles[d:d + n], gauche[d:d + n],
+                    duree * (n + 1))
+            for d, n in zip(departs.tolist(), nb_pas.tolist())]
+
+
+class MagasinSegments:
+    """Tronçons et étapes déjà analysés pour un réglage (note à l'angle cumulé), partagés entre étapes"""
+
+    def __init__(self, reglage, capacite=CAPACITE, pas_ancres=PAS_ANCRES):
+        if reglage.rayons is not None:
+            raise ValueError("Mutualisation des tronçons disponible pour la note à l'angle cumulé uniquement")
+        self.reglage = reglage
+        self.capacite = capacite
+        self.pas_ancres = pas_ancres
+        self.troncons = OrderedDict()
+        self.etapes = OrderedDict()  # Empreinte de l'étape -> (roadbook, durée de son analyse)
+        self.nb_troncons = self.troncons_reutilises = 0
+        self.nb_points = self.points_reutilises = 0
+        self.nb_etapes = self.etapes_reutilisees = 0
+        self.economie = 0.0  # Secondes de calcul évitées, d'après la durée du premier calcul
+
+    @property
+    def params(self):
+        return self.reglage.virages
+
+    def analyser(self, coordinates):
+        """Roadbook d'une géométrie brute (lon, lat), tronçons déjà vus repris du magasin"""
+        debut = time.perf_counter()
+        brut = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+        if self.reglage.simplification is not None:
+            brut = simplifier(brut, self.reglage.simplification)
+        q = quantifier(brut)
+        positions = np.flatnonzero(ancres(q, self.pas_ancres))
+        octets, taille = q.tobytes(), q.itemsize * 2  # Empreinte d'un tronçon : octets de ses sommets quantifiés
+        cles = [octets[a * taille:(b + 1) * taille] for a, b in zip(positions[:-1].tolist(), positions[1:].tolist())]
+        self.nb_etapes += 1
+        self.nb_troncons += len(cles)
+
+        # Étape entière déjà analysée (deuxième passage)
+        cle_etape = hashlib.sha1(b"".join(cles)).digest()
+        connue = self.etapes.get(cle_etape)
+        if connue is not None:
+            roadbook, duree = connue
+            self.etapes.move_to_end(cle_etape)
+            self.etapes_reutilisees += 1
+            self.troncons_reutilises += len(cles)
+            self.nb_points += len(roadbook.coordinates)
+            self.points_reutilises += len(roadbook.coordinates)
+            self.economie += duree
+            return Roadbook(roadbook.coordinates, roadbook.table.copy(), roadbook.params)
+
+        # Tronçons nouveaux calculés ensemble, les autres repris du magasin
+        troncons = {}
+        for cle in cles:
+            troncon = self.troncons.get(cle)
+            if troncon is not None and cle not in troncons:
+                self.troncons.move_to_end(cle)
+                self.troncons_reutilises += 1
+                self.points_reutilises += len(troncon.points)
+                self.economie += troncon.duree
+            troncons[cle] = troncon
+        manquants = [k for k, cle in enumerate(cles) if troncons[cle] is None]
+        manquants = list({cles[k]: k for k in reversed(manquants)}.values())  # Un calcul par empreinte
+        if manquants:
+            calcules = calculer_troncons(brut, positions[manquants], positions[np.add(manquants, 1)],
+                                         self.reglage.distance, self.params)
+            for k, troncon in zip(manquants, calcules):
+                troncons[cles[k]] = self.troncons[cles[k]] = troncon
+            while len(self.troncons) > self.capacite:
+                self.troncons.popitem(last=False)
+
+        roadbook = self._raccorder([troncons[cle] for cle in cles], brut[-1])
+        self.nb_points += len(roadbook.coordinates)
+        self.etapes[cle_etape] = (roadbook, time.perf_counter() - debut)
+        if len(self.etapes) > max(1, self.capacite // 100):
+            self.etapes.popitem(last=False)
+        return Roadbook(roadbook.coordinates, roadbook.table.copy(), roadbook.params)
+
+    def _raccorder(self, troncons, arrivee):
+        """Roadbook des tronçons mis bout à bout, angles recalculés aux ancres"""
+        params = self.params
+        troncons = [t for t in troncons if len(t.points)]
+        if not troncons:
+            points = arrivee[None, :].copy()
+            return Roadbook.depuis_colonnes(points, params, *grouper_virages(np.zeros(1), np.zeros(1, dtype=bool),
+                                                                              np.zeros(0), params), np.zeros(1))
+        points = np.concatenate([t.points for t in troncons] + [arrivee[None, :]])
+        vecteurs = np.concatenate([t.vecteurs for t in troncons])
+        longueurs = np.concatenate([t.longueurs for t in troncons])
+        angles = np.concatenate([t.angles for t in troncons] + [np.zeros(1)])
+        gauche = np.concatenate([t.gauche for t in troncons] + [np.zeros(1, dtype=bool)])
+
+        # Ancres intérieures : l'angle dépend des deux tronçons qu'elles relient
+        raccords = np.cumsum([len(t.points) for t in troncons[:-1]]).astype(np.int64)
+        angles[0], gauche[0] = 0.0, False
+        if len(raccords):
+            paires = np.empty((2 * len(raccords), 2))
+            paires[0::2], paires[1::2] = vecteurs[raccords - 1], vecteurs[raccords]
+            a, g = courbure_vecteurs(paires)
+            angles[raccords], gauche[raccords] = a[1::2], g[1::2]
+
+        colonnes = grouper_virages(angles, gauche, longueurs, params)
+        abscisses = np.concatenate(([0.0], np.cumsum(longueurs)))
+        return Roadbook.depuis_colonnes(points, params, *colonnes, abscisses)
+
+    def taux(self):
+        """Part des tronçons repris du magasin"""
+        return self.troncons_reutilises / self.nb_troncons if self.nb_troncons else 0.0
+
+    def resume(self):
+        return (f"{self.troncons_reutilises}/{self.nb_troncons} tronçons réutilisés ({self.taux():.0%}), "
+                f"{self.points_reutilises}/{self.nb_points} points, "
+                f"{self.etapes_reutilisees}/{self.nb_etapes} étapes entières, "
+                f"{self.economie * 1000:.0f} ms de calcul évités")
+
+
+_MAGASINS = {}
+
+
+def magasin_partage(reglage):
+    """MagasinSegments unique par réglage dans le processus : partagé par les étapes qu'il traite"""
+    magasin = _MAGASINS.get(reglage)
+    if magasin is None:
+        magasin = _MAGASINS[reglage] = MagasinSegments(reglage)
+    return magasin
@@ -0,0 +1,387 @@
+"""Service HTTP local de roadbooks (asyncio + aiohttp), caches gardés chauds en mémoire.
+
+Un processus de longue durée remplace le lancement d'un script par
+roadbook : numpy, le rendu et le client de routage ne sont chargés qu'une
+fois, les routes et les roadbooks calculés restent en mémoire (évincés par
+ordre de dernier usage au-delà de leur capacité). Le routage est attendu
+sans bloquer la boucle (client asynchrone, ou client bloquant dans un
+thread) ; l'analyse et le rendu de la carte, limités par le calcul, partent
+dans un pool de processus, dont chacun garde ses modules importés. Deux
+demandes identiques simultanées partagent le même calcul.
+
+    python -m rally serveur --port 8080
+    curl -X POST localhost:8080/roadbook -d '{"depart": [49.0604, 1.5994], "arrivee": [48.8268, 1.3312]}'
+
+Points d'accès :
+  POST /roadbook        {"depart": [lat, lon], "arrivee": [lat, lon], "etapes": [[lat, lon], ...],
+                         "preset", "distance", "gravite", "repere_metrique", "points_par_troncon"}
+                        -> {"id", "notes": [{"lat", "lon", "note", "angle"}], "nb_points",
+                            "nb_virages", "carte": "/carte/<id>", "cache", "durees"}
+  GET  /roadbook/<id>   même réponse, tant que le roadbook est en mémoire
+  GET  /carte/<id>      carte HTML (Leaflet) du roadbook
+  GET  /etat            compteurs des caches et des calculs
+"""
+import argparse
+import asyncio
+import hashlib
+import io
+import json
+import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import replace
+
+from rally.presets import PRESET_DEFAUT, PRESETS
+from rally.rayons import ParametresRayon
+
+CAPACITE_ROUTES = 256  # Routes gardées en mémoire
+CAPACITE_ROADBOOKS = 64  # Roadbooks (notes et carte HTML) gardés en mémoire
+PORT = 8080
+
+
+class Lru:
+    """Dictionnaire borné : au-delà de `capacite` entrées, la moins récemment utilisée est évincée"""
+
+    def __init__(self, capacite):
+        self.capacite = capacite
+        self.entrees = OrderedDict()
+        self.succes = self.echecs = self.evictions = 0
+
+    def lire(self, cle):
+        valeur = self.entrees.get(cle)
+        if valeur is None:
+            self.echecs += 1
+            return None
+        self.entrees.move_to_end(cle)
+        self.succes += 1
+        return valeur
+
+    def ecrire(self, cle, valeur):
+        self.entrees[cle] = valeur
+        self.entrees.move_to_end(cle)
+        while len(self.entrees) > self.capacite:
+            self.entrees.popitem(last=False)
+            self.evictions += 1
+
+    def etat(self):
+        return {"taille": len(self.entrees), "capacite": self.capacite, "succes": self.succes,
+                "echecs": self.echecs, "evictions": self.evictions}
+
+
+def _point(valeur, nom):
+    try:
+        lat, lon = (float(x) for x in valeur)
+    except (TypeError, ValueError):
+        raise ValueError(f"{nom} attendu sous la forme [lat, lon] : {valeur!r}")
+    return lat, lon
+
+
+def _nombre(valeur, nom):
+    try:
+        return float(valeur)
+    except (TypeError, ValueError):
+        raise ValueError(f"{nom} : nombre attendu, pas {valeur!r}")
+
+
+def lire_demande(demande):
+    """(points (lat, lon), points par tronçon, réglage) d'une demande JSON de roadbook"""
+    if not isinstance(demande, dict):
+        raise ValueError("Objet JSON attendu")
+    inconnus = set(demande) - {"depart", "arrivee", "etapes", "preset", "distance", "gravite",
+                               "repere_metrique", "points_par_troncon"}
+    if inconnus:
+        raise ValueError(f"Champ(s) inconnu(s) : {', '.join(sorted(inconnus))}")
+    if "depart" not in demande or "arrivee" not in demande:
+        raise ValueError("Champs depart et arrivee obligatoires")
+    points = (_point(demande["depart"], "depart"),
+              *(_point(p, "etape") for p in demande.get("etapes") or ()),
+              _point(demande["arrivee"], "arrivee"))
+
+    preset = demande.get("preset", PRESET_DEFAUT)
+    if preset not in PRESETS:
+        raise ValueError(f"Preset inconnu {preset!r} (choix : {', '.join(sorted(PRESETS))})")
+    reglage = PRESETS[preset]
+    if demande.get("distance") is not None:
+        distance = _nombre(demande["distance"], "distance")
+        if distance <= 0:
+            raise ValueError("distance doit être positive")
+        reglage = replace(reglage, distance=distance)
+    gravite = demande.get("gravite", "angle")
+    if gravite not in ("angle", "rayon"):
+        raise ValueError(f"gravite attendue : angle ou rayon, pas {gravite!r}")
+    if gravite == "rayon":
+        reglage = replace(reglage, rayons=ParametresRayon())
+    if demande.get("repere_metrique"):
+        reglage = replace(reglage, virages=replace(reglage.virages, repere_metrique=True))
+    points_par_troncon = demande.get("points_par_troncon")
+    if points_par_troncon is not None:
+        points_par_troncon = int(_nombre(points_par_troncon, "points_par_troncon"))
+        if points_par_troncon < 2:
+            raise ValueError("points_par_troncon doit valoir au moins 2")
+    return points, points_par_troncon, reglage
+
+
+def _prechauffer():
+    """Premier travail de chaque processus de calcul : modules importés une fois pour toutes"""
+    import rally.rendu  # noqa: F401
+
+
+def calculer_roadbook(route, reglage, depart, arrivee):
+    """Analyse et carte HTML d'une route (processus de calcul) : dictionnaire prêt pour la réponse"""
+    from rally.itineraire import coordonnees_route
+    from rally.rendu import ecrire_carte
+
+    debut = time.perf_counter()
+    roadbook = reglage.analyser(coordonnees_route(route))
+    analyse = time.perf_counter() - debut
+
+    debut = time.perf_counter()
+    carte = io.StringIO()
+    ecrire_carte(carte, route, roadbook, depart, arrivee)
+    return {
+        "notes": [{"lat": lat, "lon": lon, "note": note, "angle": angle}
+                  for lat, lon, note, angle in roadbook.notes()],
+        "nb_points": len(roadbook.coordinates),
+        "nb_virages": len(roadbook),
+        "carte": carte.getvalue(),
+        "durees": {"analyse": analyse, "rendu": time.perf_counter() - debut},
+    }
+
+
+def _partager(en_cours, cle, coroutine):
+    """(tâche, partagée) : la tâche déjà en cours pour cette clé, sinon une nouvelle tâche coroutine()"""
+    tache = en_cours.get(cle)
+    if tache is not None:
+        return tache, True
+    tache = en_cours[cle] = asyncio.ensure_future(coroutine())
+    tache.add_done_callback(lambda _: en_cours.pop(cle, None))
+    return tache, False
+
+
+class Service:
+    """Roadbooks à la demande, routes et résultats gardés en mémoire.
+
+    `parcours(points, points_par_troncon)` est la coroutine de routage
+    (points en (lat, lon), route GeoJSON raccordée en retour).
+    """
+
+    def __init__(self, parcours, processus=None, capacite_routes=CAPACITE_ROUTES,
+                 capacite_roadbooks=CAPACITE_ROADBOOKS):
+        self.parcours = parcours
+        self.processus = processus or os.cpu_count() or 1
+        self.routes = Lru(capacite_routes)
+        self.roadbooks = Lru(capacite_roadbooks)
+        self.par_id = {}  # Identifiant public -> clé du roadbook
+        self.en_cours = {}  # Clé -> tâche du calcul en cours, partagée par les demandes identiques
+        self.routages_en_cours = {}  # Idem pour les routes (même itinéraire, autre réglage)
+        self.pool = None
+        self.nb_demandes = self.nb_partages = self.nb_routages = self.nb_calculs = self.nb_erreurs = 0
+        self.nb_routages_partages = 0
+        self.duree_routage = self.duree_calcul = 0.0
+
+    async def demarrer(self):
+        """Démarre les processus de calcul (imports faits avant la première demande)"""
+        self.pool = ProcessPoolExecutor(max_workers=self.processus)
+        boucle = asyncio.get_running_loop()
+        await asyncio.gather(*(boucle.run_in_executor(self.pool, _prechauffer) for _ in range(self.processus)))
+
+    async def arreter(self):
+        if self.pool is not None:
+            self.pool.shutdown(cancel_futures=True)
+            self.pool = None
+
+    async def roadbook(self, demande):
+        """Réponse (dictionnaire) à une demande de roadbook, depuis la mémoire ou calculée"""
+        points, points_par_troncon, reglage = lire_demande(demande)
+        self.nb_demandes += 1
+        cle = (points, points_par_troncon, reglage)
+        resultat = self.roadbooks.lire(cle)
+        if resultat is not None:
+            return {**resultat, "cache": "roadbook"}
+        tache, partagee = _partager(self.en_cours, cle, lambda: self._calculer(cle))
+        if partagee:
+            self.nb_partages += 1
+            return {**await asyncio.shield(tache), "cache": "partage"}
+        return await asyncio.shield(tache)
+
+    async def _route(self, points, points_par_troncon):
+        cle = (points, points_par_troncon)
+        route = self.routes.lire(cle)
+        if route is not None:
+            return route, 0.0
+        debut = time.perf_counter()
+        tache, partagee = _partager(self.routages_en_cours, cle, lambda: self._router(cle))
+        self.nb_routages_partages += partagee
+        return await asyncio.shield(tache), time.perf_counter() - debut
+
+    async def _router(self, cle):
+        route = await self.parcours(*cle)
+        self.nb_routages += 1
+        self.routes.ecrire(cle, route)
+        return route
+
+    async def _calculer(self, cle):
+        points, points_par_troncon, reglage = cle
+        try:
+            route, routage = await self._route(points, points_par_troncon)
+            debut = time.perf_counter()
+            calcul = await asyncio.get_running_loop().run_in_executor(
+                self.pool, calculer_roadbook, route, reglage, points[0], points[-1])
+        except Exception:
+            self.nb_erreurs += 1
+            raise
+        self.nb_calculs += 1
+        self.duree_routage += routage
+        self.duree_calcul += time.perf_counter() - debut
+
+        identifiant = hashlib.sha1(repr(cle).encode()).hexdigest()[:16]
+        self.par_id[identifiant] = cle
+        carte = calcul.pop("carte")
+        resultat = {"id": identifiant, **calcul, "carte": f"/carte/{identifiant}",
+                    "durees": {"routage": routage, **calcul["durees"]}, "cache": "aucun" if routage else "route"}
+        self.roadbooks.ecrire(cle, {**resultat, "_html": carte})
+        if len(self.par_id) > 2 * self.roadbooks.capacite:
+            self.par_id = {i: c for i, c in self.par_id.items() if c in self.roadbooks.entrees}
+        return {**resultat, "_html": carte}
+
+    def retrouver(self, identifiant):
+        """Roadbook en mémoire d'après son identifiant public, ou None (inconnu ou évincé)"""
+        cle = self.par_id.get(identifiant)
+        resultat = None if cle is None else self.roadbooks.lire(cle)
+        if resultat is None:
+            self.par_id.pop(identifiant, None)
+        return resultat
+
+    def etat(self):
+        return {
+            "demandes": self.nb_demandes, "calculs": self.nb_calculs, "partages": self.nb_partages,
+            "routages": self.nb_routages,
+            "routages_partages": self.nb_routages_partages, "erreurs": self.nb_erreurs, "en_cours": len(self.en_cours),
+            "processus": self.processus, "routes": self.routes.etat(), "roadbooks": self.roadbooks.etat(),
+            "duree_routage": self.duree_routage, "duree_calcul": self.duree_calcul,
+        }
+
+
+def _publique(resultat):
+    return {cle: valeur for cle, valeur in resultat.items() if not cle.startswith("_")}
+
+
+def application(service):
+    """Application aiohttp exposant le service"""
+    from aiohttp import web
+
+    from rally.cache import RouteAbsenteDuCache
+    from rally.routage_async import ErreurRoutage
+
+    def reponse_json(donnees, status=200):
+        return web.json_response(donnees, status=status, dumps=lambda d: json.dumps(d, ensure_ascii=False))
+
+    async def poster_roadbook(requete):
+        try:
+            demande = await requete.json()
+        except ValueError:
+            return reponse_json({"erreur": "Corps JSON invalide"}, 400)
+        try:
+            return reponse_json(_publique(await service.roadbook(demande)))
+        except ValueError as exc:
+            return reponse_json({"erreur": str(exc)}, 400)
+        except RouteAbsenteDuCache as exc:
+            return reponse_json({"erreur": str(exc)}, 404)
+        except ErreurRoutage as exc:
+            return reponse_json({"erreur": f"routage : {exc}"}, 502)
+        except Exception as exc:
+            return reponse_json({"erreur": f"{type(exc).__name__} : {exc}"}, 500)
+
+    async def lire_roadbook(requete):
+        resultat = service.retrouver(requete.match_info["id"])
+        if resultat is None:
+            return reponse_json({"erreur": "Roadbook inconnu ou évincé de la mémoire"}, 404)
+        return reponse_json({**_publique(resultat), "cache": "roadbook"})
+
+    async def lire_carte(requete):
+        resultat = service.retrouver(requete.match_info["id"])
+        if resultat is None:
+            return web.Response(status=404, text="Roadbook inconnu ou évincé de la mémoire")
+        return web.Response(text=resultat["_html"], content_type="text/html")
+
+    async def lire_etat(requete):
+        return reponse_json(service.etat())
+
+    async def cycle(app):
+        await service.demarrer()
+        yield
+        await service.arreter()
+
+    app = web.Application()
+    app.router.add_post("/roadbook", poster_roadbook)
+    app.router.add_get("/roadbook/{id}", lire_roadbook)
+    app.router.add_get("/carte/{id}", lire_carte)
+    app.router.add_get("/etat", lire_etat)
+    app.cleanup_ctx.append(cycle)
+    return app
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m rally serveur",
+                                     description="Service HTTP local de roadbooks, caches gardés en mémoire")
+    parser.add_argument("--hote", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument("--processus", type=int, default=None, help="Processus de calcul (défaut : un par cœur)")
+    parser.add_argument("--capacite-routes", type=int, default=CAPACITE_ROUTES, help="Routes gardées en mémoire")
+    parser.add_argument("--capacite-roadbooks", type=int, default=CAPACITE_ROADBOOKS,
+                        help="Roadbooks (notes et carte) gardés en mémoire")
+    parser.add_argument("--url-routage", default=None,
+                        help="Serveur de routage compatible openrouteservice (défaut : api.openrouteservice.org)")
+    parser.add_argument("--requetes-par-minute", type=int, default=None,
+                        help="Débit maximal vers le routage (0 : illimité ; défaut : quota openrouteservice)")
+    parser.add_argument("--cache", default=None, help="Cache disque des itinéraires (SQLite)")
+    parser.add_argument("--hors-ligne", action="store_true", help="Uniquement le cache des itinéraires")
+    parser.add_argument("--cle-api", default=None)
+    parser.add_argument("--osm", default=None, help="Extrait OpenStreetMap (.osm, .osm.pbf) : routage local")
+    args = parser.parse_args(argv)
+
+    from aiohttp import web
+
+    from rally.cache import CHEMIN_CACHE, CacheItineraires
+
+    if args.osm or args.hors_ligne:
+        # Client bloquant (graphe local ou cache seul), gardé pour toute la durée du service
+        from rally.itineraire import creer_client, recuperer_route
+
+        client = creer_client(args.cle_api, hors_ligne=args.hors_ligne or None, osm=args.osm)
+
+        async def parcours(points, points_par_troncon):
+            return await asyncio.to_thread(recuperer_route, client, points[0], points[-1], points[1:-1],
+                                           points_par_troncon=points_par_troncon)
+    else:
+        from rally.assemblage import POINTS_PAR_TRONCON
+        from rally.routage_async import REQUETES_PAR_MINUTE, URL_ORS, ClientRoutageAsync
+
+        cle_api = args.cle_api or os.environ.get("ORS_API_KEY")
+        if not cle_api and args.url_routage is None:
+            parser.error("Clé openrouteservice manquante (variable ORS_API_KEY), ou --url-routage")
+        par_minute = REQUETES_PAR_MINUTE if args.requetes_par_minute is None else args.requetes_par_minute
+        client = ClientRoutageAsync(cle_api, url_base=args.url_routage or URL_ORS, requetes_par_minute=par_minute,
+                                    cache=CacheItineraires(args.cache or CHEMIN_CACHE))
+
+        async def parcours(points, points_par_troncon):
+            return await client.parcours(points, points_par_troncon=points_par_troncon or POINTS_PAR_TRONCON)
+
+        async def session(app):
+            async with client:
+                yield
+
+    service = Service(parcours, processus=args.processus, capacite_routes=args.capacite_routes,
+                      capacite_roadbooks=args.capacite_roadbooks)
+    app = application(service)
+    if not (args.osm or args.hors_ligne):
+        app.cleanup_ctx.insert(0, session)
+    print(f"🚦 Service de roadbooks sur http://{args.hote}:{args.port} ({service.processus} processus de calcul)",
+          flush=True)
+    web.run_app(app, host=args.hote, port=args.port, print=None)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,196 @@
+"""Simplification de la géométrie brute avant le rééchantillonnage.
+
+Les géométries openrouteservice contiennent des grappes de sommets presque
+alignés et un peu de bruit, que interpoler_points conserve tels quels et
+qui font apparaître de faux petits virages. La simplification retire, dans
+le repère métrique local (rally.projection), les sommets qui s'écartent de
+moins de `tolerance` mètres du tracé simplifié :
+  - "rdp" : Ramer–Douglas–Peucker, tous les intervalles encore ouverts
+    traités ensemble à chaque niveau (une passe NumPy par niveau) ;
+  - "visvalingam" : Visvalingam–Whyatt par passes, en retirant à chaque
+    passe tous les sommets dont le triangle avec leurs voisins est un
+    minimum local d'aire et dont le retrait laisse les sommets d'origine
+    qu'ils remplacent à moins de la tolérance.
+Les sommets conservés sont des sommets d'origine, à l'identique.
+
+Avec `lissage`, le tracé simplifié est ensuite remplacé par une spline de
+Catmull-Rom centripète passant par ses sommets, échantillonnée tous les
+`lissage` mètres : les virages deviennent des courbes régulières au lieu de
+lignes brisées.
+"""
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy as np
+
+from rally.projection import ProjectionLocale
+
+METHODES = ("rdp", "visvalingam")
+
+
+@dataclass(frozen=True)
+class ParametresSimplification:
+    """Tolérance (mètres) de la simplification et pas (mètres) de la spline de lissage éventuelle"""
+    tolerance: float = 2.0  # Écart maximal au tracé d'origine
+    methode: str = "rdp"  # "rdp" ou "visvalingam"
+    lissage: Optional[float] = None  # Pas d'échantillonnage de la spline, None : pas de lissage
+
+
+def _dedoublonner(xy):
+    """Masque des sommets gardés, sommets consécutifs confondus retirés"""
+    garder = np.ones(len(xy), dtype=bool)
+    garder[1:] = np.any(np.diff(xy, axis=0) != 0, axis=1)
+    return garder
+
+
+def _ecarts_intervalles(xy, debuts, fins):
+    """Carré de la distance de chaque sommet intérieur des intervalles (debuts[k], fins[k]) à leur corde.
+
+    Retourne (idx, groupe, premiers, d2) : sommets intérieurs bout à bout,
+    intervalle de chacun, rang du premier sommet de chaque intervalle et
+    carrés des distances au segment.
+    """
+    interieurs = fins - debuts - 1
+    groupe = np.repeat(np.arange(len(debuts)), interieurs)
+    premiers = np.cumsum(interieurs) - interieurs
+    idx = debuts[groupe] + 1 + np.arange(len(groupe)) - premiers[groupe]
+
+    a = xy[debuts][groupe]
+    ab = xy[fins][groupe] - a
+    ap = xy[idx] - a
+    norme2 = ab[:, 0] * ab[:, 0] + ab[:, 1] * ab[:, 1]
+    produit = ap[:, 0] * ab[:, 0] + ap[:, 1] * ab[:, 1]
+    t = np.clip(produit / np.where(norme2 > 0, norme2, 1.0), 0.0, 1.0)
+    ecart = ap - t[:, None] * ab
+    return idx, groupe, premiers, ecart[:, 0] * ecart[:, 0] + ecart[:, 1] * ecart[:, 1]
+
+
+def douglas_peucker(xy, tolerance):
+    """Masque des sommets conservés par Ramer–Douglas–Peucker (distance au segment, mètres)"""
+    n = len(xy)
+    garder = np.zeros(n, dtype=bool)
+    if n < 3:
+        garder[:] = True
+        return garder
+    garder[[0, -1]] = True
+    tolerance2 = tolerance * tolerance
+    debuts, fins = np.array([0]), np.array([n - 1])
+
+    while len(debuts):
+        ouverts = fins - debuts > 1
+        debuts, fins = debuts[ouverts], fins[ouverts]
+        if not len(debuts):
+            break
+
+        # Sommets intérieurs de tous les intervalles, bout à bout
+        idx, groupe, premiers, d2 = _ecarts_intervalles(xy, debuts, fins)
+
+        # Sommet le plus éloigné de chaque intervalle (le premier en cas d'égalité)
+        d2_max = np.maximum.reduceat(d2, premiers)
+        maximums = np.flatnonzero(d2 == d2_max[groupe])
+        maximums = maximums[np.r_[True, groupe[maximums[1:]] != groupe[maximums[:-1]]]]
+        coupes = idx[maximums]
+
+        a_couper = d2_max > tolerance2
+        coupes = coupes[a_couper]
+        garder[coupes] = True
+        debuts = np.concatenate((debuts[a_couper], coupes))
+        fins = np.concatenate((coupes, fins[a_couper]))
+    return garder
+
+
+def visvalingam(xy, tolerance):
+    """Masque des sommets conservés par Visvalingam–Whyatt, par passes vectorisées.
+
+    À chaque passe, un sommet est candidat si l'aire du triangle qu'il forme
+    avec ses voisins est un minimum local et si sa distance à la corde des
+    voisins est inférieure à `tolerance`. Dans une suite de candidats à aire
+    égale (portion droite), un sur deux est retenu : le nombre de passes
+    reste logarithmique. Un candidat n'est retiré que si tous les sommets
+    d'origine entre ses voisins, déjà retirés compris, restent à moins de
+    `tolerance` de la nouvelle corde : l'écart ne s'accumule pas d'une passe
+    à l'autre.
+    """
+    n = len(xy)
+    indices = np.arange(n)
+    tolerance2 = tolerance * tolerance
+    while len(indices) > 2:
+        p = xy[indices]
+        u = p[1:-1] - p[:-2]
+        v = p[2:] - p[1:-1]
+        corde = p[2:] - p[:-2]
+        aires = np.abs(u[:, 0] * v[:, 1] - u[:, 1] * v[:, 0]) / 2
+        base = np.hypot(corde[:, 0], corde[:, 1])
+        hauteurs = np.where(base > 0, 2 * aires / np.where(base > 0, base, 1.0), np.hypot(u[:, 0], u[:, 1]))
+
+        infini = np.array([np.inf])
+        retirer = ((hauteurs < tolerance)
+                   & (aires <= np.concatenate((infini, aires[:-1])))
+                   & (aires <= np.concatenate((aires[1:], infini))))
+        # Jamais deux voisins dans la même passe : un sur deux dans chaque suite de sommets retirés
+        debut_suite = retirer & ~np.concatenate(([False], retirer[:-1]))
+        rang = np.arange(len(retirer))
+        rang -= np.maximum.accumulate(np.where(debut_suite, rang, 0))
+        retirer &= rang % 2 == 0
+
+        # Écart réel au tracé simplifié : les intervalles des candidats sont disjoints
+        candidats = np.flatnonzero(retirer)
+        if len(candidats):
+            _, _, premiers, d2 = _ecarts_intervalles(xy, indices[candidats], indices[candidats + 2])
+            retirer[candidats[np.maximum.reduceat(d2, premiers) >= tolerance2]] = False
+        if not retirer.any():
+            break
+
+        garder = np.ones(len(indices), dtype=bool)
+        garder[1:-1] = ~retirer
+        indices = indices[garder]
+
+    garder = np.zeros(n, dtype=bool)
+    garder[indices] = True
+    return garder
+
+
+def catmull_rom(xy, pas, alpha=0.5):
+    """Spline de Catmull-Rom (centripète pour alpha = 0,5) passant par les points, tous les `pas` mètres environ"""
+    xy = xy[_dedoublonner(xy)]
+    if len(xy) < 3:
+        return xy.copy()
+    # Points fantômes aux extrémités, dans le prolongement du premier et du dernier segment
+    p = np.concatenate((2 * xy[:1] - xy[1:2], xy, 2 * xy[-1:] - xy[-2:-1]))
+    corde = np.hypot(*np.diff(p, axis=0).T)
+    noeuds = np.concatenate(([0.0], np.cumsum(corde ** alpha)))
+
+    # Paramètres des échantillons de chaque segment xy[k] -> xy[k + 1]
+    longueurs = corde[1:-1]
+    nombres = np.maximum(1, np.ceil(longueurs / pas)).astype(np.int64)
+    k = np.repeat(np.arange(len(longueurs)), nombres)
+    fraction = (np.arange(len(k)) - np.repeat(np.cumsum(nombres) - nombres, nombres)) / nombres[k]
+    t0, t1, t2, t3 = noeuds[k], noeuds[k + 1], noeuds[k + 2], noeuds[k + 3]
+    t = (t1 + fraction * (t2 - t1))[:, None]
+    t0, t1, t2, t3 = t0[:, None], t1[:, None], t2[:, None], t3[:, None]
+    p0, p1, p2, p3 = p[k], p[k + 1], p[k + 2], p[k + 3]
+
+    # Algorithme de Barry et Goldman
+    a1 = ((t1 - t) * p0 + (t - t0) * p1) / (t1 - t0)
+    a2 = ((t2 - t) * p1 + (t - t1) * p2) / (t2 - t1)
+    a3 = ((t3 - t) * p2 + (t - t2) * p3) / (t3 - t2)
+    b1 = ((t2 - t) * a1 + (t - t0) * a2) / (t2 - t0)
+    b2 = ((t3 - t) * a2 + (t - t1) * a3) / (t3 - t1)
+    courbe = ((t2 - t) * b1 + (t - t1) * b2) / (t2 - t1)
+    return np.concatenate((courbe, xy[-1:]))
+
+
+def simplifier(coordinates, params):
+    """Géométrie (lon, lat) simplifiée, puis lissée si params.lissage"""
+    if params.methode not in METHODES:
+        raise ValueError(f"Méthode de simplification inconnue : {params.methode!r} (attendu : {', '.join(METHODES)})")
+    pts = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+    pts = pts[_dedoublonner(pts)]
+    if len(pts) < 3:
+        return pts
+    projection = ProjectionLocale.centree(pts)
+    xy = projection.projeter(pts)
+    garder = (douglas_peucker if params.methode == "rdp" else visvalingam)(xy, params.tolerance)
+    if params.lissage is None:
+        return pts[garder]
+    return projection.deprojeter(catmull_rom(xy[garder], params.lissage))
@@ -0,0 +1,321 @@
+"""Carte à niveaux de détail pour les longues étapes et les rallyes entiers.
+
+ecrire_carte met tous les points et tous les virages dans une seule page :
+au-delà de quelques centaines de kilomètres, le navigateur ne suit plus.
+Ici, chaque étape est simplifiée (Douglas-Peucker, rally.simplification) à
+quelques niveaux de zoom et découpée en tuiles du quadrillage Web Mercator
+habituel (z/x/y). Une petite page Leaflet ne charge que les tuiles du niveau
+courant qui recouvrent la vue.
+
+    from rally.tuiles import ecrire_carte_tuiles
+    ecrire_carte_tuiles("rendu_html/rallye", [("ES1", roadbook, coordonnees_route(route))])
+
+Chaque tuile est un fichier .js qui appelle tuile("z/x/y", [features GeoJSON]).
+Une page ouverte directement depuis le disque (file://) peut en effet
+charger des scripts, alors que fetch() lui est refusé. Les étapes sont
+traitées une à une, comme dans rally.export : chacune ajoute ses features à
+la fin des tuiles qu'elle touche, et la mémoire reste celle d'une étape.
+Les couleurs des notes sont celles du roadbook, comme dans ecrire_carte.
+"""
+import json
+import os
+import shutil
+from typing import NamedTuple
+
+import numpy as np
+
+from rally.profilage import compter
+from rally.projection import ProjectionLocale
+from rally.roadbook import TYPES_RELIEF, libelle_note
+from rally.simplification import douglas_peucker
+
+LEAFLET = "https://cdn.jsdelivr.net/npm/leaflet@1.9.3/dist"
+COULEUR_ROUTE = "#3388ff"
+COULEURS_RELIEF = {"bosse": "#8c510a", "creux": "#01665e", "compression": "#2166ac"}
+METRES_PAR_PIXEL = 156543.03392804097  # Au zoom 0, à l'équateur (tuiles de 256 pixels)
+TOLERANCE_PIXELS = 0.5  # Écart maximal du tracé simplifié, en pixels écran, au zoom le plus fort du niveau
+
+
+class Niveau(NamedTuple):
+    """Niveau de détail, utilisé du zoom `zoom` jusqu'au niveau suivant"""
+    zoom: int
+    notes_virages: int  # Virages tracés en couleur jusqu'à cette note (0 : aucun, 6 : tous)
+    notes_marqueurs: int  # Marqueurs de virage jusqu'à cette note ; relief avec 6
+    points: bool = False  # Nuage des points rééchantillonnés
+    simplifier: bool = True  # False : tracés complets
+
+
+NIVEAUX = (
+    Niveau(5, notes_virages=0, notes_marqueurs=0),
+    Niveau(9, notes_virages=2, notes_marqueurs=0),
+    Niveau(12, notes_virages=6, notes_marqueurs=2),
+    Niveau(14, notes_virages=6, notes_marqueurs=6, points=True, simplifier=False),
+)
+
+
+def tuiles_flottantes(lonlat, zoom):
+    """Coordonnées (x, y) Web Mercator en unités de tuile au zoom donné ; la partie entière est la tuile"""
+    lonlat = np.asarray(lonlat, dtype=np.float64).reshape(-1, 2)
+    n = 2.0 ** zoom
+    x = (lonlat[:, 0] + 180.0) / 360.0 * n
+    y = (1.0 - np.arcsinh(np.tan(np.radians(lonlat[:, 1]))) / np.pi) / 2.0 * n
+    return x, y
+
+
+def morceaux(x, y):
+    """Découpe une polyligne (unités de tuile) en suites de segments consécutifs par tuile.
+
+    Un segment appartient à toutes les tuiles que touche son rectangle
+    englobant. Retourne (tx, ty, debut, fin) : la tuile et les sommets
+    debut..fin (inclus) de chaque morceau.
+    """
+    ix, iy = np.floor(x).astype(np.int64), np.floor(y).astype(np.int64)
+    if len(ix) < 2:
+        return ix, iy, np.zeros(len(ix), dtype=np.int64), np.zeros(len(ix), dtype=np.int64)
+    x0, x1 = np.minimum(ix[:-1], ix[1:]), np.maximum(ix[:-1], ix[1:])
+    y0, y1 = np.minimum(iy[:-1], iy[1:]), np.maximum(iy[:-1], iy[1:])
+    largeur = x1 - x0 + 1
+    nombres = largeur * (y1 - y0 + 1)
+    segment = np.repeat(np.arange(len(nombres)), nombres)
+    rang = np.arange(len(segment)) - np.repeat(np.cumsum(nombres) - nombres, nombres)
+    tx = x0[segment] + rang % largeur[segment]
+    ty = y0[segment] + rang // largeur[segment]
+
+    ordre = np.lexsort((segment, ty, tx))
+    tx, ty, segment = tx[ordre], ty[ordre], segment[ordre]
+    nouveau = np.ones(len(segment), dtype=bool)
+    nouveau[1:] = (tx[1:] != tx[:-1]) | (ty[1:] != ty[:-1]) | (segment[1:] != segment[:-1] + 1)
+    debuts = np.flatnonzero(nouveau)
+    fins = np.append(debuts[1:], len(segment)) - 1
+    return tx[debuts], ty[debuts], segment[debuts], segment[fins] + 1
+
+
+def _json(objet):
+    return json.dumps(objet, ensure_ascii=False, separators=(",", ":"))
+
+
+def _ligne(points, proprietes):
+    coordonnees = ",".join(f"[{lon:.6f},{lat:.6f}]" for lon, lat in points)
+    return f'{{"type":"Feature","geometry":{{"type":"LineString","coordinates":[{coordonnees}]}},' \
+           f'"properties":{_json(proprietes)}}}'
+
+
+def _point(lon, lat, proprietes):
+    return f'{{"type":"Feature","geometry":{{"type":"Point","coordinates":[{lon:.6f},{lat:.6f}]}},' \
+           f'"properties":{_json(proprietes)}}}'
+
+
+class _Tuiles:
+    """Features d'une étape regroupées par tuile, puis ajoutées à la fin des fichiers"""
+
+    def __init__(self, dossier):
+        self.dossier = dossier
+        self.features = {}
+        self.existantes = {}  # zoom -> {"x/y"}
+        self.nb_features = 0
+
+    def ajouter(self, zoom, tx, ty, feature):
+        self.features.setdefault((zoom, int(tx), int(ty)), []).append(feature)
+        self.nb_features += 1
+
+    def ajouter_lignes(self, zoom, lonlat, masque, proprietes):
+        """Polyligne (sommets retenus par `masque`) découpée selon les tuiles du zoom"""
+        points = lonlat[masque]
+        for tx, ty, debut, fin in zip(*morceaux(*tuiles_flottantes(points, zoom))):
+            self.ajouter(zoom, tx, ty, _ligne(points[debut:fin + 1], proprietes))
+
+    def vider(self):
+        for (zoom, tx, ty), features in self.features.items():
+            cle = f"{zoom}/{tx}/{ty}"
+            dossier = os.path.join(self.dossier, str(zoom), str(tx))
+            os.makedirs(dossier, exist_ok=True)
+            with open(os.path.join(dossier, f"{ty}.js"), "a", encoding="utf-8") as f:
+                f.write(f'tuile("{cle}",[\n' + ",\n".join(features) + "]);\n")
+            self.existantes.setdefault(zoom, set()).add(f"{tx}/{ty}")
+        self.features.clear()
+
+
+def _tolerance(zoom, lat):
+    """Tolérance de simplification (mètres) pour un affichage jusqu'au zoom donné, à la latitude de l'étape"""
+    return TOLERANCE_PIXELS * METRES_PAR_PIXEL * np.cos(np.radians(lat)) / 2.0 ** zoom
+
+
+def _ajouter_etape(tuiles, nom, roadbook, geometrie, niveaux):
+    coordinates = np.asarray(roadbook.coordinates, dtype=np.float64).reshape(-1, 2)
+    route = coordinates if geometrie is None else np.asarray(geometrie, dtype=np.float64).reshape(-1, 2)
+    if len(route) < 2:
+        return
+    projection = ProjectionLocale.centree(route)
+    xy_route, xy_points = projection.projeter(route), projection.projeter(coordinates)
+    table = roadbook.table
+    couleurs = roadbook.params.couleurs
+    sommet = roadbook.params.marqueurs == "sommet"
+
+    for niveau, suivant in zip(niveaux, [*niveaux[1:], None]):
+        # Le niveau sert jusqu'au zoom précédant le suivant : la tolérance est celle de ce zoom
+        zoom_max = niveau.zoom if suivant is None else suivant.zoom - 1
+        tolerance = _tolerance(zoom_max, projection.lat0) if niveau.simplifier else 0.0
+        garder = douglas_peucker(xy_route, tolerance) if tolerance else np.ones(len(route), dtype=bool)
+        tuiles.ajouter_lignes(niveau.zoom, route, garder, {"couleur": COULEUR_ROUTE, "epaisseur": 3, "popup": nom})
+
+        # Virages : tracé simplifié au même niveau, extrémités toujours conservées
+        retenus = table[table["note"] <= max(niveau.notes_virages, niveau.notes_marqueurs)]
+        if len(retenus):
+            garder = douglas_peucker(xy_points, tolerance) if tolerance else np.ones(len(coordinates), dtype=bool)
+            garder[retenus["index_debut"]] = garder[retenus["index_fin"]] = True
+        for ligne in retenus:
+            note = int(ligne["note"])
+            direction = "droite" if np.signbit(ligne["angle"]) else "gauche"
+            libelle = libelle_note(note, direction)
+            angle = int(abs(ligne["angle"]))
+            proprietes = {"note": libelle, "angle": angle, "distance": round(float(ligne["longueur"]), 1),
+                          "couleur": couleurs[6 - note], "epaisseur": 5, "popup": f"{nom} : {libelle} ({angle}°)"}
+            debut, fin = int(ligne["index_debut"]), int(ligne["index_fin"])
+            if note <= niveau.notes_virages:
+                tuiles.ajouter_lignes(niveau.zoom, coordinates[debut:fin + 1], garder[debut:fin + 1], proprietes)
+            if note <= niveau.notes_marqueurs:
+                if sommet:
+                    marqueurs = [(int(ligne["index"]), proprietes["popup"])]
+                else:
+                    marqueurs = [(debut, f"{nom} : Début {libelle} (Distance: {ligne['longueur']:.0f}m)"),
+                                 (fin, f"{nom} : Fin {libelle} (Distance: {ligne['longueur']:.0f}m)")]
+                for index, popup in marqueurs:
+                    lon, lat = coordinates[index]
+                    (tx,), (ty,) = tuiles_flottantes((lon, lat), niveau.zoom)
+                    tuiles.ajouter(niveau.zoom, int(tx), int(ty), _point(lon, lat, {**proprietes, "popup": popup}))
+
+        if niveau.notes_marqueurs >= 6:
+            for relief in roadbook.reliefs:
+                type_ = TYPES_RELIEF[relief["type"]]
+                popup = f"{nom} : {type_} (rayon {relief['rayon']:.0f} m, pente {relief['pente']:+.0f} %)"
+                (tx,), (ty,) = tuiles_flottantes((relief["lon"], relief["lat"]), niveau.zoom)
+                tuiles.ajouter(niveau.zoom, int(tx), int(ty), _point(
+                    float(relief["lon"]), float(relief["lat"]), {"couleur": COULEURS_RELIEF[type_], "popup": popup}))
+
+        # Nuage de points : un MultiPoint par tuile
+        if niveau.points:
+            tx, ty = (np.floor(c).astype(np.int64) for c in tuiles_flottantes(coordinates, niveau.zoom))
+            ordre = np.lexsort((ty, tx))
+            coupes = np.flatnonzero((np.diff(tx[ordre]) != 0) | (np.diff(ty[ordre]) != 0)) + 1
+            for groupe in np.split(ordre, coupes):
+                points = ",".join(f"[{lon:.6f},{lat:.6f}]" for lon, lat in coordinates[np.sort(groupe)])
+                tuiles.ajouter(niveau.zoom, tx[groupe[0]], ty[groupe[0]],
+                               f'{{"type":"Feature","geometry":{{"type":"MultiPoint","coordinates":[{points}]}},'
+                               f'"properties":{{"points":true}}}}')
+    tuiles.vider()
+
+
+def ecrire_carte_tuiles(dossier, etapes, niveaux=NIVEAUX):
+    """Écrit dossier/index.html et les tuiles dossier/tuiles/z/x/y.js.
+
+    `etapes` est un itérable de (nom, roadbook) ou (nom, roadbook, géométrie
+    (lon, lat) de la route) ; sans géométrie, la route tracée est celle des
+    points rééchantillonnés du roadbook. Retourne le nombre de tuiles écrites.
+    """
+    dossier_tuiles = os.path.join(dossier, "tuiles")
+    if os.path.isdir(dossier_tuiles):
+        shutil.rmtree(dossier_tuiles)  # Les tuiles sont écrites en ajout : repartir d'un dossier vide
+    os.makedirs(dossier_tuiles)
+    niveaux = sorted(niveaux)
+
+    tuiles = _Tuiles(dossier_tuiles)
+    bornes = [np.inf, np.inf, -np.inf, -np.inf]  # ouest, sud, est, nord
+    departs = []
+    for nom, roadbook, *geometrie in etapes:
+        geometrie = geometrie[0] if geometrie else None
+        _ajouter_etape(tuiles, nom, roadbook, geometrie, niveaux)
+        trace = np.asarray(roadbook.coordinates if geometrie is None else geometrie, dtype=np.float64).reshape(-1, 2)
+        if len(trace):
+            bornes = [min(bornes[0], trace[:, 0].min()), min(bornes[1], trace[:, 1].min()),
+                      max(bornes[2], trace[:, 0].max()), max(bornes[3], trace[:, 1].max())]
+            departs.append((nom, float(trace[0, 1]), float(trace[0, 0]), float(trace[-1, 1]), float(trace[-1, 0])))
+
+    nb_tuiles = sum(len(cles) for cles in tuiles.existantes.values())
+    compter("tuiles", nb_tuiles)
+    compter("features", tuiles.nb_features)
+    _ecrire_page(os.path.join(dossier, "index.html"), niveaux, tuiles.existantes, bornes, departs)
+    return nb_tuiles
+
+
+def _ecrire_page(chemin, niveaux, existantes, bornes, departs):
+    index = {str(n.zoom): sorted(existantes.get(n.zoom, ())) for n in niveaux}
+    limites = [[bornes[1], bornes[0]], [bornes[3], bornes[2]]] if np.isfinite(bornes[0]) else [[-60, -180], [75, 180]]
+    with open(chemin, "w", encoding="utf-8") as f:
+        f.write(f"""<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<meta name="viewport" content="width=device-width, initial-scale=1.0">
+<link rel="stylesheet" href="{LEAFLET}/leaflet.css">
+<script src="{LEAFLET}/leaflet.js"></script>
+<style>html, body, #carte {{ width: 100%; height: 100%; margin: 0; }}</style>
+</head>
+<body>
+<div id="carte"></div>
+<script>
+const NIVEAUX = {_json([n.zoom for n in niveaux])};
+const TUILES = Object.fromEntries(Object.entries({_json(index)}).map(([z, cles]) => [z, new Set(cles)]));
+const ETAPES = {_json(departs)};
+const carte = L.map("carte", {{preferCanvas: true}});
+L.tileLayer("https://tile.openstreetmap.org/{{z}}/{{x}}/{{y}}.png", {{
+  maxZoom: 19, attribution: "&copy; OpenStreetMap contributors"
+}}).addTo(carte);
+
+const toile = L.canvas({{padding: 0.5}});
+const calques = new Map();  // "z/x/y" -> calque de la tuile (chargée ou en cours)
+let visibles = new Set();
+
+function tuile(cle, features) {{
+  const calque = calques.get(cle);
+  L.geoJSON({{type: "FeatureCollection", features: features}}, {{
+    style: f => ({{color: f.properties.couleur, weight: f.properties.epaisseur, opacity: 0.9}}),
+    pointToLayer: (f, latlng) => f.properties.points
+      ? L.circleMarker(latlng, {{renderer: toile, radius: 2, color: "black", weight: 1, fill: true, fillOpacity: 0.6}})
+      : L.circleMarker(latlng, {{
+          radius: 6, color: f.properties.couleur, fillColor: f.properties.couleur, fillOpacity: 0.9
+        }}),
+    onEachFeature: (f, c) => {{ if (f.properties.popup) c.bindPopup(f.properties.popup); }}
+  }}).addTo(calque);
+}}
+
+function niveau(zoom) {{
+  return NIVEAUX.reduce((n, z) => (z <= zoom ? z : n), NIVEAUX[0]);
+}}
+
+function rafraichir() {{
+  const z = niveau(carte.getZoom());
+  const n = 2 ** z;
+  const b = carte.getBounds();
+  const tx = lon => Math.floor((lon + 180) / 360 * n);
+  const ty = lat => Math.floor((1 - Math.asinh(Math.tan(lat * Math.PI / 180)) / Math.PI) / 2 * n);
+  const nouvelles = new Set();
+  for (let x = tx(b.getWest()); x <= tx(b.getEast()); x++) {{
+    for (let y = ty(b.getNorth()); y <= ty(b.getSouth()); y++) {{
+      if (TUILES[z].has(`${{x}}/${{y}}`)) nouvelles.add(`${{z}}/${{x}}/${{y}}`);
+    }}
+  }}
+  for (const cle of visibles) {{
+    if (!nouvelles.has(cle)) carte.removeLayer(calques.get(cle));
+  }}
+  for (const cle of nouvelles) {{
+    if (!calques.has(cle)) {{
+      calques.set(cle, L.layerGroup());
+      const script = document.createElement("script");
+      script.src = `tuiles/${{cle}}.js`;
+      document.head.appendChild(script);
+    }}
+    calques.get(cle).addTo(carte);
+  }}
+  visibles = nouvelles;
+}}
+
+for (const [nom, lat1, lon1, lat2, lon2] of ETAPES) {{
+  L.marker([lat1, lon1]).bindPopup(`${{nom}} : départ`).addTo(carte);
+  L.marker([lat2, lon2]).bindPopup(`${{nom}} : arrivée`).addTo(carte);
+}}
+carte.on("moveend", rafraichir);
+carte.fitBounds({_json(limites)});
+</script>
+</body>
+</html>
+""")
@@ -0,0 +1,177 @@
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import numpy as np
+
+from rally.geodesie import longueurs_segments
+from rally.projection import TraceMetrique
+from rally.roadbook import Roadbook
+
+
+@dataclass(frozen=True)
+class ParametresVirage:
+    """Seuils du regroupement des points en virages (angles en degrés, distances en mètres)"""
+    seuil_angle_depart: float = 5  # Filtrage initial du point de départ du virage
+    seuil_angle_min: float = 10  # Angle minimal pour prolonger un virage dans la même direction
+    seuil_angle_coupure: float = 10  # En dessous, on arrête le regroupement
+    seuil_angle_total: float = 20  # Angle cumulé minimal pour retenir le virage
+    distance_max_virage: Optional[float] = 150  # None : pas de limite de longueur
+    ratio_min: Optional[float] = 1  # Angle par 10 m minimal, None : pas de contrôle
+    tolerance_correction: Optional[float] = 10  # Petite correction de sens comptée partiellement
+    poids_correction: float = 0.7
+    chevauchement: bool = True  # Reprendre à j - 2 plutôt qu'à j après un virage
+    bornes_notes: Tuple[float, ...] = (45, 75, 105, 135, 165)
+    couleurs: Tuple[str, ...] = ("lightgreen", "green", "orange", "darkorange", "red", "#800000")
+    marqueurs: str = "debut_fin"  # "debut_fin" : deux notes par virage, "sommet" : une seule
+    repere_metrique: bool = False  # Angles et longueurs en mètres (rally.projection) plutôt qu'en degrés
+
+
+def courbure(coordinates):
+    """Angle (degrés) et sens de rotation en chaque point de la polyligne (lon, lat).
+
+    Calcul vectorisé sur tout l'itinéraire : retourne (angles, gauche) de
+    longueur N, les extrémités valant 0 / False.
+    """
+    pts = np.asarray(coordinates, dtype=np.float64)
+    if len(pts) < 3:
+        return np.zeros(len(pts)), np.zeros(len(pts), dtype=bool)
+    return courbure_vecteurs(np.diff(pts, axis=0))
+
+
+def courbure_vecteurs(v):
+    """Comme courbure(), à partir des N - 1 vecteurs des segments"""
+    n = len(v) + 1
+    angles = np.zeros(n)
+    gauche = np.zeros(n, dtype=bool)
+    if n < 3:
+        return angles, gauche
+
+    v1, v2 = v[:-1], v[1:]
+    norme1 = np.sqrt(v1[:, 0] * v1[:, 0] + v1[:, 1] * v1[:, 1])
+    norme2 = np.sqrt(v2[:, 0] * v2[:, 0] + v2[:, 1] * v2[:, 1])
+    produit = v1[:, 0] * v2[:, 0] + v1[:, 1] * v2[:, 1]
+    cross = v1[:, 0] * v2[:, 1] - v1[:, 1] * v2[:, 0]
+
+    # Vecteur nul : angle 0 (comme calcul_angle)
+    nul = (norme1 == 0) | (norme2 == 0)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        cosinus = np.clip(produit / (norme1 * norme2), -1.0, 1.0)
+    angles[1:-1] = np.where(nul, 0.0, np.degrees(np.arccos(np.where(nul, 1.0, cosinus))))
+    gauche[1:-1] = cross > 0
+    return angles, gauche
+
+
+def mesurer_longueurs(coordinates, params):
+    """Longueur des segments (mètres) : géodésique, ou repère métrique local si params.repere_metrique"""
+    if params.repere_metrique:
+        return TraceMetrique(coordinates).longueurs
+    return longueurs_segments(coordinates)
+
+
+def mesurer(coordinates, params):
+    """(angles, gauche, longueurs) d'une polyligne (lon, lat), dans le repère choisi par params"""
+    if params.repere_metrique:
+        trace = TraceMetrique(coordinates)
+        return (*courbure_vecteurs(trace.vecteurs), trace.longueurs)
+    return (*courbure(coordinates), longueurs_segments(coordinates))
+
+
+def evaluer_departs(angles, gauche, longueurs, params):
+    """Évalue chaque point 1..N-2 comme départ de virage.
+
+    Chaque point de départ possible est évalué en parallèle : à chaque
+    itération, tous les virages encore ouverts avancent d'un point. Le nombre
+    d'itérations est donc la longueur du plus long virage, pas le nombre de
+    points. longueurs[k] est la longueur du segment (k, k + 1).
+
+    Retourne (retenu, total, distance, j) indexés par départ - 1 : virage
+    accepté, angle cumulé, longueur parcourue et indice de fin.
+    """
+    n = len(angles)
+    departs = np.arange(1, max(n - 1, 1))
+    angle_depart = angles[departs]
+    sens = gauche[departs]
+    total = angle_depart.copy()
+    distance = np.zeros(len(departs))
+    j = departs + 1
+    valide = angle_depart >= params.seuil_angle_depart
+    ouvert = valide & (j < n - 1)
+
+    while True:
+        idx = np.flatnonzero(ouvert)
+        if len(idx) == 0:
+            break
+        jj = j[idx]
+
+        distance[idx] += longueurs[jj - 1]
+        continuer = np.ones(len(idx), dtype=bool)
+        if params.distance_max_virage is not None:
+            continuer &= distance[idx] <= params.distance_max_virage
+
+        a = angles[jj]
+        continuer &= a >= params.seuil_angle_coupure
+        meme_sens = gauche[jj] == sens[idx]
+        prolonge = continuer & meme_sens & (a >= params.seuil_angle_min)
+        increment = np.where(prolonge, a, 0.0)
+
+        if params.tolerance_correction is not None:
+            correction = (continuer & ~prolonge & ~meme_sens
+                          & (np.abs(a - angle_depart[idx]) < params.tolerance_correction))
+            increment = np.where(correction, a * params.poids_correction, increment)
+            prolonge |= correction
+
+        total[idx] += increment
+        j[idx] = jj + prolonge
+        ouvert[idx] = prolonge & (j[idx] < n - 1)
+
+    retenu = valide & (total >= params.seuil_angle_total)
+    if params.ratio_min is not None:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            ratio = total / (distance / 10)
+        retenu &= ~((distance > 0) & (ratio < params.ratio_min))
+    return retenu, total, distance, j
+
+
+def reprise(index, index_fin, params):
+    """Point où reprend la recherche après un virage"""
+    return max(index + 1, index_fin - 2) if params.chevauchement else index_fin
+
+
+def grouper_virages(angles, gauche, longueurs, params):
+    """Regroupe les points consécutifs de même sens en virages (tableaux par virage)"""
+    n = len(angles)
+    if n < 3:
+        vide = np.zeros(0, dtype=np.int64)
+        return vide, vide, np.zeros(0, dtype=bool), np.zeros(0), np.zeros(0)
+
+    retenu, total, distance, j = evaluer_departs(angles, gauche, longueurs, params)
+    departs = np.arange(1, n - 1)
+
+    # Prochain départ retenu à partir de chaque point
+    candidats = np.where(retenu, departs, n)
+    suivant = np.minimum.accumulate(candidats[::-1])[::-1]
+
+    retenus = []
+    i = 1
+    while i < n - 1:
+        k = suivant[i - 1]
+        if k >= n - 1:
+            break
+        retenus.append(k - 1)
+        i = reprise(k, j[k - 1], params)
+
+    # Colonnes des virages retenus : index, fin, sens, angle cumulé, longueur
+    retenus = np.asarray(retenus, dtype=np.int64)
+    return departs[retenus], j[retenus], gauche[departs][retenus], total[retenus], distance[retenus]
+
+
+def detecter_virages(coordinates, params):
+    """Détecte les virages d'une polyligne (lon, lat) déjà rééchantillonnée.
+
+    Fonction pure : aucun accès réseau ni écriture de fichier.
+    """
+    coordinates = np.asarray(coordinates, dtype=np.float64).reshape(-1, 2)
+    angles, gauche, longueurs = mesurer(coordinates, params)
+    colonnes = grouper_virages(angles, gauche, longueurs, params)
+    abscisses = np.concatenate(([0.0], np.cumsum(longueurs)))
+    return Roadbook.depuis_colonnes(coordinates, params, *colonnes, abscisses)